@@ -6,6 +6,18 @@ from typing import Optional
 from ...interfaces.control_channel import IControlChannel
 from ...domain.entities.tunnel_config import TunnelConfig
 from ...common.errors import ConnectionError, AuthenticationError
+from ...common.compression import available_codecs
+from ...common.flow_control import DEFAULT_WINDOW_SIZE
+from ...common.handshake import (
+    Handshake,
+    PROTOCOL_VERSION,
+    CAP_FLOW_CONTROL,
+    CAP_COMPRESSION,
+    CAP_COMPACT_HEADER,
+    CAP_STRIPING,
+    CAP_RESUME,
+    CAP_HEARTBEAT
+)
 
 logger = logging.getLogger(__name__)
 
@@ -28,19 +40,14 @@ class ConnectToServerUseCase:
             AuthenticationError: If authentication fails
         """
         try:
-            # Connect to server
-            await self._control_channel.connect(config.server_host, config.server_port)
-            
-            # Send HELLO
-            await self._control_channel.send_hello(
-                config.token, config.local_host, config.local_port
-            )
-            
-            # Wait for WELCOME
-            public_port = await self._control_channel.wait_for_welcome()
-            
-            logger.info(f"Connected to server, public port: {public_port}")
-            return public_port
+            try:
+                return await self._register(config, self._create_handshake(config))
+            except AuthenticationError:
+                # Servers without the binary handshake drop the connection
+                # just like on a wrong token, so retry once with the legacy HELLO
+                logger.info("Server rejected binary HELLO, retrying with legacy HELLO")
+                await self._control_channel.disconnect()
+                return await self._register(config, None)
         
         except AuthenticationError:
             # Re-raise authentication errors without modification
@@ -50,4 +57,60 @@ class ConnectToServerUseCase:
             logger.error(f"Failed to connect to server: {e}")
             await self._control_channel.disconnect()
             raise ConnectionError(str(e))
+    
+    async def _register(self, config: TunnelConfig, handshake: Optional[Handshake]) -> int:
+        """Connect, send HELLO and wait for WELCOME."""
+        # Connect to server
+        await self._control_channel.connect(config.server_host, config.server_port)
+        
+        # Send HELLO
+        await self._control_channel.send_hello(
+            config.token, config.local_host, config.local_port, handshake
+        )
+        
+        # Wait for WELCOME
+        public_port = await self._control_channel.wait_for_welcome()
+        
+        # Stripe streams over as many connections as the server allows
+        _, welcome = self._control_channel.get_handshake()
+        if welcome.supports(CAP_STRIPING) and welcome.stripes > 1:
+            added = await self._control_channel.add_connections(
+                config.token, config.local_host, config.local_port, welcome.stripes - 1
+            )
+            logger.info(f"Using {added + 1} control connections")
+        
+        if welcome.supports(CAP_RESUME):
+            logger.info(f"Session can be resumed within {welcome.resume_grace:g}s after a lost connection")
+        if welcome.hostname:
+            logger.info(f"Reachable as {welcome.hostname} on port {public_port}")
+        elif handshake and handshake.hostname:
+            logger.warning(
+                f"Server did not register host name {handshake.hostname}, using a port of its own"
+            )
+        
+        logger.info(f"Connected to server, public port: {public_port}")
+        return public_port
+    
+    @staticmethod
+    def _create_handshake(config: TunnelConfig) -> Handshake:
+        """Protocol features this agent offers to the server."""
+        capabilities = CAP_FLOW_CONTROL | CAP_RESUME
+        if config.compact_header:
+            capabilities |= CAP_COMPACT_HEADER
+        if config.compression:
+            capabilities |= CAP_COMPRESSION
+        if config.connections > 1:
+            capabilities |= CAP_STRIPING
+        if config.keepalive > 0:
+            capabilities |= CAP_HEARTBEAT
+        return Handshake(
+            version=PROTOCOL_VERSION,
+            capabilities=capabilities,
+            window_size=DEFAULT_WINDOW_SIZE,
+            keepalive=config.keepalive,
+            compression=available_codecs() if config.compression else [],
+            stripes=config.connections,
+            hostname=config.hostname,
+            max_streams=config.max_streams
+        )
 
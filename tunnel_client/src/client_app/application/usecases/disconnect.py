@@ -21,7 +21,7 @@ class DisconnectUseCase:
         # Close all local connections
         connections = list(self._tunnel_state.active_connections.values())
         for conn in connections:
-            await conn.close()
+            await conn.close(abort=True)
         
         self._tunnel_state.active_connections.clear()
         
@@ -8,7 +8,11 @@ from ...interfaces.control_channel import IControlChannel
 from ...interfaces.local_transport import ILocalTransport
 from ...domain.entities.tunnel_state import TunnelState, LocalConnection
 from ...common.protocol import ProtocolCodec
-from ...common.framing import OPEN, DATA, CLOSE
+from ...common.framing import OPEN, DATA, CLOSE, WINDOW_UPDATE
+from ...common.flow_control import SendWindow, ReceiveWindow
+from ...common.send_queue import SendQueue, DEFAULT_HIGH_WATER
+from ...common.handshake import CAP_FLOW_CONTROL
+from ...common.read_size import AdaptiveReadSize, DEFAULT_MAX_READ_SIZE
 
 logger = logging.getLogger(__name__)
 
@@ -21,12 +25,20 @@ class StartTunnelUseCase:
         control_channel: IControlChannel,
         local_transport: ILocalTransport,
         tunnel_state: TunnelState,
-        codec: ProtocolCodec
+        codec: ProtocolCodec,
+        max_read_size: int = DEFAULT_MAX_READ_SIZE,
+        send_queue_size: int = DEFAULT_HIGH_WATER
     ):
         self._control_channel = control_channel
         self._local_transport = local_transport
         self._tunnel_state = tunnel_state
         self._codec = codec
+        self._max_read_size = max_read_size
+        # Sending is held back at the queue size and resumed at a quarter of it
+        self._high_water = send_queue_size
+        self._low_water = send_queue_size // 4
+        # Tasks connecting, relaying and closing streams
+        self._tasks: set[asyncio.Task] = set()
         
         # Initialize statistics
         self._tunnel_state._bytes_sent = 0
@@ -43,15 +55,41 @@ class StartTunnelUseCase:
             await self._handle_data(conn_id, payload)
         elif msg_type == CLOSE:
             await self._handle_close(conn_id)
+        elif msg_type == WINDOW_UPDATE:
+            self._handle_window_update(conn_id, self._codec.decode_window_update(payload))
         else:
             logger.warning(f"Unknown message type: {msg_type}")
     
     async def _handle_open(self, conn_id: int) -> None:
-        """Handle OPEN message - connect to local service."""
+        """
+        Handle OPEN message - connect to local service.
+        
+        The connection is made by a task of its own, so a slow local
+        service does not stall the other streams in the shared receive
+        loop. DATA arriving meanwhile waits on the connection.
+        """
         if conn_id in self._tunnel_state.active_connections:
             logger.warning(f"Connection {conn_id} already exists")
             return
         
+        # Create connection with the flow-control windows agreed in WELCOME
+        hello, welcome = self._control_channel.get_handshake()
+        if welcome.supports(CAP_FLOW_CONTROL):
+            send_window = SendWindow(welcome.window_size)
+            recv_window = ReceiveWindow(hello.window_size)
+        else:
+            send_window, recv_window = SendWindow(None), ReceiveWindow(None)
+        conn = LocalConnection(
+            conn_id=conn_id,
+            send_window=send_window,
+            recv_window=recv_window,
+            pending=[]
+        )
+        self._tunnel_state.add_connection(conn_id, conn)
+        self._spawn(self._run_connection(conn))
+    
+    async def _run_connection(self, conn: LocalConnection) -> None:
+        """Connect a stream to the local service and relay its data."""
         # Get local config from state (we'll need to store it)
         local_host = getattr(self._tunnel_state, '_local_host', 'localhost')
         local_port = getattr(self._tunnel_state, '_local_port', 8080)
@@ -59,60 +97,153 @@ class StartTunnelUseCase:
         try:
             # Connect to local service
             reader, writer = await self._local_transport.connect(local_host, local_port)
-            
-            # Create connection
-            conn = LocalConnection(conn_id=conn_id, reader=reader, writer=writer)
-            self._tunnel_state.add_connection(conn_id, conn)
-            
-            # Start relaying data
-            asyncio.create_task(self._relay_local_to_server(conn))
-            
-            logger.info(f"Opened connection {conn_id} to local service")
-        
         except Exception as e:
             logger.error(f"Failed to connect to local service: {e}")
-            # Send CLOSE to server
-            await self._control_channel.send_close(conn_id)
+            if self._is_active(conn):
+                self._tunnel_state.remove_connection(conn.conn_id)
+                # Send CLOSE to server
+                await self._control_channel.send_close(conn.conn_id)
+            return
+        
+        if not self._is_active(conn):
+            # Closed by the server while connecting
+            writer.transport.abort()
+            return
+        conn.reader = reader
+        conn.writer = writer
+        conn.send_queue = self._create_send_queue(conn)
+        pending, conn.pending = conn.pending, None
+        for payload in pending:
+            conn.send_queue.write(payload)
+        logger.info(f"Opened connection {conn.conn_id} to local service")
+        
+        # Start relaying data
+        await self._relay_local_to_server(conn)
+    
+    def _is_active(self, conn: LocalConnection) -> bool:
+        """Whether a stream is still open, and not replaced by a newer one with its id."""
+        return self._tunnel_state.active_connections.get(conn.conn_id) is conn
+    
+    def _spawn(self, coro) -> None:
+        """Run a stream's work in a task of its own."""
+        task = asyncio.ensure_future(coro)
+        self._tasks.add(task)
+        task.add_done_callback(self._task_done)
+    
+    def _task_done(self, task: asyncio.Task) -> None:
+        self._tasks.discard(task)
+        if not task.cancelled() and task.exception():
+            logger.error(f"Stream task failed: {task.exception()}")
     
     async def _handle_data(self, conn_id: int, payload: bytes) -> None:
-        """Handle DATA message - relay to local service."""
+        """
+        Handle DATA message - relay to local service.
+        
+        Does not wait for the local service: that would stall every other
+        stream in the shared receive loop. The data goes to the stream's
+        send queue, whose writer task hands it over as the service reads.
+        """
         conn = self._tunnel_state.active_connections.get(conn_id)
-        if not conn or not conn.writer:
+        if conn and conn.connecting:
+            # Credit for it returns once the local service has read it
+            conn.pending.append(payload)
+            self._tunnel_state._bytes_received += len(payload)
+            return
+        if not conn or not conn.writer or not conn.send_queue:
             logger.warning(f"Connection {conn_id} not found or closed")
             return
         
         try:
-            conn.writer.write(payload)
-            await conn.writer.drain()
-            # Update received bytes statistics
-            self._tunnel_state._bytes_received += len(payload)
+            conn.send_queue.write(payload)
         except Exception as e:
             logger.error(f"Failed to write to local service: {e}")
-            await self._close_connection(conn_id)
+            self._close_connection(conn_id)
+            return
+        # Update received bytes statistics
+        self._tunnel_state._bytes_received += len(payload)
+    
+    def _handle_window_update(self, conn_id: int, increment: int) -> None:
+        """Handle WINDOW_UPDATE message - resume sending on the stream."""
+        conn = self._tunnel_state.active_connections.get(conn_id)
+        if conn:
+            conn.send_window.grant(increment)
+    
+    def _create_send_queue(self, conn: LocalConnection) -> SendQueue:
+        """
+        Send queue of a stream.
+        
+        Flow-controlled streams return their credit as data is sent, so the
+        server stops sending once a window is queued. Without flow control
+        the control connection carrying the stream stops being read while
+        the queue is above its high-water mark.
+        """
+        if conn.recv_window.size is not None:
+            return SendQueue(
+                conn.writer,
+                self._high_water,
+                self._low_water,
+                on_sent=lambda size: self._return_credit(conn, size)
+            )
+        return SendQueue(
+            conn.writer,
+            self._high_water,
+            self._low_water,
+            on_pause=lambda: self._control_channel.pause_reading(conn.conn_id),
+            on_resume=lambda: self._control_channel.resume_reading(conn.conn_id)
+        )
+    
+    def _return_credit(self, conn: LocalConnection, size: int) -> None:
+        """Credit bytes sent to the local service back to the server."""
+        increment = conn.recv_window.delivered(size)
+        if increment:
+            self._spawn(self._send_window_update(conn.conn_id, increment))
+    
+    async def _send_window_update(self, conn_id: int, increment: int) -> None:
+        try:
+            await self._control_channel.send_window_update(conn_id, increment)
+        except Exception as e:
+            logger.debug(f"Failed to send WINDOW_UPDATE: {e}")
     
     async def _handle_close(self, conn_id: int) -> None:
         """Handle CLOSE message - close local connection."""
-        await self._close_connection(conn_id)
+        self._close_connection(conn_id)
     
-    async def _close_connection(self, conn_id: int) -> None:
-        """Close a connection."""
+    def _close_connection(self, conn_id: int) -> None:
+        """
+        Close a connection.
+        
+        The stream is forgotten at once and closed by a task of its own, so
+        a local service that stopped reading holds up nothing but itself
+        while its last data drains.
+        """
         conn = self._tunnel_state.active_connections.get(conn_id)
         if conn:
-            await conn.close()
             self._tunnel_state.remove_connection(conn_id)
+            self._spawn(conn.close())
             logger.info(f"Closed connection {conn_id}")
     
     async def _relay_local_to_server(self, conn: LocalConnection) -> None:
         """Relay data from local service to server."""
+        # DATA payloads never exceed what the server agreed to receive
+        _, welcome = self._control_channel.get_handshake()
+        read_size = AdaptiveReadSize(min(self._max_read_size, welcome.max_frame))
         try:
             while True:
                 if not conn.reader:
                     break
                 
-                data = await conn.reader.read(4096)
+                # Pause this stream while the server has no credit for it
+                credit = await conn.send_window.wait()
+                if not credit:
+                    break
+                
+                requested = min(read_size.size, credit)
+                data = await conn.reader.read(requested)
                 if not data:
                     break
+                read_size.update(len(data), requested)
                 
+                conn.send_window.consume(len(data))
                 await self._control_channel.send_data(conn.conn_id, data)
                 # Update sent bytes statistics
                 self._tunnel_state._bytes_sent += len(data)
@@ -121,7 +252,8 @@ class StartTunnelUseCase:
             logger.debug(f"Local->Server relay ended: {e}")
         finally:
             # Close connection
-            await self._close_connection(conn.conn_id)
+            if self._is_active(conn):
+                self._close_connection(conn.conn_id)
             # Notify server
             await self._control_channel.send_close(conn.conn_id)
     
@@ -0,0 +1,209 @@
+"""Per-frame DATA compression."""
+
+import asyncio
+import time
+import zlib
+from concurrent.futures import Executor
+from dataclasses import dataclass
+from typing import Callable, Optional
+
+from .errors import ProtocolError
+from .framing import FLAG_COMPRESSED, MAX_PAYLOAD
+
+try:
+    import zstandard
+except ImportError:  # optional dependency
+    zstandard = None
+
+try:
+    import lz4.frame as lz4_frame
+except ImportError:  # optional dependency
+    lz4_frame = None
+
+
+def _zlib_decompress(data: bytes) -> bytes:
+    decompressor = zlib.decompressobj()
+    result = decompressor.decompress(data, MAX_PAYLOAD)
+    if decompressor.unconsumed_tail or not decompressor.eof:
+        raise ProtocolError("Compressed payload is truncated or exceeds MAX_PAYLOAD")
+    return result
+
+
+def _zstd_compress(data: bytes) -> bytes:
+    return zstandard.ZstdCompressor(level=3).compress(data)
+
+
+def _zstd_decompress(data: bytes) -> bytes:
+    return zstandard.ZstdDecompressor().decompress(data, max_output_size=MAX_PAYLOAD)
+
+
+def _lz4_decompress(data: bytes) -> bytes:
+    decompressor = lz4_frame.LZ4FrameDecompressor()
+    result = decompressor.decompress(data, max_length=MAX_PAYLOAD)
+    if not decompressor.eof:
+        raise ProtocolError("Compressed payload is truncated or exceeds MAX_PAYLOAD")
+    return result
+
+
+# name -> (compress, decompress), in order of preference
+CODECS: dict[str, tuple[Callable[[bytes], bytes], Callable[[bytes], bytes]]] = {}
+if zstandard is not None:
+    CODECS['zstd'] = (_zstd_compress, _zstd_decompress)
+if lz4_frame is not None:
+    CODECS['lz4'] = (lz4_frame.compress, _lz4_decompress)
+CODECS['zlib'] = (lambda data: zlib.compress(data, 6), _zlib_decompress)
+
+
+def available_codecs() -> list[str]:
+    """Names of the compression codecs available here, most preferred first."""
+    return list(CODECS)
+
+
+def choose_codec(offered: list[str]) -> Optional[str]:
+    """Pick the first codec offered by the peer that is available here."""
+    for name in offered:
+        if name in CODECS:
+            return name
+    return None
+
+
+@dataclass
+class CompressionStats:
+    """Compression counters for one control connection."""
+    
+    codec: str
+    bytes_in: int = 0
+    bytes_out: int = 0
+    frames_compressed: int = 0
+    frames_skipped: int = 0
+    bytes_decompressed: int = 0
+    cpu_time: float = 0.0  # seconds spent compressing and decompressing
+    
+    @property
+    def ratio(self) -> float:
+        """Wire bytes per input byte for compressed DATA (lower is better)."""
+        return self.bytes_out / self.bytes_in if self.bytes_in else 1.0
+    
+    def as_dict(self) -> dict:
+        """Return the counters as a plain dict."""
+        return {
+            'codec': self.codec,
+            'bytes_in': self.bytes_in,
+            'bytes_out': self.bytes_out,
+            'ratio': self.ratio,
+            'frames_compressed': self.frames_compressed,
+            'frames_skipped': self.frames_skipped,
+            'bytes_decompressed': self.bytes_decompressed,
+            'cpu_time': self.cpu_time,
+        }
+
+
+class FrameCompressor:
+    """
+    Compresses DATA payloads of one control connection.
+    
+    Chunks large enough to be worth it are compressed in a thread pool, so
+    compression does not add latency to other streams on the event loop.
+    Payloads are always decompressed there: a small one may inflate to
+    MAX_PAYLOAD.
+    A stream whose chunks do not shrink (TLS, media, archives) stops being
+    compressed for a while; the back-off doubles every time a retry fails.
+    """
+    
+    MIN_SIZE = 256  # smaller chunks are sent as-is
+    OFFLOAD_SIZE = 16 * 1024  # smaller chunks are cheaper to compress inline
+    MIN_SAVING = 0.1  # compressed output must be at least 10% smaller
+    MAX_BACKOFF = 256  # chunks
+    
+    def __init__(self, codec: str, executor: Optional[Executor] = None):
+        self._compress, self._decompress = CODECS[codec]
+        self._executor = executor
+        self._stats = CompressionStats(codec=codec)
+        # conn_id -> (chunks left to skip, current back-off)
+        self._skip: dict[int, tuple[int, int]] = {}
+    
+    @property
+    def codec(self) -> str:
+        """Negotiated codec name."""
+        return self._stats.codec
+    
+    @property
+    def stats(self) -> CompressionStats:
+        """Compression counters."""
+        return self._stats
+    
+    async def compress(self, conn_id: int, data: bytes) -> tuple[int, bytes]:
+        """
+        Compress a DATA payload if it is worth it.
+        
+        Returns:
+            (flags, payload) - flags is FLAG_COMPRESSED or 0
+        """
+        size = len(data)
+        if size < self.MIN_SIZE or self._should_skip(conn_id):
+            self._stats.frames_skipped += 1
+            return (0, data)
+        
+        compressed, cpu_time = await self._run(self._timed_compress, data)
+        self._stats.cpu_time += cpu_time
+        
+        if len(compressed) > size * (1 - self.MIN_SAVING):
+            self._back_off(conn_id)
+            self._stats.frames_skipped += 1
+            return (0, data)
+        
+        self._skip.pop(conn_id, None)
+        self._stats.frames_compressed += 1
+        self._stats.bytes_in += size
+        self._stats.bytes_out += len(compressed)
+        return (FLAG_COMPRESSED, compressed)
+    
+    async def decompress(self, payload: bytes) -> bytes:
+        """Decompress a payload received with FLAG_COMPRESSED."""
+        try:
+            data, cpu_time = await self._run(self._timed_decompress, payload, offload=True)
+        except ProtocolError:
+            raise
+        except Exception as e:
+            raise ProtocolError(f"Failed to decompress payload: {e}")
+        self._stats.cpu_time += cpu_time
+        self._stats.bytes_decompressed += len(data)
+        return data
+    
+    def forget(self, conn_id: int) -> None:
+        """Drop per-stream state of a closed stream."""
+        self._skip.pop(conn_id, None)
+    
+    def _should_skip(self, conn_id: int) -> bool:
+        """Check (and advance) the back-off of an incompressible stream."""
+        state = self._skip.get(conn_id)
+        if state is None:
+            return False
+        remaining, backoff = state
+        if remaining <= 0:
+            return False
+        self._skip[conn_id] = (remaining - 1, backoff)
+        return True
+    
+    def _back_off(self, conn_id: int) -> None:
+        """Stop compressing a stream whose data does not shrink."""
+        _, backoff = self._skip.get(conn_id, (0, 8))
+        backoff = min(backoff * 2, self.MAX_BACKOFF)
+        self._skip[conn_id] = (backoff, backoff)
+    
+    async def _run(self, func, data: bytes, offload: bool = False):
+        if not offload and len(data) < self.OFFLOAD_SIZE:
+            return func(data)
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._executor, func, data)
+    
+    def _timed_compress(self, data: bytes) -> tuple[bytes, float]:
+        start = time.thread_time()
+        result = self._compress(data)
+        return result, time.thread_time() - start
+    
+    def _timed_decompress(self, data: bytes) -> tuple[bytes, float]:
+        start = time.thread_time()
+        result = self._decompress(data)
+        return result, time.thread_time() - start
+
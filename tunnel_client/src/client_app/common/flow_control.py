@@ -0,0 +1,103 @@
+"""Credit-based per-stream flow control."""
+
+import asyncio
+import sys
+from typing import Optional
+
+DEFAULT_WINDOW_SIZE = 256 * 1024
+
+
+class SendWindow:
+    """
+    Credit the peer has granted for sending DATA on one stream.
+    
+    The reader of a stream waits for credit before each read and never
+    reads more than the remaining credit, so a stream whose receiver is
+    slow pauses on its own while other streams keep flowing.
+    
+    A window of size None never runs out of credit; it is used when the
+    peer does not support flow control.
+    """
+    
+    def __init__(self, size: Optional[int] = DEFAULT_WINDOW_SIZE):
+        self._unlimited = size is None
+        self._credit = sys.maxsize if size is None else size
+        self._available = asyncio.Event()
+        self._available.set()
+        self._closed = False
+    
+    @property
+    def credit(self) -> int:
+        """Bytes that may be sent right now."""
+        return self._credit
+    
+    async def wait(self) -> int:
+        """
+        Wait until credit is available.
+        
+        Returns:
+            Available credit, or 0 if the window was closed
+        """
+        while self._credit <= 0 and not self._closed:
+            self._available.clear()
+            await self._available.wait()
+        return 0 if self._closed else self._credit
+    
+    def consume(self, size: int) -> None:
+        """Account for `size` bytes sent."""
+        if not self._unlimited:
+            self._credit -= size
+    
+    def grant(self, increment: int) -> None:
+        """Add credit received in a WINDOW_UPDATE."""
+        self._credit += increment
+        if self._credit > 0:
+            self._available.set()
+    
+    def close(self) -> None:
+        """Wake up a waiting reader; the stream is going away."""
+        self._closed = True
+        self._available.set()
+
+
+class ReceiveWindow:
+    """
+    Tracks bytes delivered to the local end of one stream.
+    
+    Credit is returned to the sender in batches of at least half a window,
+    so interactive streams do not produce one WINDOW_UPDATE per chunk.
+    A window of size None never returns credit.
+    """
+    
+    def __init__(self, size: Optional[int] = DEFAULT_WINDOW_SIZE):
+        self._size = size
+        self._threshold = max(1, size // 2) if size is not None else None
+        self._delivered = 0
+    
+    @property
+    def size(self) -> Optional[int]:
+        """Window size advertised to the sender (None = no flow control)."""
+        return self._size
+    
+    def delivered(self, size: int) -> int:
+        """
+        Account for `size` bytes handed to the local end.
+        
+        Returns:
+            Credit to grant back to the sender now, or 0
+        """
+        if self._threshold is None:
+            return 0
+        self._delivered += size
+        if self._delivered < self._threshold:
+            return 0
+        increment = self._delivered
+        self._delivered = 0
+        return increment
+
+
+def writer_is_congested(writer: asyncio.StreamWriter) -> bool:
+    """Check whether writer.drain() would block."""
+    transport = writer.transport
+    return transport.get_write_buffer_size() > transport.get_write_buffer_limits()[1]
+
@@ -11,6 +11,56 @@ WELCOME = 2
 OPEN = 3
 DATA = 4
 CLOSE = 5
+WINDOW_UPDATE = 6
+RESUME = 7  # per-stream offsets exchanged after a resumed WELCOME
+PING = 8  # heartbeat; the payload is echoed in PONG
+PONG = 9
+
+# The high nibble of the type byte carries per-frame flags
+TYPE_MASK = 0x0F
+FLAG_COMPRESSED = 0x80  # payload is compressed with the negotiated codec
+
+# Precompiled header: type (uint8) + conn_id (uint32) + length (uint32 BE)
+HEADER = struct.Struct('>BII')
+
+# Compact header: type (uint8) + conn_id (varint) + length (varint)
+COMPACT_HEADER_MIN_SIZE = 3
+_MAX_CONN_ID_VARINT = 5  # 32 bits
+_MAX_LENGTH_VARINT = 3  # 21 bits, enough for MAX_PAYLOAD
+
+
+def encode_varint(value: int) -> bytes:
+    """Encode an unsigned integer as a varint (7 bits per byte, low bits first)."""
+    if value < 0x80:
+        return bytes((value,))
+    if value < 0x4000:
+        return bytes(((value & 0x7F) | 0x80, value >> 7))
+    result = bytearray()
+    while value >= 0x80:
+        result.append((value & 0x7F) | 0x80)
+        value >>= 7
+    result.append(value)
+    return bytes(result)
+
+
+def _read_varint(buffer: bytearray, offset: int, end: int, max_size: int) -> Optional[tuple[int, int]]:
+    """
+    Read a varint from buffer[offset:end].
+    
+    Returns:
+        (value, offset after the varint) or None if the varint is incomplete
+    """
+    value = 0
+    shift = 0
+    for index in range(offset, min(end, offset + max_size)):
+        byte = buffer[index]
+        value |= (byte & 0x7F) << shift
+        if byte < 0x80:
+            return (value, index + 1)
+        shift += 7
+    if end - offset >= max_size:
+        raise ValueError("Varint too long")
+    return None
 
 
 class FrameEncoder:
@@ -26,49 +76,277 @@ class FrameEncoder:
         if len(payload) > MAX_PAYLOAD:
             raise ValueError(f"Payload too large: {len(payload)} > {MAX_PAYLOAD}")
         
-        header = struct.pack('>BII', message_type, conn_id, len(payload))
+        header = HEADER.pack(message_type, conn_id, len(payload))
         return header + payload
+    
+    @staticmethod
+    def encode_parts(message_type: int, conn_id: int, payload: bytes) -> tuple[bytes, bytes]:
+        """
+        Encode a message as separate header and payload buffers.
+        
+        The payload is returned as-is, so the frame can be written with
+        StreamWriter.writelines() without concatenating it first.
+        """
+        if len(payload) > MAX_PAYLOAD:
+            raise ValueError(f"Payload too large: {len(payload)} > {MAX_PAYLOAD}")
+        
+        return (HEADER.pack(message_type, conn_id, len(payload)), payload)
+
+
+# Compact headers of each size, packed by one precompiled struct
+_pack3, _pack4, _pack5, _pack6 = (
+    struct.Struct('B' * size).pack for size in range(3, 7)
+)
+
+
+def _compact_header(message_type: int, conn_id: int, length: int) -> bytes:
+    """Encode a compact frame header."""
+    if conn_id < 0x80:
+        if length < 0x80:
+            return _pack3(message_type, conn_id, length)
+        if length < 0x4000:
+            return _pack4(message_type, conn_id, length & 0x7F | 0x80, length >> 7)
+        return _pack5(
+            message_type, conn_id,
+            length & 0x7F | 0x80, (length >> 7) & 0x7F | 0x80, length >> 14
+        )
+    if conn_id < 0x4000:
+        low, high = conn_id & 0x7F | 0x80, conn_id >> 7
+        if length < 0x80:
+            return _pack4(message_type, low, high, length)
+        if length < 0x4000:
+            return _pack5(message_type, low, high, length & 0x7F | 0x80, length >> 7)
+        return _pack6(
+            message_type, low, high,
+            length & 0x7F | 0x80, (length >> 7) & 0x7F | 0x80, length >> 14
+        )
+    return bytes((message_type,)) + encode_varint(conn_id) + encode_varint(length)
+
+
+class CompactFrameEncoder:
+    """
+    Encodes messages into frames with the compact header.
+    
+    Format: type (uint8) + conn_id (varint) + length (varint) + payload.
+    A keystroke-sized frame on a low conn_id has a 3-byte header instead
+    of 9. Headers with a conn_id below 2**14 are packed by one precompiled
+    struct, as fast as the fixed header.
+    """
+    
+    header = staticmethod(_compact_header)
+    
+    @staticmethod
+    def encode(message_type: int, conn_id: int, payload: bytes) -> bytes:
+        """Encode a message into a compact binary frame."""
+        if len(payload) > MAX_PAYLOAD:
+            raise ValueError(f"Payload too large: {len(payload)} > {MAX_PAYLOAD}")
+        
+        return _compact_header(message_type, conn_id, len(payload)) + payload
+    
+    @staticmethod
+    def encode_parts(message_type: int, conn_id: int, payload: bytes) -> tuple[bytes, bytes]:
+        """Encode a message as separate compact header and payload buffers."""
+        if len(payload) > MAX_PAYLOAD:
+            raise ValueError(f"Payload too large: {len(payload)} > {MAX_PAYLOAD}")
+        
+        return (_compact_header(message_type, conn_id, len(payload)), payload)
 
 
 class FrameDecoder:
-    """Decodes binary frames into messages."""
+    """
+    Decodes binary frames into messages.
+    
+    Incoming data is appended to a bytearray and consumed through a read
+    cursor, so decoding a frame never re-slices the remaining buffer.
+    Regions that were already handed out as payload views are never
+    overwritten: when the buffer runs out of room, the unconsumed tail is
+    moved into a fresh buffer instead of being compacted in place.
     
-    HEADER_SIZE = 9  # 1 + 4 + 4
+    The header format can be switched to the compact one between two
+    frames; frames already in the buffer after the switch point are
+    decoded with the new format.
+    """
+    
+    HEADER_SIZE = HEADER.size  # 1 + 4 + 4
+    INITIAL_CAPACITY = 64 * 1024
+    MIN_RECEIVE_SIZE = 16 * 1024  # smallest free space offered by get_buffer()
     
     def __init__(self):
-        self._buffer = b''
+        self._buffer = bytearray(self.INITIAL_CAPACITY)
+        self._start = 0
+        self._end = 0
+        self._compact_header = False
+    
+    @property
+    def compact_header(self) -> bool:
+        """Whether frames use the compact header."""
+        return self._compact_header
+    
+    def set_compact_header(self, enabled: bool) -> None:
+        """Decode the following frames with the compact (or fixed) header."""
+        self._compact_header = enabled
     
     def feed(self, data: bytes) -> None:
         """Feed data into the decoder buffer."""
-        self._buffer += data
+        size = len(data)
+        if not size:
+            return
+        if self._end + size > len(self._buffer):
+            self._compact(size)
+        self._buffer[self._end:self._end + size] = data
+        self._end += size
     
-    def decode(self) -> Optional[tuple[int, int, bytes]]:
+    def get_buffer(self, size_hint: int = -1) -> memoryview:
         """
-        Try to decode a frame from the buffer.
+        Return the free space after the buffered data to receive into.
+        
+        Together with buffer_updated() this lets an asyncio.BufferedProtocol
+        receive straight into the decoder buffer instead of feeding a new
+        bytes object for every read.
+        """
+        wanted = max(size_hint, self.MIN_RECEIVE_SIZE)
+        if len(self._buffer) - self._end < wanted:
+            self._compact(wanted)
+        return memoryview(self._buffer)[self._end:]
+    
+    def buffer_updated(self, nbytes: int) -> None:
+        """Account for `nbytes` written into the buffer from get_buffer()."""
+        self._end += nbytes
+    
+    def _compact(self, incoming: int) -> None:
+        """Move unconsumed bytes into a new buffer with room for `incoming` more."""
+        pending = self._end - self._start
+        capacity = self.INITIAL_CAPACITY
+        while capacity < pending + incoming:
+            capacity *= 2
+        buffer = bytearray(capacity)
+        buffer[:pending] = memoryview(self._buffer)[self._start:self._end]
+        self._buffer = buffer
+        self._start = 0
+        self._end = pending
+    
+    def _next_frame(self) -> Optional[tuple[int, int, int, int]]:
+        """
+        Locate the next complete frame and advance the read cursor past it.
         
         Returns:
-            (message_type, conn_id, payload) or None if not enough data
+            (message_type, conn_id, payload_start, payload_end) or None
         """
-        if len(self._buffer) < self.HEADER_SIZE:
+        if self._compact_header:
+            return self._next_compact_frame()
+        
+        if self._end - self._start < self.HEADER_SIZE:
             return None
         
-        message_type, conn_id, payload_length = struct.unpack(
-            '>BII', self._buffer[:self.HEADER_SIZE]
+        message_type, conn_id, payload_length = HEADER.unpack_from(
+            self._buffer, self._start
         )
         
         if payload_length > MAX_PAYLOAD:
             raise ValueError(f"Payload length too large: {payload_length}")
         
-        total_size = self.HEADER_SIZE + payload_length
-        if len(self._buffer) < total_size:
+        payload_start = self._start + self.HEADER_SIZE
+        payload_end = payload_start + payload_length
+        if payload_end > self._end:
+            return None
+        
+        self._start = payload_end
+        return (message_type, conn_id, payload_start, payload_end)
+    
+    def _next_compact_frame(self) -> Optional[tuple[int, int, int, int]]:
+        """Like _next_frame(), for the compact header."""
+        end = self._end
+        if end - self._start < COMPACT_HEADER_MIN_SIZE:
+            return None
+        
+        buffer = self._buffer
+        start = self._start
+        message_type = buffer[start]
+        # One- and two-byte varints are read inline; longer ones, and
+        # headers cut short by the end of the buffer, by _read_varint()
+        conn_id = buffer[start + 1]
+        if conn_id < 0x80:
+            offset = start + 2
+        elif buffer[start + 2] < 0x80:
+            conn_id = conn_id & 0x7F | buffer[start + 2] << 7
+            offset = start + 3
+        else:
+            field = _read_varint(buffer, start + 1, end, _MAX_CONN_ID_VARINT)
+            if field is None:
+                return None
+            conn_id, offset = field
+            if conn_id > 0xFFFFFFFF:
+                raise ValueError(f"Connection id too large: {conn_id}")
+        
+        if offset + 1 < end:
+            payload_length = buffer[offset]
+            if payload_length < 0x80:
+                payload_start = offset + 1
+            elif buffer[offset + 1] < 0x80:
+                payload_length = payload_length & 0x7F | buffer[offset + 1] << 7
+                payload_start = offset + 2
+            else:
+                field = _read_varint(buffer, offset, end, _MAX_LENGTH_VARINT)
+                if field is None:
+                    return None
+                payload_length, payload_start = field
+        elif offset < end and buffer[offset] < 0x80:
+            payload_length = buffer[offset]
+            payload_start = offset + 1
+        else:
+            return None
+        
+        if payload_length > MAX_PAYLOAD:
+            raise ValueError(f"Payload length too large: {payload_length}")
+        
+        payload_end = payload_start + payload_length
+        if payload_end > end:
             return None
         
-        payload = self._buffer[self.HEADER_SIZE:total_size]
-        self._buffer = self._buffer[total_size:]
+        self._start = payload_end
+        return (message_type, conn_id, payload_start, payload_end)
+    
+    def decode(self) -> Optional[tuple[int, int, bytes]]:
+        """
+        Try to decode a frame from the buffer.
         
+        Returns:
+            (message_type, conn_id, payload) or None if not enough data
+        """
+        frame = self._next_frame()
+        if frame is None:
+            return None
+        message_type, conn_id, payload_start, payload_end = frame
+        payload = bytes(memoryview(self._buffer)[payload_start:payload_end])
         return (message_type, conn_id, payload)
     
+    def decode_all(self) -> list[tuple[int, int, memoryview]]:
+        """
+        Decode every complete frame currently in the buffer.
+        
+        Payloads are zero-copy memoryview slices of the decoder buffer. They
+        stay valid after later calls to feed(), so they can be passed
+        straight to StreamWriter.write().
+        
+        Returns:
+            List of (message_type, conn_id, payload) tuples, possibly empty
+        """
+        frames = []
+        view = None
+        next_frame = self._next_compact_frame if self._compact_header else self._next_frame
+        while True:
+            frame = next_frame()
+            if frame is None:
+                break
+            if view is None:
+                view = memoryview(self._buffer)
+            message_type, conn_id, payload_start, payload_end = frame
+            frames.append((message_type, conn_id, view[payload_start:payload_end]))
+        return frames
+    
     def clear(self) -> None:
         """Clear the decoder buffer."""
-        self._buffer = b''
+        self._buffer = bytearray(self.INITIAL_CAPACITY)
+        self._start = 0
+        self._end = 0
 
@@ -0,0 +1,143 @@
+"""Heartbeat of a control connection: PING/PONG, round-trip time and dead peers."""
+
+import asyncio
+import logging
+import struct
+import time
+from typing import Callable, Optional
+
+logger = logging.getLogger(__name__)
+
+# Intervals without any frame from the peer after which it is dead
+DEFAULT_MISSES = 3
+
+# PING payload: send time in microseconds of the sender's monotonic clock
+_TIMESTAMP = struct.Struct('>Q')
+
+
+class RttEstimator:
+    """
+    Smoothed round-trip time and jitter of a peer.
+    
+    Uses the estimator of TCP (RFC 6298): `srtt` moves 1/8 and `jitter`
+    (RTTVAR) 1/4 of the way towards each new sample.
+    """
+    
+    ALPHA = 1 / 8
+    BETA = 1 / 4
+    
+    def __init__(self):
+        self.samples = 0
+        self.last = 0.0  # seconds
+        self.srtt = 0.0
+        self.jitter = 0.0
+        self.min = 0.0
+    
+    def update(self, rtt: float) -> None:
+        """Add a round-trip sample in seconds."""
+        if not self.samples:
+            self.srtt = rtt
+            self.jitter = rtt / 2
+            self.min = rtt
+        else:
+            self.jitter += self.BETA * (abs(self.srtt - rtt) - self.jitter)
+            self.srtt += self.ALPHA * (rtt - self.srtt)
+            self.min = min(self.min, rtt)
+        self.last = rtt
+        self.samples += 1
+    
+    def as_dict(self) -> dict:
+        """Return the estimates as a plain dict (times in milliseconds)."""
+        return {
+            'samples': self.samples,
+            'rtt_ms': self.last * 1000,
+            'srtt_ms': self.srtt * 1000,
+            'jitter_ms': self.jitter * 1000,
+            'min_rtt_ms': self.min * 1000,
+        }
+
+
+class Heartbeat:
+    """
+    Liveness check of one control connection.
+    
+    Every `interval` seconds a PING carrying its send time is passed to
+    `send_ping(payload)`; the peer echoes the payload in a PONG, which
+    gives a round-trip sample for `rtt`. Any frame from the peer counts as
+    a sign of life, so a busy connection is never declared dead because a
+    PONG waits behind DATA. When nothing arrived for `misses` intervals in
+    a row, `on_dead()` is called once and the heartbeat stops. Intervals
+    are counted as timer wakeups rather than measured, so an event loop
+    that was blocked for a while does not count all that time as silence
+    before it had the chance to read what arrived meanwhile.
+    """
+    
+    def __init__(
+        self,
+        interval: float,
+        send_ping: Callable[[bytes], None],
+        on_dead: Callable[[], None],
+        misses: int = DEFAULT_MISSES,
+        rtt: Optional[RttEstimator] = None
+    ):
+        if interval <= 0 or misses < 1:
+            raise ValueError("interval must be positive and misses at least 1")
+        self._interval = interval
+        self._send_ping = send_ping
+        self._on_dead = on_dead
+        self._misses = misses
+        self.rtt = rtt if rtt is not None else RttEstimator()
+        self._seen = False  # frames arrived since the last interval
+        self._silent = 0  # intervals in a row without frames
+        self._task: Optional[asyncio.Task] = None
+    
+    def start(self) -> None:
+        """Start sending PINGs."""
+        self._silent = 0
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+    
+    async def close(self) -> None:
+        """Stop sending PINGs."""
+        task = self._task
+        self._task = None
+        if task and task is not asyncio.current_task():
+            task.cancel()
+            try:
+                await task
+            except asyncio.CancelledError:
+                pass
+    
+    def seen(self) -> None:
+        """Record that frames arrived from the peer."""
+        self._seen = True
+    
+    def pong(self, payload: bytes) -> None:
+        """Take a round-trip sample from the peer's PONG."""
+        if len(payload) != _TIMESTAMP.size:
+            return
+        sent = _TIMESTAMP.unpack(payload)[0] / 1e6
+        rtt = time.monotonic() - sent
+        if rtt >= 0:
+            self.rtt.update(rtt)
+    
+    async def _run(self) -> None:
+        """Send PINGs until the peer stops answering."""
+        while True:
+            await asyncio.sleep(self._interval)
+            if self._seen:
+                self._seen = False
+                self._silent = 0
+            else:
+                self._silent += 1
+            if self._silent >= self._misses:
+                self._task = None
+                self._on_dead()
+                return
+            try:
+                self._send_ping(_TIMESTAMP.pack(int(time.monotonic() * 1e6)))
+            except Exception as e:
+                # The connection is closing; its owner cleans up
+                logger.debug(f"Heartbeat stopped: {e}")
+                self._task = None
+                return
@@ -3,7 +3,27 @@
 import struct
 from typing import Optional
 
-from .framing import FrameEncoder, FrameDecoder, HELLO, WELCOME, OPEN, DATA, CLOSE
+from .framing import (
+    FrameEncoder,
+    CompactFrameEncoder,
+    FrameDecoder,
+    HELLO,
+    WELCOME,
+    OPEN,
+    DATA,
+    CLOSE,
+    WINDOW_UPDATE,
+    RESUME,
+    PING,
+    PONG
+)
+from . import handshake as handshake_format
+from .handshake import Handshake
+from .errors import ProtocolError
+
+_UINT32 = struct.Struct('>I')
+# RESUME entry: conn_id (uint32) + bytes received (uint64) + credit granted (uint64)
+_RESUME_ENTRY = struct.Struct('>IQQ')
 
 
 class ProtocolCodec:
@@ -13,26 +33,65 @@ class ProtocolCodec:
         self._encoder = FrameEncoder()
         self._decoder = FrameDecoder()
     
-    def encode_hello(self, token: str, local_host: str, local_port: int) -> bytes:
-        """Encode HELLO message."""
-        payload = f"{token}\0{local_host}\0{local_port}".encode('utf-8')
+    def encode_hello(
+        self,
+        token: str,
+        local_host: str,
+        local_port: int,
+        handshake: Optional[Handshake] = None
+    ) -> bytes:
+        """
+        Encode HELLO message.
+        
+        Without handshake parameters (or with a legacy version) the legacy
+        text format is used, which every server understands.
+        """
+        if handshake is None or handshake.is_legacy:
+            payload = f"{token}\0{local_host}\0{local_port}".encode('utf-8')
+        else:
+            payload = handshake_format.encode_hello(token, local_host, local_port, handshake)
         return self._encoder.encode(HELLO, 0, payload)
     
     def decode_hello(self, payload: bytes) -> tuple[str, str, int]:
         """Decode HELLO message."""
-        parts = payload.decode('utf-8').split('\0')
+        return self.decode_hello_handshake(payload)[:3]
+    
+    def decode_hello_handshake(self, payload: bytes) -> tuple[str, str, int, Handshake]:
+        """
+        Decode HELLO message of either format.
+        
+        Returns:
+            (token, local_host, local_port, handshake) - a legacy HELLO
+            yields a legacy Handshake without capabilities
+        """
+        if handshake_format.is_binary(payload):
+            return handshake_format.decode_hello(payload)
+        parts = bytes(payload).decode('utf-8').split('\0')
         if len(parts) != 3:
             raise ValueError("Invalid HELLO message format")
-        return (parts[0], parts[1], int(parts[2]))
+        return (parts[0], parts[1], int(parts[2]), Handshake())
     
-    def encode_welcome(self, public_port: int) -> bytes:
-        """Encode WELCOME message."""
-        payload = struct.pack('>I', public_port)
+    def encode_welcome(self, public_port: int, handshake: Optional[Handshake] = None) -> bytes:
+        """
+        Encode WELCOME message.
+        
+        The binary format must only be sent in answer to a binary HELLO.
+        """
+        if handshake is None or handshake.is_legacy:
+            payload = _UINT32.pack(public_port)
+        else:
+            payload = handshake_format.encode_welcome(public_port, handshake)
         return self._encoder.encode(WELCOME, 0, payload)
     
     def decode_welcome(self, payload: bytes) -> int:
         """Decode WELCOME message."""
-        return struct.unpack('>I', payload)[0]
+        return self.decode_welcome_handshake(payload)[0]
+    
+    def decode_welcome_handshake(self, payload: bytes) -> tuple[int, Handshake]:
+        """Decode WELCOME message of either format."""
+        if handshake_format.is_binary(payload):
+            return handshake_format.decode_welcome(payload)
+        return (_UINT32.unpack(payload)[0], Handshake())
     
     def encode_open(self, conn_id: int) -> bytes:
         """Encode OPEN message."""
@@ -46,6 +105,10 @@ class ProtocolCodec:
         """Encode DATA message."""
         return self._encoder.encode(DATA, conn_id, data)
     
+    def encode_data_parts(self, conn_id: int, data: bytes, flags: int = 0) -> tuple[bytes, bytes]:
+        """Encode DATA message as (header, payload) for vectored writes."""
+        return self._encoder.encode_parts(DATA | flags, conn_id, data)
+    
     def decode_data(self, payload: bytes) -> bytes:
         """Decode DATA message."""
         return payload
@@ -58,15 +121,80 @@ class ProtocolCodec:
         """Decode CLOSE message."""
         pass
     
+    def encode_window_update(self, conn_id: int, increment: int) -> bytes:
+        """Encode WINDOW_UPDATE message (credit in bytes for the stream)."""
+        return self._encoder.encode(WINDOW_UPDATE, conn_id, _UINT32.pack(increment))
+    
+    def decode_window_update(self, payload: bytes) -> int:
+        """Decode WINDOW_UPDATE message."""
+        return _UINT32.unpack(payload)[0]
+    
+    def encode_resume(self, streams: dict[int, tuple[int, int]]) -> bytes:
+        """
+        Encode RESUME message.
+        
+        Args:
+            streams: conn_id -> (bytes received, credit granted) of every open stream
+        """
+        payload = b''.join(
+            _RESUME_ENTRY.pack(conn_id, received, granted)
+            for conn_id, (received, granted) in streams.items()
+        )
+        return self._encoder.encode(RESUME, 0, payload)
+    
+    def decode_resume(self, payload: bytes) -> dict[int, tuple[int, int]]:
+        """Decode RESUME message."""
+        if len(payload) % _RESUME_ENTRY.size:
+            raise ProtocolError("Truncated RESUME entry")
+        return {
+            conn_id: (received, granted)
+            for conn_id, received, granted in _RESUME_ENTRY.iter_unpack(payload)
+        }
+    
+    def encode_ping(self, payload: bytes) -> bytes:
+        """Encode PING message."""
+        return self._encoder.encode(PING, 0, payload)
+    
+    def encode_pong(self, payload: bytes) -> bytes:
+        """Encode PONG message echoing the payload of a PING."""
+        return self._encoder.encode(PONG, 0, bytes(payload))
+    
     def feed(self, data: bytes) -> None:
         """Feed data to the decoder."""
         self._decoder.feed(data)
     
+    def get_buffer(self, size_hint: int = -1) -> memoryview:
+        """Get free decoder buffer space to receive into (BufferedProtocol)."""
+        return self._decoder.get_buffer(size_hint)
+    
+    def buffer_updated(self, nbytes: int) -> None:
+        """Account for bytes received into get_buffer()."""
+        self._decoder.buffer_updated(nbytes)
+    
     def decode_frame(self) -> Optional[tuple[int, int, bytes]]:
         """Decode a frame from the buffer."""
         return self._decoder.decode()
     
+    def decode_frames(self) -> list[tuple[int, int, memoryview]]:
+        """Decode all complete frames from the buffer (payloads are zero-copy views)."""
+        return self._decoder.decode_all()
+    
     def clear(self) -> None:
         """Clear the decoder buffer."""
         self._decoder.clear()
+    
+    @property
+    def compact_header(self) -> bool:
+        """Whether frames are encoded and decoded with the compact header."""
+        return self._decoder.compact_header
+    
+    def set_compact_header(self, enabled: bool) -> None:
+        """
+        Switch encoding and decoding to the compact (or fixed) header.
+        
+        Both peers switch right after WELCOME, which is the last frame
+        with the fixed header in each direction.
+        """
+        self._encoder = CompactFrameEncoder() if enabled else FrameEncoder()
+        self._decoder.set_compact_header(enabled)
 
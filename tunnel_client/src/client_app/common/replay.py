@@ -0,0 +1,69 @@
+"""Per-stream state for resuming a session after a lost control connection."""
+
+from collections import deque
+
+
+class ReplayBuffer:
+    """
+    Resumption state of one stream.
+    
+    Keeps the DATA sent on the stream until the peer acknowledges it with
+    WINDOW_UPDATE credit, and counts the bytes received and the credit
+    granted on the stream, which the peer needs after a reconnect. Credit
+    is only granted for data the receiver has delivered, so flow control
+    bounds the buffer to one window.
+    
+    All offsets are totals since the stream was opened, in bytes of
+    uncompressed payload.
+    """
+    
+    def __init__(self):
+        self._chunks: deque[bytes] = deque()
+        self._base = 0  # offset of the first buffered byte
+        self.sent = 0  # bytes sent
+        self.acked = 0  # credit received from the peer
+        self.received = 0  # bytes received from the peer
+        self.granted = 0  # credit granted to the peer
+    
+    @property
+    def size(self) -> int:
+        """Bytes kept for replay."""
+        return self.sent - self._base
+    
+    def append(self, data: bytes) -> None:
+        """Keep data sent on the stream."""
+        self._chunks.append(bytes(data))
+        self.sent += len(data)
+    
+    def acknowledge(self, increment: int) -> None:
+        """Drop data the peer acknowledged with a WINDOW_UPDATE."""
+        self.acked += increment
+        self._trim(self.acked)
+    
+    def resume(self, received: int, granted: int) -> tuple[int, list[bytes]]:
+        """
+        Apply the peer's RESUME entry for the stream.
+        
+        Args:
+            received: Bytes of this stream the peer has received
+            granted: Credit the peer has granted in total
+        
+        Returns:
+            Credit granted by WINDOW_UPDATEs that were lost, and the data
+            to send again
+        """
+        missing = max(0, granted - self.acked)
+        self.acknowledge(missing)
+        self._trim(received)
+        return missing, list(self._chunks)
+    
+    def _trim(self, offset: int) -> None:
+        """Drop buffered data before `offset`."""
+        while self._chunks and self._base < offset:
+            chunk = self._chunks[0]
+            if self._base + len(chunk) <= offset:
+                self._chunks.popleft()
+                self._base += len(chunk)
+            else:
+                self._chunks[0] = chunk[offset - self._base:]
+                self._base = offset
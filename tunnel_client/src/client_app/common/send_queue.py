@@ -0,0 +1,206 @@
+"""Bounded outbound queue of one stream."""
+
+import asyncio
+import logging
+from collections import deque
+from typing import Callable, Optional, Protocol
+
+from .flow_control import writer_is_congested
+
+logger = logging.getLogger(__name__)
+
+# Unsent bytes at which the stream's sender is paused, and at which it is
+# resumed again
+DEFAULT_HIGH_WATER = 256 * 1024
+DEFAULT_LOW_WATER = 64 * 1024
+
+
+class Limiter(Protocol):
+    """Bandwidth a send queue waits for, such as the server's RateLimiter."""
+    
+    def try_take(self, size: int) -> bool:
+        """Take bandwidth for `size` bytes if it is available right away."""
+    
+    async def take(self, size: int) -> None:
+        """Wait until `size` bytes may be transferred."""
+
+
+class SendQueue:
+    """
+    Outbound queue of one stream with its own writer task.
+    
+    write() never waits. While the peer keeps up, data goes straight to
+    its transport; once the transport is congested, data is queued and a
+    writer task hands it over as the transport drains. The loop that
+    demultiplexes the control connection therefore never waits for a
+    single slow peer.
+    
+    Bytes count as sent once the transport has taken them without being
+    congested; `on_sent(size)` is called for them, e.g. to return credit.
+    When the unsent bytes reach `high_water`, `on_pause()` is called so
+    the sender of the stream can stop reading, and `on_resume()` once they
+    fall to `low_water` again.
+    
+    With a `limiter`, data goes to the transport no faster than the
+    limiter allows and waits in the queue meanwhile; the watermarks then
+    hold the sender back while it is throttled.
+    """
+    
+    def __init__(
+        self,
+        writer: asyncio.StreamWriter,
+        high_water: int = DEFAULT_HIGH_WATER,
+        low_water: int = DEFAULT_LOW_WATER,
+        on_sent: Optional[Callable[[int], None]] = None,
+        on_pause: Optional[Callable[[], None]] = None,
+        on_resume: Optional[Callable[[], None]] = None,
+        limiter: Optional[Limiter] = None
+    ):
+        if not 0 <= low_water <= high_water:
+            raise ValueError("low_water must be between 0 and high_water")
+        self._writer = writer
+        self._high_water = high_water
+        self._low_water = low_water
+        self._on_sent = on_sent
+        self._on_pause = on_pause
+        self._on_resume = on_resume
+        self._limiter = limiter
+        self._chunks: deque = deque()
+        self._queued = 0  # bytes in _chunks
+        self._in_transport = 0  # bytes written to a congested transport
+        self._unsent = 0  # bytes not reported to on_sent yet
+        self._task: Optional[asyncio.Task] = None
+        self._paused = False
+        self._closed = False
+    
+    @property
+    def size(self) -> int:
+        """Bytes queued or waiting in a congested transport."""
+        return self._unsent
+    
+    @property
+    def paused(self) -> bool:
+        """Whether the sender of the stream is paused."""
+        return self._paused
+    
+    def write(self, data: bytes) -> None:
+        """
+        Queue data for the peer without waiting.
+        
+        Raises:
+            ConnectionResetError: If the queue was closed
+        """
+        if self._closed:
+            raise ConnectionResetError("Send queue is closed")
+        size = len(data)
+        self._unsent += size
+        if (
+            self._task is None
+            and not writer_is_congested(self._writer)
+            and (self._limiter is None or self._limiter.try_take(size))
+        ):
+            self._writer.write(data)
+            if not writer_is_congested(self._writer):
+                self._sent(size)
+                return
+            self._in_transport += size
+        else:
+            self._chunks.append(data)
+            self._queued += size
+        
+        if self._task is None:
+            self._task = asyncio.ensure_future(self._run())
+        if not self._paused and self._unsent >= self._high_water:
+            self._paused = True
+            if self._on_pause:
+                self._on_pause()
+    
+    async def flush(self, timeout: float) -> bool:
+        """
+        Wait up to `timeout` seconds for queued data to reach the transport.
+        
+        Returns:
+            True if nothing is left in the queue
+        """
+        task = self._task
+        if task and task is not asyncio.current_task():
+            await asyncio.wait({task}, timeout=timeout)
+        return self._task is None
+    
+    async def close(self, abort: bool = False) -> None:
+        """
+        Stop the queue.
+        
+        Args:
+            abort: Drop queued data instead of handing it to the transport
+        """
+        self._closed = True
+        task = self._task
+        if task and task is not asyncio.current_task():
+            if abort:
+                task.cancel()
+            try:
+                await task
+            except BaseException:
+                pass
+        self._discard()
+    
+    async def _run(self) -> None:
+        """Hand queued data to the transport as it drains."""
+        try:
+            while True:
+                while writer_is_congested(self._writer):
+                    await self._writer.drain()
+                if self._in_transport:
+                    size = self._in_transport
+                    self._in_transport = 0
+                    self._sent(size)
+                if not self._chunks:
+                    return
+                if self._limiter:
+                    await self._write_limited()
+                    continue
+                chunks = list(self._chunks)
+                self._chunks.clear()
+                self._in_transport += self._queued
+                self._queued = 0
+                self._writer.writelines(chunks)
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logger.debug(f"Send queue writer stopped: {e}")
+            self._discard()
+        finally:
+            self._task = None
+    
+    async def _write_limited(self) -> None:
+        """Hand the first queued chunk to the transport once the limiter allows."""
+        size = len(self._chunks[0])
+        await self._limiter.take(size)
+        if not self._chunks:
+            # Discarded meanwhile
+            return
+        chunk = self._chunks.popleft()
+        self._queued -= size
+        self._in_transport += size
+        self._writer.write(chunk)
+    
+    def _sent(self, size: int) -> None:
+        self._unsent -= size
+        if self._on_sent:
+            self._on_sent(size)
+        if self._paused and self._unsent <= self._low_water:
+            self._paused = False
+            if self._on_resume:
+                self._on_resume()
+    
+    def _discard(self) -> None:
+        """Drop unsent data and release a paused sender."""
+        self._chunks.clear()
+        self._queued = 0
+        self._in_transport = 0
+        self._unsent = 0
+        if self._paused:
+            self._paused = False
+            if self._on_resume:
+                self._on_resume()
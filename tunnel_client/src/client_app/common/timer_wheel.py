@@ -0,0 +1,199 @@
+"""Hashed timer wheel for connection timeouts."""
+
+import asyncio
+import math
+from typing import Callable, Optional
+
+# Resolution and size of the wheel: timers fire up to one tick late, and
+# delays longer than one revolution wait for extra rounds
+DEFAULT_TICK = 0.1  # seconds
+DEFAULT_SLOTS = 512
+
+
+class WheelTimer:
+    """A callback scheduled on a TimerWheel."""
+    
+    __slots__ = ('_wheel', '_slot', '_rounds', '_callback', '_args')
+    
+    def __init__(self, wheel: 'TimerWheel', callback: Callable, args: tuple):
+        self._wheel = wheel
+        self._slot: Optional[int] = None
+        self._rounds = 0
+        self._callback = callback
+        self._args = args
+    
+    @property
+    def active(self) -> bool:
+        """Whether the timer is still waiting to fire."""
+        return self._slot is not None
+    
+    def cancel(self) -> None:
+        """Cancel the timer; does nothing if it fired or was cancelled."""
+        if self._slot is not None:
+            self._wheel._remove(self)
+
+
+class TimerWheel:
+    """
+    Hashed timer wheel shared by many connections.
+    
+    Timers are kept in a ring of `slots` buckets that a single loop
+    callback advances every `tick` seconds, so arming and cancelling a
+    timer is O(1) and costs no task or event loop handle of its own.
+    Timers fire up to one tick late, never early. The wheel only ticks
+    while timers are armed.
+    """
+    
+    def __init__(self, tick: float = DEFAULT_TICK, slots: int = DEFAULT_SLOTS):
+        if tick <= 0 or slots < 1:
+            raise ValueError("tick must be positive and slots at least 1")
+        self._tick = tick
+        self._buckets: list[set[WheelTimer]] = [set() for _ in range(slots)]
+        self._cursor = 0  # index of the last processed tick
+        self._time = 0.0  # loop time of the last processed tick
+        self._count = 0
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._handle: Optional[asyncio.TimerHandle] = None
+    
+    def __len__(self) -> int:
+        """Number of armed timers."""
+        return self._count
+    
+    def time(self) -> float:
+        """Current time of the event loop the wheel runs on."""
+        if self._loop is None:
+            self._loop = asyncio.get_running_loop()
+        return self._loop.time()
+    
+    def call_later(self, delay: float, callback: Callable, *args) -> WheelTimer:
+        """Call `callback(*args)` after `delay` seconds."""
+        timer = WheelTimer(self, callback, args)
+        self._add(timer, delay)
+        return timer
+    
+    def timeout(self, delay: float) -> 'Deadline':
+        """Async context manager raising TimeoutError after `delay` seconds."""
+        return Deadline(self, delay)
+    
+    def close(self) -> None:
+        """Drop all timers without calling them."""
+        for bucket in self._buckets:
+            for timer in bucket:
+                timer._slot = None
+            bucket.clear()
+        self._count = 0
+        if self._handle:
+            self._handle.cancel()
+            self._handle = None
+    
+    def _add(self, timer: WheelTimer, delay: float) -> None:
+        now = self.time()
+        if not self._count:
+            # The wheel was idle; restart it from now
+            self._time = now
+            if self._handle is None:
+                self._handle = self._loop.call_at(now + self._tick, self._advance)
+        ticks = max(1, math.ceil((now + delay - self._time) / self._tick))
+        slots = len(self._buckets)
+        timer._slot = (self._cursor + ticks) % slots
+        timer._rounds = (ticks - 1) // slots
+        self._buckets[timer._slot].add(timer)
+        self._count += 1
+    
+    def _remove(self, timer: WheelTimer) -> None:
+        self._buckets[timer._slot].discard(timer)
+        timer._slot = None
+        self._count -= 1
+    
+    def _advance(self) -> None:
+        """Process every tick that has passed, then schedule the next one."""
+        self._handle = None
+        now = self._loop.time()
+        slots = len(self._buckets)
+        while self._count and self._time + self._tick <= now:
+            self._time += self._tick
+            self._cursor = (self._cursor + 1) % slots
+            bucket = self._buckets[self._cursor]
+            if not bucket:
+                continue
+            due = []
+            for timer in bucket:
+                if timer._rounds:
+                    timer._rounds -= 1
+                else:
+                    due.append(timer)
+            for timer in due:
+                self._remove(timer)
+            # Callbacks may arm and cancel timers
+            for timer in due:
+                timer._callback(*timer._args)
+        if self._count and self._handle is None:
+            self._handle = self._loop.call_at(self._time + self._tick, self._advance)
+
+
+class Deadline:
+    """
+    Cancel the current task once a delay has passed, like asyncio.timeout(),
+    with the timer armed on a TimerWheel.
+    
+    Raises:
+        TimeoutError: On exit, if the deadline cancelled the block
+    """
+    
+    def __init__(self, wheel: TimerWheel, delay: float):
+        self._wheel = wheel
+        self._delay = delay
+        self._task: Optional[asyncio.Task] = None
+        self._timer: Optional[WheelTimer] = None
+        self._cancelling = 0
+        self.expired = False
+    
+    async def __aenter__(self) -> 'Deadline':
+        self._task = asyncio.current_task()
+        self._cancelling = self._task.cancelling()
+        self._timer = self._wheel.call_later(self._delay, self._expire)
+        return self
+    
+    async def __aexit__(self, exc_type, exc, tb) -> None:
+        self._timer.cancel()
+        if self.expired and self._task.uncancel() <= self._cancelling and exc_type is asyncio.CancelledError:
+            raise TimeoutError from exc
+    
+    def _expire(self) -> None:
+        self.expired = True
+        self._task.cancel()
+
+
+class IdleTimeout:
+    """
+    Call `on_idle()` once nothing touched the timeout for `timeout` seconds.
+    
+    touch() only records the time; the wheel timer is moved when it fires
+    early, so a busy connection costs one timer per `timeout` seconds
+    rather than one per read.
+    """
+    
+    def __init__(self, wheel: TimerWheel, timeout: float, on_idle: Callable[[], None]):
+        self._wheel = wheel
+        self._timeout = timeout
+        self._on_idle = on_idle
+        self._last = wheel.time()
+        self._timer: Optional[WheelTimer] = wheel.call_later(timeout, self._check)
+    
+    def touch(self) -> None:
+        """Record activity."""
+        self._last = self._wheel.time()
+    
+    def cancel(self) -> None:
+        """Stop watching."""
+        if self._timer:
+            self._timer.cancel()
+            self._timer = None
+    
+    def _check(self) -> None:
+        remaining = self._last + self._timeout - self._wheel.time()
+        if remaining > 0:
+            self._timer = self._wheel.call_later(remaining, self._check)
+            return
+        self._timer = None
+        self._on_idle()
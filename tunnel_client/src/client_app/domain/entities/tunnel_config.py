@@ -12,6 +12,12 @@ class TunnelConfig:
     token: str
     local_host: str
     local_port: int
+    compression: bool = False  # ask the server to compress DATA frames
+    compact_header: bool = False  # offer the compact frame header (smaller, but slower to encode)
+    connections: int = 1  # control connections to stripe streams over
+    hostname: str = ''  # name to be reached under on the server's shared port; '' = own port
+    keepalive: float = 15.0  # seconds between heartbeat PINGs; 0 = off
+    max_streams: int = 0  # concurrent streams the local service can take; 0 = no limit
     
     def validate(self) -> bool:
         """Validate the configuration."""
@@ -25,5 +31,11 @@ class TunnelConfig:
             return False
         if not (1 <= self.local_port <= 65535):
             return False
+        if self.connections < 1:
+            return False
+        if self.keepalive < 0:
+            return False
+        if self.max_streams < 0:
+            return False
         return True
 
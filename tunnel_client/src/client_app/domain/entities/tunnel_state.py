@@ -4,6 +4,13 @@ from dataclasses import dataclass, field
 from typing import Dict, Optional
 import asyncio
 
+from ...common.flow_control import SendWindow, ReceiveWindow
+from ...common.send_queue import SendQueue
+
+# Seconds a graceful close waits for the local service to read the last
+# data before the connection is aborted
+CLOSE_LINGER = 5.0
+
 
 @dataclass
 class TunnelState:
@@ -39,15 +46,47 @@ class LocalConnection:
     conn_id: int
     reader: Optional[asyncio.StreamReader] = None
     writer: Optional[asyncio.StreamWriter] = None
+    # Flow control: credit for local -> server, accounting for server -> local
+    send_window: SendWindow = field(default_factory=SendWindow)
+    recv_window: ReceiveWindow = field(default_factory=ReceiveWindow)
+    # Data from the server on its way to the local service
+    send_queue: Optional[SendQueue] = None
+    # Data from the server received while connecting to the local service;
+    # None once connected
+    pending: Optional[list[bytes]] = None
     
-    async def close(self) -> None:
-        """Close the connection."""
+    @property
+    def connecting(self) -> bool:
+        """Whether the local service has not accepted the connection yet."""
+        return self.pending is not None
+    
+    async def close(self, abort: bool = False, linger: float = CLOSE_LINGER) -> None:
+        """
+        Close the connection.
+        
+        Args:
+            abort: Drop unsent data instead of waiting for the peer to read it
+            linger: Seconds to wait for the peer to read it before aborting
+        """
+        self.send_window.close()
+        self.pending = None
+        if self.send_queue:
+            if not abort and not await self.send_queue.flush(linger):
+                abort = True
+            await self.send_queue.close(abort)
         if self.writer:
+            writer = self.writer
+            self.writer = None
+            self.reader = None
             try:
-                self.writer.close()
-                await self.writer.wait_closed()
+                if abort:
+                    writer.transport.abort()
+                else:
+                    writer.close()
+                await asyncio.wait_for(writer.wait_closed(), linger)
+            except asyncio.TimeoutError:
+                # The peer stopped reading; drop what the transport holds
+                writer.transport.abort()
             except Exception:
                 pass
-            self.writer = None
-            self.reader = None
 
@@ -34,6 +34,10 @@ class ConfigManager:
                 'server_host': config.get('server_host', ''),
                 'server_port': config.get('server_port', 7000),
                 'local_port': config.get('local_port', 8080),
+                'compression': config.get('compression', False),
+                'compact_header': config.get('compact_header', False),
+                'connections': config.get('connections', 1),
+                'hostname': config.get('hostname', ''),
             }
             
             with open(self._config_file, 'w') as f:
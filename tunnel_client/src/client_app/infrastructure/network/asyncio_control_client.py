@@ -1,32 +1,170 @@
 """Asyncio-based control client implementation."""
 
 import asyncio
+import contextlib
 import logging
+import struct
+from dataclasses import replace
 from typing import Optional, Callable, Awaitable
 
 from ...interfaces.control_channel import IControlChannel
 from ...common.protocol import ProtocolCodec
-from ...common.framing import WELCOME, OPEN, DATA, CLOSE
+from ...common.write_scheduler import (
+    WriteScheduler,
+    WriteSchedulerStats,
+    split_payload,
+    DEFAULT_FLUSH_INTERVAL,
+    DEFAULT_FLUSH_BYTES
+)
+from ...common.compression import FrameCompressor, CompressionStats
+from ...common.handshake import (
+    Handshake, CAP_COMPRESSION, CAP_COMPACT_HEADER, CAP_STRIPING, CAP_RESUME, CAP_HEARTBEAT
+)
+from ...common.framing import (
+    WELCOME, OPEN, DATA, CLOSE, WINDOW_UPDATE, RESUME, PING, PONG, TYPE_MASK, FLAG_COMPRESSED
+)
+from ...common.replay import ReplayBuffer
+from ...common.heartbeat import Heartbeat, RttEstimator, DEFAULT_MISSES
+from ...common.timer_wheel import TimerWheel
+from ...common.errors import ProtocolError, ConnectionError
+from .frame_reader import (
+    FrameReader,
+    StreamFrameReader,
+    BufferedFrameReader,
+    STREAM_TRANSPORT,
+    BUFFERED_TRANSPORT
+)
 
 logger = logging.getLogger(__name__)
 
+# Attempts per additional control connection. A server running several
+# workers refuses joins that reach a worker other than the session's own,
+# and every new TCP connection may land on a different worker.
+JOIN_ATTEMPTS = 8
+
+# Delay between attempts to resume the session, doubled up to the maximum
+RESUME_RETRY_MIN = 0.25
+RESUME_RETRY_MAX = 4.0
+
+# Seconds to open a control connection, and again to receive its WELCOME
+CONNECT_TIMEOUT = 10.0
+
+_UINT32 = struct.Struct('>I')
+
+
+class _ControlStripe:
+    """One control connection of the agent session."""
+    
+    def __init__(self, index: int, frames: FrameReader, writer: asyncio.StreamWriter, scheduler: WriteScheduler):
+        self.index = index
+        self.frames = frames
+        self.writer = writer
+        self.write_scheduler = scheduler
+        self.receive_task: Optional[asyncio.Task] = None
+        self.heartbeat: Optional[Heartbeat] = None
+        # Streams opened by the server on this connection
+        self.streams: set[int] = set()
+    
+    @property
+    def codec(self) -> ProtocolCodec:
+        return self.frames.codec
+    
+    async def close(self) -> None:
+        """Stop the writer and close the connection."""
+        if self.heartbeat:
+            await self.heartbeat.close()
+        await self.write_scheduler.close()
+        try:
+            self.writer.close()
+            await self.writer.wait_closed()
+        except Exception:
+            pass
+
 
 class AsyncioControlClient(IControlChannel):
-    """Asyncio implementation of control channel."""
+    """
+    Asyncio implementation of control channel.
     
-    def __init__(self):
-        self._reader: Optional[asyncio.StreamReader] = None
+    `transport` selects how frames are received: STREAM_TRANSPORT reads
+    through an asyncio.StreamReader, BUFFERED_TRANSPORT receives into the
+    frame buffer with an asyncio.BufferedProtocol.
+    
+    Besides the connection that registered the agent, the server may let
+    the agent join further control connections to the session. Each stream
+    uses the connection its OPEN arrived on, so a lost connection only
+    closes its own streams.
+    
+    If the server offered session resumption, losing a control connection
+    closes no streams: the client reconnects with the resume token within
+    the server's grace period and the streams continue. Meanwhile DATA is
+    kept in the streams' replay buffers, and after reconnecting both sides
+    send again what the other did not receive.
+    
+    If heartbeats were negotiated, every control connection is pinged and
+    treated as lost once the server stays silent for `heartbeat_misses`
+    intervals.
+    
+    Opening a control connection and waiting for its WELCOME each time out
+    after `connect_timeout` seconds (0 = no limit).
+    """
+    
+    def __init__(
+        self,
+        flush_interval: float = DEFAULT_FLUSH_INTERVAL,
+        flush_bytes: int = DEFAULT_FLUSH_BYTES,
+        transport: str = STREAM_TRANSPORT,
+        heartbeat_misses: int = DEFAULT_MISSES,
+        connect_timeout: float = CONNECT_TIMEOUT,
+        timers: Optional[TimerWheel] = None
+    ):
+        if transport not in (STREAM_TRANSPORT, BUFFERED_TRANSPORT):
+            raise ValueError(f"Unknown control transport: {transport}")
+        self._transport = transport
+        self._host = ''
+        self._port = 0
+        self._frames: Optional[FrameReader] = None
         self._writer: Optional[asyncio.StreamWriter] = None
+        self._flush_interval = flush_interval
+        self._flush_bytes = flush_bytes
+        self._heartbeat_misses = heartbeat_misses
+        self._connect_timeout = connect_timeout
+        self._timers = timers or TimerWheel()
+        self._rtt = RttEstimator()
+        self._write_scheduler: Optional[WriteScheduler] = None
+        self._compressor: Optional[FrameCompressor] = None
+        self._hello = Handshake()
+        self._welcome = Handshake()
         self._codec = ProtocolCodec()
         self._message_handler: Optional[Callable[[int, int, bytes], Awaitable[None]]] = None
         self._receive_task: Optional[asyncio.Task] = None
         self._welcome_future: Optional[asyncio.Future] = None
         self._welcome_received = False
+        # Live control connections; the first one registered the agent
+        self._primary: Optional[_ControlStripe] = None
+        self._stripes: list[_ControlStripe] = []
+        self._stream_stripes: dict[int, _ControlStripe] = {}
+        self._next_stripe = 0
+        # Streams that paused reading, and the connection each one paused
+        self._paused_streams: dict[int, FrameReader] = {}
+        # Session resumption: registration parameters, per-stream replay buffers
+        self._token = ''
+        self._local_host = ''
+        self._local_port = 0
+        self._replay: dict[int, ReplayBuffer] = {}
+        self._resuming = False
+        self._resume_task: Optional[asyncio.Task] = None
     
     async def connect(self, host: str, port: int) -> None:
         """Connect to the server."""
-        self._reader, self._writer = await asyncio.open_connection(host, port)
-        logger.info(f"Connected to server {host}:{port}")
+        self._host, self._port = host, port
+        self._frames, self._writer = await self._open_connection(self._codec)
+        logger.info(f"Connected to server {host}:{port} ({self._transport} transport)")
+        
+        # All outgoing frames go through the write scheduler
+        self._write_scheduler = self._create_write_scheduler(self._writer)
+        self._primary = _ControlStripe(0, self._frames, self._writer, self._write_scheduler)
+        self._stripes = [self._primary]
+        self._next_stripe = 0
         
         # Create future for WELCOME message
         self._welcome_future = asyncio.Future()
@@ -34,38 +172,94 @@ class AsyncioControlClient(IControlChannel):
         
         # Start receiving messages (but don't process them until WELCOME is received)
         self._receive_task = asyncio.create_task(self._receive_loop())
+        self._primary.receive_task = self._receive_task
+    
+    async def add_connections(self, token: str, local_host: str, local_port: int, count: int) -> int:
+        """
+        Join further control connections to the session.
+        
+        Refused joins are retried up to JOIN_ATTEMPTS times per connection;
+        connections that still cannot join are skipped and the tunnel keeps
+        working over the ones that did.
+        
+        Returns:
+            Number of connections added
+        """
+        if not self._welcome.session:
+            return 0
+        hello = replace(self._hello, session=self._welcome.session)
+        added = 0
+        attempts = 0
+        while added < count and attempts < count * JOIN_ATTEMPTS:
+            attempts += 1
+            try:
+                await self._join(token, local_host, local_port, hello)
+                added += 1
+            except Exception as e:
+                logger.debug(f"Failed to open additional control connection: {e}")
+        if added < count:
+            logger.warning(f"Opened {added} of {count} additional control connections")
+        return added
     
     async def disconnect(self) -> None:
         """Disconnect from the server."""
-        if self._receive_task:
-            self._receive_task.cancel()
+        self._resuming = False
+        if self._resume_task:
+            self._resume_task.cancel()
             try:
-                await self._receive_task
+                await self._resume_task
             except asyncio.CancelledError:
                 pass
+            self._resume_task = None
+        self._replay.clear()
         
-        if self._writer:
-            try:
-                self._writer.close()
-                await self._writer.wait_closed()
-            except Exception:
-                pass
+        stripes = self._stripes
+        self._stripes = []
+        for stripe in stripes:
+            if stripe.receive_task:
+                stripe.receive_task.cancel()
+                try:
+                    await stripe.receive_task
+                except asyncio.CancelledError:
+                    pass
+        
+        for stripe in stripes:
+            await stripe.close()
+        if self._primary and self._primary not in stripes:
+            await self._primary.close()
         
-        self._reader = None
+        self._frames = None
         self._writer = None
+        self._write_scheduler = None
+        self._receive_task = None
+        self._primary = None
+        self._stream_stripes.clear()
+        self._paused_streams.clear()
+        self._compressor = None
+        self._hello = Handshake()
+        self._welcome = Handshake()
         self._codec.clear()
+        self._codec.set_compact_header(False)
         self._welcome_future = None
         self._welcome_received = False
+        self._rtt = RttEstimator()
         logger.info("Disconnected from server")
     
-    async def send_hello(self, token: str, local_host: str, local_port: int) -> None:
-        """Send HELLO message."""
+    async def send_hello(
+        self,
+        token: str,
+        local_host: str,
+        local_port: int,
+        handshake: Optional[Handshake] = None
+    ) -> None:
+        """Send HELLO message; without handshake parameters the legacy format is used."""
         if not self._writer:
             raise RuntimeError("Not connected")
         
-        msg = self._codec.encode_hello(token, local_host, local_port)
-        self._writer.write(msg)
-        await self._writer.drain()
+        self._hello = handshake or Handshake()
+        self._token, self._local_host, self._local_port = token, local_host, local_port
+        msg = self._codec.encode_hello(token, local_host, local_port, self._hello)
+        await self._write_scheduler.send(msg)
         logger.debug("Sent HELLO message")
     
     async def wait_for_welcome(self) -> int:
@@ -75,8 +269,11 @@ class AsyncioControlClient(IControlChannel):
         
         # Wait for WELCOME to be received in receive loop
         try:
-            public_port = await self._welcome_future
+            async with self._deadline():
+                public_port = await self._welcome_future
             return public_port
+        except TimeoutError:
+            raise ConnectionError(f"No WELCOME from the server within {self._connect_timeout:g}s")
         except Exception as e:
             # If connection closed before WELCOME, it's likely authentication error
             if not self.is_connected():
@@ -84,6 +281,10 @@ class AsyncioControlClient(IControlChannel):
                 raise AuthenticationError("Неверный токен")
             raise
     
+    def get_handshake(self) -> tuple[Handshake, Handshake]:
+        """Get the parameters sent in HELLO and received in WELCOME."""
+        return (self._hello, self._welcome)
+    
     def set_message_handler(
         self, handler: Callable[[int, int, bytes], Awaitable[None]]
     ) -> None:
@@ -92,80 +293,462 @@ class AsyncioControlClient(IControlChannel):
     
     async def send_data(self, conn_id: int, data: bytes) -> None:
         """Send DATA message."""
-        if not self._writer:
-            raise RuntimeError("Not connected")
+        replay = self._replay.get(conn_id)
+        if replay:
+            replay.append(data)
+            if self._resuming:
+                # Sent when the session is resumed
+                return
+        stripe = self._stripe_for(conn_id)
         
-        msg = self._codec.encode_data(conn_id, data)
-        self._writer.write(msg)
-        await self._writer.drain()
+        try:
+            # Bounded frames let the scheduler interleave this stream with others
+            for chunk in split_payload(data, stripe.write_scheduler.quantum):
+                flags = 0
+                if self._compressor:
+                    flags, chunk = await self._compressor.compress(conn_id, chunk)
+                await stripe.write_scheduler.send(
+                    *stripe.codec.encode_data_parts(conn_id, chunk, flags), stream=conn_id
+                )
+        except Exception:
+            if not replay:
+                raise
+            # The connection was lost; the data is sent again on resume
     
     async def send_close(self, conn_id: int) -> None:
         """Send CLOSE message."""
-        if not self._writer:
-            raise RuntimeError("Not connected")
+        self._replay.pop(conn_id, None)
+        if self._resuming:
+            # The server learns from RESUME that the stream is gone
+            self._forget_stream(conn_id)
+            return
+        stripe = self._stripe_for(conn_id)
+        self._forget_stream(conn_id)
         
-        msg = self._codec.encode_close(conn_id)
-        self._writer.write(msg)
-        await self._writer.drain()
+        if self._compressor:
+            self._compressor.forget(conn_id)
+        msg = stripe.codec.encode_close(conn_id)
+        await stripe.write_scheduler.send(msg, stream=conn_id, control=True)
         logger.debug(f"Sent CLOSE for connection {conn_id}")
     
+    async def send_window_update(self, conn_id: int, increment: int) -> None:
+        """Send WINDOW_UPDATE message."""
+        replay = self._replay.get(conn_id)
+        if replay:
+            # Counted even if it cannot be sent; RESUME restores it
+            replay.granted += increment
+            if self._resuming:
+                return
+        stripe = self._stripe_for(conn_id)
+        
+        msg = stripe.codec.encode_window_update(conn_id, increment)
+        await stripe.write_scheduler.send(msg, stream=conn_id, control=True)
+    
+    def pause_reading(self, conn_id: int) -> None:
+        """Stop reading the control connection that carries a stream."""
+        if conn_id in self._paused_streams:
+            return
+        frames = self._stripe_for(conn_id).frames
+        self._paused_streams[conn_id] = frames
+        frames.pause_reading()
+    
+    def resume_reading(self, conn_id: int) -> None:
+        """Undo pause_reading() for a stream."""
+        frames = self._paused_streams.pop(conn_id, None)
+        if frames:
+            frames.resume_reading()
+    
+    def get_write_stats(self) -> Optional[WriteSchedulerStats]:
+        """Get queue-depth and batch-size statistics of the control connection."""
+        if not self._write_scheduler:
+            return None
+        return self._write_scheduler.stats
+    
+    def get_compression_stats(self) -> Optional[CompressionStats]:
+        """Get compression ratio and CPU time, if compression was negotiated."""
+        if not self._compressor:
+            return None
+        return self._compressor.stats
+    
+    def get_rtt_stats(self) -> Optional[RttEstimator]:
+        """Get the round-trip time to the server, if heartbeats were negotiated."""
+        if not self._rtt.samples:
+            return None
+        return self._rtt
+    
+    def get_connection_count(self) -> int:
+        """Get the number of live control connections."""
+        return len(self._stripes)
+    
     def is_connected(self) -> bool:
         """Check if connected."""
-        return self._writer is not None and not self._writer.is_closing()
+        return any(not stripe.writer.is_closing() for stripe in self._stripes)
+    
+    def _deadline(self):
+        """Context manager that times out a connection step."""
+        if not self._connect_timeout:
+            return contextlib.nullcontext()
+        return self._timers.timeout(self._connect_timeout)
+    
+    async def _open_connection(self, codec: ProtocolCodec) -> tuple[FrameReader, asyncio.StreamWriter]:
+        """Open a TCP connection to the server with the configured transport."""
+        try:
+            async with self._deadline():
+                if self._transport == BUFFERED_TRANSPORT:
+                    loop = asyncio.get_running_loop()
+                    _, frames = await loop.create_connection(
+                        lambda: BufferedFrameReader(codec), self._host, self._port
+                    )
+                    return frames, frames.writer
+                reader, writer = await asyncio.open_connection(self._host, self._port)
+                return StreamFrameReader(reader, codec), writer
+        except TimeoutError:
+            raise ConnectionError(
+                f"Server {self._host}:{self._port} did not accept within {self._connect_timeout:g}s"
+            ) from None
+    
+    def _create_write_scheduler(self, writer: asyncio.StreamWriter) -> WriteScheduler:
+        scheduler = WriteScheduler(
+            writer,
+            flush_interval=self._flush_interval,
+            flush_bytes=self._flush_bytes
+        )
+        scheduler.start()
+        return scheduler
+    
+    async def _join(self, token: str, local_host: str, local_port: int, hello: Handshake) -> None:
+        """Open one more control connection and join it to the session."""
+        codec = ProtocolCodec()
+        frames, writer = await self._open_connection(codec)
+        self._next_stripe += 1
+        stripe = _ControlStripe(
+            self._next_stripe,
+            frames,
+            writer,
+            self._create_write_scheduler(writer)
+        )
+        try:
+            await stripe.write_scheduler.send(codec.encode_hello(token, local_host, local_port, hello))
+            async with self._deadline():
+                frame = await frames.read_frame()
+            if frame is None or frame[0] != WELCOME:
+                raise ProtocolError("Server refused the control connection")
+            _, welcome = codec.decode_welcome_handshake(frame[2])
+            # WELCOME is the last frame with the fixed header
+            if welcome.supports(CAP_COMPACT_HEADER):
+                codec.set_compact_header(True)
+        except BaseException:
+            await stripe.close()
+            raise
+        
+        self._stripes.append(stripe)
+        stripe.receive_task = asyncio.create_task(self._receive_stripe(stripe))
+        logger.info(f"Joined control connection {stripe.index} to the session")
+    
+    def _start_heartbeat(self, stripe: _ControlStripe) -> None:
+        """Ping the server on a control connection and drop the connection when it goes silent."""
+        if not self._welcome.supports(CAP_HEARTBEAT) or not self._welcome.keepalive:
+            return
+        
+        def on_dead():
+            logger.warning(
+                f"Server sent nothing on control connection {stripe.index} "
+                f"for {self._heartbeat_misses} heartbeat intervals, dropping it"
+            )
+            # Ends the receive loop, which handles the lost connection
+            stripe.writer.transport.abort()
+        
+        stripe.heartbeat = Heartbeat(
+            self._welcome.keepalive,
+            lambda payload: stripe.write_scheduler.write(stripe.codec.encode_ping(payload), control=True),
+            on_dead,
+            misses=self._heartbeat_misses,
+            rtt=self._rtt
+        )
+        stripe.heartbeat.start()
+    
+    def _stripe_for(self, conn_id: int) -> _ControlStripe:
+        """Control connection that carries a stream."""
+        stripe = self._stream_stripes.get(conn_id)
+        if stripe:
+            return stripe
+        if self._stripes:
+            return self._stripes[0]
+        if self._primary:
+            return self._primary
+        raise RuntimeError("Not connected")
+    
+    def _forget_stream(self, conn_id: int) -> None:
+        stripe = self._stream_stripes.pop(conn_id, None)
+        if stripe:
+            stripe.streams.discard(conn_id)
+    
+    async def _stripe_lost(self, stripe: _ControlStripe) -> None:
+        """Close the streams of a lost control connection, or resume the session."""
+        if stripe not in self._stripes:
+            return
+        if self._welcome.supports(CAP_RESUME) and self._welcome.resume:
+            if not self._resuming:
+                self._resuming = True
+                self._resume_task = asyncio.create_task(self._resume_session())
+            return
+        self._stripes.remove(stripe)
+        if stripe is not self._primary:
+            await stripe.close()
+        
+        streams = list(stripe.streams)
+        for conn_id in streams:
+            self._forget_stream(conn_id)
+            if self._compressor:
+                self._compressor.forget(conn_id)
+        if self._stripes:
+            logger.warning(
+                f"Lost control connection {stripe.index}, "
+                f"closing {len(streams)} streams, {len(self._stripes)} connections left"
+            )
+        
+        if self._message_handler:
+            for conn_id in streams:
+                try:
+                    await self._message_handler(CLOSE, conn_id, b'')
+                except Exception as e:
+                    logger.error(f"Error in message handler: {e}", exc_info=True)
+    
+    async def _resume_session(self) -> None:
+        """Reconnect with the resume token until the server's grace period is over."""
+        stripes = self._stripes
+        self._stripes = []
+        for stripe in stripes:
+            if stripe.receive_task and stripe.receive_task is not asyncio.current_task():
+                stripe.receive_task.cancel()
+            await stripe.close()
+        logger.warning(
+            f"Lost connection to server, resuming {len(self._replay)} streams "
+            f"within {self._welcome.resume_grace:g}s"
+        )
+        
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + self._welcome.resume_grace
+        hello = replace(self._hello, resume=self._welcome.resume, session='')
+        delay = RESUME_RETRY_MIN
+        while True:
+            try:
+                await self._reattach(hello)
+                break
+            except Exception as e:
+                logger.debug(f"Failed to resume the session: {e}")
+            remaining = deadline - loop.time()
+            if remaining <= 0:
+                await self._resume_failed()
+                return
+            await asyncio.sleep(min(delay, remaining))
+            delay = min(delay * 2, RESUME_RETRY_MAX)
+        
+        logger.info(f"Resumed the session with {len(self._replay)} streams")
+        if self._welcome.supports(CAP_STRIPING) and self._welcome.stripes > 1:
+            await self.add_connections(
+                self._token, self._local_host, self._local_port, self._welcome.stripes - 1
+            )
+    
+    async def _reattach(self, hello: Handshake) -> None:
+        """Open a control connection that resumes the session and send RESUME."""
+        self._codec.clear()
+        self._codec.set_compact_header(False)
+        frames, writer = await self._open_connection(self._codec)
+        stripe = _ControlStripe(0, frames, writer, self._create_write_scheduler(writer))
+        try:
+            await stripe.write_scheduler.send(
+                self._codec.encode_hello(self._token, self._local_host, self._local_port, hello)
+            )
+            async with self._deadline():
+                frame = await frames.read_frame()
+            if frame is None or frame[0] != WELCOME:
+                raise ProtocolError("Server refused to resume the session")
+            # WELCOME is the last frame with the fixed header
+            if self._welcome.supports(CAP_COMPACT_HEADER):
+                self._codec.set_compact_header(True)
+            stripe.write_scheduler.write(self._codec.encode_resume({
+                conn_id: (replay.received, replay.granted)
+                for conn_id, replay in self._replay.items()
+            }), control=True)
+        except BaseException:
+            await stripe.close()
+            raise
+        
+        self._frames, self._writer, self._write_scheduler = frames, writer, stripe.write_scheduler
+        self._primary = stripe
+        self._stripes = [stripe]
+        self._next_stripe = 0
+        self._stream_stripes.clear()
+        for conn_id in self._replay:
+            self._stream_stripes[conn_id] = stripe
+            stripe.streams.add(conn_id)
+        self._receive_task = asyncio.create_task(self._receive_stripe(stripe))
+        stripe.receive_task = self._receive_task
+    
+    async def _resume_failed(self) -> None:
+        """Close all streams of a session that could not be resumed."""
+        logger.error("Could not resume the session, closing all streams")
+        self._resuming = False
+        streams = list(self._replay)
+        self._replay.clear()
+        self._stream_stripes.clear()
+        if self._message_handler:
+            for conn_id in streams:
+                try:
+                    await self._message_handler(CLOSE, conn_id, b'')
+                except Exception as e:
+                    logger.error(f"Error in message handler: {e}", exc_info=True)
+    
+    async def _resume_streams(self, stripe: _ControlStripe, payload: bytes) -> None:
+        """Handle the server's RESUME frame: send what it missed, drop what it closed."""
+        streams = stripe.codec.decode_resume(payload)
+        scheduler = stripe.write_scheduler
+        closed = []
+        credit = []
+        for conn_id, replay in list(self._replay.items()):
+            entry = streams.pop(conn_id, None)
+            if entry is None:
+                # The server closed the stream while the connection was lost
+                closed.append(conn_id)
+                continue
+            missing, chunks = replay.resume(*entry)
+            if missing:
+                credit.append((conn_id, missing))
+            # Uncompressed, so the replay is queued without waiting
+            for chunk in chunks:
+                for part in split_payload(chunk, scheduler.quantum):
+                    scheduler.write(*stripe.codec.encode_data_parts(conn_id, part), stream=conn_id)
+        for conn_id in streams:
+            scheduler.write(stripe.codec.encode_close(conn_id), stream=conn_id, control=True)
+        self._resuming = False
+        
+        if not self._message_handler:
+            return
+        for conn_id in closed:
+            self._replay.pop(conn_id, None)
+            self._forget_stream(conn_id)
+            await self._message_handler(CLOSE, conn_id, b'')
+        for conn_id, missing in credit:
+            # Credit of WINDOW_UPDATEs lost with the connection
+            await self._message_handler(WINDOW_UPDATE, conn_id, _UINT32.pack(missing))
+    
+    def _handle_welcome(self, payload: bytes) -> None:
+        """Apply the parameters agreed in WELCOME."""
+        public_port, self._welcome = self._codec.decode_welcome_handshake(payload)
+        if self._welcome.supports(CAP_COMPRESSION):
+            self._compressor = FrameCompressor(self._welcome.compression[0])
+        # WELCOME is the last frame with the fixed header
+        if self._welcome.supports(CAP_COMPACT_HEADER):
+            self._codec.set_compact_header(True)
+        logger.info(
+            f"Received WELCOME, public port: {public_port}, "
+            f"protocol: v{self._welcome.version}, "
+            f"capabilities: {self._welcome.capabilities:#x}, "
+            f"compression: {self._compressor.codec if self._compressor else 'off'}"
+        )
+        self._welcome_received = True
+        if self._welcome_future and not self._welcome_future.done():
+            self._welcome_future.set_result(public_port)
+    
+    def _welcome_failed(self) -> None:
+        """Fail wait_for_welcome(): a connection closed before WELCOME means a bad token."""
+        if not self._welcome_received and self._welcome_future and not self._welcome_future.done():
+            from ...common.errors import AuthenticationError
+            self._welcome_future.set_exception(AuthenticationError("Неверный токен"))
     
     async def _receive_loop(self) -> None:
         """Receive and process messages from server."""
-        if not self._reader:
+        if not self._frames:
             return
         
         try:
-            while True:
-                data = await self._reader.read(4096)
-                if not data:
+            # Handle WELCOME message first. Frames after it may use the
+            # compact header, so it is read one frame at a time.
+            while not self._welcome_received:
+                frame = await self._frames.read_frame()
+                if frame is None:
                     # Connection closed - if WELCOME not received, it's likely auth error
-                    if not self._welcome_received and self._welcome_future and not self._welcome_future.done():
-                        from ...common.errors import AuthenticationError
-                        self._welcome_future.set_exception(AuthenticationError("Неверный токен"))
-                    break
-                
-                self._codec.feed(data)
-                
-                while True:
-                    frame = self._codec.decode_frame()
-                    if not frame:
-                        break
-                    
-                    msg_type, conn_id, payload = frame
-                    
-                    # Handle WELCOME message first
-                    if msg_type == WELCOME and not self._welcome_received:
-                        public_port = self._codec.decode_welcome(payload)
-                        logger.info(f"Received WELCOME, public port: {public_port}")
-                        self._welcome_received = True
-                        if self._welcome_future and not self._welcome_future.done():
-                            self._welcome_future.set_result(public_port)
-                        continue
-                    
-                    # Process other messages only after WELCOME is received
-                    if self._welcome_received and self._message_handler:
-                        try:
-                            await self._message_handler(msg_type, conn_id, payload)
-                        except Exception as e:
-                            logger.error(f"Error in message handler: {e}", exc_info=True)
+                    self._welcome_failed()
+                    return
+                if frame[0] == WELCOME:
+                    self._handle_welcome(frame[2])
         
         except asyncio.CancelledError:
-            pass
+            return
         except Exception as e:
             # If error occurs before WELCOME, set exception on future
             if self._welcome_future and not self._welcome_future.done():
                 # Check if connection was closed (likely authentication error)
                 if not self.is_connected():
-                    from ...common.errors import AuthenticationError
                     # Don't log authentication errors here - they will be handled upstream
-                    self._welcome_future.set_exception(AuthenticationError("Неверный токен"))
+                    self._welcome_failed()
                 else:
                     logger.error(f"Error in receive loop: {e}", exc_info=True)
                     self._welcome_future.set_exception(e)
             else:
                 logger.error(f"Error in receive loop: {e}", exc_info=True)
+            return
+        
+        await self._receive_stripe(self._primary)
+    
+    async def _receive_stripe(self, stripe: _ControlStripe) -> None:
+        """Pass the frames of one control connection to the message handler until it is lost."""
+        try:
+            self._start_heartbeat(stripe)
+            stripe.frames.set_frame_handler(lambda frames: self._handle_frames(stripe, frames))
+            await stripe.frames.wait_closed()
+        except asyncio.CancelledError:
+            return
+        except Exception as e:
+            logger.error(f"Error in receive loop: {e}", exc_info=True)
+        if stripe.heartbeat:
+            await stripe.heartbeat.close()
+        await self._stripe_lost(stripe)
+    
+    async def _handle_frames(self, stripe: _ControlStripe, frames: list) -> None:
+        """Pass a batch of frames received after WELCOME to the message handler."""
+        if stripe.heartbeat:
+            stripe.heartbeat.seen()
+        for msg_type, conn_id, payload in frames:
+            if msg_type == PING:
+                stripe.write_scheduler.write(stripe.codec.encode_pong(payload), control=True)
+                continue
+            if msg_type == PONG:
+                if stripe.heartbeat:
+                    stripe.heartbeat.pong(payload)
+                continue
+            if msg_type & FLAG_COMPRESSED:
+                if not self._compressor:
+                    raise ProtocolError("Compressed frame without negotiated compression")
+                payload = await self._compressor.decompress(payload)
+                msg_type &= TYPE_MASK
+            elif msg_type == OPEN:
+                # Frames of this stream go back over the same connection
+                self._stream_stripes[conn_id] = stripe
+                stripe.streams.add(conn_id)
+                if self._welcome.resume:
+                    self._replay[conn_id] = ReplayBuffer()
+            elif msg_type == CLOSE:
+                self._forget_stream(conn_id)
+                self._replay.pop(conn_id, None)
+                if self._compressor:
+                    self._compressor.forget(conn_id)
+            elif msg_type == WINDOW_UPDATE:
+                replay = self._replay.get(conn_id)
+                if replay:
+                    replay.acknowledge(stripe.codec.decode_window_update(payload))
+            elif msg_type == RESUME:
+                await self._resume_streams(stripe, payload)
+                continue
+            if msg_type == DATA:
+                replay = self._replay.get(conn_id)
+                if replay:
+                    replay.received += len(payload)
+            
+            if self._message_handler:
+                try:
+                    await self._message_handler(msg_type, conn_id, payload)
+                except Exception as e:
+                    logger.error(f"Error in message handler: {e}", exc_info=True)
 
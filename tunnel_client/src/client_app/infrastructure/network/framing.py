@@ -2,23 +2,31 @@
 
 from ...common.framing import (
     FrameEncoder,
+    CompactFrameEncoder,
     FrameDecoder,
     HELLO,
     WELCOME,
     OPEN,
     DATA,
     CLOSE,
+    WINDOW_UPDATE,
+    TYPE_MASK,
+    FLAG_COMPRESSED,
     MAX_PAYLOAD
 )
 
 __all__ = [
     'FrameEncoder',
+    'CompactFrameEncoder',
     'FrameDecoder',
     'HELLO',
     'WELCOME',
     'OPEN',
     'DATA',
     'CLOSE',
+    'WINDOW_UPDATE',
+    'TYPE_MASK',
+    'FLAG_COMPRESSED',
     'MAX_PAYLOAD'
 ]
 
@@ -2,19 +2,41 @@
 
 import asyncio
 import logging
-from typing import Tuple
+from typing import Optional, Tuple
 
 from ...interfaces.local_transport import ILocalTransport
+from ...common.timer_wheel import TimerWheel
 
 logger = logging.getLogger(__name__)
 
+# Seconds to connect to the local service before the stream is refused
+CONNECT_TIMEOUT = 5.0
+
 
 class AsyncioLocalConnector(ILocalTransport):
-    """Asyncio implementation of local transport."""
+    """
+    Asyncio implementation of local transport.
+    
+    Connection attempts time out after `connect_timeout` seconds (0 = no
+    limit) on a timer wheel shared by all attempts.
+    """
+    
+    def __init__(self, connect_timeout: float = CONNECT_TIMEOUT, timers: Optional[TimerWheel] = None):
+        self._connect_timeout = connect_timeout
+        self._timers = timers or TimerWheel()
     
     async def connect(self, host: str, port: int) -> Tuple[asyncio.StreamReader, asyncio.StreamWriter]:
         """Connect to local service."""
-        reader, writer = await asyncio.open_connection(host, port)
+        if not self._connect_timeout:
+            reader, writer = await asyncio.open_connection(host, port)
+        else:
+            try:
+                async with self._timers.timeout(self._connect_timeout):
+                    reader, writer = await asyncio.open_connection(host, port)
+            except TimeoutError:
+                raise TimeoutError(
+                    f"Local service {host}:{port} did not accept within {self._connect_timeout:g}s"
+                ) from None
         logger.debug(f"Connected to local service {host}:{port}")
         return reader, writer
 
@@ -1,7 +1,9 @@
 """Control channel interface."""
 
 from abc import ABC, abstractmethod
-from typing import Callable, Awaitable, Any
+from typing import Callable, Awaitable, Any, Optional
+
+from ..common.handshake import Handshake
 
 
 class IControlChannel(ABC):
@@ -18,8 +20,14 @@ class IControlChannel(ABC):
         pass
     
     @abstractmethod
-    async def send_hello(self, token: str, local_host: str, local_port: int) -> None:
-        """Send HELLO message."""
+    async def send_hello(
+        self,
+        token: str,
+        local_host: str,
+        local_port: int,
+        handshake: Optional[Handshake] = None
+    ) -> None:
+        """Send HELLO message; without handshake parameters the legacy format is used."""
         pass
     
     @abstractmethod
@@ -27,6 +35,16 @@ class IControlChannel(ABC):
         """Wait for WELCOME message and return public port."""
         pass
     
+    @abstractmethod
+    async def add_connections(self, token: str, local_host: str, local_port: int, count: int) -> int:
+        """Join further control connections to the session; returns how many were added."""
+        pass
+    
+    @abstractmethod
+    def get_handshake(self) -> tuple[Handshake, Handshake]:
+        """Get the parameters sent in HELLO and received in WELCOME."""
+        pass
+    
     @abstractmethod
     def set_message_handler(
         self, handler: Callable[[int, int, bytes], Awaitable[None]]
@@ -44,6 +62,21 @@ class IControlChannel(ABC):
         """Send CLOSE message."""
         pass
     
+    @abstractmethod
+    async def send_window_update(self, conn_id: int, increment: int) -> None:
+        """Send WINDOW_UPDATE message granting more credit for a stream."""
+        pass
+    
+    @abstractmethod
+    def pause_reading(self, conn_id: int) -> None:
+        """Stop reading the control connection that carries a stream."""
+        pass
+    
+    @abstractmethod
+    def resume_reading(self, conn_id: int) -> None:
+        """Undo pause_reading() for a stream."""
+        pass
+    
     @abstractmethod
     def is_connected(self) -> bool:
         """Check if connected."""
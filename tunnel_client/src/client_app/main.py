@@ -28,6 +28,7 @@ from client_app.domain.entities.tunnel_config import TunnelConfig
 from client_app.domain.entities.tunnel_state import TunnelState
 from client_app.common.protocol import ProtocolCodec
 from client_app.common.threading_bridge import ThreadingBridge
+from client_app.common.timer_wheel import TimerWheel
 from client_app.presentation.gui.app import TunnelClientApp
 
 logger = logging.getLogger(__name__)
@@ -37,9 +38,10 @@ class TunnelClient:
     """Main tunnel client application."""
     
     def __init__(self):
-        # Infrastructure
-        self._control_channel = AsyncioControlClient()
-        self._local_transport = AsyncioLocalConnector()
+        # Infrastructure; connection timeouts share one timer wheel
+        self._timers = TimerWheel()
+        self._control_channel = AsyncioControlClient(timers=self._timers)
+        self._local_transport = AsyncioLocalConnector(timers=self._timers)
         self._codec = ProtocolCodec()
         
         # Domain
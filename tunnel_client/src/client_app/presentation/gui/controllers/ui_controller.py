@@ -23,7 +23,12 @@ class UIController:
                 server_port=config_dict['server_port'],
                 token=config_dict['token'],
                 local_host=config_dict['local_host'],
-                local_port=config_dict['local_port']
+                local_port=config_dict['local_port'],
+                compression=config_dict.get('compression', False),
+                compact_header=config_dict.get('compact_header', False),
+                connections=config_dict.get('connections', 1),
+                hostname=config_dict.get('hostname', ''),
+                max_streams=config_dict.get('max_streams', 0)
             )
             
             if not config.validate():
@@ -46,16 +46,28 @@ class ConnectView(ctk.CTkFrame):
         self._local_port_entry.insert(0, "8080")
         self._local_port_entry.grid(row=5, column=1, padx=10, pady=5, sticky="ew")
         
+        ctk.CTkLabel(self, text="Connections:").grid(row=6, column=0, padx=10, pady=5, sticky="w")
+        self._connections_entry = ctk.CTkEntry(self, width=200)
+        self._connections_entry.insert(0, "1")
+        self._connections_entry.grid(row=6, column=1, padx=10, pady=5, sticky="ew")
+        
+        ctk.CTkLabel(self, text="Host Name:").grid(row=7, column=0, padx=10, pady=5, sticky="w")
+        self._hostname_entry = ctk.CTkEntry(self, width=200, placeholder_text="optional")
+        self._hostname_entry.grid(row=7, column=1, padx=10, pady=5, sticky="ew")
+        
+        self._compression_check = ctk.CTkCheckBox(self, text="Compression")
+        self._compression_check.grid(row=8, column=0, columnspan=2, padx=10, pady=5, sticky="w")
+        
         # Buttons
         self._connect_btn = ctk.CTkButton(
             self, text="Connect", command=self._on_connect_clicked, width=150
         )
-        self._connect_btn.grid(row=6, column=0, columnspan=2, pady=20)
+        self._connect_btn.grid(row=9, column=0, columnspan=2, pady=20)
         
         self._disconnect_btn = ctk.CTkButton(
             self, text="Disconnect", command=self._on_disconnect_clicked, width=150, state="disabled"
         )
-        self._disconnect_btn.grid(row=7, column=0, columnspan=2, pady=5)
+        self._disconnect_btn.grid(row=10, column=0, columnspan=2, pady=5)
         
         self.grid_columnconfigure(0, weight=1)
         self.grid_columnconfigure(1, weight=1)
@@ -78,7 +90,10 @@ class ConnectView(ctk.CTkFrame):
                 'server_port': int(self._server_port_entry.get().strip()),
                 'token': self._token_entry.get().strip(),
                 'local_host': 'localhost',  # Always localhost
-                'local_port': int(self._local_port_entry.get().strip())
+                'local_port': int(self._local_port_entry.get().strip()),
+                'compression': bool(self._compression_check.get()),
+                'connections': int(self._connections_entry.get().strip()),
+                'hostname': self._hostname_entry.get().strip()
             }
         except ValueError:
             return None
@@ -97,6 +112,17 @@ class ConnectView(ctk.CTkFrame):
         if 'local_port' in config:
             self._local_port_entry.delete(0, 'end')
             self._local_port_entry.insert(0, str(config['local_port']))
+        if 'connections' in config:
+            self._connections_entry.delete(0, 'end')
+            self._connections_entry.insert(0, str(config['connections']))
+        if config.get('hostname'):
+            self._hostname_entry.delete(0, 'end')
+            self._hostname_entry.insert(0, config['hostname'])
+        if 'compression' in config:
+            if config['compression']:
+                self._compression_check.select()
+            else:
+                self._compression_check.deselect()
     
     def set_connected(self, connected: bool) -> None:
         """Update UI state based on connection status."""
@@ -108,6 +134,9 @@ class ConnectView(ctk.CTkFrame):
             self._server_port_entry.configure(state="disabled")
             self._token_entry.configure(state="disabled")
             self._local_port_entry.configure(state="disabled")
+            self._connections_entry.configure(state="disabled")
+            self._hostname_entry.configure(state="disabled")
+            self._compression_check.configure(state="disabled")
         else:
             self._connect_btn.configure(state="normal")
             self._disconnect_btn.configure(state="disabled")
@@ -116,4 +145,7 @@ class ConnectView(ctk.CTkFrame):
             self._server_port_entry.configure(state="normal")
             self._token_entry.configure(state="normal")
             self._local_port_entry.configure(state="normal")
+            self._connections_entry.configure(state="normal")
+            self._hostname_entry.configure(state="normal")
+            self._compression_check.configure(state="normal")
 
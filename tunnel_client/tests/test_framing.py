@@ -1,7 +1,17 @@
 """Tests for framing module."""
 
 import pytest
-from src.client_app.common.framing import FrameEncoder, FrameDecoder, HELLO, DATA, MAX_PAYLOAD
+from src.client_app.common.framing import (
+    FrameEncoder,
+    CompactFrameEncoder,
+    FrameDecoder,
+    HELLO,
+    WELCOME,
+    DATA,
+    FLAG_COMPRESSED,
+    MAX_PAYLOAD,
+    encode_varint
+)
 
 
 def test_encode_decode():
@@ -37,3 +47,164 @@ def test_encode_decode_with_conn_id():
     assert conn_id == 12345
     assert payload == b"data"
 
+
+
+def test_decode_all_many_frames():
+    """Test decoding many small frames from a single feed."""
+    encoder = FrameEncoder()
+    decoder = FrameDecoder()
+    
+    stream = b"".join(encoder.encode(DATA, i, bytes([i % 256]) * (i % 7)) for i in range(1000))
+    decoder.feed(stream)
+    frames = decoder.decode_all()
+    
+    assert len(frames) == 1000
+    for i, (msg_type, conn_id, payload) in enumerate(frames):
+        assert msg_type == DATA
+        assert conn_id == i
+        assert isinstance(payload, memoryview)
+        assert payload == bytes([i % 256]) * (i % 7)
+    assert decoder.decode_all() == []
+
+
+def test_decode_all_split_across_feeds():
+    """Test batch decoding when frames are split across reads."""
+    encoder = FrameEncoder()
+    decoder = FrameDecoder()
+    
+    stream = encoder.encode(DATA, 1, b"first") + encoder.encode(DATA, 2, b"second")
+    decoder.feed(stream[:12])
+    frames = decoder.decode_all()
+    assert frames == []
+    
+    decoder.feed(stream[12:20])
+    frames = decoder.decode_all()
+    assert [(f[1], bytes(f[2])) for f in frames] == [(1, b"first")]
+    
+    decoder.feed(stream[20:])
+    frames = decoder.decode_all()
+    assert [(f[1], bytes(f[2])) for f in frames] == [(2, b"second")]
+
+
+def test_payload_views_survive_buffer_growth():
+    """Test that payload views stay valid after the buffer is compacted."""
+    encoder = FrameEncoder()
+    decoder = FrameDecoder()
+    
+    decoder.feed(encoder.encode(DATA, 1, b"a" * 1000))
+    (_, _, first), = decoder.decode_all()
+    
+    # Force the decoder to move to a new, larger buffer
+    decoder.feed(encoder.encode(DATA, 2, b"b" * (FrameDecoder.INITIAL_CAPACITY * 2)))
+    (_, _, second), = decoder.decode_all()
+    
+    assert first == b"a" * 1000
+    assert second == b"b" * (FrameDecoder.INITIAL_CAPACITY * 2)
+
+
+def test_encode_parts():
+    """Test vectored encoding matches the concatenated frame."""
+    encoder = FrameEncoder()
+    payload = b"relayed chunk"
+    
+    header, body = encoder.encode_parts(DATA, 7, payload)
+    assert body is payload
+    assert header + body == encoder.encode(DATA, 7, payload)
+    
+    with pytest.raises(ValueError):
+        encoder.encode_parts(DATA, 1, b"x" * (MAX_PAYLOAD + 1))
+
+
+def test_compact_header_size():
+    """Test that small frames get a 3-byte compact header."""
+    assert len(CompactFrameEncoder.encode(DATA, 1, b"x")) == 3 + 1
+    assert len(CompactFrameEncoder.encode(DATA, 300, b"x" * 200)) == 1 + 2 + 2 + 200
+    assert len(CompactFrameEncoder.encode(DATA, 2**32 - 1, b"")) == 1 + 5 + 1
+
+
+def test_compact_encode_decode():
+    """Test compact frames across varint boundaries and split feeds."""
+    decoder = FrameDecoder()
+    decoder.set_compact_header(True)
+    
+    cases = [(0, b""), (127, b"a" * 127), (128, b"b" * 128), (16384, b"c" * 20000), (2**32 - 1, b"d")]
+    stream = b"".join(
+        CompactFrameEncoder.encode(DATA | FLAG_COMPRESSED, conn_id, payload)
+        for conn_id, payload in cases
+    )
+    
+    frames = []
+    for i in range(0, len(stream), 7):
+        decoder.feed(stream[i:i + 7])
+        frames.extend(decoder.decode_all())
+    
+    assert [(t, c, bytes(p)) for t, c, p in frames] == [
+        (DATA | FLAG_COMPRESSED, conn_id, payload) for conn_id, payload in cases
+    ]
+
+
+def test_compact_header_matches_varints():
+    """Test that packed compact headers equal the varint encoding, byte by byte on decode."""
+    conn_ids = [0, 0x7F, 0x80, 0x3FFF, 0x4000, 2**32 - 1]
+    lengths = [0, 0x7F, 0x80, 0x3FFF, 0x4000, MAX_PAYLOAD]
+    decoder = FrameDecoder()
+    decoder.set_compact_header(True)
+    for conn_id in conn_ids:
+        for length in lengths:
+            header = CompactFrameEncoder.header(DATA, conn_id, length)
+            assert header == bytes([DATA]) + encode_varint(conn_id) + encode_varint(length)
+            
+            frame = header + bytes(length)
+            for i in range(len(header) - 1):
+                decoder.feed(frame[i:i + 1])
+                assert decoder.decode() is None
+            decoder.feed(frame[len(header) - 1:])
+            assert decoder.decode() == (DATA, conn_id, bytes(length))
+
+
+def test_compact_rejects_bad_headers():
+    """Test that oversized lengths and overlong varints are rejected."""
+    decoder = FrameDecoder()
+    decoder.set_compact_header(True)
+    decoder.feed(bytes([DATA]) + encode_varint(1) + encode_varint(MAX_PAYLOAD + 1))
+    with pytest.raises(ValueError):
+        decoder.decode()
+    
+    decoder = FrameDecoder()
+    decoder.set_compact_header(True)
+    decoder.feed(bytes([DATA]) + b"\xff" * 6)
+    with pytest.raises(ValueError):
+        decoder.decode()
+
+
+def test_switch_to_compact_header_mid_buffer():
+    """Test that frames after the switch point are decoded in the new format."""
+    decoder = FrameDecoder()
+    decoder.feed(FrameEncoder.encode(WELCOME, 0, b"port") + CompactFrameEncoder.encode(DATA, 5, b"hi"))
+    
+    assert decoder.decode() == (WELCOME, 0, b"port")
+    decoder.set_compact_header(True)
+    assert decoder.decode() == (DATA, 5, b"hi")
+
+
+def test_receive_into_buffer():
+    """Test receiving straight into the decoder buffer (BufferedProtocol style)."""
+    decoder = FrameDecoder()
+    data = FrameEncoder.encode(DATA, 1, b"first") + FrameEncoder.encode(DATA, 2, b"x" * 70000)
+    
+    frames = []
+    offset = 0
+    while offset < len(data):
+        buffer = decoder.get_buffer(-1)
+        assert len(buffer) >= FrameDecoder.MIN_RECEIVE_SIZE
+        chunk = data[offset:offset + min(len(buffer), 1000)]
+        buffer[:len(chunk)] = chunk
+        decoder.buffer_updated(len(chunk))
+        offset += len(chunk)
+        frames.extend(decoder.decode_all())
+    
+    assert [(t, c, bytes(p)) for t, c, p in frames] == [
+        (DATA, 1, b"first"),
+        (DATA, 2, b"x" * 70000),
+    ]
+
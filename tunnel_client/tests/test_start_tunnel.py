@@ -0,0 +1,150 @@
+"""Tests for relaying streams to the local service."""
+
+import asyncio
+import socket
+
+import pytest
+from src.client_app.application.usecases.start_tunnel import StartTunnelUseCase
+from src.client_app.domain.entities.tunnel_state import TunnelState
+from src.client_app.common.protocol import ProtocolCodec
+from src.client_app.common.framing import OPEN, DATA, CLOSE
+from src.client_app.common.handshake import Handshake, PROTOCOL_VERSION, CAP_FLOW_CONTROL
+
+
+class FakeControlChannel:
+    """Control channel that records what the client sends to the server."""
+    
+    def __init__(self):
+        self.handler = None
+        self.closed = []
+        hello = Handshake(version=PROTOCOL_VERSION, capabilities=CAP_FLOW_CONTROL)
+        self.handshake = (hello, hello)
+    
+    def set_message_handler(self, handler) -> None:
+        self.handler = handler
+    
+    def get_handshake(self):
+        return self.handshake
+    
+    async def send_data(self, conn_id: int, data: bytes) -> None:
+        pass
+    
+    async def send_close(self, conn_id: int) -> None:
+        self.closed.append(conn_id)
+    
+    async def send_window_update(self, conn_id: int, increment: int) -> None:
+        pass
+
+
+class FakeLocalTransport:
+    """Local service reached over socket pairs; the n-th connect waits for `gates[n]`."""
+    
+    def __init__(self):
+        self.peers = []
+        self.gates = {}
+    
+    async def connect(self, host: str, port: int):
+        gate = self.gates.get(len(self.peers))
+        local, peer = socket.socketpair()
+        self.peers.append(peer)
+        if gate:
+            await gate.wait()
+        return await asyncio.open_connection(sock=local)
+
+
+@pytest.mark.asyncio
+async def test_slow_connect_does_not_stall_other_streams():
+    """Test that a stream still connecting buffers its data while other streams flow."""
+    channel = FakeControlChannel()
+    transport = FakeLocalTransport()
+    state = TunnelState()
+    StartTunnelUseCase(channel, transport, state, ProtocolCodec())
+    
+    gate = transport.gates[0] = asyncio.Event()
+    await asyncio.wait_for(channel.handler(OPEN, 1, b''), 1)
+    await asyncio.wait_for(channel.handler(DATA, 1, b'early'), 1)
+    await channel.handler(OPEN, 2, b'')
+    await channel.handler(DATA, 2, b'hello')
+    await asyncio.sleep(0.01)
+    
+    reader, writer = await asyncio.open_connection(sock=transport.peers[1])
+    assert await asyncio.wait_for(reader.readexactly(5), 2) == b'hello'
+    assert state.active_connections[1].connecting
+    
+    slow_reader, slow_writer = await asyncio.open_connection(sock=transport.peers[0])
+    gate.set()
+    assert await asyncio.wait_for(slow_reader.readexactly(5), 2) == b'early'
+    
+    await channel.handler(CLOSE, 1, b'')
+    await channel.handler(CLOSE, 2, b'')
+    assert state.get_connection_count() == 0
+    writer.close()
+    slow_writer.close()
+
+
+@pytest.mark.asyncio
+async def test_early_data_is_delivered_after_connect():
+    """Test that data received while connecting reaches the local service in order."""
+    channel = FakeControlChannel()
+    transport = FakeLocalTransport()
+    state = TunnelState()
+    StartTunnelUseCase(channel, transport, state, ProtocolCodec())
+    
+    gate = transport.gates[0] = asyncio.Event()
+    await channel.handler(OPEN, 1, b'')
+    await channel.handler(DATA, 1, b'one ')
+    await channel.handler(DATA, 1, b'two')
+    await asyncio.sleep(0.01)
+    
+    reader, writer = await asyncio.open_connection(sock=transport.peers[0])
+    gate.set()
+    assert await asyncio.wait_for(reader.readexactly(7), 2) == b'one two'
+    assert not state.active_connections[1].connecting
+    
+    await channel.handler(CLOSE, 1, b'')
+    assert await asyncio.wait_for(reader.read(), 2) == b''
+    writer.close()
+
+
+@pytest.mark.asyncio
+async def test_close_while_connecting():
+    """Test that a stream closed by the server while connecting is dropped once connected."""
+    channel = FakeControlChannel()
+    transport = FakeLocalTransport()
+    state = TunnelState()
+    StartTunnelUseCase(channel, transport, state, ProtocolCodec())
+    
+    gate = transport.gates[0] = asyncio.Event()
+    await channel.handler(OPEN, 1, b'')
+    await channel.handler(DATA, 1, b'lost')
+    await channel.handler(CLOSE, 1, b'')
+    assert state.get_connection_count() == 0
+    await asyncio.sleep(0.01)
+    
+    reader, writer = await asyncio.open_connection(sock=transport.peers[0])
+    gate.set()
+    assert await asyncio.wait_for(reader.read(), 2) == b''
+    # The server closed the stream; it is not told again
+    assert channel.closed == []
+    writer.close()
+
+
+@pytest.mark.asyncio
+async def test_close_does_not_wait_for_non_reading_service():
+    """Test that closing a stream whose local service stopped reading returns at once."""
+    channel = FakeControlChannel()
+    channel.handshake = (Handshake(), Handshake())
+    channel.pause_reading = channel.resume_reading = lambda conn_id: None
+    transport = FakeLocalTransport()
+    state = TunnelState()
+    StartTunnelUseCase(channel, transport, state, ProtocolCodec())
+    
+    await channel.handler(OPEN, 1, b'')
+    await asyncio.sleep(0.05)
+    transport.peers[0].setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, 4096)
+    for _ in range(64):
+        await channel.handler(DATA, 1, b'x' * 65536)
+    
+    await asyncio.wait_for(channel.handler(CLOSE, 1, b''), 0.5)
+    assert state.get_connection_count() == 0
+    transport.peers[0].close()
@@ -0,0 +1,104 @@
+#!/usr/bin/env python
+"""
+Microbenchmark: bytes copied per relayed MiB on the DATA encode path.
+
+Relays 1 MiB in 4 KiB chunks through a real StreamWriter (socketpair) and
+measures, with tracemalloc, how many bytes are allocated per chunk between
+encoding the frame and handing it to the transport. Compares the legacy
+`header + payload` path with the vectored `encode_parts` + `writelines` path.
+
+On Python 3.12+ selector transports implement writelines() with sendmsg(),
+so the vectored path hands both buffers to the kernel without copying them.
+On 3.11 writelines() still joins the buffers, and both paths copy about the
+same amount.
+
+Usage:
+    python benchmarks/bench_data_encoding.py
+"""
+
+import asyncio
+import socket
+import sys
+import time
+import tracemalloc
+from pathlib import Path
+
+# Add src to path
+src_path = Path(__file__).resolve().parent.parent / "src"
+sys.path.insert(0, str(src_path))
+
+from server_app.common.protocol import ProtocolCodec
+
+MIB = 1024 * 1024
+CHUNK_SIZE = 4096
+
+
+async def _open_pair():
+    """Open a connected (reader, writer) pair plus the raw peer socket."""
+    local, peer = socket.socketpair()
+    peer.setblocking(False)
+    reader, writer = await asyncio.open_connection(sock=local)
+    return reader, writer, peer
+
+
+def _drain_peer(peer: socket.socket) -> None:
+    """Discard everything the peer socket has received so far."""
+    try:
+        while peer.recv(1024 * 1024):
+            pass
+    except BlockingIOError:
+        pass
+
+
+async def _measure(write_chunk, writer, peer, chunks: list[bytes]) -> tuple[int, float]:
+    """Return (bytes allocated, seconds) for relaying all chunks."""
+    copied = 0
+    elapsed = 0.0
+    for chunk in chunks:
+        tracemalloc.reset_peak()
+        before, _ = tracemalloc.get_traced_memory()
+        start = time.perf_counter()
+        write_chunk(writer, chunk)
+        elapsed += time.perf_counter() - start
+        _, peak = tracemalloc.get_traced_memory()
+        copied += peak - before
+        await writer.drain()
+        _drain_peer(peer)
+    return copied, elapsed
+
+
+async def run() -> dict[str, tuple[int, float]]:
+    codec = ProtocolCodec()
+    chunks = [bytes([i % 256]) * CHUNK_SIZE for i in range(MIB // CHUNK_SIZE)]
+    
+    def legacy(writer, chunk):
+        writer.write(codec.encode_data(1, chunk))
+    
+    def vectored(writer, chunk):
+        writer.writelines(codec.encode_data_parts(1, chunk))
+    
+    results = {}
+    tracemalloc.start()
+    try:
+        for name, write_chunk in (("concat + write", legacy), ("encode_parts + writelines", vectored)):
+            _, writer, peer = await _open_pair()
+            # Warm up the transport before measuring
+            await _measure(write_chunk, writer, peer, chunks[:16])
+            results[name] = await _measure(write_chunk, writer, peer, chunks)
+            writer.close()
+            peer.close()
+    finally:
+        tracemalloc.stop()
+    return results
+
+
+def main() -> None:
+    results = asyncio.run(run())
+    print(f"Python {sys.version.split()[0]}, {CHUNK_SIZE}-byte chunks, 1 MiB relayed")
+    for name, (copied, elapsed) in results.items():
+        print(f"  {name:28s} {copied / MIB:6.2f} MiB copied per MiB  {elapsed * 1000:7.2f} ms")
+
+
+if __name__ == '__main__':
+    main()
+
@@ -0,0 +1,86 @@
+#!/usr/bin/env python
+"""
+Microbenchmark: fixed vs compact frame header.
+
+Encodes and decodes the same DATA frames with the fixed 9-byte header and
+with the compact varint header, and reports the time per frame and the
+header overhead per relayed payload byte for three traffic shapes:
+keystrokes (SSH/RDP input), a mixed interactive session and bulk transfer.
+
+Usage:
+    python benchmarks/bench_frame_header.py
+"""
+
+import random
+import sys
+import time
+from pathlib import Path
+
+# Add src to path
+src_path = Path(__file__).resolve().parent.parent / "src"
+sys.path.insert(0, str(src_path))
+
+from server_app.common.framing import FrameEncoder, CompactFrameEncoder, FrameDecoder, DATA
+
+FRAMES = 20000
+
+
+def _workloads() -> dict[str, list[tuple[int, bytes]]]:
+    """Return (conn_id, payload) lists for each traffic shape."""
+    rng = random.Random(0)
+    return {
+        'keystrokes': [(rng.randrange(1, 64), b'k' * rng.randrange(1, 8)) for _ in range(FRAMES)],
+        'interactive': [
+            (rng.randrange(1, 4096), b'i' * rng.choice((4, 32, 96, 200, 1400)))
+            for _ in range(FRAMES)
+        ],
+        'bulk': [(rng.randrange(1, 4096), b'b' * 65536) for _ in range(FRAMES // 20)],
+    }
+
+
+def _measure(encoder, compact: bool, frames: list[tuple[int, bytes]]) -> tuple[float, float, float]:
+    """Return (encode ns/frame, decode ns/frame, header bytes per payload byte)."""
+    start = time.perf_counter()
+    headers = [encoder.encode_parts(DATA, conn_id, payload)[0] for conn_id, payload in frames]
+    encode_time = time.perf_counter() - start
+    
+    stream = b''.join(header + payload for header, (_, payload) in zip(headers, frames))
+    decoder = FrameDecoder()
+    decoder.set_compact_header(compact)
+    start = time.perf_counter()
+    decoder.feed(stream)
+    decoded = decoder.decode_all()
+    decode_time = time.perf_counter() - start
+    assert len(decoded) == len(frames)
+    
+    header_bytes = sum(len(header) for header in headers)
+    payload_bytes = sum(len(payload) for _, payload in frames)
+    return (
+        encode_time / len(frames) * 1e9,
+        decode_time / len(frames) * 1e9,
+        header_bytes / payload_bytes,
+    )
+
+
+def run() -> dict[str, dict[str, tuple[float, float, float]]]:
+    results = {}
+    for name, frames in _workloads().items():
+        results[name] = {
+            'fixed': _measure(FrameEncoder, False, frames),
+            'compact': _measure(CompactFrameEncoder, True, frames),
+        }
+    return results
+
+
+def main() -> None:
+    results = run()
+    print(f"Python {sys.version.split()[0]}")
+    print(f"  {'workload':12s} {'header':8s} {'encode ns':>10s} {'decode ns':>10s} {'overhead/byte':>14s}")
+    for name, by_format in results.items():
+        for header, (encode_ns, decode_ns, overhead) in by_format.items():
+            print(f"  {name:12s} {header:8s} {encode_ns:10.0f} {decode_ns:10.0f} {overhead:14.4f}")
+
+
+if __name__ == '__main__':
+    main()
+
@@ -0,0 +1,623 @@
+#!/usr/bin/env python
+"""
+Hot-path benchmark suite with regression baselines.
+
+Runs microbenchmarks of the frame codec, the port allocator, the agent
+registry and an in-process relay (tunnel server + minimal agent + echo
+service on loopback). Each benchmark reports a throughput; the best of
+several repeats is compared with the stored baseline.
+
+Baselines are machine specific: record them on the machine that runs the
+check (e.g. the CI runner) with --save.
+
+Usage:
+    python benchmarks/suite.py                      # run and compare
+    python benchmarks/suite.py --save               # store new baselines
+    python benchmarks/suite.py --check              # exit 1 on regression
+    python benchmarks/suite.py -k decoder --repeat 10
+"""
+
+import argparse
+import asyncio
+import json
+import logging
+import os
+import platform
+import sys
+import time
+from pathlib import Path
+from typing import Awaitable, Callable, Optional
+
+# Add src to path
+src_path = Path(__file__).resolve().parent.parent / "src"
+sys.path.insert(0, str(src_path))
+
+from server_app.common.framing import (
+    FrameEncoder,
+    CompactFrameEncoder,
+    FrameDecoder,
+    DATA,
+    OPEN,
+    CLOSE,
+    WELCOME,
+    WINDOW_UPDATE
+)
+from server_app.common.protocol import ProtocolCodec
+from server_app.common.handshake import Handshake, PROTOCOL_VERSION, CAP_FLOW_CONTROL
+from server_app.domain.entities.agent_session import AgentSession
+from server_app.domain.entities.external_conn import ExternalConn
+from server_app.application.usecases.relay_data_usecase import RelayDataUseCase
+from server_app.infrastructure.allocators.range_port_allocator import RangePortAllocator
+from server_app.infrastructure.persistence.in_memory_registry import InMemoryAgentRegistry
+from server_app.infrastructure.network.asyncio_control_server import AsyncioControlServer
+from server_app.infrastructure.network.frame_reader import STREAM_TRANSPORT, BUFFERED_TRANSPORT
+from server_app.main import TunnelServer
+from server_app.presentation.cli import ServerConfig
+
+BASELINE_FILE = Path(__file__).resolve().parent / "baselines.json"
+DEFAULT_THRESHOLD = 0.25  # fail when throughput drops by more than 25%
+
+MIB = 1024 * 1024
+
+# name -> (unit, benchmark); a benchmark returns (units of work, seconds)
+BENCHMARKS: dict[str, tuple[str, Callable[[], Awaitable[tuple[float, float]]]]] = {}
+
+
+def benchmark(name: str, unit: str):
+    """Register a benchmark."""
+    def register(func):
+        BENCHMARKS[name] = (unit, func)
+        return func
+    return register
+
+
+def _frames(count: int, size: int, encoder=FrameEncoder) -> bytes:
+    """Encode `count` DATA frames with `size`-byte payloads into one stream."""
+    payload = b'x' * size
+    return b''.join(encoder.encode(DATA, i % 1000, payload) for i in range(count))
+
+
+# --- Frame codec ---
+
+@benchmark('framing.encode', 'frames/s')
+async def bench_encode() -> tuple[float, float]:
+    payload = b'x' * 64
+    encode = FrameEncoder.encode
+    count = 200000
+    start = time.perf_counter()
+    for i in range(count):
+        encode(DATA, i, payload)
+    return count, time.perf_counter() - start
+
+
+@benchmark('framing.encode_parts', 'frames/s')
+async def bench_encode_parts() -> tuple[float, float]:
+    payload = b'x' * 4096
+    encode_parts = FrameEncoder.encode_parts
+    count = 200000
+    start = time.perf_counter()
+    for i in range(count):
+        encode_parts(DATA, i, payload)
+    return count, time.perf_counter() - start
+
+
+@benchmark('decoder.tiny_frames', 'frames/s')
+async def bench_decode_tiny_frames() -> tuple[float, float]:
+    count = 100000
+    stream = _frames(count, 16)
+    decoder = FrameDecoder()
+    start = time.perf_counter()
+    decoder.feed(stream)
+    frames = decoder.decode_all()
+    elapsed = time.perf_counter() - start
+    assert len(frames) == count
+    return count, elapsed
+
+
+@benchmark('decoder.tiny_frames_compact', 'frames/s')
+async def bench_decode_tiny_frames_compact() -> tuple[float, float]:
+    count = 100000
+    stream = _frames(count, 16, CompactFrameEncoder)
+    decoder = FrameDecoder()
+    decoder.set_compact_header(True)
+    start = time.perf_counter()
+    decoder.feed(stream)
+    frames = decoder.decode_all()
+    elapsed = time.perf_counter() - start
+    assert len(frames) == count
+    return count, elapsed
+
+
+@benchmark('decoder.large_frames', 'MiB/s')
+async def bench_decode_large_frames() -> tuple[float, float]:
+    frame = FrameEncoder.encode(DATA, 1, b'x' * MIB)
+    count = 64
+    decoder = FrameDecoder()
+    start = time.perf_counter()
+    for _ in range(count):
+        decoder.feed(frame)
+        assert len(decoder.decode_all()) == 1
+    return count, time.perf_counter() - start
+
+
+@benchmark('decoder.split_reads', 'frames/s')
+async def bench_decode_split_reads() -> tuple[float, float]:
+    # Frames of mixed sizes arriving in MTU-sized reads
+    sizes = (16, 200, 1400, 4096)
+    stream = b''.join(
+        FrameEncoder.encode(DATA, i, b'x' * sizes[i % len(sizes)]) for i in range(20000)
+    )
+    reads = [stream[i:i + 1448] for i in range(0, len(stream), 1448)]
+    decoder = FrameDecoder()
+    decoded = 0
+    start = time.perf_counter()
+    for data in reads:
+        decoder.feed(data)
+        decoded += len(decoder.decode_all())
+    elapsed = time.perf_counter() - start
+    assert decoded == 20000
+    return decoded, elapsed
+
+
+# --- Port allocator and registry ---
+
+@benchmark('allocator.allocate_high_occupancy', 'ops/s')
+async def bench_allocate_high_occupancy() -> tuple[float, float]:
+    # 95% of a 2000-port range is taken; allocate and release the free ports
+    allocator = RangePortAllocator(20000, 21999)
+    for _ in range(1900):
+        await allocator.allocate()
+    count = 2000
+    start = time.perf_counter()
+    for _ in range(count // 100):
+        ports = [await allocator.allocate() for _ in range(100)]
+        for port in ports:
+            await allocator.release(port)
+    return count, time.perf_counter() - start
+
+
+@benchmark('registry.lookup', 'lookups/s')
+async def bench_registry_lookup() -> tuple[float, float]:
+    registry = InMemoryAgentRegistry()
+    sessions = [
+        AgentSession(
+            agent_id=f"agent-{i}",
+            token="t",
+            local_host="localhost",
+            local_port=8080,
+            public_port=20000 + i
+        )
+        for i in range(1000)
+    ]
+    for session in sessions:
+        await registry.save(session)
+    
+    count = 100000
+    start = time.perf_counter()
+    for i in range(count // 2):
+        session = sessions[i % 1000]
+        await registry.get_by_port(session.public_port)
+        await registry.get_by_id(session.agent_id)
+    return count, time.perf_counter() - start
+
+
+def _fleet(count: int) -> list[AgentSession]:
+    """Sessions of a large fleet: 100 agents per remote address, every 10th named."""
+    # One codec for all: each owns a 64 KiB receive buffer
+    codec = ProtocolCodec()
+    return [
+        AgentSession(
+            agent_id=f"agent-{i}",
+            token="t",
+            local_host="localhost",
+            local_port=8080,
+            public_port=20000 + i,
+            hostname=f"app-{i}.example.com" if i % 10 == 0 else '',
+            remote_host=f"10.{i // 25600 % 256}.{i // 100 % 256}.1",
+            codec=codec
+        )
+        for i in range(count)
+    ]
+
+
+async def _registry_churn(count: int) -> tuple[float, float]:
+    """Register and remove a fleet of `count` agents."""
+    sessions = _fleet(count)
+    registry = InMemoryAgentRegistry()
+    start = time.perf_counter()
+    for session in sessions:
+        await registry.save(session)
+    for session in sessions:
+        await registry.remove(session.agent_id)
+    return 2 * count, time.perf_counter() - start
+
+
+async def _registry_scan(count: int) -> tuple[float, float]:
+    """Indexed lookups, O(1) stats and a full iteration over `count` agents."""
+    sessions = _fleet(count)
+    registry = InMemoryAgentRegistry()
+    for session in sessions:
+        await registry.save(session)
+    
+    start = time.perf_counter()
+    for session in sessions:
+        await registry.get_by_id(session.agent_id)
+        await registry.get_by_port(session.public_port)
+        if session.hostname:
+            await registry.get_by_hostname(session.hostname)
+        registry.get_stats()
+    iterated = 0
+    async for _ in registry.iterate():
+        iterated += 1
+    assert iterated == count
+    return 2 * count, time.perf_counter() - start
+
+
+@benchmark('registry.churn_10k', 'ops/s')
+async def bench_registry_churn_10k() -> tuple[float, float]:
+    return await _registry_churn(10000)
+
+
+@benchmark('registry.churn_100k', 'ops/s')
+async def bench_registry_churn_100k() -> tuple[float, float]:
+    return await _registry_churn(100000)
+
+
+@benchmark('registry.scan_10k', 'ops/s')
+async def bench_registry_scan_10k() -> tuple[float, float]:
+    return await _registry_scan(10000)
+
+
+@benchmark('registry.scan_100k', 'ops/s')
+async def bench_registry_scan_100k() -> tuple[float, float]:
+    return await _registry_scan(100000)
+
+
+class _NullScheduler:
+    """WriteScheduler stand-in that drops frames, to time the relay path alone."""
+    
+    quantum = 16 * 1024
+    
+    async def send(self, *parts: bytes, stream: int = 0, control: bool = False) -> None:
+        pass
+
+
+@benchmark('relay.chunk_dispatch', 'chunks/s')
+async def bench_relay_chunk_dispatch() -> tuple[float, float]:
+    # Per-chunk cost of external -> agent relaying between reading a chunk
+    # and queueing its DATA frame, with 1000 agents registered
+    registry = InMemoryAgentRegistry()
+    for i in range(1000):
+        await registry.save(AgentSession(
+            agent_id=f"agent-{i}",
+            token="t",
+            local_host="localhost",
+            local_port=8080,
+            public_port=20000 + i
+        ))
+    session = await registry.get_by_id("agent-500")
+    session.add_stripe(None, None, _NullScheduler())
+    conn = ExternalConn(conn_id=1, agent_id=session.agent_id)
+    conn.stripe = session.assign_stripe(conn.conn_id)
+    session.add_external_connection(conn)
+    
+    relay = RelayDataUseCase()
+    codec = ProtocolCodec()
+    chunk = b'x' * 4096
+    count = 100000
+    start = time.perf_counter()
+    for _ in range(count):
+        await relay.relay_to_agent(session, conn, chunk, codec)
+    return count, time.perf_counter() - start
+
+
+# --- Control connection receive path ---
+
+async def _control_frames(transport: str) -> tuple[float, float]:
+    """Receive a burst of small DATA frames through AsyncioControlServer."""
+    count = 200000
+    stream = _frames(count, 64)
+    received = 0
+    done = asyncio.get_running_loop().create_future()
+    
+    def on_frames(frames):
+        nonlocal received
+        received += len(frames)
+        if received >= count and not done.done():
+            done.set_result(time.perf_counter())
+    
+    async def handle_connection(frames, writer):
+        frames.set_frame_handler(on_frames)
+        await frames.wait_closed()
+    
+    port = int(os.environ.get('BENCH_CONTROL_PORT', 17000)) + 20
+    server = AsyncioControlServer(transport)
+    server.set_connection_handler(handle_connection)
+    await server.start('127.0.0.1', port)
+    try:
+        _, writer = await asyncio.open_connection('127.0.0.1', port)
+        start = time.perf_counter()
+        writer.write(stream)
+        await writer.drain()
+        end = await done
+        writer.close()
+        await writer.wait_closed()
+        return count, end - start
+    finally:
+        await server.stop()
+
+
+@benchmark('control.stream_transport', 'frames/s')
+async def bench_control_stream() -> tuple[float, float]:
+    return await _control_frames(STREAM_TRANSPORT)
+
+
+@benchmark('control.buffered_transport', 'frames/s')
+async def bench_control_buffered() -> tuple[float, float]:
+    return await _control_frames(BUFFERED_TRANSPORT)
+
+
+# --- In-process relay ---
+
+class _EchoAgent:
+    """Minimal agent that echoes every stream back through the tunnel."""
+    
+    def __init__(self):
+        self._codec = ProtocolCodec()
+        self._writer: Optional[asyncio.StreamWriter] = None
+        self._task: Optional[asyncio.Task] = None
+    
+    async def connect(self, port: int) -> int:
+        reader, self._writer = await asyncio.open_connection('127.0.0.1', port)
+        handshake = Handshake(version=PROTOCOL_VERSION, capabilities=CAP_FLOW_CONTROL)
+        self._writer.write(self._codec.encode_hello('bench', '127.0.0.1', 0, handshake))
+        
+        while True:
+            frame = self._codec.decode_frame()
+            if frame:
+                break
+            self._codec.feed(await reader.read(65536))
+        assert frame[0] == WELCOME
+        public_port = self._codec.decode_welcome(frame[2])
+        self._task = asyncio.create_task(self._run(reader))
+        return public_port
+    
+    async def _run(self, reader: asyncio.StreamReader) -> None:
+        codec = self._codec
+        writer = self._writer
+        while True:
+            data = await reader.read(256 * 1024)
+            if not data:
+                return
+            codec.feed(data)
+            for msg_type, conn_id, payload in codec.decode_frames():
+                if msg_type == DATA:
+                    writer.writelines(codec.encode_data_parts(conn_id, payload))
+                    writer.write(codec.encode_window_update(conn_id, len(payload)))
+                elif msg_type == CLOSE:
+                    writer.write(codec.encode_close(conn_id))
+                elif msg_type not in (OPEN, WINDOW_UPDATE):
+                    raise RuntimeError(f"Unexpected frame type {msg_type}")
+            await writer.drain()
+    
+    async def close(self) -> None:
+        if self._task:
+            self._task.cancel()
+        if self._writer:
+            self._writer.close()
+            await self._writer.wait_closed()
+
+
+async def _open_public(port: int):
+    """Connect to a public port; it is bound before WELCOME is sent."""
+    return await asyncio.open_connection('127.0.0.1', port)
+
+
+async def _with_tunnel(func) -> tuple[float, float]:
+    """Run func(public_port) against a tunnel server with an echo agent."""
+    control_port = int(os.environ.get('BENCH_CONTROL_PORT', 17000))
+    server = TunnelServer(ServerConfig(
+        bind='127.0.0.1',
+        control_port=control_port,
+        port_min=control_port + 1,
+        port_max=control_port + 10,
+        token='bench'
+    ))
+    await server.start()
+    agent = _EchoAgent()
+    try:
+        public_port = await agent.connect(control_port)
+        return await func(public_port)
+    finally:
+        await agent.close()
+        await server.stop()
+
+
+@benchmark('relay.throughput', 'MiB/s')
+async def bench_relay_throughput() -> tuple[float, float]:
+    async def run(public_port: int) -> tuple[float, float]:
+        reader, writer = await _open_public(public_port)
+        blob = b'x' * (32 * MIB)
+        start = time.perf_counter()
+        
+        async def send():
+            writer.write(blob)
+            await writer.drain()
+        
+        sender = asyncio.create_task(send())
+        await reader.readexactly(len(blob))
+        elapsed = time.perf_counter() - start
+        await sender
+        writer.close()
+        return len(blob) / MIB, elapsed
+    
+    return await _with_tunnel(run)
+
+
+@benchmark('relay.round_trips', 'round trips/s')
+async def bench_relay_round_trips() -> tuple[float, float]:
+    async def run(public_port: int) -> tuple[float, float]:
+        reader, writer = await _open_public(public_port)
+        message = b'x' * 64
+        count = 2000
+        start = time.perf_counter()
+        for _ in range(count):
+            writer.write(message)
+            await reader.readexactly(len(message))
+        elapsed = time.perf_counter() - start
+        writer.close()
+        return count, elapsed
+    
+    return await _with_tunnel(run)
+
+
+async def _saturate(public_port: int, streams: int = 4) -> list[asyncio.Task]:
+    """Start bulk streams that keep the agent's control connection saturated."""
+    blob = b'x' * MIB
+    
+    async def bulk():
+        reader, writer = await _open_public(public_port)
+        
+        async def discard():
+            while await reader.read(256 * 1024):
+                pass
+        
+        discard_task = asyncio.create_task(discard())
+        try:
+            while True:
+                writer.write(blob)
+                await writer.drain()
+        except (ConnectionError, asyncio.CancelledError):
+            pass
+        finally:
+            discard_task.cancel()
+            writer.close()
+    
+    tasks = [asyncio.create_task(bulk()) for _ in range(streams)]
+    await asyncio.sleep(0.2)
+    return tasks
+
+
+async def _stop(tasks: list[asyncio.Task]) -> None:
+    for task in tasks:
+        task.cancel()
+    await asyncio.gather(*tasks)
+
+
+@benchmark('relay.round_trips_under_bulk', 'round trips/s')
+async def bench_relay_round_trips_under_bulk() -> tuple[float, float]:
+    async def run(public_port: int) -> tuple[float, float]:
+        tasks = await _saturate(public_port)
+        reader, writer = await _open_public(public_port)
+        message = b'x' * 64
+        count = 200
+        start = time.perf_counter()
+        for _ in range(count):
+            writer.write(message)
+            await reader.readexactly(len(message))
+        elapsed = time.perf_counter() - start
+        
+        await _stop(tasks)
+        writer.close()
+        return count, elapsed
+    
+    return await _with_tunnel(run)
+
+
+@benchmark('relay.opens_under_bulk', 'opens/s')
+async def bench_relay_opens_under_bulk() -> tuple[float, float]:
+    # Open-to-first-byte: connect, send one byte, wait for its echo
+    async def run(public_port: int) -> tuple[float, float]:
+        tasks = await _saturate(public_port)
+        count = 50
+        start = time.perf_counter()
+        for _ in range(count):
+            reader, writer = await _open_public(public_port)
+            writer.write(b'x')
+            await reader.readexactly(1)
+            writer.close()
+        elapsed = time.perf_counter() - start
+        
+        await _stop(tasks)
+        return count, elapsed
+    
+    return await _with_tunnel(run)
+
+
+# --- Runner ---
+
+async def run(names: list[str], repeat: int) -> dict[str, dict]:
+    """Run benchmarks and keep the best throughput of each."""
+    results = {}
+    for name in names:
+        unit, func = BENCHMARKS[name]
+        best = 0.0
+        for _ in range(repeat):
+            work, elapsed = await func()
+            best = max(best, work / elapsed)
+        results[name] = {'value': round(best, 1), 'unit': unit}
+    return results
+
+
+def compare(results: dict[str, dict], baselines: dict[str, dict], threshold: float) -> list[str]:
+    """Print results next to baselines and return the names that regressed."""
+    regressions = []
+    print(f"  {'benchmark':38s} {'result':>14s} {'baseline':>14s} {'change':>8s}")
+    for name, result in results.items():
+        baseline = baselines.get(name)
+        line = f"  {name:38s} {result['value']:14.1f}"
+        if baseline:
+            change = result['value'] / baseline['value'] - 1
+            line += f" {baseline['value']:14.1f} {change:+8.1%}"
+            if change < -threshold:
+                regressions.append(name)
+                line += "  REGRESSION"
+        print(f"{line}  {result['unit']}")
+    return regressions
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Tunnel hot-path benchmarks")
+    parser.add_argument('-k', dest='pattern', default='', help='Only run benchmarks containing this string')
+    parser.add_argument('--repeat', type=int, default=5, help='Repeats per benchmark (default: 5)')
+    parser.add_argument('--baseline', type=Path, default=BASELINE_FILE, help='Baseline file')
+    parser.add_argument('--save', action='store_true', help='Store the results as the new baselines')
+    parser.add_argument('--check', action='store_true', help='Exit with status 1 on regression')
+    parser.add_argument(
+        '--threshold',
+        type=float,
+        default=DEFAULT_THRESHOLD,
+        help=f'Allowed throughput drop before failing (default: {DEFAULT_THRESHOLD})'
+    )
+    parser.add_argument('--output', type=Path, help='Also write the results as JSON to this file')
+    args = parser.parse_args()
+    
+    # Shutting the tunnel down between benchmarks logs expected disconnects
+    logging.basicConfig(level=logging.CRITICAL)
+    names = [name for name in BENCHMARKS if args.pattern in name]
+    results = asyncio.run(run(names, args.repeat))
+    
+    baselines = {}
+    if args.baseline.exists():
+        baselines = json.loads(args.baseline.read_text())['results']
+    
+    print(f"Python {platform.python_version()} on {platform.machine()}")
+    regressions = compare(results, baselines, args.threshold)
+    
+    report = {'python': platform.python_version(), 'machine': platform.machine(), 'results': results}
+    if args.output:
+        args.output.write_text(json.dumps(report, indent=2) + '\n')
+    if args.save:
+        # Keep baselines of benchmarks that were not run this time
+        report['results'] = {**baselines, **results}
+        args.baseline.write_text(json.dumps(report, indent=2, sort_keys=True) + '\n')
+        print(f"Baselines saved to {args.baseline}")
+    
+    if args.check and regressions:
+        print(f"{len(regressions)} benchmark(s) regressed by more than {args.threshold:.0%}")
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
+
@@ -1,5 +1,6 @@
 """Close connection use case."""
 
+import asyncio
 import logging
 from typing import Optional
 
@@ -12,15 +13,27 @@ logger = logging.getLogger(__name__)
 
 
 class CloseConnectionUseCase:
-    """Use case for closing connections."""
+    """
+    Use case for closing connections.
+    
+    A stream is removed from its session at once, but its external
+    connection is closed gracefully in a task of its own: the client may
+    take up to the connection's linger time to read the last data, and
+    the agent's other streams must not wait for it.
+    """
     
     def __init__(
         self,
         agent_repository: IAgentRepository,
-        port_allocator: IPortAllocator
+        port_allocator: IPortAllocator,
+        resume_grace: float = 0.0
     ):
         self._agent_repository = agent_repository
         self._port_allocator = port_allocator
+        # Seconds a resumable session is held without control connection
+        self._resume_grace = resume_grace
+        # Graceful closes still waiting for their clients
+        self._closing: set[asyncio.Task] = set()
     
     async def close_external_connection(
         self,
@@ -38,15 +51,18 @@ class CloseConnectionUseCase:
             return
         
         # Close external connection
-        await external_conn.close()
+        scheduler = session.scheduler_for(external_conn)
         session.remove_external_connection(conn_id)
+        self._close_gracefully(external_conn)
+        if session.compressor:
+            session.compressor.forget(conn_id)
         
         # Notify agent
-        if session.control_writer:
+        if scheduler:
+            scheduler.forget(conn_id)
             try:
                 close_msg = codec.encode_close(conn_id)
-                session.control_writer.write(close_msg)
-                await session.control_writer.drain()
+                await scheduler.send(close_msg, stream=conn_id, control=True)
                 logger.info(f"Closed external connection {conn_id} for agent {agent_id}")
             except Exception as e:
                 logger.error(f"Failed to send CLOSE message: {e}")
@@ -66,21 +82,116 @@ class CloseConnectionUseCase:
             return
         
         # Close external connection
-        await external_conn.close()
+        scheduler = session.scheduler_for(external_conn)
         session.remove_external_connection(conn_id)
+        self._close_gracefully(external_conn)
+        if session.compressor:
+            session.compressor.forget(conn_id)
+        if scheduler:
+            scheduler.forget(conn_id)
         logger.info(f"Closed connection {conn_id} for agent {agent_id}")
     
+    def _close_gracefully(self, external_conn) -> None:
+        """Close an external connection in the background."""
+        task = asyncio.ensure_future(external_conn.close())
+        self._closing.add(task)
+        task.add_done_callback(self._closed)
+    
+    def _closed(self, task: asyncio.Task) -> None:
+        self._closing.discard(task)
+        if not task.cancelled() and task.exception():
+            logger.error(f"Failed to close external connection: {task.exception()}")
+    
+    async def close_stripe(self, agent_id: str, stripe) -> bool:
+        """
+        Handle a lost control connection of an agent session.
+        
+        Only the streams carried by that connection are closed; the
+        session ends with its last control connection. A resumable
+        session is detached instead, with all of its streams.
+        
+        Returns:
+            True if the session is still alive
+        """
+        session = await self._agent_repository.get_by_id(agent_id)
+        if not session:
+            return False
+        if stripe not in session.stripes:
+            # Already dropped when the session was detached
+            await stripe.close()
+            return True
+        if session.resume_token and self._resume_grace > 0:
+            await self.detach_agent_session(session)
+            return True
+        
+        for conn in session.remove_stripe(stripe):
+            await conn.close(abort=True)
+            session.remove_external_connection(conn.conn_id)
+            if session.compressor:
+                session.compressor.forget(conn.conn_id)
+        await stripe.close()
+        
+        if not session.stripes:
+            await self.close_agent_session(agent_id)
+            return False
+        logger.info(
+            f"Lost control connection {stripe.index} of agent {agent_id}, "
+            f"{len(session.stripes)} left"
+        )
+        return True
+    
+    async def detach_agent_session(self, session) -> None:
+        """
+        Drop the control connections of a resumable session but hold the rest.
+        
+        The session is closed unless the agent resumes it within the
+        grace period. Streams keep their external connections and their
+        data to the agent waits in the replay buffers.
+        """
+        for stripe in list(session.stripes):
+            session.remove_stripe(stripe)
+            await stripe.close()
+        for conn in session.get_all_connections():
+            conn.stripe = None
+        
+        if session.resume_timer:
+            session.resume_timer.cancel()
+        if not session.detached:
+            logger.info(
+                f"Lost control connection of agent {session.agent_id}, "
+                f"holding {session.counters.streams} streams for {self._resume_grace:g}s"
+            )
+        session.detached = True
+        session.resume_timer = asyncio.get_running_loop().call_later(
+            self._resume_grace,
+            lambda: asyncio.ensure_future(self._expire(session))
+        )
+    
+    async def _expire(self, session) -> None:
+        """Close a session that was not resumed in time."""
+        if session.detached and not session.stripes:
+            logger.info(f"Agent {session.agent_id} did not resume its session in time")
+            await self.close_agent_session(session.agent_id)
+    
     async def close_agent_session(self, agent_id: str) -> None:
         """Close an entire agent session and all its connections."""
         session = await self._agent_repository.get_by_id(agent_id)
         if not session:
             return
+        if session.resume_timer:
+            session.resume_timer.cancel()
+            session.resume_timer = None
         
         # Close all external connections
         for conn in session.get_all_connections():
-            await conn.close()
+            await conn.close(abort=True)
         
-        # Close control connection
+        # Stop the writers and close the control connections
+        for stripe in list(session.stripes):
+            session.remove_stripe(stripe)
+            await stripe.close()
+        if session.write_scheduler:
+            await session.write_scheduler.close()
         if session.control_writer:
             try:
                 session.control_writer.close()
@@ -89,11 +200,12 @@ class CloseConnectionUseCase:
                 pass
         
         # Close public listener
-        if hasattr(session, '_listener'):
-            await session._listener.close()
+        if session.listener:
+            await session.listener.close()
         
-        # Release port
-        await self._port_allocator.release(session.public_port)
+        # Release port; named sessions share theirs
+        if not session.hostname:
+            await self._port_allocator.release(session.public_port)
         
         # Remove from repository
         await self._agent_repository.remove(agent_id)
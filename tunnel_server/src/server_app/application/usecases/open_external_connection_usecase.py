@@ -8,15 +8,44 @@ from ...interfaces.agent_repository import IAgentRepository
 from ...domain.entities.external_conn import ExternalConn
 from ...common.protocol import ProtocolCodec
 from ...common.framing import OPEN
+from ...common.replay import ReplayBuffer
+from ...common.admission import AdmissionController
+from ...common.stream_limit import StreamSlots, BacklogCounters, DEFAULT_BACKLOG
+from ...common.timer_wheel import TimerWheel
 
 logger = logging.getLogger(__name__)
 
 
 class OpenExternalConnectionUseCase:
-    """Use case for opening a new external connection."""
+    """
+    Use case for opening a new external connection.
     
-    def __init__(self, agent_repository: IAgentRepository):
+    With an AdmissionController, connections over the accept-rate limits
+    wait for admission or are refused before the agent hears of them.
+    
+    A session has at most `max_streams` streams open (legacy agents), or
+    the limit agreed in the handshake; 0 means no limit. Connections
+    beyond it wait in the session's backlog for up to `backlog_timeout`
+    seconds (see StreamSlots).
+    """
+    
+    def __init__(
+        self,
+        agent_repository: IAgentRepository,
+        admission: Optional[AdmissionController] = None,
+        max_streams: int = 0,
+        backlog: int = DEFAULT_BACKLOG,
+        backlog_timeout: float = 0.0,
+        timers: Optional[TimerWheel] = None
+    ):
         self._agent_repository = agent_repository
+        self._admission = admission if admission and admission.enabled else None
+        self._max_streams = max_streams
+        self._backlog = backlog
+        self._backlog_timeout = backlog_timeout
+        self._timers = timers or TimerWheel()
+        # Backlog of all sessions
+        self.backlog_counters = BacklogCounters()
         self._next_conn_id = 1
     
     async def execute(
@@ -38,30 +67,75 @@ class OpenExternalConnectionUseCase:
             logger.error(f"No agent found for port {public_port}")
             return None
         
-        if not session.control_writer:
+        return await self.open(session, external_reader, external_writer, codec)
+    
+    async def open(
+        self,
+        session,
+        external_reader,
+        external_writer,
+        codec: ProtocolCodec
+    ) -> Optional[ExternalConn]:
+        """
+        Like execute(), for callers that already hold the session.
+        
+        Returns:
+            ExternalConn if successful, None otherwise
+        """
+        if self._admission:
+            if session.admission is None:
+                session.admission = self._admission.create_port()
+            if not await self._admission.admit(session.admission):
+                logger.debug(f"Accept rate of agent {session.agent_id} exceeded, refusing external connection")
+                return None
+        
+        if session.detached:
+            # The agent only learns about streams that existed when it left
+            logger.info(f"Agent {session.agent_id} is reconnecting, refusing external connection")
+            return None
+        if not session.write_scheduler:
             logger.error(f"Agent {session.agent_id} has no control writer")
             return None
         
+        slots = self._stream_slots(session)
+        if slots:
+            if not await slots.acquire():
+                logger.debug(
+                    f"Agent {session.agent_id} has {slots.limit} streams open, refusing external connection"
+                )
+                return None
+            if session.detached or not session.write_scheduler:
+                # The agent left while the connection waited
+                slots.release()
+                return None
+        
         # Allocate connection ID
         conn_id = self._next_conn_id
         self._next_conn_id = (self._next_conn_id + 1) % (2**32)
         
         # Create external connection
+        send_window, recv_window = session.create_windows()
         external_conn = ExternalConn(
             conn_id=conn_id,
             agent_id=session.agent_id,
             reader=external_reader,
-            writer=external_writer
+            writer=external_writer,
+            send_window=send_window,
+            recv_window=recv_window
         )
+        if session.resume_token:
+            external_conn.replay = ReplayBuffer()
+        
+        # Bind the stream to one of the agent's control connections
+        external_conn.stripe = session.assign_stripe(conn_id)
         
         # Add to session
         session.add_external_connection(external_conn)
         
-        # Send OPEN message to agent
+        # Send OPEN message to agent, ahead of DATA queued for other streams
         open_msg = codec.encode_open(conn_id)
         try:
-            session.control_writer.write(open_msg)
-            await session.control_writer.drain()
+            await session.scheduler_for(external_conn).send(open_msg, stream=conn_id, control=True)
             logger.info(f"Opened external connection {conn_id} for agent {session.agent_id}")
         except Exception as e:
             logger.error(f"Failed to send OPEN message: {e}")
@@ -69,4 +143,18 @@ class OpenExternalConnectionUseCase:
             return None
         
         return external_conn
+    
+    def _stream_slots(self, session) -> Optional[StreamSlots]:
+        """Stream limit of a session, created on its first connection."""
+        if session.stream_slots is None:
+            limit = self._max_streams if session.welcome.is_legacy else session.welcome.max_streams
+            if limit:
+                session.stream_slots = StreamSlots(
+                    limit,
+                    self._timers,
+                    self._backlog,
+                    self._backlog_timeout,
+                    BacklogCounters(parent=self.backlog_counters)
+                )
+        return session.stream_slots
 
@@ -1,18 +1,35 @@
 """Register agent use case."""
 
 import logging
+import secrets
 import uuid
-from typing import Optional
+from typing import Awaitable, Callable, Optional
 
 from ...interfaces.agent_repository import IAgentRepository
 from ...interfaces.port_allocator import IPortAllocator
 from ...interfaces.public_listener_factory import IPublicListenerFactory
 from ...domain.entities.agent_session import AgentSession
-from ...common.errors import AuthenticationError, PortAllocationError
+from ...domain.entities.control_stripe import ControlStripe
+from ...common.errors import AuthenticationError, PortAllocationError, ProtocolError
 from ...common.protocol import ProtocolCodec
+from ...common.compression import FrameCompressor
+from ...common.write_scheduler import WriteScheduler
+from ...common.virtual_host import normalize_hostname
+from ...common.rate_limit import BandwidthShaper
+from ...common.handshake import (
+    Handshake,
+    CAP_COMPRESSION,
+    CAP_COMPACT_HEADER,
+    CAP_STRIPING,
+    CAP_RESUME,
+    negotiate
+)
 
 logger = logging.getLogger(__name__)
 
+# Ports tried when the allocated one cannot be bound (e.g. used by another program)
+BIND_ATTEMPTS = 3
+
 
 class RegisterAgentUseCase:
     """Use case for registering a new agent."""
@@ -22,12 +39,21 @@ class RegisterAgentUseCase:
         agent_repository: IAgentRepository,
         port_allocator: IPortAllocator,
         public_listener_factory: IPublicListenerFactory,
-        expected_token: str
+        expected_token: str,
+        handshake: Optional[Handshake] = None,
+        shared_port: int = 0,
+        shaper: Optional[BandwidthShaper] = None
     ):
         self._agent_repository = agent_repository
         self._port_allocator = port_allocator
         self._public_listener_factory = public_listener_factory
         self._expected_token = expected_token
+        # Parameters this server offers to agents using the binary handshake
+        self._handshake = handshake or Handshake()
+        # Public port shared by agents registered under a host name (0 = off)
+        self._shared_port = shared_port
+        # Bandwidth limits of agents, if any are configured
+        self._shaper = shaper if shaper and shaper.enabled else None
     
     async def execute(
         self,
@@ -36,11 +62,22 @@ class RegisterAgentUseCase:
         local_port: int,
         reader,
         writer,
-        codec: ProtocolCodec
+        codec: ProtocolCodec,
+        hello: Optional[Handshake] = None,
+        connection_handler: Optional[Callable[[AgentSession, object, object], Awaitable[None]]] = None
     ) -> Optional[AgentSession]:
         """
         Register a new agent.
         
+        With a connection handler the public listener is bound before
+        WELCOME announces the port, so no external client finds it closed.
+        It queues connections until its start_serving() is called, once
+        the caller is ready to open streams.
+        
+        Args:
+            hello: Handshake parameters from the agent's HELLO (None = legacy)
+            connection_handler: Handles external connections of the session
+        
         Returns:
             AgentSession if successful, None otherwise
         """
@@ -49,38 +86,182 @@ class RegisterAgentUseCase:
             logger.warning(f"Authentication failed: invalid token")
             raise AuthenticationError("Invalid token")
         
-        # Allocate port
-        try:
-            public_port = await self._port_allocator.allocate()
-        except PortAllocationError as e:
-            logger.error(f"Port allocation failed: {e}")
-            raise
+        # Agents registered under a host name share one public port
+        hostname = await self._claim_hostname(hello)
         
         # Create agent session
+        peer = writer.get_extra_info('peername')
         agent_id = str(uuid.uuid4())
         session = AgentSession(
             agent_id=agent_id,
             token=token,
             local_host=local_host,
             local_port=local_port,
-            public_port=public_port,
+            public_port=self._shared_port if hostname else 0,
             control_reader=reader,
-            control_writer=writer
+            control_writer=writer,
+            codec=codec,
+            hostname=hostname,
+            remote_host=peer[0] if peer else ''
         )
         
-        # Save session first (listener will be created in main.py)
-        await self._agent_repository.save(session)
+        # Agree on protocol features; legacy agents keep the defaults
+        if hello and not hello.is_legacy:
+            session.hello = hello
+            session.welcome = negotiate(hello, self._handshake)
+            if session.welcome.supports(CAP_COMPRESSION):
+                session.compressor = FrameCompressor(session.welcome.compression[0])
+            if session.welcome.supports(CAP_STRIPING):
+                # Further control connections join by this id
+                session.welcome.session = agent_id
+            session.welcome.hostname = hostname
+            if session.welcome.supports(CAP_RESUME):
+                # The agent id tells the server which session to check the token against
+                session.resume_token = f"{agent_id}:{secrets.token_urlsafe(24)}"
+                session.welcome.resume = session.resume_token
+                session.welcome.resume_grace = self._handshake.resume_grace
+        if self._shaper:
+            session.ingress, session.egress = self._shaper.create_agent()
         
-        # Send WELCOME message
-        welcome_msg = codec.encode_welcome(public_port)
-        writer.write(welcome_msg)
-        await writer.drain()
+        # Allocate port; the same agent gets its previous port back
+        if not hostname:
+            identity = f"{session.remote_host}/{local_host}:{local_port}"
+            await self._bind_public_port(session, identity, connection_handler)
+        public_port = session.public_port
+        
+        try:
+            await self._agent_repository.save(session)
+            
+            # Send WELCOME message
+            welcome_msg = codec.encode_welcome(public_port, session.welcome)
+            writer.write(welcome_msg)
+            # WELCOME is the last frame with the fixed header
+            if session.welcome.supports(CAP_COMPACT_HEADER):
+                codec.set_compact_header(True)
+            await writer.drain()
+        except Exception:
+            if session.listener:
+                await session.listener.close()
+            if not hostname:
+                await self._port_allocator.release(public_port)
+            await self._agent_repository.remove(agent_id)
+            raise
         
         logger.info(
             f"Agent registered: {agent_id}, "
             f"local={local_host}:{local_port}, "
-            f"public_port={public_port}"
+            f"public_port={public_port}, "
+            f"hostname={hostname or '-'}, "
+            f"protocol=v{session.welcome.version}, "
+            f"capabilities={session.welcome.capabilities:#x}, "
+            f"compression={session.compressor.codec if session.compressor else 'off'}"
         )
         
         return session
+    
+    async def _bind_public_port(
+        self,
+        session: AgentSession,
+        identity: str,
+        connection_handler: Optional[Callable[[AgentSession, object, object], Awaitable[None]]]
+    ) -> None:
+        """
+        Allocate the public port of a session and bind its listener.
+        
+        Raises:
+            PortAllocationError: If no port is left or none could be bound
+        """
+        for attempt in range(BIND_ATTEMPTS):
+            try:
+                # A port that failed to bind is not handed back by identity
+                port = await self._port_allocator.allocate(identity if attempt == 0 else None)
+            except PortAllocationError as e:
+                logger.error(f"Port allocation failed: {e}")
+                raise
+            
+            if connection_handler is None:
+                session.public_port = port
+                return
+            try:
+                session.listener = await self._public_listener_factory.create_listener(
+                    port,
+                    lambda r, w: connection_handler(session, r, w),
+                    start_serving=False
+                )
+            except OSError as e:
+                logger.warning(f"Cannot listen on public port {port}: {e}")
+                await self._port_allocator.release(port)
+                continue
+            session.public_port = port
+            return
+        raise PortAllocationError(f"No public port could be bound in {BIND_ATTEMPTS} attempts")
+    
+    async def _claim_hostname(self, hello: Optional[Handshake]) -> str:
+        """
+        Host name under which a new agent is reached on the shared port.
+        
+        Returns:
+            The normalized name, or '' if the agent gets a port of its own:
+            it asked for no name, the shared port is off, or the name is
+            held by another agent
+        """
+        if not hello or not hello.hostname or not self._shared_port:
+            return ''
+        hostname = normalize_hostname(hello.hostname)
+        if not hostname:
+            return ''
+        if await self._agent_repository.get_by_hostname(hostname):
+            logger.warning(f"Host name {hostname} is already registered, allocating a port instead")
+            return ''
+        return hostname
+    
+    async def join(
+        self,
+        token: str,
+        hello: Handshake,
+        reader,
+        writer,
+        codec: ProtocolCodec,
+        create_write_scheduler: Callable[[AgentSession], WriteScheduler]
+    ) -> tuple[AgentSession, ControlStripe]:
+        """
+        Add a control connection to an existing agent session.
+        
+        The connection is answered with the session's WELCOME, so it uses
+        the same frame format and features as the first one.
+        
+        Args:
+            create_write_scheduler: Creates the started writer of the connection
+        
+        Returns:
+            The joined AgentSession and the new stripe
+        
+        Raises:
+            AuthenticationError: If the token does not match
+            ProtocolError: If the session is unknown or has all its connections
+        """
+        if token != self._expected_token:
+            logger.warning(f"Authentication failed: invalid token")
+            raise AuthenticationError("Invalid token")
+        
+        session = await self._agent_repository.get_by_id(hello.session)
+        if not session or session.token != token or not session.welcome.supports(CAP_STRIPING):
+            raise ProtocolError(f"Unknown agent session {hello.session}")
+        if len(session.stripes) >= session.welcome.stripes:
+            raise ProtocolError(
+                f"Agent {session.agent_id} already has {len(session.stripes)} control connections"
+            )
+        
+        stripe = session.add_stripe(reader, writer, create_write_scheduler(session))
+        
+        writer.write(codec.encode_welcome(session.public_port, session.welcome))
+        if session.welcome.supports(CAP_COMPACT_HEADER):
+            codec.set_compact_header(True)
+        await writer.drain()
+        
+        logger.info(
+            f"Agent {session.agent_id} joined with control connection "
+            f"{len(session.stripes)}/{session.welcome.stripes}"
+        )
+        return session, stripe
 
@@ -1,25 +1,40 @@
 """Relay data use case."""
 
 import logging
-from typing import Optional
 
-from ...interfaces.agent_repository import IAgentRepository
 from ...common.protocol import ProtocolCodec
-from ...common.framing import DATA
+from ...common.send_queue import SendQueue, DEFAULT_HIGH_WATER, DEFAULT_LOW_WATER
+from ...common.write_scheduler import split_payload
 
 logger = logging.getLogger(__name__)
 
 
 class RelayDataUseCase:
-    """Use case for relaying data between external clients and agents."""
+    """
+    Use case for relaying data between external clients and agents.
     
-    def __init__(self, agent_repository: IAgentRepository):
-        self._agent_repository = agent_repository
+    The relay path works on the session and connection objects its caller
+    holds; the agent registry is only consulted when streams are opened
+    and closed.
+    
+    Data for an external client goes through a per-stream send queue
+    bounded by `high_water`/`low_water` (see SendQueue).
+    
+    Sessions with bandwidth limits have an `ingress` and an `egress`
+    RateLimiter. Data for the agent waits for its bandwidth before it is
+    sent, which holds back the next read from the external client; data
+    for an external client waits in its send queue, whose watermarks and
+    flow-control credit hold back the agent.
+    """
+    
+    def __init__(self, high_water: int = DEFAULT_HIGH_WATER, low_water: int = DEFAULT_LOW_WATER):
+        self._high_water = high_water
+        self._low_water = low_water
     
     async def relay_to_agent(
         self,
-        agent_id: str,
-        conn_id: int,
+        session,
+        external_conn,
         data: bytes,
         codec: ProtocolCodec
     ) -> bool:
@@ -29,50 +44,137 @@ class RelayDataUseCase:
         Returns:
             True if successful, False otherwise
         """
-        session = await self._agent_repository.get_by_id(agent_id)
-        if not session or not session.control_writer:
-            return False
+        if session.ingress:
+            await session.ingress.take(len(data))
         
-        external_conn = session.get_external_connection(conn_id)
-        if not external_conn:
-            logger.warning(f"Connection {conn_id} not found for agent {agent_id}")
+        # Captured first: a resumed session replays anything the old
+        # connection's writer may have dropped
+        scheduler = session.scheduler_for(external_conn)
+        if external_conn.replay:
+            external_conn.replay.append(data)
+            if session.detached:
+                # Sent when the agent resumes the session
+                session.counters.sent_to_agent(len(data))
+                return True
+        if not scheduler:
             return False
         
+        conn_id = external_conn.conn_id
+        session.counters.sent_to_agent(len(data))
         try:
-            data_msg = codec.encode_data(conn_id, data)
-            session.control_writer.write(data_msg)
-            await session.control_writer.drain()
+            # Bounded frames let the scheduler interleave this stream with others
+            for chunk in split_payload(data, scheduler.quantum):
+                flags = 0
+                if session.compressor:
+                    flags, chunk = await session.compressor.compress(conn_id, chunk)
+                await scheduler.send(*codec.encode_data_parts(conn_id, chunk, flags), stream=conn_id)
             return True
         except Exception as e:
+            if external_conn.replay:
+                # Sent again if the agent resumes the session
+                logger.debug(f"Failed to relay data to agent: {e}")
+                return True
             logger.error(f"Failed to relay data to agent: {e}")
             return False
     
     async def relay_to_external(
         self,
-        agent_id: str,
+        session,
         conn_id: int,
-        data: bytes
+        data: bytes,
+        codec: ProtocolCodec
     ) -> bool:
         """
         Relay data from agent to external client.
         
+        Never waits for the external client: the data goes to the stream's
+        send queue, whose writer task hands it to the client as fast as the
+        client reads.
+        
         Returns:
             True if successful, False otherwise
         """
-        session = await self._agent_repository.get_by_id(agent_id)
-        if not session:
-            return False
+        return self.write_to_external(session, conn_id, data, codec)
+    
+    def write_to_external(self, session, conn_id: int, data: bytes, codec: ProtocolCodec) -> bool:
+        """
+        Relay data from agent to external client; relay_to_external() without the coroutine.
         
+        Returns:
+            True if successful, False otherwise
+        """
         external_conn = session.get_external_connection(conn_id)
         if not external_conn or not external_conn.writer:
-            logger.warning(f"Connection {conn_id} not found or closed for agent {agent_id}")
+            logger.warning(f"Connection {conn_id} not found or closed for agent {session.agent_id}")
             return False
         
+        if external_conn.send_queue is None:
+            external_conn.send_queue = self._create_send_queue(session, external_conn, codec)
         try:
-            external_conn.writer.write(data)
-            await external_conn.writer.drain()
-            return True
+            external_conn.send_queue.write(data)
         except Exception as e:
             logger.error(f"Failed to relay data to external client: {e}")
             return False
-
+        session.counters.sent_to_external(len(data))
+        if external_conn.replay:
+            external_conn.replay.received += len(data)
+        if external_conn.idle:
+            external_conn.idle.touch()
+        return True
+    
+    def grant_window(self, session, conn_id: int, increment: int) -> None:
+        """Apply a WINDOW_UPDATE from the agent to the external -> agent direction."""
+        external_conn = session.get_external_connection(conn_id)
+        if external_conn:
+            external_conn.send_window.grant(increment)
+            if external_conn.replay:
+                external_conn.replay.acknowledge(increment)
+    
+    def _create_send_queue(self, session, external_conn, codec: ProtocolCodec) -> SendQueue:
+        """
+        Send queue of a stream.
+        
+        Flow-controlled streams return their credit as data is sent, so the
+        agent stops sending once a window is queued. Agents without flow
+        control have no other brake: their control connection stops being
+        read while the queue is above its high-water mark.
+        """
+        if external_conn.recv_window.size is not None:
+            return SendQueue(
+                external_conn.writer,
+                self._high_water,
+                self._low_water,
+                on_sent=lambda size: self._return_credit(session, external_conn, codec, size),
+                limiter=session.egress
+            )
+        
+        frames = external_conn.stripe.reader if external_conn.stripe else session.control_reader
+        if frames is None:
+            return SendQueue(
+                external_conn.writer, self._high_water, self._low_water, limiter=session.egress
+            )
+        return SendQueue(
+            external_conn.writer,
+            self._high_water,
+            self._low_water,
+            on_pause=frames.pause_reading,
+            on_resume=frames.resume_reading,
+            limiter=session.egress
+        )
+    
+    def _return_credit(self, session, external_conn, codec: ProtocolCodec, size: int) -> None:
+        """Credit bytes sent to the external client back to the agent."""
+        increment = external_conn.recv_window.delivered(size)
+        if increment and external_conn.replay:
+            # Counted even if it cannot be sent; RESUME restores it
+            external_conn.replay.granted += increment
+        scheduler = session.scheduler_for(external_conn)
+        if increment and scheduler:
+            try:
+                scheduler.write(
+                    codec.encode_window_update(external_conn.conn_id, increment),
+                    stream=external_conn.conn_id,
+                    control=True
+                )
+            except Exception as e:
+                logger.debug(f"Failed to send WINDOW_UPDATE: {e}")
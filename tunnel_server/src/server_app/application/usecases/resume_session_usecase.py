@@ -0,0 +1,139 @@
+"""Resume agent session use case."""
+
+import hmac
+import logging
+from typing import Callable
+
+from ...interfaces.agent_repository import IAgentRepository
+from ...domain.entities.agent_session import AgentSession
+from ...domain.entities.control_stripe import ControlStripe
+from ...common.errors import AuthenticationError, ProtocolError
+from ...common.protocol import ProtocolCodec
+from ...common.write_scheduler import WriteScheduler, split_payload
+from ...common.handshake import Handshake, CAP_COMPACT_HEADER
+from .close_connection_usecase import CloseConnectionUseCase
+
+logger = logging.getLogger(__name__)
+
+
+class ResumeSessionUseCase:
+    """
+    Use case for resuming an agent session over a new control connection.
+    
+    Both sides send a RESUME frame right after the resumed WELCOME, with
+    the bytes received and the credit granted on every open stream. Each
+    side then sends again what the other did not receive, restores credit
+    from WINDOW_UPDATEs that were lost, and closes the streams the other
+    side does not know.
+    """
+    
+    def __init__(
+        self,
+        agent_repository: IAgentRepository,
+        close_connection_uc: CloseConnectionUseCase,
+        expected_token: str
+    ):
+        self._agent_repository = agent_repository
+        self._close_connection_uc = close_connection_uc
+        self._expected_token = expected_token
+    
+    async def execute(
+        self,
+        token: str,
+        hello: Handshake,
+        reader,
+        writer,
+        codec: ProtocolCodec,
+        create_write_scheduler: Callable[[AgentSession], WriteScheduler]
+    ) -> tuple[AgentSession, ControlStripe]:
+        """
+        Pick up a session with the resume token from the agent's HELLO.
+        
+        The session's old control connections are dropped first if the
+        server has not noticed them break yet (e.g. after a NAT rebinding).
+        DATA to the agent stays held until the agent's RESUME arrives.
+        
+        Args:
+            create_write_scheduler: Creates the started writer of the connection
+        
+        Returns:
+            The resumed AgentSession and its new stripe
+        
+        Raises:
+            AuthenticationError: If the token does not match
+            ProtocolError: If the session is unknown or already ended
+        """
+        if token != self._expected_token:
+            logger.warning(f"Authentication failed: invalid token")
+            raise AuthenticationError("Invalid token")
+        
+        agent_id = hello.resume.partition(':')[0]
+        session = await self._agent_repository.get_by_id(agent_id)
+        if (
+            not session
+            or not session.resume_token
+            or not hmac.compare_digest(session.resume_token, hello.resume)
+        ):
+            raise ProtocolError(f"Unknown agent session {agent_id}")
+        
+        await self._close_connection_uc.detach_agent_session(session)
+        if session.resume_timer:
+            session.resume_timer.cancel()
+            session.resume_timer = None
+        
+        peer = writer.get_extra_info('peername')
+        session.codec = codec
+        session.control_reader = reader
+        session.control_writer = writer
+        stripe = session.add_stripe(reader, writer, create_write_scheduler(session))
+        for conn in session.get_all_connections():
+            conn.stripe = stripe
+            stripe.streams.add(conn.conn_id)
+        
+        writer.write(codec.encode_welcome(session.public_port, session.welcome))
+        if session.welcome.supports(CAP_COMPACT_HEADER):
+            codec.set_compact_header(True)
+        stripe.write_scheduler.write(codec.encode_resume({
+            conn.conn_id: (conn.replay.received, conn.replay.granted)
+            for conn in session.get_all_connections()
+            if conn.replay
+        }), control=True)
+        await writer.drain()
+        
+        logger.info(
+            f"Agent {session.agent_id} resumed its session "
+            f"from {peer[0] if peer else '?'} with {session.counters.streams} streams"
+        )
+        return session, stripe
+    
+    async def replay(self, session: AgentSession, payload: bytes, codec: ProtocolCodec) -> None:
+        """Handle the agent's RESUME frame and release DATA held for the agent."""
+        streams = codec.decode_resume(payload)
+        scheduler = session.write_scheduler
+        if not scheduler:
+            return
+        
+        closed = []
+        for conn in session.get_all_connections():
+            if not conn.replay:
+                continue
+            entry = streams.pop(conn.conn_id, None)
+            if entry is None:
+                # The OPEN or the agent's CLOSE was lost with the connection
+                closed.append(conn.conn_id)
+                continue
+            missing, chunks = conn.replay.resume(*entry)
+            if missing:
+                conn.send_window.grant(missing)
+            # Uncompressed, so the replay is queued without waiting
+            for chunk in chunks:
+                for part in split_payload(chunk, scheduler.quantum):
+                    scheduler.write(*codec.encode_data_parts(conn.conn_id, part), stream=conn.conn_id)
+        
+        # Streams only the agent knows were closed here meanwhile
+        for conn_id in streams:
+            scheduler.write(codec.encode_close(conn_id), stream=conn_id, control=True)
+        
+        session.detached = False
+        for conn_id in closed:
+            await self._close_connection_uc.close_agent_connection(session.agent_id, conn_id)
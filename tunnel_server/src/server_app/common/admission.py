@@ -0,0 +1,159 @@
+"""Accept-rate admission control for public ports."""
+
+import asyncio
+import time
+from dataclasses import dataclass
+from typing import Optional
+
+from .rate_limit import TokenBucket
+
+# Connections a port may keep waiting for admission at once
+DEFAULT_QUEUE_SIZE = 64
+
+
+@dataclass
+class AdmissionCounters:
+    """
+    Outcome of accepted connections.
+    
+    Every connection ends up admitted or rejected; `queued` counts those
+    that had to wait for a token first. Counters of a port also update
+    their `parent`, the server-wide counters.
+    """
+    
+    admitted: int = 0
+    queued: int = 0
+    rejected: int = 0
+    parent: Optional['AdmissionCounters'] = None
+    
+    def count_admitted(self) -> None:
+        """Count an admitted connection."""
+        self.admitted += 1
+        if self.parent:
+            self.parent.admitted += 1
+    
+    def count_queued(self) -> None:
+        """Count a connection that waits for a token."""
+        self.queued += 1
+        if self.parent:
+            self.parent.queued += 1
+    
+    def count_rejected(self) -> None:
+        """Count a rejected connection."""
+        self.rejected += 1
+        if self.parent:
+            self.parent.rejected += 1
+    
+    def as_dict(self) -> dict:
+        """Return the counters as a plain dict."""
+        return {
+            'admitted': self.admitted,
+            'queued': self.queued,
+            'rejected': self.rejected,
+        }
+
+
+class PortAdmission:
+    """Admission state of one public port (or host name on the shared port)."""
+    
+    def __init__(self, bucket: Optional[TokenBucket], counters: AdmissionCounters):
+        self.bucket = bucket  # None = no per-port limit
+        self.counters = counters
+        self.waiting = 0
+
+
+class AdmissionController:
+    """
+    Accept-rate limits applied before a connection is announced to its agent.
+    
+    A connection is admitted when both its port's bucket and the global
+    bucket hold a token (a rate of 0 disables either limit). Otherwise it
+    waits for up to `queue_timeout` seconds, at most `queue_size`
+    connections per port at a time, and is rejected after that. Because a
+    port must have a token of its own before it takes one from the global
+    bucket, and its queue is bounded, a flood against one port can take
+    no more than its own rate from the other ports.
+    """
+    
+    def __init__(
+        self,
+        port_rate: float = 0.0,
+        port_burst: float = 0.0,
+        global_rate: float = 0.0,
+        global_burst: float = 0.0,
+        queue_timeout: float = 0.0,
+        queue_size: int = DEFAULT_QUEUE_SIZE
+    ):
+        self._port_rate = port_rate
+        # A burst of 0 allows one second's worth of connections
+        self._port_burst = max(1.0, port_burst or port_rate)
+        self._global = (
+            TokenBucket(global_rate, max(1.0, global_burst or global_rate)) if global_rate else None
+        )
+        self._queue_timeout = queue_timeout
+        self._queue_size = queue_size
+        self.counters = AdmissionCounters()
+    
+    @property
+    def enabled(self) -> bool:
+        """Whether any limit is configured."""
+        return bool(self._port_rate or self._global)
+    
+    def create_port(self) -> PortAdmission:
+        """Admission state for a new public port."""
+        return PortAdmission(
+            TokenBucket(self._port_rate, self._port_burst) if self._port_rate else None,
+            AdmissionCounters(parent=self.counters)
+        )
+    
+    async def admit(self, port: PortAdmission) -> bool:
+        """
+        Wait for a token for a new connection on a port.
+        
+        Returns:
+            True if the connection may be opened, False if it must be closed
+        """
+        now = time.monotonic()
+        # Connections already waiting go first
+        if not port.waiting and self._try_take(port, now):
+            port.counters.count_admitted()
+            return True
+        if not self._queue_timeout or port.waiting >= self._queue_size:
+            port.counters.count_rejected()
+            return False
+        
+        port.counters.count_queued()
+        port.waiting += 1
+        deadline = now + self._queue_timeout
+        try:
+            while True:
+                delay = self._wait_time(port, now)
+                if now + delay > deadline:
+                    port.counters.count_rejected()
+                    return False
+                await asyncio.sleep(delay)
+                now = time.monotonic()
+                if self._try_take(port, now):
+                    port.counters.count_admitted()
+                    return True
+        finally:
+            port.waiting -= 1
+    
+    def _try_take(self, port: PortAdmission, now: float) -> bool:
+        """Take a token from both buckets if both have one."""
+        if port.bucket and not port.bucket.ready(now):
+            return False
+        if self._global and not self._global.ready(now):
+            return False
+        if port.bucket:
+            port.bucket.take()
+        if self._global:
+            self._global.take()
+        return True
+    
+    def _wait_time(self, port: PortAdmission, now: float) -> float:
+        delay = port.bucket.wait_time(now) if port.bucket else 0.0
+        if self._global:
+            delay = max(delay, self._global.wait_time(now))
+        # Another waiter may have taken the token; never spin
+        return max(delay, 0.001)
@@ -0,0 +1,262 @@
+"""Versioned HELLO/WELCOME handshake parameters."""
+
+import struct
+from dataclasses import dataclass, field
+from typing import Optional
+
+from .errors import ProtocolError
+from .framing import MAX_PAYLOAD
+from .flow_control import DEFAULT_WINDOW_SIZE
+
+# Binary HELLO/WELCOME payloads start with this marker. 0xFF never occurs
+# in UTF-8, and legacy WELCOME ports are below 0x00FF0000, so the marker
+# cannot be confused with a legacy payload.
+MAGIC = b'\x00\xff'
+
+LEGACY_VERSION = 0
+PROTOCOL_VERSION = 1
+
+# Capability bits
+CAP_FLOW_CONTROL = 1 << 0  # per-stream WINDOW_UPDATE credit
+CAP_COMPRESSION = 1 << 1  # FLAG_COMPRESSED DATA frames
+CAP_COMPACT_HEADER = 1 << 2  # varint frame header after WELCOME
+CAP_STRIPING = 1 << 3  # several control connections per agent session
+CAP_RESUME = 1 << 4  # session survives a lost control connection (requires CAP_FLOW_CONTROL)
+CAP_HEARTBEAT = 1 << 5  # PING/PONG every `keepalive` seconds
+
+# TLV tags: tag (uint8) + length (uint16 BE) + value
+TAG_TOKEN = 1
+TAG_LOCAL_HOST = 2
+TAG_LOCAL_PORT = 3
+TAG_PUBLIC_PORT = 4
+TAG_CAPABILITIES = 5
+TAG_MAX_FRAME = 6
+TAG_WINDOW_SIZE = 7
+TAG_KEEPALIVE = 8  # milliseconds
+TAG_COMPRESSION = 9  # comma-separated codec names
+TAG_SESSION = 10  # agent session id: in WELCOME the session to join, in HELLO the session joined
+TAG_STRIPES = 11  # control connections per session
+TAG_HOSTNAME = 12  # virtual host name on the server's shared public port
+TAG_RESUME = 13  # resume token: in WELCOME the token issued, in HELLO the session resumed
+TAG_RESUME_GRACE = 14  # milliseconds the server holds a session without control connection
+TAG_MAX_STREAMS = 15  # concurrent streams of a session
+
+_TLV_HEADER = struct.Struct('>BH')
+_UINT32 = struct.Struct('>I')
+
+
+@dataclass
+class Handshake:
+    """
+    Parameters announced by one side of the HELLO/WELCOME exchange.
+    
+    In HELLO these are the agent's offer; in WELCOME the values the server
+    agreed to. `window_size` is always the receive window of the sender of
+    the message. A legacy peer is represented by version LEGACY_VERSION
+    with no capabilities.
+    
+    With CAP_STRIPING, `stripes` is the number of control connections the
+    agent asks for (HELLO) or may open (WELCOME). A HELLO carrying
+    `session` does not register a new agent but adds a connection to that
+    session.
+    
+    `hostname` is the name an agent asks to be reachable under on the
+    server's shared public port (HELLO), or the name it got (WELCOME).
+    
+    With CAP_RESUME, WELCOME carries the `resume` token and the
+    `resume_grace` period for which the server holds the session after
+    its control connections are lost. A HELLO carrying `resume` picks up
+    that session instead of registering a new agent.
+    
+    With CAP_HEARTBEAT, both sides send a PING on every control connection
+    each `keepalive` seconds (the smaller of the two offers) and drop a
+    connection on which the peer stays silent.
+    
+    `max_streams` is the number of concurrent streams the agent can serve
+    (HELLO) or the server will open to it (WELCOME: the smaller of the
+    two limits); 0 means no limit. Connections beyond it wait on the
+    server until a stream closes.
+    """
+    
+    version: int = LEGACY_VERSION
+    capabilities: int = 0
+    max_frame: int = MAX_PAYLOAD
+    window_size: int = DEFAULT_WINDOW_SIZE
+    keepalive: float = 0.0  # seconds; 0 = disabled
+    compression: list[str] = field(default_factory=list)
+    stripes: int = 1
+    session: str = ''
+    hostname: str = ''
+    resume: str = ''
+    resume_grace: float = 0.0  # seconds
+    max_streams: int = 0  # 0 = no limit
+    
+    @property
+    def is_legacy(self) -> bool:
+        """Check whether the peer uses the legacy text handshake."""
+        return self.version == LEGACY_VERSION
+    
+    def supports(self, capability: int) -> bool:
+        """Check whether a capability bit is set."""
+        return bool(self.capabilities & capability)
+
+
+def negotiate(offer: Handshake, local: Handshake) -> Handshake:
+    """
+    Compute the WELCOME answer to an agent's HELLO offer.
+    
+    Capabilities are the intersection of both sides, the frame limit is
+    the smaller one, and compression uses the first codec the agent
+    offered that is also available locally. The number of control
+    connections is bounded by the local limit, and so is the number of
+    concurrent streams if either side limits it.
+    """
+    capabilities = offer.capabilities & local.capabilities
+    
+    compression = [name for name in offer.compression if name in local.compression][:1]
+    if not compression:
+        capabilities &= ~CAP_COMPRESSION
+    if not capabilities & CAP_FLOW_CONTROL:
+        # Replay buffers are bounded by the flow-control window
+        capabilities &= ~CAP_RESUME
+    
+    stripes = 1
+    if capabilities & CAP_STRIPING:
+        stripes = max(1, min(offer.stripes, local.stripes))
+    
+    keepalive = local.keepalive
+    if offer.keepalive and (not keepalive or offer.keepalive < keepalive):
+        keepalive = offer.keepalive
+    
+    max_streams = local.max_streams
+    if offer.max_streams and (not max_streams or offer.max_streams < max_streams):
+        max_streams = offer.max_streams
+    
+    return Handshake(
+        version=min(offer.version, local.version),
+        capabilities=capabilities,
+        max_frame=min(offer.max_frame, local.max_frame),
+        window_size=local.window_size,
+        keepalive=keepalive,
+        compression=compression if capabilities & CAP_COMPRESSION else [],
+        stripes=stripes,
+        max_streams=max_streams
+    )
+
+
+def is_binary(payload: bytes) -> bool:
+    """Check whether a HELLO/WELCOME payload uses the binary format."""
+    return bytes(payload[:len(MAGIC)]) == MAGIC
+
+
+def encode_hello(token: str, local_host: str, local_port: int, handshake: Handshake) -> bytes:
+    """Encode a binary HELLO payload."""
+    return _encode(handshake, {
+        TAG_TOKEN: token.encode('utf-8'),
+        TAG_LOCAL_HOST: local_host.encode('utf-8'),
+        TAG_LOCAL_PORT: _UINT32.pack(local_port),
+    })
+
+
+def decode_hello(payload: bytes) -> tuple[str, str, int, Handshake]:
+    """Decode a binary HELLO payload."""
+    handshake, fields = _decode(payload)
+    try:
+        token = fields[TAG_TOKEN].decode('utf-8')
+        local_host = fields[TAG_LOCAL_HOST].decode('utf-8')
+    except KeyError:
+        raise ProtocolError("HELLO is missing token or local host")
+    return (token, local_host, _uint32(fields, TAG_LOCAL_PORT), handshake)
+
+
+def encode_welcome(public_port: int, handshake: Handshake) -> bytes:
+    """Encode a binary WELCOME payload."""
+    return _encode(handshake, {TAG_PUBLIC_PORT: _UINT32.pack(public_port)})
+
+
+def decode_welcome(payload: bytes) -> tuple[int, Handshake]:
+    """Decode a binary WELCOME payload."""
+    handshake, fields = _decode(payload)
+    return (_uint32(fields, TAG_PUBLIC_PORT), handshake)
+
+
+def _encode(handshake: Handshake, fields: dict[int, bytes]) -> bytes:
+    """Encode message fields followed by the handshake parameters as TLVs."""
+    tlvs = dict(fields)
+    tlvs[TAG_CAPABILITIES] = _UINT32.pack(handshake.capabilities)
+    tlvs[TAG_MAX_FRAME] = _UINT32.pack(handshake.max_frame)
+    tlvs[TAG_WINDOW_SIZE] = _UINT32.pack(handshake.window_size)
+    tlvs[TAG_KEEPALIVE] = _UINT32.pack(int(handshake.keepalive * 1000))
+    if handshake.compression:
+        tlvs[TAG_COMPRESSION] = ','.join(handshake.compression).encode('ascii')
+    if handshake.supports(CAP_STRIPING):
+        tlvs[TAG_STRIPES] = _UINT32.pack(handshake.stripes)
+    if handshake.session:
+        tlvs[TAG_SESSION] = handshake.session.encode('utf-8')
+    if handshake.hostname:
+        tlvs[TAG_HOSTNAME] = handshake.hostname.encode('utf-8')
+    if handshake.resume:
+        tlvs[TAG_RESUME] = handshake.resume.encode('ascii')
+    if handshake.resume_grace:
+        tlvs[TAG_RESUME_GRACE] = _UINT32.pack(int(handshake.resume_grace * 1000))
+    if handshake.max_streams:
+        tlvs[TAG_MAX_STREAMS] = _UINT32.pack(handshake.max_streams)
+    
+    parts = [MAGIC, bytes([handshake.version])]
+    for tag, value in tlvs.items():
+        parts.append(_TLV_HEADER.pack(tag, len(value)))
+        parts.append(value)
+    return b''.join(parts)
+
+
+def _decode(payload: bytes) -> tuple[Handshake, dict[int, bytes]]:
+    """Split a binary payload into TLVs; unknown tags are ignored."""
+    payload = bytes(payload)
+    if not is_binary(payload) or len(payload) <= len(MAGIC):
+        raise ProtocolError("Not a binary handshake payload")
+    
+    version = payload[len(MAGIC)]
+    fields: dict[int, bytes] = {}
+    offset = len(MAGIC) + 1
+    while offset < len(payload):
+        if offset + _TLV_HEADER.size > len(payload):
+            raise ProtocolError("Truncated handshake field")
+        tag, length = _TLV_HEADER.unpack_from(payload, offset)
+        offset += _TLV_HEADER.size
+        if offset + length > len(payload):
+            raise ProtocolError("Truncated handshake field")
+        fields[tag] = payload[offset:offset + length]
+        offset += length
+    
+    handshake = Handshake(
+        version=version,
+        capabilities=_uint32(fields, TAG_CAPABILITIES, 0),
+        max_frame=min(_uint32(fields, TAG_MAX_FRAME, MAX_PAYLOAD), MAX_PAYLOAD),
+        window_size=_uint32(fields, TAG_WINDOW_SIZE, DEFAULT_WINDOW_SIZE),
+        keepalive=_uint32(fields, TAG_KEEPALIVE, 0) / 1000.0,
+        compression=[
+            name for name in fields.get(TAG_COMPRESSION, b'').decode('ascii').split(',') if name
+        ],
+        stripes=max(1, _uint32(fields, TAG_STRIPES, 1)),
+        session=fields.get(TAG_SESSION, b'').decode('utf-8'),
+        hostname=fields.get(TAG_HOSTNAME, b'').decode('utf-8'),
+        resume=fields.get(TAG_RESUME, b'').decode('ascii', 'replace'),
+        resume_grace=_uint32(fields, TAG_RESUME_GRACE, 0) / 1000.0,
+        max_streams=_uint32(fields, TAG_MAX_STREAMS, 0)
+    )
+    if not handshake.window_size or not handshake.max_frame:
+        raise ProtocolError("Window size and max frame size must be positive")
+    return handshake, fields
+
+
+def _uint32(fields: dict[int, bytes], tag: int, default: Optional[int] = None) -> int:
+    """Read an integer TLV; a missing tag without default is an error."""
+    value = fields.get(tag)
+    if value is None:
+        if default is None:
+            raise ProtocolError(f"Missing handshake field {tag}")
+        return default
+    if len(value) != _UINT32.size:
+        raise ProtocolError(f"Invalid handshake field {tag}")
+    return _UINT32.unpack(value)[0]
+
@@ -0,0 +1,256 @@
+"""Token buckets and bandwidth shaping of relayed data."""
+
+import asyncio
+import heapq
+import itertools
+import time
+from dataclasses import dataclass
+from typing import Optional
+
+# Default burst of a bandwidth limit: this many seconds' worth of its rate,
+# but at least MIN_BURST bytes
+DEFAULT_BURST_TIME = 0.1
+MIN_BURST = 64 * 1024
+
+
+class TokenBucket:
+    """
+    Token bucket: `rate` tokens per second, holding at most `burst`.
+    
+    Tokens are refilled lazily from the time elapsed since the last call,
+    so an idle bucket costs nothing. A request for more than `burst`
+    tokens is granted once the bucket is full and leaves it in debt, so
+    the rate holds over time whatever the request sizes.
+    """
+    
+    def __init__(self, rate: float, burst: float):
+        if rate <= 0 or burst < 1:
+            raise ValueError("rate must be positive and burst at least 1")
+        self._rate = rate
+        self._burst = burst
+        self._tokens = float(burst)
+        self._updated = time.monotonic()
+    
+    def _refill(self, now: float) -> None:
+        self._tokens = min(self._burst, self._tokens + (now - self._updated) * self._rate)
+        self._updated = now
+    
+    def ready(self, now: float, amount: float = 1) -> bool:
+        """Whether `amount` tokens are available."""
+        self._refill(now)
+        return self._tokens >= min(amount, self._burst)
+    
+    def take(self, amount: float = 1) -> None:
+        """Take tokens after ready() returned True."""
+        self._tokens -= amount
+    
+    def wait_time(self, now: float, amount: float = 1) -> float:
+        """Seconds until `amount` tokens are available."""
+        self._refill(now)
+        return max(0.0, (min(amount, self._burst) - self._tokens) / self._rate)
+
+
+def default_burst(rate: float, burst: float = 0) -> float:
+    """Burst of a bandwidth limit in bytes, `burst` unless it is 0."""
+    return burst or max(MIN_BURST, rate * DEFAULT_BURST_TIME)
+
+
+@dataclass
+class ShapingCounters:
+    """
+    Throttling of one direction of traffic.
+    
+    `throttled` counts transfers that had to wait for bandwidth and
+    `delay` the seconds they waited. Counters of an agent also update
+    their `parent`, the server-wide counters.
+    """
+    
+    throttled: int = 0
+    delay: float = 0.0
+    parent: Optional['ShapingCounters'] = None
+    
+    def count_delay(self, seconds: float) -> None:
+        """Count a transfer that waited for bandwidth."""
+        self.throttled += 1
+        self.delay += seconds
+        if self.parent:
+            self.parent.count_delay(seconds)
+    
+    def as_dict(self) -> dict:
+        """Return the counters as a plain dict."""
+        return {
+            'throttled': self.throttled,
+            'delay_ms': round(self.delay * 1000, 3),
+        }
+
+
+class SharedLink:
+    """
+    Bandwidth shared by all agents in one direction: `rate` bytes per second.
+    
+    Transfers waiting for the link are served by start-time fair queueing.
+    Each is tagged with the virtual time it starts at: the end of its
+    flow's previous transfer or the link's current virtual time, whichever
+    is later, and the transfer with the earliest tag goes next. Busy flows
+    thus get equal shares of bytes whatever their transfer sizes, and the
+    share of an idle flow goes to the busy ones instead of being banked.
+    """
+    
+    def __init__(self, rate: float, burst: float = 0):
+        self._bucket = TokenBucket(rate, default_burst(rate, burst))
+        self._vtime = 0.0
+        self._waiting: list = []  # heap of (start tag, sequence, size, future)
+        self._sequence = itertools.count()
+        self._task: Optional[asyncio.Task] = None
+    
+    def try_take(self, flow: 'RateLimiter', size: int, now: float) -> bool:
+        """Take bandwidth for a transfer of a flow if nobody waits and it is available."""
+        if self._waiting or not self._bucket.ready(now, size):
+            return False
+        self._bucket.take(size)
+        self._vtime = self._tag(flow, size)
+        return True
+    
+    async def take(self, flow: 'RateLimiter', size: int) -> None:
+        """Wait for the turn of a transfer of a flow."""
+        future = asyncio.get_running_loop().create_future()
+        heapq.heappush(self._waiting, (self._tag(flow, size), next(self._sequence), size, future))
+        if self._task is None:
+            self._task = asyncio.ensure_future(self._serve())
+        await future
+    
+    def _tag(self, flow: 'RateLimiter', size: int) -> float:
+        """Start tag of a new transfer of a flow."""
+        start = max(self._vtime, flow.finish)
+        flow.finish = start + size
+        return start
+    
+    async def _serve(self) -> None:
+        """Release waiting transfers in tag order as the bucket allows."""
+        try:
+            while self._waiting:
+                start, _, size, future = self._waiting[0]
+                if future.done():
+                    # Its waiter was cancelled
+                    heapq.heappop(self._waiting)
+                    continue
+                delay = self._bucket.wait_time(time.monotonic(), size)
+                if delay > 0:
+                    # A transfer with an earlier tag may arrive meanwhile
+                    await asyncio.sleep(delay)
+                    continue
+                heapq.heappop(self._waiting)
+                self._bucket.take(size)
+                self._vtime = start
+                future.set_result(None)
+        finally:
+            self._task = None
+
+
+class RateLimiter:
+    """
+    Bandwidth of one agent in one direction.
+    
+    Transfers are held to the agent's own `bucket`, if it has one, and
+    share a `link` with the other agents, if there is one. Transfers of
+    the agent's streams wait in turn.
+    """
+    
+    def __init__(
+        self,
+        bucket: Optional[TokenBucket],
+        link: Optional[SharedLink],
+        counters: ShapingCounters
+    ):
+        self.bucket = bucket
+        self.link = link
+        self.counters = counters
+        self.finish = 0.0  # virtual end time of the last transfer on the link
+        self._lock = asyncio.Lock()
+    
+    def try_take(self, size: int) -> bool:
+        """Take bandwidth for `size` bytes if it is available right away."""
+        if self._lock.locked():
+            return False
+        now = time.monotonic()
+        if self.bucket and not self.bucket.ready(now, size):
+            return False
+        if self.link and not self.link.try_take(self, size, now):
+            return False
+        if self.bucket:
+            self.bucket.take(size)
+        return True
+    
+    async def take(self, size: int) -> None:
+        """Wait until `size` bytes may be transferred."""
+        if self.try_take(size):
+            return
+        started = time.monotonic()
+        async with self._lock:
+            if self.bucket:
+                now = time.monotonic()
+                while not self.bucket.ready(now, size):
+                    await asyncio.sleep(self.bucket.wait_time(now, size))
+                    now = time.monotonic()
+                self.bucket.take(size)
+            if self.link and not self.link.try_take(self, size, time.monotonic()):
+                await self.link.take(self, size)
+        self.counters.count_delay(time.monotonic() - started)
+
+
+class BandwidthShaper:
+    """
+    Bandwidth limits of relayed data, in bytes per second.
+    
+    Ingress is data from external clients to agents, egress data from
+    agents to external clients. Each agent may be held to its own rate in
+    either direction (0 = no limit of its own), and all agents share the
+    server's total rate (0 = unlimited) fairly: an agent gets at most an
+    equal share while others are busy, and whatever they leave unused.
+    """
+    
+    def __init__(
+        self,
+        agent_ingress: float = 0,
+        agent_egress: float = 0,
+        agent_burst: float = 0,
+        total_ingress: float = 0,
+        total_egress: float = 0,
+        total_burst: float = 0
+    ):
+        self._agent_ingress = agent_ingress
+        self._agent_egress = agent_egress
+        self._agent_burst = agent_burst
+        self._ingress_link = SharedLink(total_ingress, total_burst) if total_ingress else None
+        self._egress_link = SharedLink(total_egress, total_burst) if total_egress else None
+        self.ingress_counters = ShapingCounters()
+        self.egress_counters = ShapingCounters()
+    
+    @property
+    def enabled(self) -> bool:
+        """Whether any limit is configured."""
+        return bool(
+            self._agent_ingress or self._agent_egress or self._ingress_link or self._egress_link
+        )
+    
+    def create_agent(self) -> tuple[Optional[RateLimiter], Optional[RateLimiter]]:
+        """Ingress and egress limiters of a new agent; None where there is no limit."""
+        return (
+            self._limiter(self._agent_ingress, self._ingress_link, self.ingress_counters),
+            self._limiter(self._agent_egress, self._egress_link, self.egress_counters),
+        )
+    
+    def _limiter(
+        self, rate: float, link: Optional[SharedLink], parent: ShapingCounters
+    ) -> Optional[RateLimiter]:
+        if not rate and not link:
+            return None
+        bucket = TokenBucket(rate, default_burst(rate, self._agent_burst)) if rate else None
+        return RateLimiter(bucket, link, ShapingCounters(parent=parent))
+    
+    def as_dict(self) -> dict:
+        """Server-wide throttling counters."""
+        return {
+            'ingress': self.ingress_counters.as_dict(),
+            'egress': self.egress_counters.as_dict(),
+        }
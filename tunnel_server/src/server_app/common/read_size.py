@@ -0,0 +1,48 @@
+"""Adaptive read sizing for relay loops."""
+
+from typing import Optional
+
+MIN_READ_SIZE = 4096
+DEFAULT_MAX_READ_SIZE = 64 * 1024  # stream relay loops
+CONTROL_MAX_READ_SIZE = 256 * 1024  # control connection receive loops
+
+
+class AdaptiveReadSize:
+    """
+    Read size of one connection.
+    
+    Starts small, so interactive traffic stays in small frames, doubles
+    while reads keep filling the buffer (bulk transfer) and halves once
+    reads come back much smaller than requested.
+    """
+    
+    def __init__(self, maximum: int = DEFAULT_MAX_READ_SIZE, minimum: int = MIN_READ_SIZE):
+        self._maximum = max(1, maximum)
+        self._minimum = min(minimum, self._maximum)
+        self._size = self._minimum
+    
+    @property
+    def size(self) -> int:
+        """Number of bytes to ask for in the next read."""
+        return self._size
+    
+    @property
+    def maximum(self) -> int:
+        """Ceiling of the read size."""
+        return self._maximum
+    
+    def update(self, received: int, requested: Optional[int] = None) -> None:
+        """
+        Adjust the read size after a read.
+        
+        Args:
+            received: Bytes the read returned
+            requested: Bytes asked for, if less than `size` (e.g. limited by credit)
+        """
+        if requested is None:
+            requested = self._size
+        if received >= requested:
+            self._size = min(self._size * 2, self._maximum)
+        elif received <= self._size // 4:
+            self._size = max(self._size // 2, self._minimum)
+
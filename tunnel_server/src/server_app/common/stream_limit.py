@@ -0,0 +1,143 @@
+"""Concurrent stream limits of agent sessions."""
+
+import asyncio
+import time
+from collections import deque
+from dataclasses import dataclass
+from typing import Optional
+
+from .timer_wheel import TimerWheel
+
+# Connections an agent may keep waiting for a stream at once
+DEFAULT_BACKLOG = 64
+
+
+@dataclass
+class BacklogCounters:
+    """
+    Connections that found all streams of their agent in use.
+    
+    Every queued connection ends up opened or `timed_out`; `rejected`
+    counts those that found the backlog full. The wait of each queued
+    connection counts in `wait_time` and `max_wait`. Counters of an agent
+    also update their `parent`, the server-wide counters.
+    """
+    
+    queued: int = 0
+    rejected: int = 0
+    timed_out: int = 0
+    waited: int = 0  # queued connections that stopped waiting
+    wait_time: float = 0.0  # seconds
+    max_wait: float = 0.0  # seconds
+    parent: Optional['BacklogCounters'] = None
+    
+    def count_queued(self) -> None:
+        """Count a connection that waits for a stream."""
+        self.queued += 1
+        if self.parent:
+            self.parent.count_queued()
+    
+    def count_rejected(self) -> None:
+        """Count a connection turned away by a full backlog."""
+        self.rejected += 1
+        if self.parent:
+            self.parent.count_rejected()
+    
+    def count_wait(self, seconds: float, timed_out: bool) -> None:
+        """Count the end of a connection's wait."""
+        self.waited += 1
+        self.wait_time += seconds
+        self.max_wait = max(self.max_wait, seconds)
+        if timed_out:
+            self.timed_out += 1
+        if self.parent:
+            self.parent.count_wait(seconds, timed_out)
+    
+    def as_dict(self) -> dict:
+        """Return the counters as a plain dict."""
+        return {
+            'queued': self.queued,
+            'rejected': self.rejected,
+            'timed_out': self.timed_out,
+            'avg_wait_ms': round(self.wait_time / self.waited * 1000, 3) if self.waited else 0.0,
+            'max_wait_ms': round(self.max_wait * 1000, 3),
+        }
+
+
+class StreamSlots:
+    """
+    At most `limit` concurrent streams of one agent session.
+    
+    A connection that finds all streams in use waits in a FIFO backlog of
+    at most `backlog` connections, for up to `timeout` seconds. A closed
+    stream hands its slot straight to the first connection waiting, so
+    none can overtake the backlog.
+    """
+    
+    def __init__(
+        self,
+        limit: int,
+        timers: TimerWheel,
+        backlog: int = DEFAULT_BACKLOG,
+        timeout: float = 0.0,
+        counters: Optional[BacklogCounters] = None
+    ):
+        if limit < 1:
+            raise ValueError("limit must be positive")
+        self.limit = limit
+        self.active = 0
+        self._timers = timers
+        self._backlog = backlog
+        self._timeout = timeout
+        self._waiting: deque[asyncio.Future] = deque()
+        self.counters = counters or BacklogCounters()
+    
+    @property
+    def waiting(self) -> int:
+        """Connections waiting for a stream."""
+        return len(self._waiting)
+    
+    async def acquire(self) -> bool:
+        """
+        Wait for a stream slot.
+        
+        Returns:
+            True if the connection holds a slot, which it must release(),
+            False if it must be closed
+        """
+        if self.active < self.limit and not self._waiting:
+            self.active += 1
+            return True
+        if not self._timeout or len(self._waiting) >= self._backlog:
+            self.counters.count_rejected()
+            return False
+        
+        self.counters.count_queued()
+        future = asyncio.get_running_loop().create_future()
+        self._waiting.append(future)
+        started = time.monotonic()
+        try:
+            async with self._timers.timeout(self._timeout):
+                await future
+        except TimeoutError:
+            pass
+        except asyncio.CancelledError:
+            if future.done() and not future.cancelled():
+                # Handed a slot just as the wait was cancelled
+                self.release()
+            raise
+        finally:
+            if future in self._waiting:
+                self._waiting.remove(future)
+        granted = future.done() and not future.cancelled()
+        self.counters.count_wait(time.monotonic() - started, timed_out=not granted)
+        return granted
+    
+    def release(self) -> None:
+        """Release the slot of a closed stream, to the first connection waiting if any."""
+        while self._waiting:
+            future = self._waiting.popleft()
+            if not future.done():
+                future.set_result(None)
+                return
+        self.active -= 1
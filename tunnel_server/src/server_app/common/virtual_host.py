@@ -0,0 +1,114 @@
+"""Host name detection for the shared public port."""
+
+import struct
+from typing import Optional
+
+# Longest prefix of a connection inspected for a host name: one full TLS
+# record (16 KiB plaintext + 5-byte header) fits
+MAX_PEEK = 17 * 1024
+
+_TLS_HANDSHAKE = 0x16
+_TLS_CLIENT_HELLO = 0x01
+_TLS_EXT_SERVER_NAME = 0x0000
+_SNI_HOST_NAME = 0x00
+
+_UINT8 = struct.Struct('>B')
+_UINT16 = struct.Struct('>H')
+
+
+def normalize_hostname(name: str) -> str:
+    """Lower-case a host name and strip a trailing dot and port."""
+    name = name.strip().lower()
+    if name.startswith('['):
+        # IPv6 literal, possibly with a port
+        return name[:name.find(']') + 1]
+    if name.count(':') == 1:
+        name = name.partition(':')[0]
+    return name.rstrip('.')
+
+
+def sniff_hostname(data: bytes) -> Optional[str]:
+    """
+    Find the host name a connection is addressed to from its first bytes.
+    
+    TLS connections are routed by the SNI of their ClientHello, anything
+    else is parsed as an HTTP/1.x request and routed by its Host header.
+    
+    Returns:
+        The normalized host name, '' if the connection names no host, or
+        None if more bytes are needed to tell
+    """
+    if not data:
+        return None
+    if data[0] == _TLS_HANDSHAKE:
+        return _sniff_tls(data)
+    return _sniff_http(data)
+
+
+def _sniff_http(data: bytes) -> Optional[str]:
+    """Host header of an HTTP/1.x request."""
+    lines = data.split(b'\r\n')
+    # The last element is a line that may still be incomplete
+    complete = lines[:-1]
+    if not complete:
+        return None if len(data) < MAX_PEEK else ''
+    if b' HTTP/' not in complete[0]:
+        return ''
+    for line in complete[1:]:
+        if not line:
+            # End of headers without Host
+            return ''
+        name, sep, value = line.partition(b':')
+        if sep and name.strip().lower() == b'host':
+            try:
+                return normalize_hostname(value.decode('ascii'))
+            except UnicodeDecodeError:
+                return ''
+    return None if len(data) < MAX_PEEK else ''
+
+
+def _sniff_tls(data: bytes) -> Optional[str]:
+    """Server name of a TLS ClientHello, read from its first record."""
+    if len(data) < 5:
+        return None
+    record_length = _UINT16.unpack_from(data, 3)[0]
+    if len(data) < 5 + record_length:
+        return None if record_length + 5 <= MAX_PEEK else ''
+    record = data[5:5 + record_length]
+    
+    try:
+        if record[0] != _TLS_CLIENT_HELLO:
+            return ''
+        # Handshake header (4), client version (2), random (32)
+        offset = 4 + 2 + 32
+        offset += 1 + record[offset]  # session id
+        offset += 2 + _UINT16.unpack_from(record, offset)[0]  # cipher suites
+        offset += 1 + record[offset]  # compression methods
+        end = offset + 2 + _UINT16.unpack_from(record, offset)[0]
+        offset += 2
+        while offset + 4 <= end:
+            ext_type, ext_length = struct.unpack_from('>HH', record, offset)
+            offset += 4
+            if ext_type == _TLS_EXT_SERVER_NAME:
+                return _parse_server_name(record[offset:offset + ext_length])
+            offset += ext_length
+    except (IndexError, struct.error):
+        # A ClientHello larger than its first record, or a malformed one
+        pass
+    return ''
+
+
+def _parse_server_name(extension: bytes) -> str:
+    """Host name entry of a server_name extension."""
+    offset = 2  # server name list length
+    while offset + 3 <= len(extension):
+        name_type = _UINT8.unpack_from(extension, offset)[0]
+        length = _UINT16.unpack_from(extension, offset + 1)[0]
+        offset += 3
+        if name_type == _SNI_HOST_NAME:
+            try:
+                return normalize_hostname(extension[offset:offset + length].decode('ascii'))
+            except UnicodeDecodeError:
+                return ''
+        offset += length
+    return ''
@@ -0,0 +1,360 @@
+"""Write scheduler that coalesces frames on a control connection."""
+
+import asyncio
+import logging
+import time
+from collections import deque
+from dataclasses import dataclass, field
+from typing import Optional
+
+from .errors import ConnectionError
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_FLUSH_INTERVAL = 0.0  # seconds; 0 = flush on the next loop iteration
+DEFAULT_FLUSH_BYTES = 256 * 1024
+DEFAULT_MAX_QUEUED_BYTES = 4 * 1024 * 1024
+DEFAULT_QUANTUM = 16 * 1024  # DRR quantum; DATA payloads are split to at most this size
+
+# Priority classes and their deficit round-robin weights
+PRIORITY_INTERACTIVE = 'interactive'
+PRIORITY_NORMAL = 'normal'
+PRIORITY_BULK = 'bulk'
+CONTROL_LANE = 'control'  # stats name of frames sent through the control lane
+PRIORITY_WEIGHTS = {
+    PRIORITY_INTERACTIVE: 8,
+    PRIORITY_NORMAL: 2,
+    PRIORITY_BULK: 1,
+}
+
+
+def split_payload(data: bytes, size: int) -> list:
+    """Split a DATA payload into zero-copy chunks of at most `size` bytes."""
+    if len(data) <= size:
+        return [data]
+    view = memoryview(data)
+    return [view[offset:offset + size] for offset in range(0, len(data), size)]
+
+
+@dataclass
+class PriorityClassStats:
+    """Queueing delay of the frames of one priority class (or the control lane)."""
+    
+    frames: int = 0
+    bytes: int = 0
+    total_delay: float = 0.0  # seconds
+    max_delay: float = 0.0  # seconds
+    
+    @property
+    def avg_delay(self) -> float:
+        """Average time a frame spent queued, in seconds."""
+        return self.total_delay / self.frames if self.frames else 0.0
+    
+    def add(self, size: int, delay: float) -> None:
+        """Count one written frame."""
+        self.frames += 1
+        self.bytes += size
+        self.total_delay += delay
+        if delay > self.max_delay:
+            self.max_delay = delay
+    
+    def as_dict(self) -> dict:
+        """Return the counters as a plain dict (delays in milliseconds)."""
+        return {
+            'frames': self.frames,
+            'bytes': self.bytes,
+            'avg_delay_ms': self.avg_delay * 1000,
+            'max_delay_ms': self.max_delay * 1000,
+        }
+
+
+@dataclass
+class WriteSchedulerStats:
+    """Counters exported by a write scheduler."""
+    
+    queue_depth: int = 0
+    queued_bytes: int = 0
+    frames_written: int = 0
+    bytes_written: int = 0
+    batches: int = 0
+    max_batch_frames: int = 0
+    max_batch_bytes: int = 0
+    classes: dict[str, PriorityClassStats] = field(default_factory=dict)
+    
+    @property
+    def avg_batch_frames(self) -> float:
+        """Average number of frames per write."""
+        return self.frames_written / self.batches if self.batches else 0.0
+    
+    @property
+    def avg_batch_bytes(self) -> float:
+        """Average number of bytes per write."""
+        return self.bytes_written / self.batches if self.batches else 0.0
+    
+    def as_dict(self) -> dict:
+        """Return the counters as a plain dict."""
+        return {
+            'queue_depth': self.queue_depth,
+            'queued_bytes': self.queued_bytes,
+            'frames_written': self.frames_written,
+            'bytes_written': self.bytes_written,
+            'batches': self.batches,
+            'avg_batch_frames': self.avg_batch_frames,
+            'avg_batch_bytes': self.avg_batch_bytes,
+            'max_batch_frames': self.max_batch_frames,
+            'max_batch_bytes': self.max_batch_bytes,
+            'classes': {name: stats.as_dict() for name, stats in self.classes.items()},
+        }
+
+
+class _StreamQueue:
+    """Frames queued for one stream and its deficit round-robin state."""
+    
+    __slots__ = ('stream', 'priority', 'frames', 'deficit', 'credited')
+    
+    def __init__(self, stream: int, priority: str):
+        self.stream = stream
+        self.priority = priority
+        self.frames: deque[tuple[tuple[bytes, ...], int, float]] = deque()
+        self.deficit = 0
+        self.credited = False  # quantum already added for the current visit
+
+
+class WriteScheduler:
+    """
+    Owns the StreamWriter of a control connection.
+    
+    Producers enqueue encoded frames; a single writer task takes them from
+    the queue and writes them in batches with writelines(), followed by one
+    drain() per batch instead of one per frame. A batch is flushed once it
+    reaches `flush_bytes` or `flush_interval` seconds after its first frame
+    was queued, whichever comes first.
+    
+    Frames are queued per stream (conn_id; 0 for connection-level frames)
+    and stay in order within a stream. Streams are interleaved by deficit
+    round-robin: each visit adds `quantum` times the weight of the stream's
+    priority class to its deficit, and the stream sends frames while they
+    fit. Producers should keep frames at most `quantum` bytes long, so a
+    bulk stream delays other streams by no more than one quantum per
+    visit.
+    
+    Control frames (OPEN, CLOSE, WINDOW_UPDATE, keepalives) can skip the
+    round-robin and go through a control lane that is always emptied
+    first. A control frame of a stream that still has DATA queued is
+    queued behind that DATA instead, so e.g. CLOSE never overtakes the
+    end of its own stream.
+    """
+    
+    def __init__(
+        self,
+        writer: asyncio.StreamWriter,
+        flush_interval: float = DEFAULT_FLUSH_INTERVAL,
+        flush_bytes: int = DEFAULT_FLUSH_BYTES,
+        max_queued_bytes: int = DEFAULT_MAX_QUEUED_BYTES,
+        quantum: int = DEFAULT_QUANTUM,
+        default_priority: str = PRIORITY_NORMAL
+    ):
+        if default_priority not in PRIORITY_WEIGHTS:
+            raise ValueError(f"Unknown priority class: {default_priority}")
+        self._writer = writer
+        self._flush_interval = flush_interval
+        self._flush_bytes = flush_bytes
+        self._max_queued_bytes = max_queued_bytes
+        self._quantum = quantum
+        self._default_priority = default_priority
+        self._priorities: dict[int, str] = {}
+        self._streams: dict[int, _StreamQueue] = {}
+        self._active: deque[_StreamQueue] = deque()  # streams with queued frames, in visit order
+        self._control: deque[tuple[tuple[bytes, ...], int, float]] = deque()
+        self._queued_frames = 0
+        self._queued_bytes = 0
+        self._wakeup = asyncio.Event()
+        self._space = asyncio.Event()
+        self._space.set()
+        self._task: Optional[asyncio.Task] = None
+        self._error: Optional[BaseException] = None
+        self._stats = WriteSchedulerStats()
+    
+    @property
+    def quantum(self) -> int:
+        """Largest frame size that keeps round-robin interleaving fine-grained."""
+        return self._quantum
+    
+    def set_priority(self, stream: int, priority: str) -> None:
+        """Assign a priority class to a stream (applies to frames queued from now on)."""
+        if priority not in PRIORITY_WEIGHTS:
+            raise ValueError(f"Unknown priority class: {priority}")
+        self._priorities[stream] = priority
+    
+    def forget(self, stream: int) -> None:
+        """Drop the priority of a closed stream."""
+        self._priorities.pop(stream, None)
+    
+    def start(self) -> None:
+        """Start the writer task."""
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+    
+    def write(self, *buffers: bytes, stream: int = 0, control: bool = False) -> None:
+        """
+        Queue one frame of a stream without waiting for queue space.
+        
+        Args:
+            stream: conn_id of the frame (0 for connection-level frames)
+            control: send ahead of queued DATA through the control lane
+        """
+        if self._error is not None:
+            raise ConnectionError(f"Control connection is closed: {self._error}")
+        size = sum(len(buffer) for buffer in buffers)
+        queue = self._streams.get(stream)
+        if control and queue is None:
+            self._control.append((buffers, size, time.monotonic()))
+        else:
+            if queue is None:
+                queue = _StreamQueue(stream, self._priorities.get(stream, self._default_priority))
+                self._streams[stream] = queue
+                self._active.append(queue)
+            queue.frames.append((buffers, size, time.monotonic()))
+        self._queued_frames += 1
+        self._queued_bytes += size
+        if self._queued_bytes >= self._max_queued_bytes:
+            self._space.clear()
+        self._wakeup.set()
+    
+    async def send(self, *buffers: bytes, stream: int = 0, control: bool = False) -> None:
+        """Queue one frame, waiting while the queue is over its byte limit."""
+        self.write(*buffers, stream=stream, control=control)
+        if not self._space.is_set():
+            await self._space.wait()
+            if self._error is not None:
+                raise ConnectionError(f"Control connection is closed: {self._error}")
+    
+    async def close(self) -> None:
+        """Stop the writer task and drop any frames still queued."""
+        if self._error is None:
+            self._error = ConnectionError("Write scheduler closed")
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        self._release()
+    
+    @property
+    def stats(self) -> WriteSchedulerStats:
+        """Current queue and batching statistics."""
+        self._stats.queue_depth = self._queued_frames
+        self._stats.queued_bytes = self._queued_bytes
+        return self._stats
+    
+    def _release(self) -> None:
+        """Drop queued frames and wake up blocked producers."""
+        self._streams.clear()
+        self._active.clear()
+        self._control.clear()
+        self._queued_frames = 0
+        self._queued_bytes = 0
+        self._space.set()
+    
+    async def _wait_for_batch(self) -> None:
+        """Wait until the flush deadline or byte threshold is reached."""
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + self._flush_interval
+        while self._queued_bytes < self._flush_bytes:
+            timeout = deadline - loop.time()
+            if timeout <= 0:
+                return
+            self._wakeup.clear()
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout)
+            except asyncio.TimeoutError:
+                return
+    
+    def _take_batch(self) -> list[bytes]:
+        """
+        Pop frames up to the byte threshold (at least one): the control
+        lane first, then the streams in round-robin order.
+        """
+        buffers: list[bytes] = []
+        frames = 0
+        size = 0
+        now = time.monotonic()
+        
+        control = self._control
+        if control:
+            class_stats = self._class_stats(CONTROL_LANE)
+            while control:
+                frame_buffers, frame_size, queued_at = control.popleft()
+                buffers.extend(frame_buffers)
+                frames += 1
+                size += frame_size
+                class_stats.add(frame_size, now - queued_at)
+        
+        active = self._active
+        while active and (not frames or size < self._flush_bytes):
+            queue = active[0]
+            if not queue.credited:
+                queue.deficit += self._quantum * PRIORITY_WEIGHTS[queue.priority]
+                queue.credited = True
+            
+            frame_buffers, frame_size, queued_at = queue.frames[0]
+            if frame_size > queue.deficit:
+                # Not enough credit left in this visit; the deficit carries over
+                queue.credited = False
+                active.rotate(-1)
+                continue
+            
+            queue.frames.popleft()
+            queue.deficit -= frame_size
+            buffers.extend(frame_buffers)
+            frames += 1
+            size += frame_size
+            self._class_stats(queue.priority).add(frame_size, now - queued_at)
+            
+            if not queue.frames:
+                active.popleft()
+                del self._streams[queue.stream]
+        self._queued_frames -= frames
+        self._queued_bytes -= size
+        
+        stats = self._stats
+        stats.batches += 1
+        stats.frames_written += frames
+        stats.bytes_written += size
+        stats.max_batch_frames = max(stats.max_batch_frames, frames)
+        stats.max_batch_bytes = max(stats.max_batch_bytes, size)
+        return buffers
+    
+    def _class_stats(self, name: str) -> PriorityClassStats:
+        """Get the statistics of a priority class (or the control lane)."""
+        class_stats = self._stats.classes.get(name)
+        if class_stats is None:
+            class_stats = self._stats.classes[name] = PriorityClassStats()
+        return class_stats
+    
+    async def _run(self) -> None:
+        """Writer task: coalesce queued frames into large writes."""
+        try:
+            while True:
+                if not self._active and not self._control:
+                    self._wakeup.clear()
+                    await self._wakeup.wait()
+                    continue
+                
+                if self._flush_interval > 0:
+                    await self._wait_for_batch()
+                
+                self._writer.writelines(self._take_batch())
+                await self._writer.drain()
+                
+                if self._queued_bytes < self._max_queued_bytes:
+                    self._space.set()
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logger.debug(f"Write scheduler stopped: {e}")
+            self._error = e
+            self._release()
+
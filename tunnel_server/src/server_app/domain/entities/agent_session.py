@@ -1,33 +1,159 @@
 """Agent session entity."""
 
-from dataclasses import dataclass
+from dataclasses import dataclass, field
 from typing import Optional
 import asyncio
 
+from ...common.write_scheduler import WriteScheduler
+from ...common.compression import FrameCompressor
+from ...common.protocol import ProtocolCodec
+from ...common.flow_control import SendWindow, ReceiveWindow
+from ...common.handshake import Handshake, CAP_FLOW_CONTROL
+from ...common.heartbeat import RttEstimator
+from ...common.admission import PortAdmission
+from ...common.rate_limit import RateLimiter
+from ...common.stream_limit import StreamSlots
+from .control_stripe import ControlStripe
+from .traffic_counters import TrafficCounters
+
+# How new streams are spread over the control connections of a session
+STRIPE_HASH = 'hash'  # by connection ID
+STRIPE_LEAST_LOADED = 'least-loaded'  # connection with the fewest open streams
+STRIPE_POLICIES = (STRIPE_HASH, STRIPE_LEAST_LOADED)
+
 
 @dataclass
 class AgentSession:
-    """Represents an active agent session."""
+    """
+    Represents an active agent session.
+    
+    An agent may hold several control connections (stripes). Every stream
+    is bound to one of them when it is opened and all of its frames use
+    that connection, so a lost connection only ends its own streams.
+    `control_writer`, `control_reader` and `write_scheduler` refer to the
+    first live stripe.
+    
+    A session with a `hostname` is reached through the server's shared
+    public port and owns no port of its own; `public_port` is then the
+    shared port.
+    
+    A session that negotiated resumption has a `resume_token`. When its
+    control connections are lost it is `detached`: port and external
+    connections are held, DATA to the agent is kept in the streams'
+    replay buffers, and the agent may pick the session up again until
+    `resume_timer` fires.
+    """
     
     agent_id: str
     token: str
     local_host: str
     local_port: int
     public_port: int
+    listener: Optional[object] = None  # listener of the own public port; None for named sessions
     control_writer: Optional[asyncio.StreamWriter] = None
-    control_reader: Optional[asyncio.StreamReader] = None
+    control_reader: Optional[object] = None  # FrameReader of the control connection
+    write_scheduler: Optional[WriteScheduler] = None
+    codec: ProtocolCodec = field(default_factory=ProtocolCodec)  # frame format of the control connection
+    compressor: Optional[FrameCompressor] = None  # set if compression was negotiated
+    # Parameters offered by the agent and agreed by the server (legacy agents: defaults)
+    hello: Handshake = field(default_factory=Handshake)
+    welcome: Handshake = field(default_factory=Handshake)
+    stripes: list[ControlStripe] = field(default_factory=list)
+    stripe_policy: str = STRIPE_HASH
+    hostname: str = ''  # virtual host name on the shared public port
+    remote_host: str = ''  # address the agent connected from
+    counters: TrafficCounters = field(default_factory=TrafficCounters)
+    resume_token: str = ''  # '' = the session ends with its control connections
+    detached: bool = False
+    resume_timer: Optional[asyncio.TimerHandle] = None
+    rtt: RttEstimator = field(default_factory=RttEstimator)  # from PINGs on all stripes
+    admission: Optional[PortAdmission] = None  # accept-rate state, if limits are configured
+    # Bandwidth to and from the agent, if limits are configured
+    ingress: Optional[RateLimiter] = None
+    egress: Optional[RateLimiter] = None
+    # Concurrent stream limit, if the agent or the server set one
+    stream_slots: Optional[StreamSlots] = None
     
     def __post_init__(self):
         """Initialize the session."""
         self._external_connections: dict[int, 'ExternalConn'] = {}
+        self._next_stripe = 0
+    
+    def add_stripe(self, reader, writer, write_scheduler: WriteScheduler) -> ControlStripe:
+        """Add a control connection to the session."""
+        stripe = ControlStripe(
+            index=self._next_stripe,
+            writer=writer,
+            reader=reader,
+            write_scheduler=write_scheduler
+        )
+        self._next_stripe += 1
+        self.stripes.append(stripe)
+        if len(self.stripes) == 1:
+            self._use_stripe(stripe)
+        return stripe
+    
+    def remove_stripe(self, stripe: ControlStripe) -> list['ExternalConn']:
+        """
+        Remove a lost control connection from the session.
+        
+        Returns:
+            The external connections whose streams used it
+        """
+        if stripe in self.stripes:
+            self.stripes.remove(stripe)
+        if self.write_scheduler is stripe.write_scheduler:
+            if self.stripes:
+                self._use_stripe(self.stripes[0])
+            else:
+                self.control_writer = None
+                self.control_reader = None
+                self.write_scheduler = None
+        return [conn for conn in self._external_connections.values() if conn.stripe is stripe]
+    
+    def assign_stripe(self, conn_id: int) -> Optional[ControlStripe]:
+        """Choose the control connection of a new stream."""
+        if not self.stripes:
+            return None
+        if self.stripe_policy == STRIPE_LEAST_LOADED:
+            stripe = min(self.stripes, key=lambda s: len(s.streams))
+        else:
+            stripe = self.stripes[conn_id % len(self.stripes)]
+        stripe.streams.add(conn_id)
+        return stripe
+    
+    def scheduler_for(self, conn: 'ExternalConn') -> Optional[WriteScheduler]:
+        """Write scheduler of the control connection carrying a stream."""
+        if conn.stripe:
+            return conn.stripe.write_scheduler
+        return self.write_scheduler
+    
+    def _use_stripe(self, stripe: ControlStripe) -> None:
+        self.control_writer = stripe.writer
+        self.control_reader = stripe.reader
+        self.write_scheduler = stripe.write_scheduler
+    
+    def create_windows(self) -> tuple[SendWindow, ReceiveWindow]:
+        """Create the flow-control windows of a new stream as negotiated."""
+        if not self.welcome.supports(CAP_FLOW_CONTROL):
+            return SendWindow(None), ReceiveWindow(None)
+        return SendWindow(self.hello.window_size), ReceiveWindow(self.welcome.window_size)
     
     def add_external_connection(self, conn: 'ExternalConn') -> None:
         """Add an external connection to this session."""
+        if conn.conn_id not in self._external_connections:
+            self.counters.stream_opened()
         self._external_connections[conn.conn_id] = conn
     
     def remove_external_connection(self, conn_id: int) -> None:
         """Remove an external connection from this session."""
-        self._external_connections.pop(conn_id, None)
+        conn = self._external_connections.pop(conn_id, None)
+        if conn:
+            self.counters.stream_closed()
+            if conn.stripe:
+                conn.stripe.streams.discard(conn_id)
+            if self.stream_slots:
+                self.stream_slots.release()
     
     def get_external_connection(self, conn_id: int) -> Optional['ExternalConn']:
         """Get an external connection by ID."""
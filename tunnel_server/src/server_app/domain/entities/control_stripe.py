@@ -0,0 +1,35 @@
+"""Control stripe entity."""
+
+from dataclasses import dataclass, field
+from typing import Optional
+import asyncio
+
+from ...common.write_scheduler import WriteScheduler
+from ...common.heartbeat import Heartbeat
+
+
+@dataclass
+class ControlStripe:
+    """One of the control connections of an agent session."""
+    
+    index: int
+    writer: Optional[asyncio.StreamWriter] = None
+    reader: Optional[object] = None  # FrameReader of the connection
+    write_scheduler: Optional[WriteScheduler] = None
+    # Streams whose frames go through this connection
+    streams: set[int] = field(default_factory=set)
+    heartbeat: Optional[Heartbeat] = None  # set if heartbeats were negotiated
+    
+    async def close(self) -> None:
+        """Stop the writer and close the connection."""
+        if self.heartbeat:
+            await self.heartbeat.close()
+        if self.write_scheduler:
+            await self.write_scheduler.close()
+        if self.writer:
+            try:
+                self.writer.close()
+                await self.writer.wait_closed()
+            except Exception:
+                pass
+
@@ -1,9 +1,19 @@
 """External connection entity."""
 
-from dataclasses import dataclass
+from dataclasses import dataclass, field
 from typing import Optional
 import asyncio
 
+from ...common.flow_control import SendWindow, ReceiveWindow
+from ...common.send_queue import SendQueue
+from ...common.replay import ReplayBuffer
+from ...common.timer_wheel import IdleTimeout
+from .control_stripe import ControlStripe
+
+# Seconds a graceful close waits for the client to read the last data
+# before the connection is aborted
+CLOSE_LINGER = 5.0
+
 
 @dataclass
 class ExternalConn:
@@ -13,19 +23,49 @@ class ExternalConn:
     agent_id: str
     reader: Optional[asyncio.StreamReader] = None
     writer: Optional[asyncio.StreamWriter] = None
+    stripe: Optional[ControlStripe] = None  # control connection carrying this stream
+    # Flow control: credit for external -> agent, accounting for agent -> external
+    send_window: SendWindow = field(default_factory=SendWindow)
+    recv_window: ReceiveWindow = field(default_factory=ReceiveWindow)
+    # Data from the agent on its way to the external client
+    send_queue: Optional[SendQueue] = None
+    # Set if the session can be resumed after a lost control connection
+    replay: Optional[ReplayBuffer] = None
+    # Closes the connection after a period without traffic, if configured
+    idle: Optional[IdleTimeout] = None
     
     def is_closed(self) -> bool:
         """Check if the connection is closed."""
         return self.writer is None or self.writer.is_closing()
     
-    async def close(self) -> None:
-        """Close the connection."""
+    async def close(self, abort: bool = False, linger: float = CLOSE_LINGER) -> None:
+        """
+        Close the connection.
+        
+        Args:
+            abort: Drop unsent data instead of waiting for the peer to read it
+            linger: Seconds to wait for the peer to read it before aborting
+        """
+        self.send_window.close()
+        if self.idle:
+            self.idle.cancel()
+        if self.send_queue:
+            if not abort and not await self.send_queue.flush(linger):
+                abort = True
+            await self.send_queue.close(abort)
         if self.writer:
+            writer = self.writer
+            self.writer = None
+            self.reader = None
             try:
-                self.writer.close()
-                await self.writer.wait_closed()
+                if abort:
+                    writer.transport.abort()
+                else:
+                    writer.close()
+                await asyncio.wait_for(writer.wait_closed(), linger)
+            except asyncio.TimeoutError:
+                # The peer stopped reading; drop what the transport holds
+                writer.transport.abort()
             except Exception:
                 pass
-            self.writer = None
-            self.reader = None
 
@@ -0,0 +1,65 @@
+"""Traffic counters entity."""
+
+from dataclasses import dataclass
+from typing import Optional
+
+
+@dataclass
+class TrafficCounters:
+    """
+    Open streams and relayed bytes of an agent session.
+    
+    Counters attached to a `parent` also update it, so the registry keeps
+    fleet-wide totals without walking its sessions.
+    """
+    
+    streams: int = 0
+    bytes_to_agent: int = 0
+    bytes_to_external: int = 0
+    parent: Optional['TrafficCounters'] = None
+    
+    def stream_opened(self) -> None:
+        """Count a new stream."""
+        self.streams += 1
+        if self.parent:
+            self.parent.streams += 1
+    
+    def stream_closed(self) -> None:
+        """Count a closed stream."""
+        self.streams -= 1
+        if self.parent:
+            self.parent.streams -= 1
+    
+    def sent_to_agent(self, size: int) -> None:
+        """Count bytes relayed from an external client to the agent."""
+        self.bytes_to_agent += size
+        if self.parent:
+            self.parent.bytes_to_agent += size
+    
+    def sent_to_external(self, size: int) -> None:
+        """Count bytes relayed from the agent to an external client."""
+        self.bytes_to_external += size
+        if self.parent:
+            self.parent.bytes_to_external += size
+    
+    def attach(self, parent: 'TrafficCounters') -> None:
+        """Roll these counters up into `parent` from now on."""
+        self.detach()
+        self.parent = parent
+        parent.streams += self.streams
+        parent.bytes_to_agent += self.bytes_to_agent
+        parent.bytes_to_external += self.bytes_to_external
+    
+    def detach(self) -> None:
+        """Stop rolling up; the parent keeps the bytes but not the open streams."""
+        if self.parent:
+            self.parent.streams -= self.streams
+            self.parent = None
+    
+    def as_dict(self) -> dict:
+        """Return the counters as a plain dict."""
+        return {
+            'streams': self.streams,
+            'bytes_to_agent': self.bytes_to_agent,
+            'bytes_to_external': self.bytes_to_external,
+        }
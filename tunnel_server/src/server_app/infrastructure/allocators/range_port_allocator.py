@@ -1,8 +1,9 @@
 """Range-based port allocator."""
 
-import asyncio
 import logging
-from typing import Set
+import time
+from collections import OrderedDict
+from typing import Callable, Dict, Optional, Set
 
 from ...interfaces.port_allocator import IPortAllocator
 from ...common.errors import PortAllocationError
@@ -10,39 +11,120 @@ from ...common.errors import PortAllocationError
 logger = logging.getLogger(__name__)
 
 
+def partition_port_range(port_min: int, port_max: int, parts: int) -> list[tuple[int, int]]:
+    """
+    Split a port range into contiguous, non-overlapping sub-ranges.
+    
+    Used to give every server worker its own RangePortAllocator range;
+    the first sub-ranges get one port more when the range does not divide
+    evenly.
+    """
+    total = port_max - port_min + 1
+    if parts <= 0 or total < parts:
+        raise ValueError(f"Cannot split {total} ports into {parts} ranges")
+    size, extra = divmod(total, parts)
+    ranges = []
+    start = port_min
+    for index in range(parts):
+        end = start + size + (1 if index < extra else 0) - 1
+        ranges.append((start, end))
+        start = end + 1
+    return ranges
+
+
 class RangePortAllocator(IPortAllocator):
-    """Port allocator that manages a range of ports."""
+    """
+    Port allocator that manages a range of ports.
     
-    def __init__(self, port_min: int, port_max: int):
+    Free ports are kept in insertion order, so allocate() and release()
+    are O(1) and the port released longest ago is reused first. A released
+    port cools down for `cooldown` seconds before it is handed to another
+    agent, unless no other port is free. An agent allocating with the
+    identity it had before gets its previous port back while that port is
+    not in use by someone else.
+    """
+    
+    def __init__(
+        self,
+        port_min: int,
+        port_max: int,
+        cooldown: float = 0.0,
+        clock: Callable[[], float] = time.monotonic
+    ):
         if port_min > port_max:
             raise ValueError("port_min must be <= port_max")
         self._port_min = port_min
         self._port_max = port_max
+        self._cooldown = cooldown
+        self._clock = clock
         self._allocated: Set[int] = set()
-        self._lock = asyncio.Lock()
-    
-    async def allocate(self) -> int:
-        """Allocate a port from the range."""
-        async with self._lock:
-            for port in range(self._port_min, self._port_max + 1):
-                if port not in self._allocated:
-                    self._allocated.add(port)
-                    logger.debug(f"Allocated port {port}")
-                    return port
-            raise PortAllocationError(
-                f"No available ports in range [{self._port_min}, {self._port_max}]"
-            )
+        # Free ports ready for reuse, oldest release first
+        self._free: OrderedDict[int, None] = OrderedDict.fromkeys(range(port_min, port_max + 1))
+        # Released ports still cooling down -> time they become ready
+        self._cooling: OrderedDict[int, float] = OrderedDict()
+        # Sticky assignment: identity -> last port, port -> its last identity
+        self._last_port: Dict[str, int] = {}
+        self._last_identity: Dict[int, str] = {}
+    
+    async def allocate(self, identity: Optional[str] = None) -> int:
+        """Allocate a port from the range, the previous port of `identity` if free."""
+        port = self._take_sticky(identity) if identity else None
+        if port is None:
+            self._expire_cooldowns()
+            if self._free:
+                port, _ = self._free.popitem(last=False)
+            elif self._cooling:
+                # Better a port that was released recently than none
+                port, _ = self._cooling.popitem(last=False)
+            else:
+                raise PortAllocationError(
+                    f"No available ports in range [{self._port_min}, {self._port_max}]"
+                )
+        
+        self._allocated.add(port)
+        if identity:
+            previous = self._last_identity.get(port)
+            if previous is not None and previous != identity:
+                self._last_port.pop(previous, None)
+            self._last_port[identity] = port
+            self._last_identity[port] = identity
+        logger.debug(f"Allocated port {port}")
+        return port
     
     async def release(self, port: int) -> None:
         """Release a port back to the pool."""
-        async with self._lock:
-            if port in self._allocated:
-                self._allocated.remove(port)
-                logger.debug(f"Released port {port}")
+        if port in self._allocated:
+            self._allocated.remove(port)
+            if self._cooldown > 0:
+                self._cooling[port] = self._clock() + self._cooldown
             else:
-                logger.warning(f"Attempted to release unallocated port {port}")
+                self._free[port] = None
+            logger.debug(f"Released port {port}")
+        else:
+            logger.warning(f"Attempted to release unallocated port {port}")
     
     def get_available_count(self) -> int:
         """Get the number of available ports."""
         return (self._port_max - self._port_min + 1) - len(self._allocated)
-
+    
+    def _take_sticky(self, identity: str) -> Optional[int]:
+        """Take the previous port of an identity if it is not in use."""
+        port = self._last_port.get(identity)
+        if port is None or port in self._allocated:
+            return None
+        if port in self._free:
+            del self._free[port]
+        else:
+            # A port of its own is not kept from its identity by the cool-down
+            del self._cooling[port]
+        return port
+    
+    def _expire_cooldowns(self) -> None:
+        """Move ports whose cool-down is over to the free list."""
+        now = self._clock()
+        while self._cooling:
+            port, ready_at = next(iter(self._cooling.items()))
+            if ready_at > now:
+                break
+            del self._cooling[port]
+            self._free[port] = None
@@ -5,35 +5,69 @@ import logging
 from typing import Callable, Awaitable, Optional
 
 from ...interfaces.control_server import IControlServer
+from ...common.protocol import ProtocolCodec
+from .frame_reader import (
+    FrameReader,
+    StreamFrameReader,
+    BufferedFrameReader,
+    STREAM_TRANSPORT,
+    BUFFERED_TRANSPORT
+)
 
 logger = logging.getLogger(__name__)
 
 
 class AsyncioControlServer(IControlServer):
-    """Asyncio implementation of control server."""
+    """
+    Asyncio implementation of control server.
     
-    def __init__(self):
+    The connection handler is called with a FrameReader (which owns the
+    connection's ProtocolCodec) and an asyncio.StreamWriter. `transport`
+    selects how frames are received: STREAM_TRANSPORT reads through an
+    asyncio.StreamReader, BUFFERED_TRANSPORT receives into the frame
+    buffer with an asyncio.BufferedProtocol.
+    """
+    
+    def __init__(self, transport: str = STREAM_TRANSPORT):
+        if transport not in (STREAM_TRANSPORT, BUFFERED_TRANSPORT):
+            raise ValueError(f"Unknown control transport: {transport}")
+        self._transport = transport
         self._server: Optional[asyncio.Server] = None
         self._connection_handler: Optional[Callable[[object, object], Awaitable[None]]] = None
     
-    async def start(self, host: str, port: int) -> None:
-        """Start the control server."""
-        async def handle_client(reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
-            """Handle a new client connection."""
-            if self._connection_handler:
+    async def start(self, host: str, port: int, reuse_port: bool = False) -> None:
+        """Start the control server; with reuse_port the port is shared via SO_REUSEPORT."""
+        if self._transport == BUFFERED_TRANSPORT:
+            def on_connection(frames: BufferedFrameReader):
+                asyncio.create_task(self._handle_client(frames, frames.writer))
+            
+            loop = asyncio.get_running_loop()
+            self._server = await loop.create_server(
+                lambda: BufferedFrameReader(ProtocolCodec(), on_connection), host, port,
+                reuse_port=reuse_port or None
+            )
+        else:
+            async def handle_client(reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+                await self._handle_client(StreamFrameReader(reader, ProtocolCodec()), writer)
+            
+            self._server = await asyncio.start_server(
+                handle_client, host, port, reuse_port=reuse_port or None
+            )
+        logger.info(f"Control server listening on {host}:{port} ({self._transport} transport)")
+    
+    async def _handle_client(self, frames: FrameReader, writer: asyncio.StreamWriter) -> None:
+        """Handle a new client connection."""
+        if self._connection_handler:
+            try:
+                await self._connection_handler(frames, writer)
+            except Exception as e:
+                logger.error(f"Error handling control connection: {e}", exc_info=True)
+            finally:
                 try:
-                    await self._connection_handler(reader, writer)
-                except Exception as e:
-                    logger.error(f"Error handling control connection: {e}", exc_info=True)
-                finally:
-                    try:
-                        writer.close()
-                        await writer.wait_closed()
-                    except Exception:
-                        pass
-        
-        self._server = await asyncio.start_server(handle_client, host, port)
-        logger.info(f"Control server listening on {host}:{port}")
+                    writer.close()
+                    await writer.wait_closed()
+                except Exception:
+                    pass
     
     async def stop(self) -> None:
         """Stop the control server."""
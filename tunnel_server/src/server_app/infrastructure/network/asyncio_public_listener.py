@@ -15,6 +15,10 @@ class AsyncioPublicListener:
     def __init__(self, server: asyncio.Server):
         self._server = server
     
+    async def start_serving(self) -> None:
+        """Start accepting connections queued since the port was bound."""
+        await self._server.start_serving()
+    
     async def close(self) -> None:
         """Close the listener."""
         self._server.close()
@@ -27,7 +31,8 @@ class AsyncioPublicListenerFactory(IPublicListenerFactory):
     async def create_listener(
         self,
         port: int,
-        connection_handler: Callable[[object, object], Awaitable[None]]
+        connection_handler: Callable[[object, object], Awaitable[None]],
+        start_serving: bool = True
     ) -> AsyncioPublicListener:
         """Create a listener on the given port."""
         async def handle_client(reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
@@ -43,7 +48,9 @@ class AsyncioPublicListenerFactory(IPublicListenerFactory):
                 except Exception:
                     pass
         
-        server = await asyncio.start_server(handle_client, '0.0.0.0', port)
+        server = await asyncio.start_server(
+            handle_client, '0.0.0.0', port, start_serving=start_serving
+        )
         logger.info(f"Public listener started on port {port}")
         return AsyncioPublicListener(server)
 
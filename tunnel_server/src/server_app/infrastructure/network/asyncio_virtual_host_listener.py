@@ -0,0 +1,174 @@
+"""Asyncio-based shared public listener routing by host name."""
+
+import asyncio
+import logging
+import socket
+from typing import Callable, Awaitable, Optional
+
+from ...common.virtual_host import MAX_PEEK, sniff_hostname
+from ...common.timer_wheel import TimerWheel
+
+logger = logging.getLogger(__name__)
+
+# Delays between peeks while the first bytes of a connection are
+# incomplete, where the socket's receive low-water mark cannot be set
+PEEK_RETRY_INTERVAL = 0.005
+MAX_PEEK_RETRY_INTERVAL = 0.5
+
+
+class AsyncioVirtualHostListener:
+    """
+    Public listener shared by all agents registered under a host name.
+    
+    The first bytes of every accepted connection are peeked with MSG_PEEK,
+    so they stay in the socket and reach the agent unchanged. The host
+    name found in them (HTTP Host or TLS SNI) is passed to the connection
+    handler together with the connection's streams; connections that name
+    no host within `peek_timeout` are closed. The timeouts of all pending
+    connections share one timer wheel.
+    
+    While the bytes peeked so far are incomplete, the socket's receive
+    low-water mark is raised past them, so the connection is only peeked
+    again once more bytes have arrived.
+    """
+    
+    def __init__(self, peek_timeout: float = 5.0, timers: Optional[TimerWheel] = None):
+        self._peek_timeout = peek_timeout
+        self._timers = timers or TimerWheel()
+        self._sock: Optional[socket.socket] = None
+        self._accept_task: Optional[asyncio.Task] = None
+        # Connections being peeked at or relayed
+        self._clients: set[asyncio.Task] = set()
+        self._connection_handler: Optional[Callable[[str, object, object], Awaitable[None]]] = None
+    
+    async def start(
+        self,
+        host: str,
+        port: int,
+        connection_handler: Callable[[str, object, object], Awaitable[None]]
+    ) -> None:
+        """Start accepting connections on the shared port."""
+        self._connection_handler = connection_handler
+        self._sock = socket.create_server((host, port))
+        self._sock.setblocking(False)
+        self._accept_task = asyncio.create_task(self._accept_loop())
+        logger.info(f"Shared public listener started on {host}:{port}")
+    
+    async def close(self) -> None:
+        """Stop accepting connections and drop those still open."""
+        if self._accept_task:
+            self._accept_task.cancel()
+            try:
+                await self._accept_task
+            except asyncio.CancelledError:
+                pass
+            self._accept_task = None
+        for task in list(self._clients):
+            task.cancel()
+        if self._clients:
+            await asyncio.gather(*self._clients, return_exceptions=True)
+        if self._sock:
+            self._sock.close()
+            self._sock = None
+            logger.info("Shared public listener stopped")
+    
+    async def _accept_loop(self) -> None:
+        """Accept connections and route each in its own task."""
+        loop = asyncio.get_running_loop()
+        while True:
+            try:
+                sock, _ = await loop.sock_accept(self._sock)
+            except OSError as e:
+                # E.g. out of file descriptors; keep the listener alive
+                logger.error(f"Failed to accept connection: {e}")
+                await asyncio.sleep(0.1)
+                continue
+            sock.setblocking(False)
+            task = asyncio.create_task(self._handle_client(sock))
+            self._clients.add(task)
+            task.add_done_callback(self._client_done)
+    
+    def _client_done(self, task: asyncio.Task) -> None:
+        self._clients.discard(task)
+        if not task.cancelled() and task.exception():
+            logger.error(f"Error routing shared port connection: {task.exception()}")
+    
+    async def _handle_client(self, sock: socket.socket) -> None:
+        """Route one connection by the host name in its first bytes."""
+        try:
+            hostname = await self._peek_hostname(sock)
+        except asyncio.CancelledError:
+            sock.close()
+            raise
+        except Exception as e:
+            logger.debug(f"Failed to read host name: {e}")
+            hostname = ''
+        if not hostname:
+            logger.debug("Closing shared port connection without host name")
+            sock.close()
+            return
+        
+        writer = None
+        try:
+            reader, writer = await asyncio.open_connection(sock=sock)
+            await self._connection_handler(hostname, reader, writer)
+        except Exception as e:
+            logger.error(f"Error handling external connection: {e}", exc_info=True)
+        finally:
+            if writer is None:
+                sock.close()
+            else:
+                try:
+                    writer.close()
+                    await writer.wait_closed()
+                except Exception:
+                    pass
+    
+    async def _peek_hostname(self, sock: socket.socket) -> str:
+        """Peek at the first bytes of a connection until they name a host."""
+        retry_interval = PEEK_RETRY_INTERVAL
+        low_water = 1
+        try:
+            async with self._timers.timeout(self._peek_timeout):
+                while True:
+                    await self._wait_readable(sock)
+                    data = sock.recv(MAX_PEEK, socket.MSG_PEEK)
+                    if not data:
+                        return ''
+                    hostname = sniff_hostname(data)
+                    if hostname is not None:
+                        return hostname
+                    if len(data) < low_water:
+                        # Readable below the mark: the peer closed its side
+                        return ''
+                    # Wake up once the rest of the request has started to arrive
+                    if self._set_low_water(sock, len(data) + 1):
+                        low_water = len(data) + 1
+                    else:
+                        await asyncio.sleep(retry_interval)
+                        retry_interval = min(retry_interval * 2, MAX_PEEK_RETRY_INTERVAL)
+        except TimeoutError:
+            return ''
+        finally:
+            if low_water > 1:
+                self._set_low_water(sock, 1)
+    
+    @staticmethod
+    def _set_low_water(sock: socket.socket, size: int) -> bool:
+        """Set the bytes a socket must hold to count as readable; False where unsupported."""
+        try:
+            sock.setsockopt(socket.SOL_SOCKET, socket.SO_RCVLOWAT, size)
+        except (AttributeError, OSError):
+            return False
+        return True
+    
+    @staticmethod
+    async def _wait_readable(sock: socket.socket) -> None:
+        """Wait until the socket has data or is closed by the peer."""
+        loop = asyncio.get_running_loop()
+        readable = loop.create_future()
+        loop.add_reader(sock.fileno(), lambda: readable.done() or readable.set_result(None))
+        try:
+            await readable
+        finally:
+            loop.remove_reader(sock.fileno())
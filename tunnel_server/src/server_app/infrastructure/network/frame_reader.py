@@ -0,0 +1,304 @@
+"""Frame readers for the control connection."""
+
+import asyncio
+import logging
+from abc import ABC, abstractmethod
+from collections import deque
+from typing import Awaitable, Callable, Optional
+
+from ...common.protocol import ProtocolCodec
+from ...common.read_size import AdaptiveReadSize, CONTROL_MAX_READ_SIZE
+
+logger = logging.getLogger(__name__)
+
+# Control connection transports
+STREAM_TRANSPORT = 'stream'  # StreamReader.read() loop
+BUFFERED_TRANSPORT = 'buffered'  # asyncio.BufferedProtocol, frames decoded in place
+CONTROL_TRANSPORTS = (STREAM_TRANSPORT, BUFFERED_TRANSPORT)
+
+Frame = tuple[int, int, memoryview]
+
+# Receives each batch of decoded frames. Returns None when the batch was
+# handled synchronously, or an awaitable that finishes handling it; no
+# further frames are delivered until that awaitable completes.
+FrameHandler = Callable[[list[Frame]], Optional[Awaitable[None]]]
+
+
+class FrameReader(ABC):
+    """
+    Receiving side of a control connection.
+    
+    During the handshake frames are pulled one at a time with read_frame(),
+    so the header format can still be switched between two frames. After
+    that a frame handler is installed and every following frame is pushed
+    to it in batches.
+    
+    Reading can be paused from outside, e.g. while a stream carried by the
+    connection has too much data queued for its peer. Pauses nest: reading
+    resumes when every pause_reading() has been matched by resume_reading().
+    """
+    
+    def __init__(self, codec: ProtocolCodec):
+        self.codec = codec
+        self._pauses = 0
+    
+    @property
+    def reading_paused(self) -> bool:
+        """Whether reading is paused from outside."""
+        return self._pauses > 0
+    
+    def pause_reading(self) -> None:
+        """Stop reading from the connection until resume_reading()."""
+        self._pauses += 1
+        if self._pauses == 1:
+            self._set_reading(False)
+    
+    def resume_reading(self) -> None:
+        """Undo one pause_reading()."""
+        if not self._pauses:
+            return
+        self._pauses -= 1
+        if not self._pauses:
+            self._set_reading(True)
+    
+    @abstractmethod
+    def _set_reading(self, reading: bool) -> None:
+        """Pause or resume reading from the transport."""
+        pass
+    
+    @abstractmethod
+    async def read_frame(self) -> Optional[tuple[int, int, bytes]]:
+        """Wait for the next frame; None if the connection was closed first."""
+        pass
+    
+    @abstractmethod
+    def set_frame_handler(self, handler: FrameHandler) -> None:
+        """Deliver all following frames to the handler."""
+        pass
+    
+    @abstractmethod
+    async def wait_closed(self) -> None:
+        """
+        Wait until the connection is closed and all frames are handled.
+        
+        Raises:
+            The exception that ended the connection, if any
+        """
+        pass
+
+
+class StreamFrameReader(FrameReader):
+    """Frame reader on top of an asyncio.StreamReader."""
+    
+    def __init__(self, reader: asyncio.StreamReader, codec: ProtocolCodec):
+        super().__init__(codec)
+        self._reader = reader
+        self._read_size = AdaptiveReadSize(CONTROL_MAX_READ_SIZE)
+        self._task: Optional[asyncio.Task] = None
+        self._reading = asyncio.Event()
+        self._reading.set()
+    
+    async def read_frame(self) -> Optional[tuple[int, int, bytes]]:
+        """Wait for the next frame; None if the connection was closed first."""
+        while True:
+            frame = self.codec.decode_frame()
+            if frame:
+                return frame
+            if not await self._read():
+                return None
+    
+    def set_frame_handler(self, handler: FrameHandler) -> None:
+        """Start reading frames into the handler."""
+        self._task = asyncio.create_task(self._run(handler))
+    
+    async def wait_closed(self) -> None:
+        """Wait until the connection is closed and all frames are handled."""
+        if self._task:
+            await self._task
+    
+    def _set_reading(self, reading: bool) -> None:
+        # The StreamReader pauses the transport itself once its buffer fills
+        if reading:
+            self._reading.set()
+        else:
+            self._reading.clear()
+    
+    async def _read(self) -> bool:
+        """Read the next chunk into the codec; False at EOF."""
+        data = await self._reader.read(self._read_size.size)
+        if not data:
+            return False
+        self._read_size.update(len(data))
+        self.codec.feed(data)
+        return True
+    
+    async def _run(self, handler: FrameHandler) -> None:
+        """Hand buffered and newly read frames to the handler until EOF."""
+        while True:
+            # A read in flight when reading is paused is held back here
+            await self._reading.wait()
+            frames = self.codec.decode_frames()
+            if frames:
+                result = handler(frames)
+                if result is not None:
+                    await result
+            if not await self._read():
+                return
+
+
+class BufferedFrameReader(FrameReader, asyncio.streams.FlowControlMixin, asyncio.BufferedProtocol):
+    """
+    Frame reader implemented as an asyncio.BufferedProtocol.
+    
+    The transport receives straight into the free space of the codec's
+    frame buffer, and complete frames are handed to the frame handler from
+    buffer_updated(), without a StreamReader copy or a coroutine hop per
+    read. While the handler finishes a batch asynchronously, reading is
+    paused and newly decoded frames are held back, so frames are handled
+    strictly in order.
+    
+    The sending side is a regular asyncio.StreamWriter (`writer`).
+    """
+    
+    def __init__(
+        self,
+        codec: ProtocolCodec,
+        on_connection: Optional[Callable[['BufferedFrameReader'], None]] = None
+    ):
+        FrameReader.__init__(self, codec)
+        asyncio.streams.FlowControlMixin.__init__(self)
+        self.writer: Optional[asyncio.StreamWriter] = None
+        self._on_connection = on_connection
+        self._transport: Optional[asyncio.Transport] = None
+        self._handler: Optional[FrameHandler] = None
+        self._pending: deque[Frame] = deque()
+        self._busy: Optional[asyncio.Future] = None
+        self._waiter: Optional[asyncio.Future] = None
+        self._eof = False
+        self._error: Optional[BaseException] = None
+        self._connection_closed = self._loop.create_future()
+        self._done = self._loop.create_future()
+    
+    # asyncio.BufferedProtocol
+    
+    def connection_made(self, transport: asyncio.Transport) -> None:
+        self._transport = transport
+        self.writer = asyncio.StreamWriter(transport, self, None, self._loop)
+        if self._on_connection:
+            self._on_connection(self)
+    
+    def get_buffer(self, sizehint: int) -> memoryview:
+        return self.codec.get_buffer(sizehint)
+    
+    def buffer_updated(self, nbytes: int) -> None:
+        self.codec.buffer_updated(nbytes)
+        if self._handler is None:
+            self._wake_waiter()
+            return
+        try:
+            self._pending.extend(self.codec.decode_frames())
+        except Exception as e:
+            self._fail(e)
+            return
+        self._deliver()
+    
+    def eof_received(self) -> None:
+        # Returning None closes the transport
+        self._eof = True
+    
+    def connection_lost(self, exc: Optional[Exception]) -> None:
+        super().connection_lost(exc)
+        self._eof = True
+        if exc and not self._error:
+            self._error = exc
+        if not self._connection_closed.done():
+            self._connection_closed.set_result(None)
+        self._wake_waiter()
+        self._deliver()
+    
+    def _get_close_waiter(self, stream: asyncio.StreamWriter) -> asyncio.Future:
+        # Used by StreamWriter.wait_closed()
+        return self._connection_closed
+    
+    # FrameReader
+    
+    async def read_frame(self) -> Optional[tuple[int, int, bytes]]:
+        """Wait for the next frame; None if the connection was closed first."""
+        while True:
+            frame = self.codec.decode_frame()
+            if frame:
+                return frame
+            if self._eof:
+                return None
+            self._waiter = self._loop.create_future()
+            try:
+                await self._waiter
+            finally:
+                self._waiter = None
+    
+    def set_frame_handler(self, handler: FrameHandler) -> None:
+        """Deliver buffered and all following frames to the handler."""
+        self._handler = handler
+        self._pending.extend(self.codec.decode_frames())
+        self._deliver()
+    
+    async def wait_closed(self) -> None:
+        """Wait until the connection is closed and all frames are handled."""
+        await self._done
+        if self._error:
+            raise self._error
+    
+    def _set_reading(self, reading: bool) -> None:
+        if not self._transport or self._transport.is_closing():
+            return
+        if not reading:
+            self._transport.pause_reading()
+        elif self._busy is None:
+            # Otherwise reading resumes when the handler is done
+            self._transport.resume_reading()
+    
+    def _wake_waiter(self) -> None:
+        if self._waiter and not self._waiter.done():
+            self._waiter.set_result(None)
+    
+    def _deliver(self) -> None:
+        """Hand pending frames to the handler unless it is still busy."""
+        if self._handler is None or self._done.done():
+            return
+        while self._pending and self._busy is None:
+            frames = list(self._pending)
+            self._pending.clear()
+            try:
+                result = self._handler(frames)
+            except Exception as e:
+                self._fail(e)
+                return
+            if result is not None:
+                self._busy = asyncio.ensure_future(result)
+                self._busy.add_done_callback(self._handler_done)
+                if not self._transport.is_closing():
+                    self._transport.pause_reading()
+        if self._busy is None and self._eof:
+            self._done.set_result(None)
+    
+    def _handler_done(self, future: asyncio.Future) -> None:
+        self._busy = None
+        if future.cancelled():
+            self._fail(ConnectionAbortedError("Frame handler was cancelled"))
+            return
+        if future.exception():
+            self._fail(future.exception())
+            return
+        if not self._transport.is_closing() and not self.reading_paused:
+            self._transport.resume_reading()
+        self._deliver()
+    
+    def _fail(self, exc: BaseException) -> None:
+        """Stop handling frames and close the connection."""
+        logger.debug(f"Frame handling failed: {exc}")
+        self._error = exc
+        self._pending.clear()
+        self._transport.close()
+        if not self._done.done():
+            self._done.set_result(None)
+
@@ -1,53 +1,116 @@
 """In-memory agent registry."""
 
-import asyncio
 import logging
-from typing import Optional, Dict
+from typing import AsyncIterator, Optional, Dict, Set
 
 from ...interfaces.agent_repository import IAgentRepository
 from ...domain.entities.agent_session import AgentSession
+from ...domain.entities.traffic_counters import TrafficCounters
 
 logger = logging.getLogger(__name__)
 
+DEFAULT_SHARDS = 64
+
 
 class InMemoryAgentRegistry(IAgentRepository):
-    """In-memory implementation of agent repository."""
+    """
+    In-memory implementation of agent repository.
+    
+    Sessions are spread over `shards` dicts by agent ID, so iterate()
+    copies one shard at a time instead of the whole fleet, and no single
+    dict resize has to move every session. Secondary indexes (public port,
+    host name, remote address) and the traffic totals are maintained on
+    save() and remove(), so lookups and get_stats() are O(1).
+    
+    No method awaits, so every call runs to completion on the event loop
+    without interleaving with others and needs no lock.
+    """
     
-    def __init__(self):
-        self._sessions: Dict[str, AgentSession] = {}
-        self._port_to_agent: Dict[int, str] = {}
-        self._lock = asyncio.Lock()
+    def __init__(self, shards: int = DEFAULT_SHARDS):
+        if shards <= 0:
+            raise ValueError("shards must be positive")
+        self._shards: list[Dict[str, AgentSession]] = [{} for _ in range(shards)]
+        self._count = 0
+        self._port_to_agent: Dict[int, AgentSession] = {}
+        self._hostname_to_agent: Dict[str, AgentSession] = {}
+        self._remote_to_agents: Dict[str, Set[str]] = {}
+        self._totals = TrafficCounters()
+    
+    def _shard(self, agent_id: str) -> Dict[str, AgentSession]:
+        return self._shards[hash(agent_id) % len(self._shards)]
     
     async def save(self, session: AgentSession) -> None:
         """Save an agent session."""
-        async with self._lock:
-            self._sessions[session.agent_id] = session
-            self._port_to_agent[session.public_port] = session.agent_id
-            logger.debug(f"Saved agent session: {session.agent_id} on port {session.public_port}")
+        shard = self._shard(session.agent_id)
+        previous = shard.get(session.agent_id)
+        if previous is not None:
+            self._unindex(previous)
+        else:
+            self._count += 1
+        shard[session.agent_id] = session
+        
+        if session.hostname:
+            # Named sessions share the public port
+            self._hostname_to_agent[session.hostname] = session
+        else:
+            self._port_to_agent[session.public_port] = session
+        if session.remote_host:
+            self._remote_to_agents.setdefault(session.remote_host, set()).add(session.agent_id)
+        session.counters.attach(self._totals)
+        logger.debug(f"Saved agent session: {session.agent_id} on port {session.public_port}")
     
     async def get_by_id(self, agent_id: str) -> Optional[AgentSession]:
         """Get an agent session by ID."""
-        async with self._lock:
-            return self._sessions.get(agent_id)
+        return self._shard(agent_id).get(agent_id)
     
     async def get_by_port(self, public_port: int) -> Optional[AgentSession]:
         """Get an agent session by public port."""
-        async with self._lock:
-            agent_id = self._port_to_agent.get(public_port)
-            if agent_id:
-                return self._sessions.get(agent_id)
-            return None
+        return self._port_to_agent.get(public_port)
+    
+    async def get_by_hostname(self, hostname: str) -> Optional[AgentSession]:
+        """Get an agent session by its virtual host name."""
+        return self._hostname_to_agent.get(hostname)
+    
+    async def get_by_remote_host(self, remote_host: str) -> list[AgentSession]:
+        """Get the agent sessions connected from an address."""
+        return [
+            self._shard(agent_id)[agent_id]
+            for agent_id in self._remote_to_agents.get(remote_host, ())
+        ]
     
     async def remove(self, agent_id: str) -> None:
         """Remove an agent session."""
-        async with self._lock:
-            session = self._sessions.pop(agent_id, None)
-            if session:
-                self._port_to_agent.pop(session.public_port, None)
-                logger.debug(f"Removed agent session: {agent_id}")
+        session = self._shard(agent_id).pop(agent_id, None)
+        if session:
+            self._count -= 1
+            self._unindex(session)
+            logger.debug(f"Removed agent session: {agent_id}")
     
     async def get_all(self) -> list[AgentSession]:
         """Get all agent sessions."""
-        async with self._lock:
-            return list(self._sessions.values())
-
+        return [session for shard in self._shards for session in shard.values()]
+    
+    async def iterate(self) -> AsyncIterator[AgentSession]:
+        """Iterate over all agent sessions, copying one shard at a time."""
+        for shard in self._shards:
+            for agent_id, session in list(shard.items()):
+                # Skip sessions removed while the caller was busy
+                if shard.get(agent_id) is session:
+                    yield session
+    
+    def get_stats(self) -> dict:
+        """Get the number of agents and their total streams and bytes."""
+        return {'agents': self._count, **self._totals.as_dict()}
+    
+    def _unindex(self, session: AgentSession) -> None:
+        """Drop a session from the secondary indexes and totals."""
+        if self._hostname_to_agent.get(session.hostname) is session:
+            del self._hostname_to_agent[session.hostname]
+        if self._port_to_agent.get(session.public_port) is session:
+            del self._port_to_agent[session.public_port]
+        agents = self._remote_to_agents.get(session.remote_host)
+        if agents is not None:
+            agents.discard(session.agent_id)
+            if not agents:
+                del self._remote_to_agents[session.remote_host]
+        session.counters.detach()
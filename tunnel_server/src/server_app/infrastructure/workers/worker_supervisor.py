@@ -0,0 +1,229 @@
+"""Supervisor of forked server worker processes."""
+
+import logging
+import multiprocessing
+import os
+import signal
+import time
+from dataclasses import dataclass
+from multiprocessing.connection import Connection, wait
+from typing import Any, Callable, Optional
+
+logger = logging.getLogger(__name__)
+
+# Worker commands sent over the control pipe
+CMD_STATS = 'stats'
+
+# Delay before restarting a worker, doubled for every crash in a row
+RESTART_DELAY = 0.5
+MAX_RESTART_DELAY = 30.0
+# A worker that ran this long is considered healthy again
+STABLE_UPTIME = 60.0
+
+# Worker entry point: (worker config, command pipe); the supervisor pins
+# the process to its CPU before calling it
+WorkerTarget = Callable[[Any, Connection], None]
+
+
+@dataclass
+class _Worker:
+    index: int
+    config: Any
+    cpu: Optional[int] = None
+    process: Optional[multiprocessing.Process] = None
+    conn: Optional[Connection] = None
+    started_at: float = 0.0
+    restarts: int = 0
+    crashes_in_row: int = 0
+    restart_at: Optional[float] = None
+
+
+def cpus_for_workers(workers: int) -> list[Optional[int]]:
+    """CPUs to pin workers to, round-robin over the CPUs this process may use."""
+    if not hasattr(os, 'sched_getaffinity'):
+        return [None] * workers
+    cpus = sorted(os.sched_getaffinity(0))
+    return [cpus[index % len(cpus)] for index in range(workers)]
+
+
+def pin_to_cpu(cpu: Optional[int]) -> None:
+    """Restrict the calling process to one CPU; no-op where unsupported."""
+    if cpu is None or not hasattr(os, 'sched_setaffinity'):
+        return
+    try:
+        os.sched_setaffinity(0, {cpu})
+    except OSError as e:
+        logger.warning(f"Failed to pin worker to CPU {cpu}: {e}")
+
+
+class WorkerSupervisor:
+    """
+    Runs server workers as forked processes and restarts them when they die.
+    
+    Every worker gets its own config (e.g. its part of the public port
+    range) and a pipe over which the supervisor requests its statistics.
+    Workers are started with the fork start method, so they share nothing
+    with the supervisor but the listening sockets they create themselves.
+    """
+    
+    def __init__(
+        self,
+        target: WorkerTarget,
+        configs: list,
+        cpus: Optional[list[Optional[int]]] = None
+    ):
+        self._target = target
+        self._context = multiprocessing.get_context('fork')
+        self._workers = [
+            _Worker(index, config, cpus[index] if cpus else None)
+            for index, config in enumerate(configs)
+        ]
+        self._running = False
+    
+    @property
+    def running(self) -> bool:
+        return self._running
+    
+    def start(self) -> None:
+        """Start all workers."""
+        self._running = True
+        for worker in self._workers:
+            self._spawn(worker)
+    
+    def poll(self, timeout: float = 1.0) -> None:
+        """Wait up to `timeout` for a worker to exit and restart exited workers when due."""
+        sentinels = [w.process.sentinel for w in self._workers if w.process]
+        if sentinels:
+            wait(sentinels, timeout)
+        elif timeout:
+            time.sleep(timeout)
+        if not self._running:
+            return
+        
+        now = time.monotonic()
+        for worker in self._workers:
+            if worker.process and not worker.process.is_alive():
+                self._reap(worker, now)
+            if worker.process is None and worker.restart_at is not None and now >= worker.restart_at:
+                worker.restarts += 1
+                self._spawn(worker)
+    
+    def get_stats(self, timeout: float = 2.0) -> dict:
+        """
+        Collect statistics of all workers.
+        
+        Returns:
+            'workers' with per-worker process state and 'agents' with the
+            agents of all workers, each tagged with its worker index
+        """
+        workers = []
+        agents = []
+        for worker in self._workers:
+            stats = self._request(worker, CMD_STATS, timeout)
+            worker_agents = stats.get('agents', []) if stats else []
+            for agent in worker_agents:
+                agents.append(dict(agent, worker=worker.index))
+            # Workers report O(1) totals; fall back to summing their agents
+            totals = stats.get('totals') if stats else None
+            if not totals:
+                totals = {
+                    'agents': len(worker_agents),
+                    'streams': sum(agent.get('connections', 0) for agent in worker_agents),
+                }
+            workers.append({
+                'index': worker.index,
+                'pid': worker.process.pid if worker.process else None,
+                'alive': bool(worker.process and worker.process.is_alive()),
+                'restarts': worker.restarts,
+                'cpu': worker.cpu,
+                'port_min': getattr(worker.config, 'port_min', None),
+                'port_max': getattr(worker.config, 'port_max', None),
+                'agents': totals['agents'],
+                'connections': totals['streams'],
+            })
+        return {'workers': workers, 'agents': agents}
+    
+    def stop(self, timeout: float = 10.0) -> None:
+        """Ask all workers to shut down; kill those that do not exit in time."""
+        self._running = False
+        for worker in self._workers:
+            if worker.process and worker.process.is_alive():
+                worker.process.terminate()
+        deadline = time.monotonic() + timeout
+        for worker in self._workers:
+            if not worker.process:
+                continue
+            worker.process.join(max(0.0, deadline - time.monotonic()))
+            if worker.process.is_alive():
+                logger.warning(f"Worker {worker.index} did not stop, killing it")
+                worker.process.kill()
+                worker.process.join()
+            self._close(worker)
+        logger.info("All workers stopped")
+    
+    def _spawn(self, worker: _Worker) -> None:
+        parent_conn, child_conn = self._context.Pipe()
+        process = self._context.Process(
+            target=_run_worker,
+            args=(self._target, worker.config, child_conn, worker.cpu),
+            name=f"tunnel-worker-{worker.index}",
+            daemon=False
+        )
+        process.start()
+        child_conn.close()
+        worker.process = process
+        worker.conn = parent_conn
+        worker.started_at = time.monotonic()
+        worker.restart_at = None
+        logger.info(
+            f"Started worker {worker.index} (pid {process.pid}"
+            f"{f', cpu {worker.cpu}' if worker.cpu is not None else ''})"
+        )
+    
+    def _reap(self, worker: _Worker, now: float) -> None:
+        """Schedule the restart of a worker that exited."""
+        exitcode = worker.process.exitcode
+        uptime = now - worker.started_at
+        self._close(worker)
+        worker.process = None
+        if uptime >= STABLE_UPTIME:
+            worker.crashes_in_row = 0
+        delay = min(RESTART_DELAY * 2 ** worker.crashes_in_row, MAX_RESTART_DELAY)
+        worker.crashes_in_row += 1
+        worker.restart_at = now + delay
+        logger.error(
+            f"Worker {worker.index} exited with code {exitcode} after {uptime:.1f}s, "
+            f"restarting in {delay:.1f}s"
+        )
+    
+    def _request(self, worker: _Worker, command: str, timeout: float) -> Optional[Any]:
+        """Send a command to a worker and wait for its reply."""
+        if not worker.conn or not worker.process or not worker.process.is_alive():
+            return None
+        try:
+            # Drop a late answer to an earlier request
+            while worker.conn.poll():
+                worker.conn.recv()
+            worker.conn.send(command)
+            if worker.conn.poll(timeout):
+                return worker.conn.recv()
+            logger.warning(f"Worker {worker.index} did not answer {command!r}")
+        except (OSError, EOFError) as e:
+            logger.debug(f"Worker {worker.index} pipe failed: {e}")
+        return None
+    
+    @staticmethod
+    def _close(worker: _Worker) -> None:
+        if worker.conn:
+            worker.conn.close()
+            worker.conn = None
+
+
+def _run_worker(target: WorkerTarget, config, conn: Connection, cpu: Optional[int]) -> None:
+    """Entry point of a worker process."""
+    # The supervisor's handlers must not run in the worker
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    signal.signal(signal.SIGTERM, signal.SIG_DFL)
+    pin_to_cpu(cpu)
+    target(config, conn)
+
@@ -1,7 +1,7 @@
 """Agent repository interface."""
 
 from abc import ABC, abstractmethod
-from typing import Optional
+from typing import AsyncIterator, Optional
 
 from ..domain.entities.agent_session import AgentSession
 
@@ -24,6 +24,16 @@ class IAgentRepository(ABC):
         """Get an agent session by public port."""
         pass
     
+    @abstractmethod
+    async def get_by_hostname(self, hostname: str) -> Optional[AgentSession]:
+        """Get an agent session by its virtual host name."""
+        pass
+    
+    @abstractmethod
+    async def get_by_remote_host(self, remote_host: str) -> list[AgentSession]:
+        """Get the agent sessions connected from an address."""
+        pass
+    
     @abstractmethod
     async def remove(self, agent_id: str) -> None:
         """Remove an agent session."""
@@ -33,4 +43,19 @@ class IAgentRepository(ABC):
     async def get_all(self) -> list[AgentSession]:
         """Get all agent sessions."""
         pass
+    
+    @abstractmethod
+    def iterate(self) -> AsyncIterator[AgentSession]:
+        """
+        Iterate over all agent sessions without copying the whole registry.
+        
+        Sessions may be saved and removed while iterating; a session
+        removed before it is reached is skipped.
+        """
+        pass
+    
+    @abstractmethod
+    def get_stats(self) -> dict:
+        """Get the number of agents and their total streams and bytes."""
+        pass
 
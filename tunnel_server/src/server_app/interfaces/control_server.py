@@ -8,8 +8,13 @@ class IControlServer(ABC):
     """Interface for control server."""
     
     @abstractmethod
-    async def start(self, host: str, port: int) -> None:
-        """Start the control server."""
+    async def start(self, host: str, port: int, reuse_port: bool = False) -> None:
+        """
+        Start the control server.
+        
+        Args:
+            reuse_port: Bind with SO_REUSEPORT, so several processes share the port
+        """
         pass
     
     @abstractmethod
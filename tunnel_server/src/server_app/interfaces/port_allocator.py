@@ -1,14 +1,21 @@
 """Port allocator interface."""
 
 from abc import ABC, abstractmethod
+from typing import Optional
 
 
 class IPortAllocator(ABC):
     """Interface for port allocation."""
     
     @abstractmethod
-    async def allocate(self) -> int:
-        """Allocate a port. Raises PortAllocationError if none available."""
+    async def allocate(self, identity: Optional[str] = None) -> int:
+        """
+        Allocate a port. Raises PortAllocationError if none available.
+        
+        Args:
+            identity: Stable key of the agent; it gets its previous port
+                back when that port is free
+        """
         pass
     
     @abstractmethod
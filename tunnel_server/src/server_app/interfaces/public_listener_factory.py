@@ -11,11 +11,17 @@ class IPublicListenerFactory(ABC):
     async def create_listener(
         self,
         port: int,
-        connection_handler: Callable[[object, object], Awaitable[None]]
+        connection_handler: Callable[[object, object], Awaitable[None]],
+        start_serving: bool = True
     ) -> object:
         """
         Create a listener on the given port.
         
+        Args:
+            start_serving: Accept connections right away. Otherwise the
+                port is bound and connections queue in the backlog until
+                the listener's start_serving() is called.
+        
         Returns:
             A listener object that can be closed.
         """
@@ -4,8 +4,10 @@ import asyncio
 import logging
 import signal
 import sys
+import time
+from dataclasses import replace
 from pathlib import Path
-from typing import Optional
+from typing import Awaitable, Optional
 
 # Add src directory to path for direct execution
 # This allows running the script directly: python main.py
@@ -25,28 +27,74 @@ except ImportError:
 try:
     from ..infrastructure.logging.logging_adapter import setup_logging
     from ..infrastructure.network.asyncio_control_server import AsyncioControlServer
+    from ..infrastructure.network.frame_reader import FrameReader
     from ..infrastructure.network.asyncio_public_listener import AsyncioPublicListenerFactory
-    from ..infrastructure.allocators.range_port_allocator import RangePortAllocator
+    from ..infrastructure.network.asyncio_virtual_host_listener import AsyncioVirtualHostListener
+    from ..infrastructure.allocators.range_port_allocator import RangePortAllocator, partition_port_range
+    from ..infrastructure.workers.worker_supervisor import WorkerSupervisor, CMD_STATS, cpus_for_workers
     from ..infrastructure.persistence.in_memory_registry import InMemoryAgentRegistry
     from ..application.usecases.register_agent_usecase import RegisterAgentUseCase
     from ..application.usecases.open_external_connection_usecase import OpenExternalConnectionUseCase
     from ..application.usecases.relay_data_usecase import RelayDataUseCase
     from ..application.usecases.close_connection_usecase import CloseConnectionUseCase
+    from ..application.usecases.resume_session_usecase import ResumeSessionUseCase
     from ..common.protocol import ProtocolCodec
-    from ..common.framing import HELLO, DATA, CLOSE
+    from ..common.write_scheduler import WriteScheduler, PRIORITY_NORMAL
+    from ..common.compression import available_codecs
+    from ..common.read_size import AdaptiveReadSize
+    from ..common.heartbeat import Heartbeat
+    from ..common.timer_wheel import TimerWheel, IdleTimeout
+    from ..common.admission import AdmissionController
+    from ..common.rate_limit import BandwidthShaper
+    from ..common.handshake import (
+        Handshake,
+        PROTOCOL_VERSION,
+        CAP_FLOW_CONTROL,
+        CAP_COMPRESSION,
+        CAP_COMPACT_HEADER,
+        CAP_STRIPING,
+        CAP_RESUME,
+        CAP_HEARTBEAT
+    )
+    from ..common.framing import (
+        HELLO, DATA, CLOSE, WINDOW_UPDATE, RESUME, PING, PONG, TYPE_MASK, FLAG_COMPRESSED
+    )
     from ..common.errors import AuthenticationError, ProtocolError
 except ImportError:
     from server_app.infrastructure.logging.logging_adapter import setup_logging
     from server_app.infrastructure.network.asyncio_control_server import AsyncioControlServer
+    from server_app.infrastructure.network.frame_reader import FrameReader
     from server_app.infrastructure.network.asyncio_public_listener import AsyncioPublicListenerFactory
-    from server_app.infrastructure.allocators.range_port_allocator import RangePortAllocator
+    from server_app.infrastructure.network.asyncio_virtual_host_listener import AsyncioVirtualHostListener
+    from server_app.infrastructure.allocators.range_port_allocator import RangePortAllocator, partition_port_range
+    from server_app.infrastructure.workers.worker_supervisor import WorkerSupervisor, CMD_STATS, cpus_for_workers
     from server_app.infrastructure.persistence.in_memory_registry import InMemoryAgentRegistry
     from server_app.application.usecases.register_agent_usecase import RegisterAgentUseCase
     from server_app.application.usecases.open_external_connection_usecase import OpenExternalConnectionUseCase
     from server_app.application.usecases.relay_data_usecase import RelayDataUseCase
     from server_app.application.usecases.close_connection_usecase import CloseConnectionUseCase
+    from server_app.application.usecases.resume_session_usecase import ResumeSessionUseCase
     from server_app.common.protocol import ProtocolCodec
-    from server_app.common.framing import HELLO, DATA, CLOSE
+    from server_app.common.write_scheduler import WriteScheduler, PRIORITY_NORMAL
+    from server_app.common.compression import available_codecs
+    from server_app.common.read_size import AdaptiveReadSize
+    from server_app.common.heartbeat import Heartbeat
+    from server_app.common.timer_wheel import TimerWheel, IdleTimeout
+    from server_app.common.admission import AdmissionController
+    from server_app.common.rate_limit import BandwidthShaper
+    from server_app.common.handshake import (
+        Handshake,
+        PROTOCOL_VERSION,
+        CAP_FLOW_CONTROL,
+        CAP_COMPRESSION,
+        CAP_COMPACT_HEADER,
+        CAP_STRIPING,
+        CAP_RESUME,
+        CAP_HEARTBEAT
+    )
+    from server_app.common.framing import (
+        HELLO, DATA, CLOSE, WINDOW_UPDATE, RESUME, PING, PONG, TYPE_MASK, FLAG_COMPRESSED
+    )
     from server_app.common.errors import AuthenticationError, ProtocolError
 
 logger = logging.getLogger(__name__)
@@ -57,26 +105,99 @@ class TunnelServer:
     
     def __init__(self, config):
         self._config = config
-        self._control_server = AsyncioControlServer()
+        # Handshake, idle and host name timeouts of all connections
+        self._timers = TimerWheel()
+        self._control_server = AsyncioControlServer(config.control_transport)
         self._public_listener_factory = AsyncioPublicListenerFactory()
-        self._port_allocator = RangePortAllocator(config.port_min, config.port_max)
+        # Shared public port routing by HTTP Host / TLS SNI, if enabled
+        self._virtual_host_listener = (
+            AsyncioVirtualHostListener(config.vhost_peek_timeout, self._timers)
+            if config.vhost_port else None
+        )
+        self._port_allocator = RangePortAllocator(
+            config.port_min, config.port_max, cooldown=config.port_cooldown
+        )
         self._agent_repository = InMemoryAgentRegistry()
+        self._shaper = BandwidthShaper(
+            agent_ingress=config.agent_ingress_rate,
+            agent_egress=config.agent_egress_rate,
+            agent_burst=config.agent_rate_burst,
+            total_ingress=config.total_ingress_rate,
+            total_egress=config.total_egress_rate,
+            total_burst=config.total_rate_burst
+        )
         
         # Use cases
         self._register_agent_uc = RegisterAgentUseCase(
             self._agent_repository,
             self._port_allocator,
             self._public_listener_factory,
-            config.token
+            config.token,
+            handshake=self._server_handshake(config),
+            shared_port=config.vhost_port,
+            shaper=self._shaper
+        )
+        self._admission = AdmissionController(
+            port_rate=config.accept_rate,
+            port_burst=config.accept_burst,
+            global_rate=config.global_accept_rate,
+            global_burst=config.global_accept_burst,
+            queue_timeout=config.accept_queue_timeout,
+            queue_size=config.accept_queue_size
+        )
+        self._open_external_uc = OpenExternalConnectionUseCase(
+            self._agent_repository,
+            self._admission,
+            max_streams=config.max_streams,
+            backlog=config.stream_backlog,
+            backlog_timeout=config.stream_backlog_timeout,
+            timers=self._timers
+        )
+        # Sending is held back at the queue size and resumed at a quarter of it
+        self._relay_data_uc = RelayDataUseCase(
+            high_water=config.send_queue_size,
+            low_water=config.send_queue_size // 4
         )
-        self._open_external_uc = OpenExternalConnectionUseCase(self._agent_repository)
-        self._relay_data_uc = RelayDataUseCase(self._agent_repository)
         self._close_connection_uc = CloseConnectionUseCase(
             self._agent_repository,
-            self._port_allocator
+            self._port_allocator,
+            resume_grace=config.resume_grace
+        )
+        self._resume_session_uc = ResumeSessionUseCase(
+            self._agent_repository,
+            self._close_connection_uc,
+            config.token
         )
         
         self._running = False
+        # Closes of idle external connections in progress
+        self._idle_closes: set[asyncio.Task] = set()
+    
+    @staticmethod
+    def _server_handshake(config) -> Handshake:
+        """Protocol features this server offers to agents."""
+        capabilities = CAP_FLOW_CONTROL
+        if config.compact_header:
+            capabilities |= CAP_COMPACT_HEADER
+        if config.compression:
+            capabilities |= CAP_COMPRESSION
+        if config.max_stripes > 1:
+            capabilities |= CAP_STRIPING
+        if config.resume_grace > 0:
+            capabilities |= CAP_RESUME
+        if config.heartbeat_interval > 0:
+            capabilities |= CAP_HEARTBEAT
+        return Handshake(
+            version=PROTOCOL_VERSION,
+            capabilities=capabilities,
+            max_frame=config.max_frame,
+            window_size=config.window_size,
+            keepalive=config.heartbeat_interval,
+            compression=available_codecs() if config.compression else [],
+            stripes=config.max_stripes,
+            resume_grace=config.resume_grace,
+            max_streams=config.max_streams
+        )
     
     async def start(self) -> None:
         """Start the server."""
@@ -86,74 +207,178 @@ class TunnelServer:
         self._control_server.set_connection_handler(self._handle_control_connection)
         
         # Start control server
-        await self._control_server.start(self._config.bind, self._config.control_port)
+        await self._control_server.start(
+            self._config.bind, self._config.control_port, reuse_port=self._config.reuse_port
+        )
+        if self._virtual_host_listener:
+            await self._virtual_host_listener.start(
+                self._config.bind, self._config.vhost_port, self._handle_virtual_host_connection
+            )
         
         logger.info(
             f"Tunnel server started: "
             f"control={self._config.bind}:{self._config.control_port}, "
             f"port range=[{self._config.port_min}, {self._config.port_max}]"
+            + (f", shared port={self._config.vhost_port}" if self._config.vhost_port else "")
         )
     
     async def stop(self) -> None:
         """Stop the server."""
         self._running = False
         await self._control_server.stop()
+        if self._virtual_host_listener:
+            await self._virtual_host_listener.close()
         
         # Close all agent sessions
-        sessions = await self._agent_repository.get_all()
-        for session in sessions:
+        async for session in self._agent_repository.iterate():
             await self._close_connection_uc.close_agent_session(session.agent_id)
+        self._timers.close()
         
         logger.info("Tunnel server stopped")
     
-    async def _handle_control_connection(self, reader, writer) -> None:
+    async def get_stats(self, per_agent: bool = True) -> dict:
+        """
+        Collect statistics.
+        
+        Returns:
+            'totals' with the number of agents and their streams and bytes,
+            and unless per_agent is False, 'agents' with per-agent details
+        """
+        stats = {'totals': self._agent_repository.get_stats()}
+        if self._admission.enabled:
+            stats['totals']['admission'] = self._admission.counters.as_dict()
+        if self._shaper.enabled:
+            stats['totals']['shaping'] = self._shaper.as_dict()
+        backlog = self._open_external_uc.backlog_counters
+        if self._config.max_streams or backlog.queued or backlog.rejected:
+            stats['totals']['stream_backlog'] = backlog.as_dict()
+        if not per_agent:
+            return stats
+        
+        agents = []
+        async for session in self._agent_repository.iterate():
+            agent_stats = {
+                'agent_id': session.agent_id,
+                'public_port': session.public_port,
+                'hostname': session.hostname,
+                'remote_host': session.remote_host,
+                'protocol_version': session.welcome.version,
+                'capabilities': session.welcome.capabilities,
+                'connections': session.counters.streams,
+                'detached': session.detached,
+                'bytes_to_agent': session.counters.bytes_to_agent,
+                'bytes_to_external': session.counters.bytes_to_external,
+            }
+            if session.write_scheduler:
+                agent_stats['write'] = session.write_scheduler.stats.as_dict()
+            if len(session.stripes) > 1:
+                agent_stats['stripes'] = [
+                    {
+                        'index': stripe.index,
+                        'streams': len(stripe.streams),
+                        'write': stripe.write_scheduler.stats.as_dict(),
+                    }
+                    for stripe in session.stripes
+                ]
+            if session.compressor:
+                agent_stats['compression'] = session.compressor.stats.as_dict()
+            if session.rtt.samples:
+                agent_stats['rtt'] = session.rtt.as_dict()
+            if session.admission:
+                agent_stats['admission'] = session.admission.counters.as_dict()
+            if session.stream_slots:
+                agent_stats['stream_limit'] = {
+                    'max_streams': session.stream_slots.limit,
+                    'waiting': session.stream_slots.waiting,
+                    **session.stream_slots.counters.as_dict(),
+                }
+            if session.ingress or session.egress:
+                agent_stats['shaping'] = {
+                    direction: limiter.counters.as_dict()
+                    for direction, limiter in (('ingress', session.ingress), ('egress', session.egress))
+                    if limiter
+                }
+            agents.append(agent_stats)
+        stats['agents'] = agents
+        return stats
+    
+    async def _handle_control_connection(self, frames: FrameReader, writer) -> None:
         """Handle a new control connection from an agent."""
-        codec = ProtocolCodec()
+        codec = frames.codec
         session = None
+        stripe = None
+        # Until WELCOME is sent; a peer that never speaks must not hold the connection
+        handshake_timer = None
+        if self._config.handshake_timeout:
+            handshake_timer = self._timers.call_later(
+                self._config.handshake_timeout, self._handshake_expired, writer
+            )
         
         try:
             # Read HELLO message
-            hello_data = await reader.read(4096)
-            if not hello_data:
+            frame = await frames.read_frame()
+            if not frame:
                 return
             
-            codec.feed(hello_data)
-            frame = codec.decode_frame()
-            
-            if not frame or frame[0] != HELLO:
+            if frame[0] != HELLO:
                 logger.error("Expected HELLO message")
                 return
             
             # Decode HELLO
             try:
-                token, local_host, local_port = codec.decode_hello(frame[2])
+                token, local_host, local_port, hello = codec.decode_hello_handshake(frame[2])
             except Exception as e:
                 logger.error(f"Failed to decode HELLO: {e}")
                 return
             
-            # Register agent
+            # Register agent, or add a control connection to its session
             try:
-                session = await self._register_agent_uc.execute(
-                    token, local_host, local_port, reader, writer, codec
-                )
-                
-                if not session:
-                    return
-                
-                # Create public listener for this session
-                listener = await self._public_listener_factory.create_listener(
-                    session.public_port,
-                    lambda r, w: self._handle_external_connection(session, r, w)
-                )
-                session._listener = listener
+                if hello and hello.resume:
+                    session, stripe = await self._resume_session_uc.execute(
+                        token, hello, frames, writer, codec,
+                        lambda s: self._create_write_scheduler(s, writer)
+                    )
+                elif hello and hello.session:
+                    session, stripe = await self._register_agent_uc.join(
+                        token, hello, frames, writer, codec,
+                        lambda s: self._create_write_scheduler(s, writer)
+                    )
+                else:
+                    session = await self._register_agent_uc.execute(
+                        token, local_host, local_port, frames, writer, codec, hello,
+                        connection_handler=self._handle_external_connection
+                    )
+                    
+                    if not session:
+                        return
+                    
+                    # All further frames to the agent go through the write scheduler
+                    session.stripe_policy = self._config.stripe_policy
+                    stripe = session.add_stripe(
+                        frames, writer, self._create_write_scheduler(session, writer)
+                    )
+                    
+                    # The public port was bound before WELCOME; accept the
+                    # connections queued since then. Named sessions are
+                    # reached through the shared listener.
+                    if session.listener:
+                        await session.listener.start_serving()
                 
+                if handshake_timer:
+                    handshake_timer.cancel()
                 # Process messages from agent
-                await self._process_agent_messages(session, codec)
+                await self._process_agent_messages(session, stripe, codec)
             except AuthenticationError:
                 logger.warning("Authentication failed")
                 writer.close()
                 await writer.wait_closed()
                 return
+            except ProtocolError as e:
+                # E.g. a join that reached a worker not owning the session
+                logger.info(f"Rejected control connection: {e}")
+                writer.close()
+                await writer.wait_closed()
+                return
             except Exception as e:
                 logger.error(f"Error registering agent: {e}", exc_info=True)
                 return
@@ -161,31 +386,85 @@ class TunnelServer:
         except Exception as e:
             logger.error(f"Error in control connection: {e}", exc_info=True)
         finally:
-            if session:
+            if handshake_timer:
+                handshake_timer.cancel()
+            if stripe:
+                # Only the streams of this connection end with it
+                await self._close_connection_uc.close_stripe(session.agent_id, stripe)
+            elif session:
                 await self._close_connection_uc.close_agent_session(session.agent_id)
     
+    def _handshake_expired(self, writer) -> None:
+        """Drop a control connection that did not register in time."""
+        peer = writer.get_extra_info('peername')
+        logger.info(
+            f"Control connection from {peer[0] if peer else '?'} did not complete "
+            f"the handshake within {self._config.handshake_timeout:g}s"
+        )
+        writer.transport.abort()
+    
+    def _create_write_scheduler(self, session, writer) -> WriteScheduler:
+        """Create and start the writer of one control connection of a session."""
+        scheduler = WriteScheduler(
+            writer,
+            flush_interval=self._config.flush_interval,
+            flush_bytes=self._config.flush_bytes,
+            quantum=self._config.quantum,
+            default_priority=self._config.port_priorities.get(
+                session.public_port, PRIORITY_NORMAL
+            )
+        )
+        scheduler.start()
+        return scheduler
+    
+    async def _handle_virtual_host_connection(self, hostname: str, reader, writer) -> None:
+        """Handle a connection to the shared public port."""
+        session = await self._agent_repository.get_by_hostname(hostname)
+        if not session:
+            logger.info(f"No agent registered for host {hostname}")
+            return
+        await self._handle_external_connection(session, reader, writer)
+    
     async def _handle_external_connection(self, session, reader, writer) -> None:
         """Handle a new external client connection."""
-        codec = ProtocolCodec()
+        # Frames to the agent must use the header format of its control connection
+        codec = session.codec
         
         # Open connection with agent
-        external_conn = await self._open_external_uc.execute(
-            session.public_port, reader, writer, codec
-        )
+        external_conn = await self._open_external_uc.open(session, reader, writer, codec)
         
         if not external_conn:
             return
+        if self._config.idle_timeout:
+            external_conn.idle = IdleTimeout(
+                self._timers,
+                self._config.idle_timeout,
+                lambda: self._external_idle(session, external_conn.conn_id, codec)
+            )
         
         try:
             # Relay data: external -> agent
             async def relay_external_to_agent():
+                # DATA payloads never exceed what the agent agreed to receive
+                read_size = AdaptiveReadSize(
+                    min(self._config.max_read_size, session.welcome.max_frame)
+                )
                 try:
                     while True:
-                        data = await reader.read(4096)
+                        # Pause this stream while the agent has no credit for it
+                        credit = await external_conn.send_window.wait()
+                        if not credit:
+                            break
+                        requested = min(read_size.size, credit)
+                        data = await reader.read(requested)
                         if not data:
                             break
+                        read_size.update(len(data), requested)
+                        if external_conn.idle:
+                            external_conn.idle.touch()
+                        external_conn.send_window.consume(len(data))
                         await self._relay_data_uc.relay_to_agent(
-                            session.agent_id, external_conn.conn_id, data, codec
+                            session, external_conn, data, codec
                         )
                 except Exception as e:
                     logger.debug(f"External->Agent relay ended: {e}")
@@ -206,52 +485,138 @@ class TunnelServer:
                 session.agent_id, external_conn.conn_id, codec
             )
     
-    async def _process_agent_messages(self, session, codec: ProtocolCodec) -> None:
-        """Process messages from the agent."""
-        reader = session.control_reader
-        writer = session.control_writer
+    def _external_idle(self, session, conn_id: int, codec: ProtocolCodec) -> None:
+        """Close an external connection that had no traffic for the idle timeout."""
+        logger.info(
+            f"Closing external connection {conn_id} of agent {session.agent_id}: "
+            f"idle for {self._config.idle_timeout:g}s"
+        )
+        task = asyncio.ensure_future(
+            self._close_connection_uc.close_external_connection(session.agent_id, conn_id, codec)
+        )
+        self._idle_closes.add(task)
+        task.add_done_callback(self._idle_closed)
+    
+    def _idle_closed(self, task: asyncio.Task) -> None:
+        self._idle_closes.discard(task)
+        if not task.cancelled() and task.exception():
+            logger.error(f"Failed to close idle external connection: {task.exception()}")
+    
+    async def _process_agent_messages(self, session, stripe, codec: ProtocolCodec) -> None:
+        """Process messages from one control connection of the agent."""
+        frames = stripe.reader
+        writer = stripe.writer
         
-        if not reader or not writer:
+        if not frames or not writer:
             return
         
         try:
-            while True:
-                data = await reader.read(4096)
-                if not data:
-                    break
-                
-                codec.feed(data)
-                
-                while True:
-                    frame = codec.decode_frame()
-                    if not frame:
-                        break
-                    
-                    msg_type, conn_id, payload = frame
-                    
-                    if msg_type == DATA:
-                        # Relay data from agent to external client
-                        await self._relay_data_uc.relay_to_external(
-                            session.agent_id, conn_id, payload
-                        )
-                    elif msg_type == CLOSE:
-                        # Close connection requested by agent
-                        await self._close_connection_uc.close_agent_connection(
-                            session.agent_id, conn_id
-                        )
-                    else:
-                        logger.warning(f"Unexpected message type: {msg_type}")
+            self._start_heartbeat(session, stripe, codec)
+            frames.set_frame_handler(
+                lambda batch: self._dispatch_agent_frames(session, stripe, codec, batch)
+            )
+            await frames.wait_closed()
         
         except Exception as e:
             logger.error(f"Error processing agent messages: {e}", exc_info=True)
         finally:
             # Connection closed
             pass
+    
+    def _start_heartbeat(self, session, stripe, codec: ProtocolCodec) -> None:
+        """Ping the agent on one control connection and drop the connection when it goes silent."""
+        if not session.welcome.supports(CAP_HEARTBEAT) or not session.welcome.keepalive:
+            return
+        
+        def on_dead():
+            logger.warning(
+                f"Agent {session.agent_id} sent nothing on control connection {stripe.index} "
+                f"for {self._config.heartbeat_misses} heartbeat intervals, dropping it"
+            )
+            # Ends the frame reader, which closes the stripe as usual
+            stripe.writer.transport.abort()
+        
+        stripe.heartbeat = Heartbeat(
+            session.welcome.keepalive,
+            lambda payload: stripe.write_scheduler.write(codec.encode_ping(payload), control=True),
+            on_dead,
+            misses=self._config.heartbeat_misses,
+            rtt=session.rtt
+        )
+        stripe.heartbeat.start()
+    
+    @staticmethod
+    def _handle_heartbeat(stripe, codec: ProtocolCodec, msg_type: int, payload) -> None:
+        """Answer a PING or take a round-trip sample from a PONG."""
+        if msg_type == PING:
+            stripe.write_scheduler.write(codec.encode_pong(payload), control=True)
+        elif stripe.heartbeat:
+            stripe.heartbeat.pong(payload)
+    
+    def _dispatch_agent_frames(
+        self, session, stripe, codec: ProtocolCodec, frames: list
+    ) -> Optional[Awaitable[None]]:
+        """
+        Handle a batch of frames from the agent.
+        
+        DATA and WINDOW_UPDATE frames of flow-controlled streams never wait
+        and are handled right here. From the first frame that may have to
+        wait (compressed DATA, CLOSE, any frame of a legacy agent) on, the
+        rest of the batch is handled by the returned coroutine.
+        """
+        if stripe.heartbeat:
+            stripe.heartbeat.seen()
+        if not session.welcome.supports(CAP_FLOW_CONTROL):
+            return self._handle_agent_frames(session, stripe, codec, frames)
+        
+        for index, (msg_type, conn_id, payload) in enumerate(frames):
+            if msg_type == DATA:
+                self._relay_data_uc.write_to_external(session, conn_id, payload, codec)
+            elif msg_type == WINDOW_UPDATE:
+                self._relay_data_uc.grant_window(
+                    session, conn_id, codec.decode_window_update(payload)
+                )
+            elif msg_type == PING or msg_type == PONG:
+                self._handle_heartbeat(stripe, codec, msg_type, payload)
+            else:
+                return self._handle_agent_frames(session, stripe, codec, frames[index:])
+        return None
+    
+    async def _handle_agent_frames(self, session, stripe, codec: ProtocolCodec, frames: list) -> None:
+        """Handle frames from the agent one by one."""
+        for msg_type, conn_id, payload in frames:
+            if msg_type & FLAG_COMPRESSED:
+                if not session.compressor:
+                    raise ProtocolError("Compressed frame without negotiated compression")
+                payload = await session.compressor.decompress(payload)
+                msg_type &= TYPE_MASK
+            
+            if msg_type == DATA:
+                # Relay data from agent to external client
+                await self._relay_data_uc.relay_to_external(session, conn_id, payload, codec)
+            elif msg_type == WINDOW_UPDATE:
+                # Agent granted more credit for this stream
+                self._relay_data_uc.grant_window(
+                    session, conn_id, codec.decode_window_update(payload)
+                )
+            elif msg_type == RESUME:
+                # Agent picked up its session; send what it missed
+                await self._resume_session_uc.replay(session, payload, codec)
+            elif msg_type == PING or msg_type == PONG:
+                self._handle_heartbeat(stripe, codec, msg_type, payload)
+            elif msg_type == CLOSE:
+                # Close connection requested by agent
+                await self._close_connection_uc.close_agent_connection(
+                    session.agent_id, conn_id
+                )
+            else:
+                logger.warning(f"Unexpected message type: {msg_type}")
 
 
-async def main_async() -> None:
+async def main_async(config=None) -> None:
     """Async main function."""
-    config = parse_args()
+    if config is None:
+        config = parse_args()
     setup_logging()
     
     server = TunnelServer(config)
@@ -277,10 +642,125 @@ async def main_async() -> None:
         await server.stop()
 
 
+async def _worker_async(config, conn) -> None:
+    """Run one worker: a TunnelServer that answers supervisor commands."""
+    server = TunnelServer(config)
+    loop = asyncio.get_running_loop()
+    stopping = asyncio.Event()
+    loop.add_signal_handler(signal.SIGTERM, stopping.set)
+    
+    async def send_stats():
+        try:
+            conn.send(await server.get_stats())
+        except Exception as e:
+            logger.debug(f"Failed to send worker stats: {e}")
+    
+    def on_command():
+        try:
+            command = conn.recv()
+        except (EOFError, OSError):
+            # The supervisor is gone
+            loop.remove_reader(conn.fileno())
+            stopping.set()
+            return
+        if command == CMD_STATS:
+            asyncio.create_task(send_stats())
+    
+    loop.add_reader(conn.fileno(), on_command)
+    try:
+        await server.start()
+        await stopping.wait()
+    finally:
+        loop.remove_reader(conn.fileno())
+        await server.stop()
+
+
+def run_worker(config, conn) -> None:
+    """Entry point of a worker process."""
+    setup_logging()
+    asyncio.run(_worker_async(config, conn))
+
+
+def worker_configs(config) -> list:
+    """Configs of the `config.workers` worker processes."""
+    # Each worker allocates public ports from its own part of the range and
+    # admits its share of the global accept rate and total bandwidth.
+    # SO_REUSEPORT hands every new control connection to any worker, so a
+    # HELLO joining a stripe or resuming a session would mostly miss the
+    # worker holding its session: workers offer neither.
+    return [
+        replace(
+            config,
+            port_min=port_min,
+            port_max=port_max,
+            workers=1,
+            reuse_port=True,
+            max_stripes=1,
+            resume_grace=0.0,
+            global_accept_rate=config.global_accept_rate / config.workers,
+            global_accept_burst=config.global_accept_burst / config.workers,
+            total_ingress_rate=config.total_ingress_rate // config.workers,
+            total_egress_rate=config.total_egress_rate // config.workers,
+            total_rate_burst=config.total_rate_burst // config.workers
+        )
+        for port_min, port_max in partition_port_range(
+            config.port_min, config.port_max, config.workers
+        )
+    ]
+
+
+def run_supervisor(config) -> None:
+    """Run `config.workers` server processes sharing the control port."""
+    setup_logging()
+    
+    supervisor = WorkerSupervisor(
+        run_worker,
+        worker_configs(config),
+        cpus=cpus_for_workers(config.workers) if config.pin_cpus else None
+    )
+    
+    stopping = False
+    
+    def signal_handler(sig, frame):
+        nonlocal stopping
+        logger.info("Received shutdown signal")
+        stopping = True
+    
+    signal.signal(signal.SIGINT, signal_handler)
+    signal.signal(signal.SIGTERM, signal_handler)
+    
+    supervisor.start()
+    logger.info(
+        f"Tunnel server supervisor started: {config.workers} workers, "
+        f"control={config.bind}:{config.control_port}, "
+        f"port range=[{config.port_min}, {config.port_max}]"
+    )
+    next_stats = time.monotonic() + config.stats_interval
+    try:
+        while not stopping:
+            supervisor.poll(1.0)
+            if config.stats_interval and time.monotonic() >= next_stats:
+                next_stats = time.monotonic() + config.stats_interval
+                stats = supervisor.get_stats()
+                logger.info(
+                    "Workers: " + ", ".join(
+                        f"#{w['index']} {'up' if w['alive'] else 'down'} "
+                        f"agents={w['agents']} connections={w['connections']} restarts={w['restarts']}"
+                        for w in stats['workers']
+                    )
+                )
+    finally:
+        supervisor.stop()
+
+
 def main() -> None:
     """Main entry point."""
     try:
-        asyncio.run(main_async())
+        config = parse_args()
+        if config.workers > 1:
+            run_supervisor(config)
+        else:
+            asyncio.run(main_async(config))
     except KeyboardInterrupt:
         pass
     except Exception as e:
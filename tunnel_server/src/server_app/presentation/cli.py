@@ -1,7 +1,8 @@
 """CLI argument parser."""
 
 import argparse
-from dataclasses import dataclass
+import socket
+from dataclasses import dataclass, field
 
 
 @dataclass
@@ -12,6 +13,46 @@ class ServerConfig:
     port_min: int
     port_max: int
     token: str
+    flush_interval: float = 0.0  # seconds
+    flush_bytes: int = 256 * 1024
+    compression: bool = True
+    compact_header: bool = False  # offer the compact frame header (smaller, but slower to encode)
+    window_size: int = 256 * 1024  # per-stream receive window offered to agents
+    max_read_size: int = 64 * 1024  # ceiling of adaptive external reads
+    send_queue_size: int = 256 * 1024  # unsent bytes per external client before its sender is held
+    max_frame: int = 1024 * 1024  # max DATA payload in either direction, offered to agents
+    control_transport: str = 'stream'  # 'stream' or 'buffered' (asyncio.BufferedProtocol)
+    quantum: int = 16 * 1024  # round-robin quantum and max DATA frame to agents
+    port_priorities: dict[int, str] = field(default_factory=dict)  # public port -> priority class
+    max_stripes: int = 4  # control connections an agent may open per session
+    stripe_policy: str = 'hash'  # 'hash' or 'least-loaded' stream placement
+    workers: int = 1  # server processes sharing the control port
+    pin_cpus: bool = False  # pin each worker process to one CPU
+    stats_interval: float = 0.0  # seconds between logged worker statistics; 0 = off
+    reuse_port: bool = False  # bind the control port with SO_REUSEPORT (set for workers)
+    port_cooldown: float = 5.0  # seconds before a released public port goes to another agent
+    vhost_port: int = 0  # shared public port routing by HTTP Host / TLS SNI; 0 = off
+    vhost_peek_timeout: float = 5.0  # seconds to wait for the host name of a connection
+    resume_grace: float = 30.0  # seconds a session is held for its agent to reconnect; 0 = off
+    heartbeat_interval: float = 15.0  # seconds between PINGs offered to agents; 0 = off
+    heartbeat_misses: int = 3  # silent intervals after which a control connection is dropped
+    handshake_timeout: float = 10.0  # seconds for a new control connection to register; 0 = off
+    idle_timeout: float = 0.0  # seconds without traffic after which an external connection is closed; 0 = off
+    accept_rate: float = 0.0  # new external connections per second and public port; 0 = unlimited
+    accept_burst: float = 0.0  # connections a port may accept at once; 0 = one second's worth
+    global_accept_rate: float = 0.0  # new external connections per second over all ports; 0 = unlimited
+    global_accept_burst: float = 0.0  # 0 = one second's worth
+    accept_queue_timeout: float = 0.5  # seconds a connection over the rate may wait for admission
+    accept_queue_size: int = 64  # connections per port waiting for admission
+    agent_ingress_rate: int = 0  # bytes per second from external clients to each agent; 0 = unlimited
+    agent_egress_rate: int = 0  # bytes per second from each agent to its external clients; 0 = unlimited
+    agent_rate_burst: int = 0  # bytes an agent may send at once above its rate; 0 = 100 ms worth
+    total_ingress_rate: int = 0  # bytes per second to all agents, shared fairly; 0 = unlimited
+    total_egress_rate: int = 0  # bytes per second from all agents, shared fairly; 0 = unlimited
+    total_rate_burst: int = 0  # 0 = 100 ms worth
+    max_streams: int = 0  # concurrent streams per agent, offered to agents; 0 = unlimited
+    stream_backlog: int = 64  # connections per agent waiting for a stream
+    stream_backlog_timeout: float = 5.0  # seconds a connection waits for a stream; 0 = do not wait
 
 
 def parse_args() -> ServerConfig:
@@ -46,16 +87,338 @@ def parse_args() -> ServerConfig:
         help='Authentication token'
     )
     
+    parser.add_argument(
+        '--flush-interval-ms',
+        type=float,
+        default=0.0,
+        help='Max delay before queued control frames are flushed, in ms (default: 0)'
+    )
+    parser.add_argument(
+        '--flush-bytes',
+        type=int,
+        default=256 * 1024,
+        help='Flush queued control frames once this many bytes are pending (default: 262144)'
+    )
+    parser.add_argument(
+        '--window-size',
+        type=int,
+        default=256 * 1024,
+        help='Per-stream receive window offered to agents, bytes (default: 262144)'
+    )
+    parser.add_argument(
+        '--max-read-size',
+        type=int,
+        default=64 * 1024,
+        help='Upper limit for adaptive reads from external clients, bytes (default: 65536)'
+    )
+    parser.add_argument(
+        '--send-queue-size',
+        type=int,
+        default=256 * 1024,
+        help='Unsent bytes queued per external client before the agent side is held back (default: 262144)'
+    )
+    parser.add_argument(
+        '--max-frame',
+        type=int,
+        default=1024 * 1024,
+        help='Max DATA payload offered to agents, bytes (default: 1048576)'
+    )
+    parser.add_argument(
+        '--no-compression',
+        action='store_true',
+        help='Refuse DATA compression requested by agents'
+    )
+    parser.add_argument(
+        '--compact-header',
+        action='store_true',
+        help='Offer agents the compact varint frame header: up to 6 bytes smaller per frame, '
+             'but slower to encode and decode than the fixed 9-byte header'
+    )
+    parser.add_argument(
+        '--control-transport',
+        choices=['stream', 'buffered'],
+        default='stream',
+        help='Control connection receive path: StreamReader or BufferedProtocol (default: stream)'
+    )
+    parser.add_argument(
+        '--quantum',
+        type=int,
+        default=16 * 1024,
+        help='Round-robin quantum between streams of an agent, bytes (default: 16384)'
+    )
+    parser.add_argument(
+        '--port-priority',
+        action='append',
+        default=[],
+        metavar='PORT=CLASS',
+        help='Priority class (interactive, normal, bulk) of the streams of a public port; repeatable'
+    )
+    parser.add_argument(
+        '--max-stripes',
+        type=int,
+        default=4,
+        help='Max control connections per agent session; 1 disables striping (default: 4)'
+    )
+    parser.add_argument(
+        '--stripe-policy',
+        choices=['hash', 'least-loaded'],
+        default='hash',
+        help='How streams are spread over the control connections of an agent (default: hash)'
+    )
+    parser.add_argument(
+        '--workers',
+        type=int,
+        default=1,
+        help='Worker processes sharing the control port via SO_REUSEPORT; '
+             'disables striping and session resume (default: 1)'
+    )
+    parser.add_argument(
+        '--pin-cpus',
+        action='store_true',
+        help='Pin every worker process to its own CPU'
+    )
+    parser.add_argument(
+        '--stats-interval',
+        type=float,
+        default=0.0,
+        help='Log aggregated worker statistics every N seconds (default: 0, off)'
+    )
+    parser.add_argument(
+        '--port-cooldown',
+        type=float,
+        default=5.0,
+        help='Seconds before a released public port is given to another agent (default: 5)'
+    )
+    parser.add_argument(
+        '--vhost-port',
+        type=int,
+        default=0,
+        help='Shared public port routing connections to agents by HTTP Host or TLS SNI (default: 0, off)'
+    )
+    parser.add_argument(
+        '--vhost-peek-timeout',
+        type=float,
+        default=5.0,
+        help='Seconds to wait for the Host header or ClientHello on the shared port (default: 5)'
+    )
+    parser.add_argument(
+        '--resume-grace',
+        type=float,
+        default=30.0,
+        help='Seconds a disconnected agent has to resume its session and streams (default: 30, 0 = off)'
+    )
+    parser.add_argument(
+        '--heartbeat-interval',
+        type=float,
+        default=15.0,
+        help='Seconds between PINGs on agent control connections (default: 15, 0 = off)'
+    )
+    parser.add_argument(
+        '--heartbeat-misses',
+        type=int,
+        default=3,
+        help='Heartbeat intervals without frames from an agent before its connection is dropped (default: 3)'
+    )
+    parser.add_argument(
+        '--handshake-timeout',
+        type=float,
+        default=10.0,
+        help='Seconds a new control connection has to complete HELLO/WELCOME (default: 10, 0 = off)'
+    )
+    parser.add_argument(
+        '--idle-timeout',
+        type=float,
+        default=0.0,
+        help='Close external connections without traffic in either direction for this many seconds (default: 0, off)'
+    )
+    parser.add_argument(
+        '--accept-rate',
+        type=float,
+        default=0.0,
+        help='New external connections per second admitted on each public port (default: 0, unlimited)'
+    )
+    parser.add_argument(
+        '--accept-burst',
+        type=float,
+        default=0.0,
+        help='Connections a public port may admit at once above its rate (default: one second\'s worth)'
+    )
+    parser.add_argument(
+        '--global-accept-rate',
+        type=float,
+        default=0.0,
+        help='New external connections per second admitted over all public ports (default: 0, unlimited)'
+    )
+    parser.add_argument(
+        '--global-accept-burst',
+        type=float,
+        default=0.0,
+        help='Connections admitted at once over all ports above the global rate (default: one second\'s worth)'
+    )
+    parser.add_argument(
+        '--accept-queue-timeout',
+        type=float,
+        default=0.5,
+        help='Seconds a connection over the accept rate waits for admission before it is closed (default: 0.5)'
+    )
+    parser.add_argument(
+        '--accept-queue-size',
+        type=int,
+        default=64,
+        help='Connections per public port that may wait for admission at once (default: 64)'
+    )
+    parser.add_argument(
+        '--agent-ingress-rate',
+        type=int,
+        default=0,
+        help='Bytes per second relayed from external clients to each agent (default: 0, unlimited)'
+    )
+    parser.add_argument(
+        '--agent-egress-rate',
+        type=int,
+        default=0,
+        help='Bytes per second relayed from each agent to its external clients (default: 0, unlimited)'
+    )
+    parser.add_argument(
+        '--agent-rate-burst',
+        type=int,
+        default=0,
+        help='Bytes an agent may relay at once above its rate (default: 100 ms worth, at least 64 KiB)'
+    )
+    parser.add_argument(
+        '--total-ingress-rate',
+        type=int,
+        default=0,
+        help='Bytes per second relayed to all agents, shared fairly between them (default: 0, unlimited)'
+    )
+    parser.add_argument(
+        '--total-egress-rate',
+        type=int,
+        default=0,
+        help='Bytes per second relayed from all agents, shared fairly between them (default: 0, unlimited)'
+    )
+    parser.add_argument(
+        '--total-rate-burst',
+        type=int,
+        default=0,
+        help='Bytes relayed at once above the total rates (default: 100 ms worth, at least 64 KiB)'
+    )
+    parser.add_argument(
+        '--max-streams',
+        type=int,
+        default=0,
+        help='Concurrent external connections per agent; agents may ask for fewer (default: 0, unlimited)'
+    )
+    parser.add_argument(
+        '--stream-backlog',
+        type=int,
+        default=64,
+        help='External connections per agent that may wait for a free stream (default: 64)'
+    )
+    parser.add_argument(
+        '--stream-backlog-timeout',
+        type=float,
+        default=5.0,
+        help='Seconds an external connection waits for a free stream before it is closed (default: 5, 0 = close at once)'
+    )
+    
     args = parser.parse_args()
     
     if args.port_min > args.port_max:
         parser.error("--port-min must be <= --port-max")
+    if not 0 < args.max_frame <= 1024 * 1024:
+        parser.error("--max-frame must be between 1 and 1048576")
+    if args.send_queue_size <= 0:
+        parser.error("--send-queue-size must be positive")
+    if args.quantum <= 0:
+        parser.error("--quantum must be positive")
+    if args.max_stripes <= 0:
+        parser.error("--max-stripes must be positive")
+    if args.workers <= 0:
+        parser.error("--workers must be positive")
+    if args.workers > 1 and not hasattr(socket, 'SO_REUSEPORT'):
+        parser.error("--workers requires SO_REUSEPORT, which this platform does not support")
+    if args.workers > args.port_max - args.port_min + 1:
+        parser.error("--workers must not exceed the number of public ports")
+    if args.vhost_port:
+        if not 0 < args.vhost_port <= 65535:
+            parser.error("--vhost-port must be between 1 and 65535")
+        if args.port_min <= args.vhost_port <= args.port_max or args.vhost_port == args.control:
+            parser.error("--vhost-port must be outside the public port range and differ from --control")
+        if args.workers > 1:
+            # A connection could reach a worker that does not hold its agent
+            parser.error("--vhost-port cannot be combined with --workers")
+    if args.port_cooldown < 0:
+        parser.error("--port-cooldown must not be negative")
+    if args.resume_grace < 0:
+        parser.error("--resume-grace must not be negative")
+    if args.heartbeat_interval < 0:
+        parser.error("--heartbeat-interval must not be negative")
+    if args.heartbeat_misses < 1:
+        parser.error("--heartbeat-misses must be at least 1")
+    if args.handshake_timeout < 0 or args.idle_timeout < 0:
+        parser.error("--handshake-timeout and --idle-timeout must not be negative")
+    for name in ('accept_rate', 'accept_burst', 'global_accept_rate', 'global_accept_burst',
+                 'accept_queue_timeout', 'accept_queue_size',
+                 'agent_ingress_rate', 'agent_egress_rate', 'agent_rate_burst',
+                 'total_ingress_rate', 'total_egress_rate', 'total_rate_burst',
+                 'max_streams', 'stream_backlog', 'stream_backlog_timeout'):
+        if getattr(args, name) < 0:
+            parser.error(f"--{name.replace('_', '-')} must not be negative")
+    if args.vhost_peek_timeout <= 0:
+        parser.error("--vhost-peek-timeout must be positive")
+    
+    port_priorities = {}
+    for item in args.port_priority:
+        port, _, priority = item.partition('=')
+        if not port.isdigit() or priority not in ('interactive', 'normal', 'bulk'):
+            parser.error(f"Invalid --port-priority {item!r}, expected PORT=interactive|normal|bulk")
+        port_priorities[int(port)] = priority
     
     return ServerConfig(
         bind=args.bind,
         control_port=args.control,
         port_min=args.port_min,
         port_max=args.port_max,
-        token=args.token
+        token=args.token,
+        flush_interval=args.flush_interval_ms / 1000.0,
+        flush_bytes=args.flush_bytes,
+        compression=not args.no_compression,
+        compact_header=args.compact_header,
+        window_size=args.window_size,
+        max_read_size=args.max_read_size,
+        send_queue_size=args.send_queue_size,
+        max_frame=args.max_frame,
+        control_transport=args.control_transport,
+        quantum=args.quantum,
+        port_priorities=port_priorities,
+        max_stripes=args.max_stripes,
+        stripe_policy=args.stripe_policy,
+        workers=args.workers,
+        pin_cpus=args.pin_cpus,
+        stats_interval=args.stats_interval,
+        port_cooldown=args.port_cooldown,
+        vhost_port=args.vhost_port,
+        vhost_peek_timeout=args.vhost_peek_timeout,
+        resume_grace=args.resume_grace,
+        heartbeat_interval=args.heartbeat_interval,
+        heartbeat_misses=args.heartbeat_misses,
+        handshake_timeout=args.handshake_timeout,
+        idle_timeout=args.idle_timeout,
+        accept_rate=args.accept_rate,
+        accept_burst=args.accept_burst,
+        global_accept_rate=args.global_accept_rate,
+        global_accept_burst=args.global_accept_burst,
+        accept_queue_timeout=args.accept_queue_timeout,
+        accept_queue_size=args.accept_queue_size,
+        agent_ingress_rate=args.agent_ingress_rate,
+        agent_egress_rate=args.agent_egress_rate,
+        agent_rate_burst=args.agent_rate_burst,
+        total_ingress_rate=args.total_ingress_rate,
+        total_egress_rate=args.total_egress_rate,
+        total_rate_burst=args.total_rate_burst,
+        max_streams=args.max_streams,
+        stream_backlog=args.stream_backlog,
+        stream_backlog_timeout=args.stream_backlog_timeout
     )
 
@@ -0,0 +1,104 @@
+"""Tests for accept-rate admission control."""
+
+import asyncio
+
+import pytest
+from src.server_app.main import TunnelServer
+from src.server_app.presentation.cli import ServerConfig
+from src.server_app.common.protocol import ProtocolCodec
+from src.server_app.common.framing import WELCOME, OPEN
+from src.server_app.common.admission import TokenBucket, AdmissionController
+from src.server_app.common.handshake import Handshake, PROTOCOL_VERSION, CAP_FLOW_CONTROL
+
+
+def test_token_bucket():
+    """Test burst, refill and the wait for the next token."""
+    bucket = TokenBucket(rate=10, burst=2)
+    now = bucket._updated
+    for _ in range(2):
+        assert bucket.ready(now)
+        bucket.take()
+    assert not bucket.ready(now)
+    assert bucket.wait_time(now) == pytest.approx(0.1)
+    assert bucket.ready(now + 0.11)
+    # Never more than the burst
+    assert bucket.wait_time(now + 60) == 0
+    bucket.take()
+    bucket.take()
+    assert not bucket.ready(now + 60)
+
+
+@pytest.mark.asyncio
+async def test_admission_queues_then_rejects():
+    """Test that connections over the rate wait, and are rejected once the queue is full."""
+    admission = AdmissionController(port_rate=20, port_burst=1, queue_timeout=0.2, queue_size=2)
+    hot = admission.create_port()
+    quiet = admission.create_port()
+    
+    results = await asyncio.gather(*(admission.admit(hot) for _ in range(4)))
+    # One from the burst, two queued for 50 ms each, one over the queue size
+    assert sorted(results) == [False, True, True, True]
+    assert hot.counters.as_dict() == {'admitted': 3, 'queued': 2, 'rejected': 1}
+    
+    # Other ports keep their own rate
+    assert await admission.admit(quiet)
+    assert admission.counters.as_dict() == {'admitted': 4, 'queued': 2, 'rejected': 1}
+
+
+@pytest.mark.asyncio
+async def test_global_rate_limit():
+    """Test that the global bucket limits all ports together."""
+    admission = AdmissionController(global_rate=1, global_burst=2)
+    ports = [admission.create_port() for _ in range(3)]
+    assert [await admission.admit(port) for port in ports] == [True, True, False]
+
+
+@pytest.mark.asyncio
+async def test_flood_is_refused_before_open():
+    """Test that connections over the port's rate never reach the agent."""
+    server = TunnelServer(ServerConfig(
+        bind="127.0.0.1",
+        control_port=7017,
+        port_min=10091,
+        port_max=10095,
+        token="testtoken",
+        compact_header=False,
+        accept_rate=0.1,
+        accept_burst=2,
+        accept_queue_timeout=0
+    ))
+    await server.start()
+    try:
+        reader, writer = await asyncio.open_connection("127.0.0.1", 7017)
+        codec = ProtocolCodec()
+        hello = Handshake(version=PROTOCOL_VERSION, capabilities=CAP_FLOW_CONTROL)
+        writer.write(codec.encode_hello("testtoken", "localhost", 8080, hello))
+        codec.feed(await asyncio.wait_for(reader.read(65536), 2))
+        msg_type, _, payload = codec.decode_frame()
+        assert msg_type == WELCOME
+        public_port = codec.decode_welcome(payload)
+        
+        clients = [await asyncio.open_connection("127.0.0.1", public_port) for _ in range(5)]
+        # Refused connections are closed without reaching the agent
+        closed = 0
+        for ext_reader, _ in clients:
+            try:
+                if await asyncio.wait_for(ext_reader.read(), 0.5) == b'':
+                    closed += 1
+            except asyncio.TimeoutError:
+                pass
+        assert closed == 3
+        
+        opens = []
+        while len(opens) < 2:
+            codec.feed(await asyncio.wait_for(reader.read(65536), 2))
+            opens.extend(frame for frame in iter(codec.decode_frame, None) if frame[0] == OPEN)
+        
+        stats = await server.get_stats()
+        assert stats['totals']['admission'] == {'admitted': 2, 'queued': 0, 'rejected': 3}
+        assert stats['agents'][0]['admission']['rejected'] == 3
+        for _, ext_writer in clients:
+            ext_writer.close()
+        writer.close()
+    finally:
+        await server.stop()
@@ -0,0 +1,61 @@
+"""Tests for agent session stripes."""
+
+import pytest
+from src.server_app.domain.entities.agent_session import AgentSession, STRIPE_LEAST_LOADED
+from src.server_app.domain.entities.external_conn import ExternalConn
+
+
+def _session(stripes: int, policy: str = 'hash') -> AgentSession:
+    session = AgentSession(
+        agent_id="agent-1",
+        token="token",
+        local_host="localhost",
+        local_port=8080,
+        public_port=10001,
+        stripe_policy=policy
+    )
+    for index in range(stripes):
+        session.add_stripe(f"reader{index}", f"writer{index}", f"scheduler{index}")
+    return session
+
+
+def _open(session: AgentSession, conn_id: int) -> ExternalConn:
+    conn = ExternalConn(conn_id=conn_id, agent_id=session.agent_id)
+    conn.stripe = session.assign_stripe(conn_id)
+    session.add_external_connection(conn)
+    return conn
+
+
+def test_stripe_assignment():
+    """Test that streams are spread over the control connections."""
+    session = _session(3)
+    assert session.write_scheduler == "scheduler0"
+    conns = [_open(session, conn_id) for conn_id in range(1, 7)]
+    assert [session.scheduler_for(conn) for conn in conns] == [
+        "scheduler1", "scheduler2", "scheduler0", "scheduler1", "scheduler2", "scheduler0"
+    ]
+    
+    # Least loaded: the connection with the fewest open streams
+    session = _session(3, STRIPE_LEAST_LOADED)
+    for conn_id in range(1, 4):
+        _open(session, conn_id)
+    session.remove_external_connection(2)
+    assert _open(session, 4).stripe is session.stripes[1]
+    assert [len(stripe.streams) for stripe in session.stripes] == [1, 1, 1]
+
+
+def test_remove_stripe():
+    """Test that a lost control connection only takes its own streams."""
+    session = _session(2)
+    conns = [_open(session, conn_id) for conn_id in range(1, 5)]
+    
+    lost = session.remove_stripe(session.stripes[0])
+    assert [conn.conn_id for conn in lost] == [2, 4]
+    assert session.write_scheduler == "scheduler1"
+    assert session.control_writer == "writer1"
+    assert _open(session, 5).stripe is session.stripes[0]
+    
+    assert session.remove_stripe(session.stripes[0]) == [conns[0], conns[2], session.get_external_connection(5)]
+    assert session.write_scheduler is None
+    assert session.assign_stripe(6) is None
+
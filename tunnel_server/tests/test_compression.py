@@ -0,0 +1,105 @@
+"""Tests for DATA compression."""
+
+import os
+import tracemalloc
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+from src.server_app.common.compression import (
+    CODECS,
+    FrameCompressor,
+    available_codecs,
+    choose_codec
+)
+from src.server_app.common.framing import FLAG_COMPRESSED, MAX_PAYLOAD
+from src.server_app.common.errors import ProtocolError
+
+
+def test_choose_codec():
+    """Test that the first offered codec available here is chosen."""
+    assert choose_codec(['unknown', 'zlib']) == 'zlib'
+    assert choose_codec(['unknown']) is None
+
+
+@pytest.mark.asyncio
+async def test_compress_roundtrip():
+    """Test that compressible data is compressed and restored."""
+    sender = FrameCompressor('zlib')
+    receiver = FrameCompressor('zlib')
+    data = b'{"key": "value"}' * 4096
+    
+    flags, payload = await sender.compress(1, data)
+    assert flags == FLAG_COMPRESSED
+    assert len(payload) < len(data)
+    assert await receiver.decompress(payload) == data
+    
+    stats = sender.stats
+    assert stats.frames_compressed == 1
+    assert stats.ratio < 0.1
+
+
+@pytest.mark.asyncio
+async def test_incompressible_stream_backs_off():
+    """Test that a stream whose data does not shrink is skipped for a while."""
+    compressor = FrameCompressor('zlib')
+    data = os.urandom(4096)
+    
+    flags, payload = await compressor.compress(1, data)
+    assert flags == 0
+    assert payload == data
+    
+    # The next chunks of that stream are not even tried
+    results = [(await compressor.compress(1, b'a' * 4096))[0] for _ in range(20)]
+    skipped = results.index(FLAG_COMPRESSED)
+    assert skipped > 0
+    assert not any(results[:skipped])
+    
+    # Other streams are unaffected
+    flags, _ = await compressor.compress(2, b'a' * 4096)
+    assert flags == FLAG_COMPRESSED
+
+
+@pytest.mark.asyncio
+async def test_decompress_rejects_oversized_payload():
+    """Test that a payload inflating past MAX_PAYLOAD is rejected."""
+    compressor = FrameCompressor('zlib')
+    _, payload = await compressor.compress(1, bytes(MAX_PAYLOAD + 1))
+    
+    with pytest.raises(ProtocolError):
+        await compressor.decompress(payload)
+
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize('codec', available_codecs())
+async def test_decompression_bomb_is_bounded(codec):
+    """Test that a tiny payload inflating far past MAX_PAYLOAD is rejected without inflating it."""
+    compress, _ = CODECS[codec]
+    bomb = compress(bytes(64 * MAX_PAYLOAD))
+    assert len(bomb) < MAX_PAYLOAD // 4
+    compressor = FrameCompressor(codec)
+    
+    tracemalloc.start()
+    try:
+        with pytest.raises(ProtocolError):
+            await compressor.decompress(bomb)
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    assert peak < 4 * MAX_PAYLOAD
+
+
+@pytest.mark.asyncio
+async def test_decompress_is_offloaded():
+    """Test that even a small payload is decompressed off the event loop."""
+    executor = ThreadPoolExecutor(1)
+    submitted = []
+    submit = executor.submit
+    executor.submit = lambda *args: submitted.append(args) or submit(*args)
+    compressor = FrameCompressor('zlib', executor)
+    _, payload = await compressor.compress(1, b'a' * 1024)
+    assert not submitted
+    
+    assert await compressor.decompress(payload) == b'a' * 1024
+    assert len(submitted) == 1
+    executor.shutdown()
@@ -0,0 +1,53 @@
+"""Tests for flow control module."""
+
+import asyncio
+
+import pytest
+from src.server_app.common.flow_control import SendWindow, ReceiveWindow
+
+
+@pytest.mark.asyncio
+async def test_send_window_pauses_until_granted():
+    """Test that a reader waits once its credit is exhausted."""
+    window = SendWindow(100)
+    assert await window.wait() == 100
+    window.consume(100)
+    
+    waiter = asyncio.create_task(window.wait())
+    await asyncio.sleep(0)
+    assert not waiter.done()
+    
+    window.grant(40)
+    assert await asyncio.wait_for(waiter, 1) == 40
+
+
+@pytest.mark.asyncio
+async def test_send_window_close_wakes_reader():
+    """Test that closing a window releases a paused reader."""
+    window = SendWindow(10)
+    window.consume(10)
+    
+    waiter = asyncio.create_task(window.wait())
+    await asyncio.sleep(0)
+    window.close()
+    assert await asyncio.wait_for(waiter, 1) == 0
+
+
+def test_receive_window_batches_updates():
+    """Test that credit is returned in batches of half a window."""
+    window = ReceiveWindow(100)
+    assert window.delivered(20) == 0
+    assert window.delivered(20) == 0
+    assert window.delivered(20) == 60
+    assert window.delivered(10) == 0
+
+@pytest.mark.asyncio
+async def test_windows_without_flow_control():
+    """Test that windows of size None never block and never return credit."""
+    send_window = SendWindow(None)
+    send_window.consume(10 * 1024 * 1024)
+    assert await send_window.wait() > 0
+    
+    recv_window = ReceiveWindow(None)
+    assert recv_window.delivered(10 * 1024 * 1024) == 0
+
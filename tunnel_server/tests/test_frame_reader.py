@@ -0,0 +1,104 @@
+"""Tests for control connection frame readers."""
+
+import asyncio
+import pytest
+from src.server_app.common.framing import FrameEncoder, DATA
+from src.server_app.infrastructure.network.asyncio_control_server import AsyncioControlServer
+from src.server_app.infrastructure.network.frame_reader import STREAM_TRANSPORT, BUFFERED_TRANSPORT
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("transport", [STREAM_TRANSPORT, BUFFERED_TRANSPORT])
+async def test_frames_delivered_in_order(transport):
+    """Test that frames reach the handler in order, also when it waits."""
+    received = []
+    first_frame = asyncio.get_running_loop().create_future()
+    
+    async def finish_batch(frames):
+        await asyncio.sleep(0.01)
+        received.extend(conn_id for _, conn_id, _ in frames)
+    
+    def on_frames(frames):
+        # Every other batch is finished asynchronously
+        if len(received) % 2:
+            return finish_batch(frames)
+        received.extend(conn_id for _, conn_id, _ in frames)
+        return None
+    
+    async def handle_connection(frames, writer):
+        first_frame.set_result(await frames.read_frame())
+        frames.set_frame_handler(on_frames)
+        await frames.wait_closed()
+    
+    server = AsyncioControlServer(transport)
+    server.set_connection_handler(handle_connection)
+    await server.start("127.0.0.1", 7002)
+    try:
+        _, writer = await asyncio.open_connection("127.0.0.1", 7002)
+        for conn_id in range(1000):
+            writer.write(FrameEncoder.encode(DATA, conn_id, b"x" * conn_id))
+            if conn_id % 100 == 0:
+                await writer.drain()
+                await asyncio.sleep(0)
+        await writer.drain()
+        writer.close()
+        
+        assert await asyncio.wait_for(first_frame, 5) == (DATA, 0, b"")
+        for _ in range(500):
+            if len(received) == 999:
+                break
+            await asyncio.sleep(0.01)
+        assert received == list(range(1, 1000))
+    finally:
+        await server.stop()
+
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("transport", [STREAM_TRANSPORT, BUFFERED_TRANSPORT])
+async def test_paused_reading_holds_frames(transport):
+    """Test that no frames are handled until every pause is resumed."""
+    received = []
+    reader_ready = asyncio.get_running_loop().create_future()
+    
+    def on_frames(frames):
+        received.extend(conn_id for _, conn_id, _ in frames)
+        if not reader_ready.done():
+            reader_ready.set_result(frames_reader)
+    
+    async def handle_connection(frames, writer):
+        nonlocal frames_reader
+        frames_reader = frames
+        frames.set_frame_handler(on_frames)
+        await frames.wait_closed()
+    
+    frames_reader = None
+    server = AsyncioControlServer(transport)
+    server.set_connection_handler(handle_connection)
+    await server.start("127.0.0.1", 7003)
+    try:
+        _, writer = await asyncio.open_connection("127.0.0.1", 7003)
+        writer.write(FrameEncoder.encode(DATA, 1, b"x"))
+        frames = await asyncio.wait_for(reader_ready, 5)
+        frames.pause_reading()
+        frames.pause_reading()
+        assert frames.reading_paused
+        
+        writer.write(FrameEncoder.encode(DATA, 2, b"y"))
+        await writer.drain()
+        await asyncio.sleep(0.05)
+        assert received == [1]
+        
+        frames.resume_reading()
+        await asyncio.sleep(0.05)
+        assert received == [1]
+        
+        frames.resume_reading()
+        for _ in range(100):
+            if len(received) == 2:
+                break
+            await asyncio.sleep(0.01)
+        assert received == [1, 2]
+        writer.close()
+    finally:
+        await server.stop()
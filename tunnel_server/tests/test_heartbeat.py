@@ -0,0 +1,135 @@
+"""Tests for control connection heartbeats."""
+
+import asyncio
+
+import pytest
+from src.server_app.main import TunnelServer
+from src.server_app.presentation.cli import ServerConfig
+from src.server_app.common.protocol import ProtocolCodec
+from src.server_app.common.heartbeat import Heartbeat, RttEstimator
+from src.server_app.common.framing import WELCOME, PING, PONG
+from src.server_app.common.handshake import (
+    Handshake,
+    PROTOCOL_VERSION,
+    CAP_FLOW_CONTROL,
+    CAP_HEARTBEAT
+)
+
+
+def test_rtt_estimator():
+    """Test the smoothed round-trip time and jitter."""
+    rtt = RttEstimator()
+    rtt.update(0.1)
+    assert rtt.srtt == pytest.approx(0.1)
+    assert rtt.jitter == pytest.approx(0.05)
+    
+    rtt.update(0.2)
+    assert rtt.srtt == pytest.approx(0.1125)
+    assert rtt.jitter == pytest.approx(0.0625)
+    assert rtt.min == pytest.approx(0.1)
+    assert rtt.as_dict()['samples'] == 2
+
+
+@pytest.mark.asyncio
+async def test_heartbeat_detects_silent_peer():
+    """Test that PONGs are measured and a silent peer is declared dead."""
+    pings = []
+    dead = asyncio.Event()
+    heartbeat = Heartbeat(0.02, pings.append, dead.set, misses=3)
+    heartbeat.start()
+    
+    # A peer that answers stays alive
+    for _ in range(5):
+        await asyncio.sleep(0.02)
+        heartbeat.seen()
+        if pings:
+            heartbeat.pong(pings[-1])
+    assert not dead.is_set()
+    assert heartbeat.rtt.samples > 0
+    
+    await asyncio.wait_for(dead.wait(), 1)
+    await heartbeat.close()
+
+
+async def _register(port: int, keepalive: float):
+    reader, writer = await asyncio.open_connection("127.0.0.1", port)
+    codec = ProtocolCodec()
+    hello = Handshake(
+        version=PROTOCOL_VERSION,
+        capabilities=CAP_FLOW_CONTROL | CAP_HEARTBEAT,
+        keepalive=keepalive
+    )
+    writer.write(codec.encode_hello("testtoken", "localhost", 8080, hello))
+    await writer.drain()
+    
+    async def read_frame():
+        while True:
+            frame = codec.decode_frame()
+            if frame:
+                return frame
+            data = await asyncio.wait_for(reader.read(65536), 5)
+            if not data:
+                return None
+            codec.feed(data)
+    
+    msg_type, _, payload = await read_frame()
+    assert msg_type == WELCOME
+    _, welcome = codec.decode_welcome_handshake(payload)
+    return codec, read_frame, writer, welcome
+
+
+def _config(control_port: int, port_min: int) -> ServerConfig:
+    return ServerConfig(
+        bind="127.0.0.1",
+        control_port=control_port,
+        port_min=port_min,
+        port_max=port_min + 4,
+        token="testtoken",
+        compact_header=False,
+        resume_grace=0,
+        heartbeat_interval=1.0,
+        heartbeat_misses=2
+    )
+
+
+@pytest.mark.asyncio
+async def test_server_measures_agent_rtt():
+    """Test that the server pings at the agreed interval and tracks the agent's RTT."""
+    server = TunnelServer(_config(7013, 10051))
+    await server.start()
+    try:
+        codec, read_frame, writer, welcome = await _register(7013, 0.05)
+        assert welcome.supports(CAP_HEARTBEAT)
+        assert welcome.keepalive == 0.05
+        
+        for _ in range(3):
+            msg_type, conn_id, payload = await read_frame()
+            assert (msg_type, conn_id) == (PING, 0)
+            writer.write(codec.encode_pong(payload))
+        await writer.drain()
+        await asyncio.sleep(0.01)
+        
+        stats = await server.get_stats()
+        assert stats['agents'][0]['rtt']['samples'] == 3
+        writer.close()
+    finally:
+        await server.stop()
+
+
+@pytest.mark.asyncio
+async def test_server_drops_silent_agent():
+    """Test that an agent that stops answering loses its session and port."""
+    server = TunnelServer(_config(7014, 10061))
+    await server.start()
+    try:
+        _, read_frame, writer, _ = await _register(7014, 0.05)
+        assert (await server.get_stats(per_agent=False))['totals']['agents'] == 1
+        
+        # Never answer: the server closes the control connection
+        while await read_frame() is not None:
+            pass
+        await asyncio.sleep(0.01)
+        assert (await server.get_stats(per_agent=False))['totals']['agents'] == 0
+        writer.close()
+    finally:
+        await server.stop()
@@ -5,6 +5,11 @@ import pytest
 import socket
 from src.server_app.main import TunnelServer
 from src.server_app.presentation.cli import ServerConfig
+from src.server_app.common.protocol import ProtocolCodec
+from src.server_app.common.framing import WELCOME, OPEN
+from src.server_app.common.handshake import Handshake, PROTOCOL_VERSION, CAP_FLOW_CONTROL
+from src.server_app.common.send_queue import SendQueue
+from src.server_app.domain.entities.external_conn import ExternalConn
 
 
 @pytest.mark.asyncio
@@ -61,3 +66,78 @@ async def test_echo_server_integration():
     finally:
         await server.stop()
 
+
+@pytest.mark.asyncio
+async def test_close_does_not_wait_for_non_reading_client():
+    """Test that closing a stream whose client stopped reading holds up no other stream."""
+    server = TunnelServer(ServerConfig(
+        bind="127.0.0.1",
+        control_port=7021,
+        port_min=10121,
+        port_max=10125,
+        token="testtoken",
+        compact_header=False,
+        compression=False,
+        window_size=16 * 1024 * 1024
+    ))
+    await server.start()
+    try:
+        reader, writer = await asyncio.open_connection("127.0.0.1", 7021)
+        codec = ProtocolCodec()
+        hello = Handshake(version=PROTOCOL_VERSION, capabilities=CAP_FLOW_CONTROL)
+        writer.write(codec.encode_hello("testtoken", "localhost", 8080, hello))
+        codec.feed(await asyncio.wait_for(reader.read(65536), 2))
+        msg_type, _, payload = codec.decode_frame()
+        assert msg_type == WELCOME
+        public_port = codec.decode_welcome(payload)
+        
+        async def next_open():
+            while True:
+                frame = codec.decode_frame()
+                if frame is None:
+                    codec.feed(await reader.read(65536))
+                elif frame[0] == OPEN:
+                    return frame[1]
+        
+        # A client with a tiny receive buffer that never reads
+        stalled = socket.socket()
+        stalled.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, 4096)
+        stalled.setblocking(False)
+        await asyncio.get_running_loop().sock_connect(stalled, ("127.0.0.1", public_port))
+        stalled_id = await asyncio.wait_for(next_open(), 2)
+        ext_reader, ext_writer = await asyncio.open_connection("127.0.0.1", public_port)
+        conn_id = await asyncio.wait_for(next_open(), 2)
+        
+        # More than the socket buffers hold, then CLOSE
+        for _ in range(128):
+            writer.write(codec.encode_data(stalled_id, b'x' * 65536))
+        writer.write(codec.encode_close(stalled_id))
+        writer.write(codec.encode_data(conn_id, b'hello'))
+        await writer.drain()
+        
+        assert await asyncio.wait_for(ext_reader.readexactly(5), 2) == b'hello'
+        stats = await server.get_stats()
+        assert stats['totals']['streams'] == 1
+        
+        stalled.close()
+        ext_writer.close()
+        writer.close()
+    finally:
+        await server.stop()
+
+
+@pytest.mark.asyncio
+async def test_graceful_close_gives_up_after_linger():
+    """Test that a graceful close of a client that stopped reading aborts after the linger time."""
+    local, peer = socket.socketpair()
+    peer.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, 4096)
+    reader, writer = await asyncio.open_connection(sock=local)
+    conn = ExternalConn(conn_id=1, agent_id="agent", reader=reader, writer=writer)
+    conn.send_queue = SendQueue(writer)
+    for _ in range(64):
+        conn.send_queue.write(b'x' * 65536)
+    
+    await asyncio.wait_for(conn.close(linger=0.2), 2)
+    assert conn.is_closed()
+    assert writer.transport.is_closing()
+    peer.close()
@@ -0,0 +1,71 @@
+"""Tests for the range port allocator."""
+
+import pytest
+from src.server_app.infrastructure.allocators.range_port_allocator import RangePortAllocator
+from src.server_app.common.errors import PortAllocationError
+
+
+class _Clock:
+    def __init__(self):
+        self.now = 0.0
+    
+    def __call__(self) -> float:
+        return self.now
+
+
+@pytest.mark.asyncio
+async def test_allocate_and_release():
+    """Test that released ports are reused oldest first."""
+    allocator = RangePortAllocator(10001, 10003)
+    assert [await allocator.allocate() for _ in range(3)] == [10001, 10002, 10003]
+    assert allocator.get_available_count() == 0
+    with pytest.raises(PortAllocationError):
+        await allocator.allocate()
+    
+    await allocator.release(10002)
+    await allocator.release(10001)
+    assert await allocator.allocate() == 10002
+    assert await allocator.allocate() == 10001
+
+
+@pytest.mark.asyncio
+async def test_sticky_assignment():
+    """Test that an identity gets its previous port back while it is free."""
+    allocator = RangePortAllocator(10001, 10005)
+    port = await allocator.allocate("10.0.0.1/localhost:8080")
+    await allocator.allocate("10.0.0.2/localhost:8080")
+    await allocator.release(port)
+    assert await allocator.allocate("10.0.0.1/localhost:8080") == port
+    
+    # Once another agent holds the port, the identity gets a new one
+    await allocator.release(port)
+    assert await allocator.allocate() == 10003
+    assert await allocator.allocate() == 10004
+    assert await allocator.allocate() == 10005
+    assert await allocator.allocate() == port
+    await allocator.release(10003)
+    assert await allocator.allocate("10.0.0.1/localhost:8080") == 10003
+
+
+@pytest.mark.asyncio
+async def test_cooldown():
+    """Test that a released port is not handed to another agent right away."""
+    clock = _Clock()
+    allocator = RangePortAllocator(10001, 10002, cooldown=10.0, clock=clock)
+    port = await allocator.allocate("agent-a")
+    await allocator.release(port)
+    assert await allocator.allocate() == 10002
+    
+    # With nothing else free, a cooling port is better than none
+    await allocator.release(10002)
+    assert await allocator.allocate() == port
+    
+    # The identity that held a cooling port gets it back at once
+    assert await allocator.allocate("agent-b") == 10002
+    await allocator.release(10002)
+    assert await allocator.allocate("agent-b") == 10002
+    
+    await allocator.release(10002)
+    clock.now = 10.0
+    await allocator.release(port)
+    assert await allocator.allocate() == 10002
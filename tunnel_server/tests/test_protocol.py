@@ -2,7 +2,16 @@
 
 import pytest
 from src.server_app.common.protocol import ProtocolCodec
-from src.server_app.common.framing import HELLO, WELCOME, DATA, CLOSE
+from src.server_app.common.framing import HELLO, WELCOME, DATA, CLOSE, WINDOW_UPDATE, RESUME
+from src.server_app.common.handshake import (
+    Handshake,
+    PROTOCOL_VERSION,
+    CAP_FLOW_CONTROL,
+    CAP_COMPRESSION,
+    CAP_STRIPING,
+    CAP_RESUME,
+    negotiate
+)
 
 
 def test_hello_encode_decode():
@@ -68,3 +77,155 @@ def test_close_encode():
     assert msg_type == CLOSE
     assert conn_id == 456
 
+
+
+def test_window_update_encode_decode():
+    """Test WINDOW_UPDATE message encoding and decoding."""
+    codec = ProtocolCodec()
+    
+    frame = codec.encode_window_update(789, 65536)
+    codec.feed(frame)
+    result = codec.decode_frame()
+    
+    assert result is not None
+    msg_type, conn_id, payload = result
+    assert msg_type == WINDOW_UPDATE
+    assert conn_id == 789
+    assert codec.decode_window_update(payload) == 65536
+
+def test_binary_hello_welcome():
+    """Test the versioned HELLO/WELCOME with capability parameters."""
+    codec = ProtocolCodec()
+    offer = Handshake(
+        version=PROTOCOL_VERSION,
+        capabilities=CAP_FLOW_CONTROL | CAP_COMPRESSION,
+        max_frame=65536,
+        window_size=131072,
+        keepalive=15.0,
+        compression=['zstd', 'zlib']
+    )
+    
+    codec.feed(codec.encode_hello("mytoken", "localhost", 8080, offer))
+    _, _, payload = codec.decode_frame()
+    assert codec.decode_hello(payload) == ("mytoken", "localhost", 8080)
+    assert codec.decode_hello_handshake(payload) == ("mytoken", "localhost", 8080, offer)
+    
+    answer = Handshake(version=PROTOCOL_VERSION, capabilities=CAP_FLOW_CONTROL)
+    codec.feed(codec.encode_welcome(10001, answer))
+    _, _, payload = codec.decode_frame()
+    assert codec.decode_welcome(payload) == 10001
+    assert codec.decode_welcome_handshake(payload) == (10001, answer)
+
+
+def test_legacy_hello_welcome_handshake():
+    """Test that legacy messages decode to a legacy handshake."""
+    codec = ProtocolCodec()
+    
+    codec.feed(codec.encode_hello("mytoken", "localhost", 8080))
+    _, _, payload = codec.decode_frame()
+    token, host, port, hello = codec.decode_hello_handshake(payload)
+    assert (token, host, port) == ("mytoken", "localhost", 8080)
+    assert hello.is_legacy
+    assert not hello.supports(CAP_FLOW_CONTROL)
+    
+    # A legacy handshake is answered with a legacy WELCOME
+    frame = codec.encode_welcome(10001, Handshake())
+    assert len(frame) == 9 + 4
+    codec.feed(frame)
+    _, _, payload = codec.decode_frame()
+    port, welcome = codec.decode_welcome_handshake(payload)
+    assert port == 10001
+    assert welcome.is_legacy
+
+
+def test_negotiate():
+    """Test that the server agrees on the common subset of features."""
+    offer = Handshake(
+        version=PROTOCOL_VERSION,
+        capabilities=CAP_FLOW_CONTROL | CAP_COMPRESSION,
+        max_frame=65536,
+        window_size=131072,
+        compression=['lz4', 'zlib']
+    )
+    
+    local = Handshake(
+        version=PROTOCOL_VERSION,
+        capabilities=CAP_FLOW_CONTROL | CAP_COMPRESSION,
+        window_size=524288,
+        keepalive=30.0,
+        compression=['zlib']
+    )
+    answer = negotiate(offer, local)
+    assert answer.capabilities == CAP_FLOW_CONTROL | CAP_COMPRESSION
+    assert answer.compression == ['zlib']
+    assert answer.max_frame == 65536
+    assert answer.window_size == 524288
+    assert answer.keepalive == 30.0
+    
+    # No common codec: compression is off
+    local.compression = ['zstd']
+    answer = negotiate(offer, local)
+    assert answer.capabilities == CAP_FLOW_CONTROL
+    assert answer.compression == []
+
+
+def test_striping_handshake():
+    """Test the stripe count and session id of joined control connections."""
+    codec = ProtocolCodec()
+    offer = Handshake(version=PROTOCOL_VERSION, capabilities=CAP_STRIPING, stripes=8)
+    local = Handshake(version=PROTOCOL_VERSION, capabilities=CAP_STRIPING, stripes=4)
+    answer = negotiate(offer, local)
+    assert answer.stripes == 4
+    
+    # The WELCOME names the session that further connections join
+    answer.session = 'agent-1'
+    codec.feed(codec.encode_welcome(10001, answer))
+    _, _, payload = codec.decode_frame()
+    assert codec.decode_welcome_handshake(payload) == (10001, answer)
+    
+    join = Handshake(version=PROTOCOL_VERSION, capabilities=CAP_STRIPING, stripes=8, session='agent-1')
+    codec.feed(codec.encode_hello("mytoken", "localhost", 8080, join))
+    _, _, payload = codec.decode_frame()
+    assert codec.decode_hello_handshake(payload)[3] == join
+    
+    # Without the capability on both sides there is one connection
+    local.capabilities = 0
+    assert negotiate(offer, local).stripes == 1
+
+
+def test_resume_handshake():
+    """Test the resume token and grace period, and RESUME offsets."""
+    codec = ProtocolCodec()
+    offer = Handshake(version=PROTOCOL_VERSION, capabilities=CAP_FLOW_CONTROL | CAP_RESUME)
+    local = Handshake(version=PROTOCOL_VERSION, capabilities=CAP_FLOW_CONTROL | CAP_RESUME)
+    answer = negotiate(offer, local)
+    assert answer.supports(CAP_RESUME)
+    
+    answer.resume = 'agent-1:secret'
+    answer.resume_grace = 2.5
+    codec.feed(codec.encode_welcome(10001, answer))
+    _, _, payload = codec.decode_frame()
+    assert codec.decode_welcome_handshake(payload) == (10001, answer)
+    
+    # Replay buffers are bounded by flow control, so both are needed
+    offer.capabilities = CAP_RESUME
+    assert not negotiate(offer, local).supports(CAP_RESUME)
+    
+    codec.feed(codec.encode_resume({1: (100, 50), 2**32 - 1: (2**40, 0)}))
+    msg_type, conn_id, payload = codec.decode_frame()
+    assert (msg_type, conn_id) == (RESUME, 0)
+    assert codec.decode_resume(payload) == {1: (100, 50), 2**32 - 1: (2**40, 0)}
+
+
+def test_max_streams_handshake():
+    """Test that the smaller stream limit of both sides is agreed on."""
+    codec = ProtocolCodec()
+    local = Handshake(version=PROTOCOL_VERSION, max_streams=100)
+    assert negotiate(Handshake(version=PROTOCOL_VERSION, max_streams=8), local).max_streams == 8
+    assert negotiate(Handshake(version=PROTOCOL_VERSION), local).max_streams == 100
+    answer = negotiate(Handshake(version=PROTOCOL_VERSION, max_streams=8), Handshake(version=PROTOCOL_VERSION))
+    assert answer.max_streams == 8
+    
+    codec.feed(codec.encode_welcome(10001, answer))
+    _, _, payload = codec.decode_frame()
+    assert codec.decode_welcome_handshake(payload) == (10001, answer)
@@ -0,0 +1,177 @@
+"""Tests for bandwidth shaping."""
+
+import asyncio
+import socket
+import time
+
+import pytest
+from src.server_app.main import TunnelServer
+from src.server_app.presentation.cli import ServerConfig
+from src.server_app.common.protocol import ProtocolCodec
+from src.server_app.common.framing import WELCOME, OPEN
+from src.server_app.common.send_queue import SendQueue
+from src.server_app.common.rate_limit import (
+    TokenBucket,
+    SharedLink,
+    RateLimiter,
+    ShapingCounters,
+    BandwidthShaper
+)
+from src.server_app.common.handshake import Handshake, PROTOCOL_VERSION, CAP_FLOW_CONTROL
+
+
+def test_token_bucket_debt():
+    """Test that a request larger than the burst waits for a full bucket and leaves debt."""
+    bucket = TokenBucket(rate=1000, burst=100)
+    now = bucket._updated
+    assert bucket.ready(now, 500)
+    bucket.take(500)
+    # 400 tokens of debt plus a full bucket for the next large request
+    assert not bucket.ready(now + 0.45, 500)
+    assert bucket.wait_time(now, 500) == pytest.approx(0.5)
+    assert bucket.ready(now + 0.51, 500)
+
+
+@pytest.mark.asyncio
+async def test_rate_limiter_holds_rate():
+    """Test that an agent's transfers are held to its rate after the burst."""
+    limiter = RateLimiter(TokenBucket(100_000, 10_000), None, ShapingCounters())
+    started = time.monotonic()
+    for _ in range(10):
+        await limiter.take(5_000)
+    elapsed = time.monotonic() - started
+    # 50 KB less the 10 KB burst at 100 KB/s
+    assert 0.35 < elapsed < 0.8
+    assert limiter.counters.throttled == 8
+
+
+@pytest.mark.asyncio
+async def test_shared_link_is_fair():
+    """Test that busy agents share a link equally in bytes, whatever their transfer sizes."""
+    counters = ShapingCounters()
+    link = SharedLink(400_000, 4_000)
+    big = RateLimiter(None, link, ShapingCounters(parent=counters))
+    small = RateLimiter(None, link, ShapingCounters(parent=counters))
+    sent = {big: 0, small: 0}
+    
+    async def flow(limiter, size):
+        while True:
+            await limiter.take(size)
+            sent[limiter] += size
+    
+    tasks = [asyncio.create_task(flow(big, 16_000)), asyncio.create_task(flow(small, 1_000))]
+    await asyncio.sleep(0.5)
+    for task in tasks:
+        task.cancel()
+    await asyncio.gather(*tasks, return_exceptions=True)
+    
+    assert sent[small] == pytest.approx(sent[big], rel=0.2)
+    # Both together at the link's rate
+    assert 150_000 < sent[big] + sent[small] < 260_000
+    assert counters.throttled == big.counters.throttled + small.counters.throttled
+
+
+@pytest.mark.asyncio
+async def test_shared_link_gives_unused_share_away():
+    """Test that an agent alone on the link gets all of it, beyond any equal share."""
+    link = SharedLink(1_000_000, 10_000)
+    limiter = RateLimiter(None, link, ShapingCounters())
+    idle = RateLimiter(None, link, ShapingCounters())
+    started = time.monotonic()
+    for _ in range(30):
+        await limiter.take(10_000)
+    assert time.monotonic() - started < 0.45
+    assert idle.counters.throttled == 0
+
+
+@pytest.mark.asyncio
+async def test_send_queue_with_limiter_pauses_sender():
+    """Test that a throttled stream queues data and pauses its sender instead of growing."""
+    local, peer = socket.socketpair()
+    _, writer = await asyncio.open_connection(sock=local)
+    peer_reader, peer_writer = await asyncio.open_connection(sock=peer)
+    paused = []
+    queue = SendQueue(
+        writer,
+        high_water=32 * 1024,
+        low_water=8 * 1024,
+        on_pause=lambda: paused.append(True),
+        on_resume=lambda: paused.append(False),
+        limiter=RateLimiter(TokenBucket(256 * 1024, 16 * 1024), None, ShapingCounters())
+    )
+    
+    for i in range(8):
+        queue.write(bytes([i]) * 8192)
+    # Only the burst went out; the rest waits for bandwidth
+    assert queue.paused
+    assert paused == [True]
+    
+    data = await asyncio.wait_for(peer_reader.readexactly(8 * 8192), 2)
+    assert data == b''.join(bytes([i]) * 8192 for i in range(8))
+    assert paused == [True, False]
+    
+    await queue.close()
+    writer.close()
+    peer_writer.close()
+
+
+def test_shaper_limiters():
+    """Test which directions of an agent get a limiter."""
+    assert not BandwidthShaper().enabled
+    ingress, egress = BandwidthShaper(agent_egress=1_000_000).create_agent()
+    assert ingress is None
+    assert egress.bucket and not egress.link
+    shaper = BandwidthShaper(agent_ingress=1_000_000, total_ingress=5_000_000)
+    ingress, egress = shaper.create_agent()
+    assert ingress.bucket and ingress.link
+    assert egress is None
+
+
+@pytest.mark.asyncio
+async def test_agent_egress_is_shaped():
+    """Test that data from an agent reaches its external client at the agent's rate."""
+    server = TunnelServer(ServerConfig(
+        bind="127.0.0.1",
+        control_port=7018,
+        port_min=10101,
+        port_max=10105,
+        token="testtoken",
+        compact_header=False,
+        compression=False,
+        agent_egress_rate=200_000,
+        agent_rate_burst=20_000
+    ))
+    await server.start()
+    try:
+        reader, writer = await asyncio.open_connection("127.0.0.1", 7018)
+        codec = ProtocolCodec()
+        hello = Handshake(version=PROTOCOL_VERSION, capabilities=CAP_FLOW_CONTROL)
+        writer.write(codec.encode_hello("testtoken", "localhost", 8080, hello))
+        codec.feed(await asyncio.wait_for(reader.read(65536), 2))
+        msg_type, _, payload = codec.decode_frame()
+        assert msg_type == WELCOME
+        public_port = codec.decode_welcome(payload)
+        
+        ext_reader, ext_writer = await asyncio.open_connection("127.0.0.1", public_port)
+        codec.feed(await asyncio.wait_for(reader.read(65536), 2))
+        msg_type, conn_id, _ = codec.decode_frame()
+        assert msg_type == OPEN
+        
+        started = time.monotonic()
+        for _ in range(10):
+            writer.write(codec.encode_data(conn_id, b'x' * 10_000))
+        await writer.drain()
+        data = await asyncio.wait_for(ext_reader.readexactly(100_000), 5)
+        elapsed = time.monotonic() - started
+        assert data == b'x' * 100_000
+        # 100 KB less the 20 KB burst at 200 KB/s
+        assert elapsed > 0.3
+        
+        stats = await server.get_stats()
+        assert stats['agents'][0]['shaping']['egress']['throttled'] > 0
+        assert 'ingress' not in stats['agents'][0]['shaping']
+        assert stats['totals']['shaping']['egress']['throttled'] > 0
+        ext_writer.close()
+        writer.close()
+    finally:
+        await server.stop()
@@ -0,0 +1,38 @@
+"""Tests for adaptive read sizing."""
+
+from src.server_app.common.read_size import AdaptiveReadSize, MIN_READ_SIZE
+
+
+def test_read_size_grows_while_reads_are_full():
+    """Test that full reads double the read size up to the ceiling."""
+    read_size = AdaptiveReadSize(maximum=64 * 1024)
+    assert read_size.size == MIN_READ_SIZE
+    
+    for _ in range(10):
+        read_size.update(read_size.size)
+    assert read_size.size == 64 * 1024
+
+
+def test_read_size_shrinks_for_small_reads():
+    """Test that interactive traffic brings the read size back down."""
+    read_size = AdaptiveReadSize(maximum=64 * 1024)
+    for _ in range(10):
+        read_size.update(read_size.size)
+    
+    read_size.update(100)
+    assert read_size.size == 32 * 1024
+    for _ in range(10):
+        read_size.update(100)
+    assert read_size.size == MIN_READ_SIZE
+
+
+def test_read_size_limited_request():
+    """Test that a read limited by credit counts as full when it is filled."""
+    read_size = AdaptiveReadSize(maximum=64 * 1024)
+    read_size.update(1000, requested=1000)
+    assert read_size.size == 2 * MIN_READ_SIZE
+    
+    # A half-filled read neither grows nor shrinks
+    read_size.update(read_size.size // 2)
+    assert read_size.size == 2 * MIN_READ_SIZE
+
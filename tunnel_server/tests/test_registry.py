@@ -0,0 +1,80 @@
+"""Tests for the in-memory agent registry."""
+
+import pytest
+from src.server_app.domain.entities.agent_session import AgentSession
+from src.server_app.domain.entities.external_conn import ExternalConn
+from src.server_app.infrastructure.persistence.in_memory_registry import InMemoryAgentRegistry
+
+
+def _session(index: int, **kwargs) -> AgentSession:
+    return AgentSession(
+        agent_id=f"agent-{index}",
+        token="token",
+        local_host="localhost",
+        local_port=8080,
+        public_port=10000 + index,
+        **kwargs
+    )
+
+
+@pytest.mark.asyncio
+async def test_secondary_indexes():
+    """Test lookups by port, host name and remote address."""
+    registry = InMemoryAgentRegistry(shards=4)
+    first = _session(1, remote_host="10.0.0.1")
+    second = _session(2, remote_host="10.0.0.1", hostname="app.example.com")
+    await registry.save(first)
+    await registry.save(second)
+    
+    assert await registry.get_by_id("agent-2") is second
+    assert await registry.get_by_port(10001) is first
+    assert await registry.get_by_port(10002) is None  # named sessions share a port
+    assert await registry.get_by_hostname("app.example.com") is second
+    sessions = await registry.get_by_remote_host("10.0.0.1")
+    assert sorted(session.agent_id for session in sessions) == ["agent-1", "agent-2"]
+    
+    await registry.remove("agent-1")
+    assert await registry.get_by_port(10001) is None
+    assert await registry.get_by_remote_host("10.0.0.1") == [second]
+    await registry.remove("agent-2")
+    assert await registry.get_by_hostname("app.example.com") is None
+    assert await registry.get_by_remote_host("10.0.0.1") == []
+
+
+@pytest.mark.asyncio
+async def test_iterate_while_removing():
+    """Test that iteration skips sessions removed before they are reached."""
+    registry = InMemoryAgentRegistry(shards=4)
+    for index in range(100):
+        await registry.save(_session(index))
+    
+    seen = []
+    async for session in registry.iterate():
+        seen.append(session.agent_id)
+        if session.agent_id == "agent-0":
+            for index in range(1, 100):
+                await registry.remove(f"agent-{index}")
+    assert "agent-0" in seen
+    assert len(seen) < 100
+    assert registry.get_stats()['agents'] == 1
+
+
+@pytest.mark.asyncio
+async def test_traffic_totals():
+    """Test that stream and byte totals follow the sessions."""
+    registry = InMemoryAgentRegistry()
+    session = _session(1)
+    await registry.save(session)
+    session.add_external_connection(ExternalConn(conn_id=1, agent_id=session.agent_id))
+    session.add_external_connection(ExternalConn(conn_id=2, agent_id=session.agent_id))
+    session.counters.sent_to_agent(100)
+    session.counters.sent_to_external(40)
+    session.remove_external_connection(1)
+    assert registry.get_stats() == {
+        'agents': 1, 'streams': 1, 'bytes_to_agent': 100, 'bytes_to_external': 40
+    }
+    
+    await registry.remove(session.agent_id)
+    assert registry.get_stats() == {
+        'agents': 0, 'streams': 0, 'bytes_to_agent': 100, 'bytes_to_external': 40
+    }
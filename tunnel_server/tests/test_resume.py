@@ -0,0 +1,149 @@
+"""Tests for agent session resumption."""
+
+import asyncio
+
+import pytest
+from src.server_app.main import TunnelServer
+from src.server_app.presentation.cli import ServerConfig
+from src.server_app.common.protocol import ProtocolCodec
+from src.server_app.common.replay import ReplayBuffer
+from src.server_app.common.framing import WELCOME, OPEN, DATA, RESUME
+from src.server_app.common.handshake import (
+    Handshake,
+    PROTOCOL_VERSION,
+    CAP_FLOW_CONTROL,
+    CAP_RESUME
+)
+
+
+def test_replay_buffer():
+    """Test that acknowledged and received data is not sent again."""
+    replay = ReplayBuffer()
+    for chunk in (b"aaaa", b"bbbb", b"cccc"):
+        replay.append(chunk)
+    assert replay.size == 12
+    
+    replay.acknowledge(2)
+    assert replay.size == 10
+    
+    # The peer received 6 bytes and granted 5 of credit, 3 of it lost
+    missing, chunks = replay.resume(6, 5)
+    assert missing == 3
+    assert replay.acked == 5
+    assert b"".join(chunks) == b"bbcccc"
+    
+    # Later credit for bytes already dropped does not drop more
+    replay.acknowledge(1)
+    assert replay.size == 6
+
+
+class _Agent:
+    """Minimal agent speaking the binary protocol with resumption."""
+    
+    def __init__(self, reader, writer):
+        self.reader = reader
+        self.writer = writer
+        self.codec = ProtocolCodec()
+    
+    @classmethod
+    async def connect(cls, port: int, resume: str = '') -> '_Agent':
+        reader, writer = await asyncio.open_connection("127.0.0.1", port)
+        agent = cls(reader, writer)
+        hello = Handshake(
+            version=PROTOCOL_VERSION,
+            capabilities=CAP_FLOW_CONTROL | CAP_RESUME,
+            resume=resume
+        )
+        writer.write(agent.codec.encode_hello("testtoken", "localhost", 8080, hello))
+        await writer.drain()
+        return agent
+    
+    async def read_frame(self):
+        while True:
+            frame = self.codec.decode_frame()
+            if frame:
+                return frame
+            data = await asyncio.wait_for(self.reader.read(65536), 5)
+            assert data, "Server closed the control connection"
+            self.codec.feed(data)
+
+
+def _config(control_port: int, port_min: int, grace: float) -> ServerConfig:
+    return ServerConfig(
+        bind="127.0.0.1",
+        control_port=control_port,
+        port_min=port_min,
+        port_max=port_min + 4,
+        token="testtoken",
+        compact_header=False,
+        resume_grace=grace
+    )
+
+
+@pytest.mark.asyncio
+async def test_stream_survives_lost_control_connection():
+    """Test that a resumed agent gets the data sent while it was away."""
+    server = TunnelServer(_config(7011, 10031, 5.0))
+    await server.start()
+    try:
+        agent = await _Agent.connect(7011)
+        msg_type, _, payload = await agent.read_frame()
+        assert msg_type == WELCOME
+        public_port, welcome = agent.codec.decode_welcome_handshake(payload)
+        assert welcome.resume and welcome.resume_grace == 5.0
+        
+        _, ext_writer = await asyncio.open_connection("127.0.0.1", public_port)
+        msg_type, conn_id, _ = await agent.read_frame()
+        assert msg_type == OPEN
+        ext_writer.write(b"before")
+        await ext_writer.drain()
+        msg_type, _, payload = await agent.read_frame()
+        assert (msg_type, bytes(payload)) == (DATA, b"before")
+        
+        agent.writer.transport.abort()
+        await asyncio.sleep(0.1)
+        stats = await server.get_stats()
+        assert stats['agents'][0]['detached']
+        assert stats['totals']['streams'] == 1
+        
+        # Data from the external client is held for the agent
+        ext_writer.write(b"during")
+        await ext_writer.drain()
+        await asyncio.sleep(0.05)
+        
+        agent = await _Agent.connect(7011, resume=welcome.resume)
+        msg_type, _, payload = await agent.read_frame()
+        assert msg_type == WELCOME
+        assert agent.codec.decode_welcome_handshake(payload)[0] == public_port
+        msg_type, _, payload = await agent.read_frame()
+        assert msg_type == RESUME
+        assert agent.codec.decode_resume(payload) == {conn_id: (0, 0)}
+        
+        # The agent had only received the first DATA
+        agent.writer.write(agent.codec.encode_resume({conn_id: (6, 0)}))
+        await agent.writer.drain()
+        msg_type, _, payload = await agent.read_frame()
+        assert (msg_type, bytes(payload)) == (DATA, b"during")
+        assert not (await server.get_stats())['agents'][0]['detached']
+        ext_writer.close()
+    finally:
+        await server.stop()
+
+
+@pytest.mark.asyncio
+async def test_session_closed_after_grace_period():
+    """Test that a session not resumed in time releases its port."""
+    server = TunnelServer(_config(7012, 10041, 0.2))
+    await server.start()
+    try:
+        agent = await _Agent.connect(7012)
+        msg_type, _, _ = await agent.read_frame()
+        assert msg_type == WELCOME
+        agent.writer.transport.abort()
+        
+        await asyncio.sleep(0.1)
+        assert (await server.get_stats(per_agent=False))['totals']['agents'] == 1
+        await asyncio.sleep(0.3)
+        assert (await server.get_stats(per_agent=False))['totals']['agents'] == 0
+    finally:
+        await server.stop()
@@ -0,0 +1,124 @@
+"""Tests for per-stream send queues."""
+
+import asyncio
+import socket
+
+import pytest
+from src.server_app.common.send_queue import SendQueue
+
+
+async def _open_pair():
+    """Open a StreamWriter and the socket on the other end."""
+    local, peer = socket.socketpair()
+    reader, writer = await asyncio.open_connection(sock=local)
+    peer_reader, peer_writer = await asyncio.open_connection(sock=peer)
+    return writer, peer_reader, peer_writer
+
+
+class _Events:
+    """Records the callbacks of a send queue."""
+    
+    def __init__(self):
+        self.sent = 0
+        self.pauses = 0
+        self.resumes = 0
+    
+    def queue(self, writer, **kwargs) -> SendQueue:
+        return SendQueue(
+            writer,
+            on_sent=self._on_sent,
+            on_pause=self._on_pause,
+            on_resume=self._on_resume,
+            **kwargs
+        )
+    
+    def _on_sent(self, size):
+        self.sent += size
+    
+    def _on_pause(self):
+        self.pauses += 1
+    
+    def _on_resume(self):
+        self.resumes += 1
+
+
+@pytest.mark.asyncio
+async def test_writes_pass_through_while_peer_keeps_up():
+    """Test that data goes straight to the transport and counts as sent."""
+    writer, peer_reader, peer_writer = await _open_pair()
+    events = _Events()
+    queue = events.queue(writer)
+    
+    queue.write(b"hello ")
+    queue.write(memoryview(b"world"))
+    
+    assert events.sent == 11
+    assert queue.size == 0
+    assert await peer_reader.readexactly(11) == b"hello world"
+    
+    await queue.close()
+    writer.close()
+    peer_writer.close()
+
+
+@pytest.mark.asyncio
+async def test_slow_peer_pauses_and_resumes_sender():
+    """Test that a peer that does not read pauses the sender without blocking writes."""
+    writer, peer_reader, peer_writer = await _open_pair()
+    writer.transport.set_write_buffer_limits(high=4096)
+    events = _Events()
+    queue = events.queue(writer, high_water=64 * 1024, low_water=16 * 1024)
+    
+    chunks = [bytes([i]) * 65536 for i in range(32)]
+    for chunk in chunks:
+        # Never waits, however far behind the peer is
+        queue.write(chunk)
+    
+    assert queue.paused
+    assert events.pauses == 1
+    assert events.sent < len(chunks) * 65536
+    
+    data = await asyncio.wait_for(peer_reader.readexactly(len(chunks) * 65536), 5)
+    assert data == b"".join(chunks)
+    for _ in range(100):
+        if queue.size == 0:
+            break
+        await asyncio.sleep(0.01)
+    
+    assert not queue.paused
+    assert events.resumes == 1
+    assert events.sent == len(chunks) * 65536
+    
+    await queue.close()
+    writer.close()
+    peer_writer.close()
+
+
+@pytest.mark.asyncio
+async def test_abort_drops_data_and_releases_sender():
+    """Test that an aborted queue resumes a paused sender and refuses writes."""
+    writer, peer_reader, peer_writer = await _open_pair()
+    writer.transport.set_write_buffer_limits(high=4096)
+    events = _Events()
+    queue = events.queue(writer, high_water=64 * 1024, low_water=16 * 1024)
+    
+    for _ in range(32):
+        queue.write(b"x" * 65536)
+    assert queue.paused
+    
+    await queue.close(abort=True)
+    
+    assert not queue.paused
+    assert events.resumes == 1
+    assert queue.size == 0
+    with pytest.raises(ConnectionResetError):
+        queue.write(b"late")
+    
+    writer.transport.abort()
+    peer_writer.close()
+
+
+def test_water_marks_validated():
+    """Test that the low-water mark may not exceed the high-water mark."""
+    with pytest.raises(ValueError):
+        SendQueue(None, high_water=1024, low_water=2048)
@@ -0,0 +1,129 @@
+"""Tests for concurrent stream limits."""
+
+import asyncio
+
+import pytest
+from src.server_app.main import TunnelServer
+from src.server_app.presentation.cli import ServerConfig
+from src.server_app.common.protocol import ProtocolCodec
+from src.server_app.common.framing import WELCOME, OPEN
+from src.server_app.common.stream_limit import StreamSlots
+from src.server_app.common.timer_wheel import TimerWheel
+from src.server_app.common.handshake import Handshake, PROTOCOL_VERSION, CAP_FLOW_CONTROL
+
+
+@pytest.mark.asyncio
+async def test_backlog_is_fifo():
+    """Test that closed streams hand their slots to waiting connections in order."""
+    timers = TimerWheel(tick=0.01)
+    slots = StreamSlots(2, timers, backlog=2, timeout=1.0)
+    assert await slots.acquire()
+    assert await slots.acquire()
+    
+    order = []
+    
+    async def wait(name):
+        if await slots.acquire():
+            order.append(name)
+    
+    waiters = [asyncio.create_task(wait(name)) for name in ('first', 'second')]
+    await asyncio.sleep(0)
+    assert slots.waiting == 2
+    # The backlog is full
+    assert not await slots.acquire()
+    assert slots.counters.rejected == 1
+    
+    slots.release()
+    await asyncio.sleep(0)
+    assert order == ['first']
+    slots.release()
+    await asyncio.gather(*waiters)
+    assert order == ['first', 'second']
+    assert slots.active == 2
+    assert slots.counters.queued == 2
+    assert slots.counters.as_dict()['timed_out'] == 0
+    
+    slots.release()
+    slots.release()
+    assert slots.active == 0
+    timers.close()
+
+
+@pytest.mark.asyncio
+async def test_backlog_timeout():
+    """Test that a connection waits no longer than the backlog timeout, and the wait is counted."""
+    timers = TimerWheel(tick=0.01)
+    slots = StreamSlots(1, timers, timeout=0.05)
+    assert await slots.acquire()
+    assert not await slots.acquire()
+    
+    stats = slots.counters.as_dict()
+    assert stats['queued'] == 1 and stats['timed_out'] == 1
+    assert 40 <= stats['max_wait_ms'] < 500
+    # Nothing is left waiting, so the slot goes back to the pool
+    slots.release()
+    assert slots.active == 0 and slots.waiting == 0
+    
+    # Without a timeout, connections over the limit are refused at once
+    slots = StreamSlots(1, timers)
+    assert await slots.acquire()
+    assert not await slots.acquire()
+    assert slots.counters.rejected == 1
+    timers.close()
+
+
+@pytest.mark.asyncio
+async def test_agent_stream_limit():
+    """Test that connections beyond the agent's limit are opened as its streams close."""
+    server = TunnelServer(ServerConfig(
+        bind="127.0.0.1",
+        control_port=7019,
+        port_min=10111,
+        port_max=10115,
+        token="testtoken",
+        compact_header=False,
+        max_streams=10,
+        stream_backlog_timeout=2.0
+    ))
+    await server.start()
+    try:
+        reader, writer = await asyncio.open_connection("127.0.0.1", 7019)
+        codec = ProtocolCodec()
+        # The agent's own limit is lower than the server's
+        hello = Handshake(version=PROTOCOL_VERSION, capabilities=CAP_FLOW_CONTROL, max_streams=1)
+        writer.write(codec.encode_hello("testtoken", "localhost", 8080, hello))
+        codec.feed(await asyncio.wait_for(reader.read(65536), 2))
+        msg_type, _, payload = codec.decode_frame()
+        assert msg_type == WELCOME
+        public_port, welcome = codec.decode_welcome_handshake(payload)
+        assert welcome.max_streams == 1
+        
+        async def next_open():
+            while True:
+                frame = codec.decode_frame()
+                if frame is None:
+                    codec.feed(await reader.read(65536))
+                elif frame[0] == OPEN:
+                    return frame[1]
+        
+        first = await asyncio.open_connection("127.0.0.1", public_port)
+        conn_id = await asyncio.wait_for(next_open(), 2)
+        second = await asyncio.open_connection("127.0.0.1", public_port)
+        # The second connection waits for the first stream
+        pending = asyncio.ensure_future(next_open())
+        await asyncio.sleep(0.2)
+        assert not pending.done()
+        
+        writer.write(codec.encode_close(conn_id))
+        assert await asyncio.wait_for(pending, 2) != conn_id
+        
+        stats = await server.get_stats()
+        limit = stats['agents'][0]['stream_limit']
+        assert limit['max_streams'] == 1 and limit['queued'] == 1 and limit['waiting'] == 0
+        assert limit['avg_wait_ms'] >= 150
+        assert stats['totals']['stream_backlog']['queued'] == 1
+        for _, ext_writer in (first, second):
+            ext_writer.close()
+        writer.close()
+    finally:
+        await server.stop()
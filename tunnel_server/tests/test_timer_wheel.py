@@ -0,0 +1,113 @@
+"""Tests for the timer wheel and the timeouts built on it."""
+
+import asyncio
+
+import pytest
+from src.server_app.main import TunnelServer
+from src.server_app.presentation.cli import ServerConfig
+from src.server_app.common.protocol import ProtocolCodec
+from src.server_app.common.framing import WELCOME, OPEN, CLOSE
+from src.server_app.common.timer_wheel import TimerWheel, IdleTimeout
+from src.server_app.common.handshake import Handshake, PROTOCOL_VERSION, CAP_FLOW_CONTROL
+
+
+@pytest.mark.asyncio
+async def test_timers_fire_in_order_and_cancel():
+    """Test firing order, cancellation and delays longer than one revolution."""
+    wheel = TimerWheel(tick=0.01, slots=4)
+    loop = asyncio.get_running_loop()
+    start = loop.time()
+    fired = []
+    for delay in (0.08, 0.02, 0.05, 0.03):
+        wheel.call_later(delay, lambda d=delay: fired.append((d, loop.time() - start)))
+    cancelled = wheel.call_later(0.04, fired.append, 'cancelled')
+    cancelled.cancel()
+    assert len(wheel) == 4 and not cancelled.active
+    
+    await asyncio.sleep(0.15)
+    assert [delay for delay, _ in fired] == [0.02, 0.03, 0.05, 0.08]
+    # Never early
+    assert all(elapsed >= delay for delay, elapsed in fired)
+    assert len(wheel) == 0
+
+
+@pytest.mark.asyncio
+async def test_deadline_and_idle_timeout():
+    """Test the wheel's timeout context manager and idle timeout."""
+    wheel = TimerWheel(tick=0.01)
+    async with wheel.timeout(0.1):
+        await asyncio.sleep(0.01)
+    with pytest.raises(TimeoutError):
+        async with wheel.timeout(0.02):
+            await asyncio.sleep(1)
+    
+    idle = asyncio.Event()
+    timeout = IdleTimeout(wheel, 0.05, idle.set)
+    for _ in range(5):
+        await asyncio.sleep(0.02)
+        timeout.touch()
+    assert not idle.is_set()
+    await asyncio.wait_for(idle.wait(), 1)
+    wheel.close()
+
+
+def _config(control_port: int, port_min: int, **kwargs) -> ServerConfig:
+    return ServerConfig(
+        bind="127.0.0.1",
+        control_port=control_port,
+        port_min=port_min,
+        port_max=port_min + 4,
+        token="testtoken",
+        compact_header=False,
+        **kwargs
+    )
+
+
+@pytest.mark.asyncio
+async def test_silent_control_connection_is_dropped():
+    """Test that a control connection without HELLO is closed after the handshake timeout."""
+    server = TunnelServer(_config(7015, 10071, handshake_timeout=0.1))
+    await server.start()
+    try:
+        reader, writer = await asyncio.open_connection("127.0.0.1", 7015)
+        assert await asyncio.wait_for(reader.read(), 2) == b''
+        writer.close()
+    finally:
+        await server.stop()
+
+
+@pytest.mark.asyncio
+async def test_idle_external_connection_is_closed():
+    """Test that an external connection without traffic is closed and the agent told."""
+    server = TunnelServer(_config(7016, 10081, idle_timeout=0.1))
+    await server.start()
+    try:
+        reader, writer = await asyncio.open_connection("127.0.0.1", 7016)
+        codec = ProtocolCodec()
+        hello = Handshake(version=PROTOCOL_VERSION, capabilities=CAP_FLOW_CONTROL)
+        writer.write(codec.encode_hello("testtoken", "localhost", 8080, hello))
+        
+        async def read_frame():
+            while True:
+                frame = codec.decode_frame()
+                if frame:
+                    return frame
+                codec.feed(await asyncio.wait_for(reader.read(65536), 2))
+        
+        msg_type, _, payload = await read_frame()
+        assert msg_type == WELCOME
+        public_port = codec.decode_welcome(payload)
+        
+        ext_reader, ext_writer = await asyncio.open_connection("127.0.0.1", public_port)
+        msg_type, conn_id, _ = await read_frame()
+        assert msg_type == OPEN
+        msg_type, closed_id, _ = await read_frame()
+        assert (msg_type, closed_id) == (CLOSE, conn_id)
+        assert await asyncio.wait_for(ext_reader.read(), 2) == b''
+        # The close task is not left behind once done
+        await asyncio.sleep(0)
+        assert not server._idle_closes
+        ext_writer.close()
+        writer.close()
+    finally:
+        await server.stop()
@@ -0,0 +1,138 @@
+"""Tests for host name routing on the shared public port."""
+
+import asyncio
+import struct
+import time
+import pytest
+from src.server_app.common.virtual_host import sniff_hostname, normalize_hostname
+from src.server_app.infrastructure.network.asyncio_virtual_host_listener import AsyncioVirtualHostListener
+
+
+def _client_hello(server_name: str) -> bytes:
+    """Build a minimal TLS ClientHello record with an SNI extension."""
+    name = server_name.encode('ascii')
+    server_names = struct.pack('>BH', 0, len(name)) + name
+    sni = struct.pack('>H', len(server_names)) + server_names
+    extensions = (
+        struct.pack('>HH', 0x000a, 2) + b'\x00\x00'  # some other extension first
+        + struct.pack('>HH', 0x0000, len(sni)) + sni
+    )
+    body = (
+        b'\x03\x03' + bytes(32)  # client version, random
+        + b'\x00'  # session id
+        + struct.pack('>H', 2) + b'\x13\x01'  # cipher suites
+        + b'\x01\x00'  # compression methods
+        + struct.pack('>H', len(extensions)) + extensions
+    )
+    handshake = b'\x01' + len(body).to_bytes(3, 'big') + body
+    return b'\x16\x03\x01' + struct.pack('>H', len(handshake)) + handshake
+
+
+def test_sniff_http_host():
+    """Test that HTTP requests are routed by their Host header."""
+    request = b'GET / HTTP/1.1\r\nUser-Agent: test\r\nHost: App.Example.com:8080\r\n\r\n'
+    assert sniff_hostname(request) == 'app.example.com'
+    
+    # Incomplete headers need more bytes, a request without Host names none
+    assert sniff_hostname(request[:20]) is None
+    assert sniff_hostname(b'GET / HTTP/1.1\r\nAccept: */*\r\n\r\n') == ''
+    assert sniff_hostname(b'SSH-2.0-OpenSSH_9.6\r\n') == ''
+
+
+def test_sniff_tls_server_name():
+    """Test that TLS connections are routed by the SNI of their ClientHello."""
+    record = _client_hello('secure.example.com')
+    assert sniff_hostname(record) == 'secure.example.com'
+    assert sniff_hostname(record[:40]) is None
+    assert sniff_hostname(b'\x16\x03\x01\x00\x04\x02\x00\x00\x00') == ''
+
+
+def test_normalize_hostname():
+    """Test host name normalization."""
+    assert normalize_hostname('Example.COM.') == 'example.com'
+    assert normalize_hostname('example.com:443') == 'example.com'
+    assert normalize_hostname('[::1]:8080') == '[::1]'
+
+
+@pytest.mark.asyncio
+async def test_listener_routes_without_consuming():
+    """Test that the peeked bytes still reach the connection handler."""
+    routed = asyncio.get_running_loop().create_future()
+    
+    async def handler(hostname, reader, writer):
+        request = await reader.readuntil(b'\r\n\r\n')
+        routed.set_result((hostname, request))
+    
+    listener = AsyncioVirtualHostListener(peek_timeout=1.0)
+    await listener.start('127.0.0.1', 0, handler)
+    port = listener._sock.getsockname()[1]
+    try:
+        _, writer = await asyncio.open_connection('127.0.0.1', port)
+        # The Host header arrives in a later segment than the request line
+        writer.write(b'GET /index.html HTTP/1.1\r\n')
+        await writer.drain()
+        await asyncio.sleep(0.05)
+        writer.write(b'Host: app.example.com\r\n\r\n')
+        await writer.drain()
+        
+        hostname, request = await asyncio.wait_for(routed, 2.0)
+        assert hostname == 'app.example.com'
+        assert request == b'GET /index.html HTTP/1.1\r\nHost: app.example.com\r\n\r\n'
+        writer.close()
+    finally:
+        await listener.close()
+
+
+@pytest.mark.asyncio
+async def test_stalled_partial_request_does_not_spin():
+    """Test that connections stalled mid-request are not peeked again until more bytes arrive."""
+    routed = asyncio.get_running_loop().create_future()
+    
+    async def handler(hostname, reader, writer):
+        routed.set_result((hostname, await reader.readuntil(b'\r\n\r\n')))
+    
+    listener = AsyncioVirtualHostListener(peek_timeout=5.0)
+    await listener.start('127.0.0.1', 0, handler)
+    port = listener._sock.getsockname()[1]
+    writers = []
+    try:
+        for _ in range(50):
+            _, writer = await asyncio.open_connection('127.0.0.1', port)
+            writer.write(b'GET / HTTP/1.1\r\n')
+            writers.append(writer)
+        await asyncio.sleep(0.1)
+        
+        started = time.process_time()
+        await asyncio.sleep(0.5)
+        assert time.process_time() - started < 0.1
+        
+        # A stalled connection is still routed once the rest arrives
+        writers[0].write(b'Host: app.example.com\r\n\r\n')
+        hostname, request = await asyncio.wait_for(routed, 2.0)
+        assert hostname == 'app.example.com'
+        assert request == b'GET / HTTP/1.1\r\nHost: app.example.com\r\n\r\n'
+    finally:
+        for writer in writers:
+            writer.close()
+        await listener.close()
+
+
+@pytest.mark.asyncio
+async def test_close_drops_pending_connections():
+    """Test that closing the listener cancels connections still waiting for a host name."""
+    listener = AsyncioVirtualHostListener(peek_timeout=5.0)
+    await listener.start('127.0.0.1', 0, None)
+    port = listener._sock.getsockname()[1]
+    reader, writer = await asyncio.open_connection('127.0.0.1', port)
+    writer.write(b'GET / HTTP/1.1\r\n')
+    await asyncio.sleep(0.05)
+    assert len(listener._clients) == 1
+    
+    await asyncio.wait_for(listener.close(), 1.0)
+    assert not listener._clients
+    # Closed with the request line unread, so possibly reset
+    try:
+        assert await asyncio.wait_for(reader.read(), 1.0) == b''
+    except ConnectionResetError:
+        pass
+    writer.close()
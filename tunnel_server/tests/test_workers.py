@@ -0,0 +1,92 @@
+"""Tests for multi-process server workers."""
+
+import os
+import sys
+import time
+from types import SimpleNamespace
+
+import pytest
+from src.server_app.infrastructure.allocators.range_port_allocator import partition_port_range
+from src.server_app.infrastructure.workers.worker_supervisor import WorkerSupervisor, CMD_STATS
+from src.server_app.main import TunnelServer, worker_configs
+from src.server_app.presentation.cli import ServerConfig
+from src.server_app.common.handshake import CAP_STRIPING, CAP_RESUME
+
+pytestmark = pytest.mark.skipif(sys.platform == 'win32', reason="workers need fork")
+
+
+def _stats_worker(config, conn):
+    """Answer stats requests until the supervisor goes away."""
+    while True:
+        try:
+            command = conn.recv()
+        except EOFError:
+            return
+        if command == CMD_STATS:
+            conn.send({'agents': [{'agent_id': f"agent-{config.port_min}", 'connections': 2}]})
+
+
+def _crashing_worker(config, conn):
+    """Exit right away, as if the worker crashed."""
+    os._exit(3)
+
+
+def test_partition_port_range():
+    """Test that worker port ranges cover the range without overlapping."""
+    assert partition_port_range(10000, 10009, 3) == [(10000, 10003), (10004, 10006), (10007, 10009)]
+    assert partition_port_range(10000, 10000, 1) == [(10000, 10000)]
+    with pytest.raises(ValueError):
+        partition_port_range(10000, 10001, 3)
+
+
+def test_supervisor_stats():
+    """Test that statistics of all workers are aggregated."""
+    configs = [SimpleNamespace(port_min=10000, port_max=10004), SimpleNamespace(port_min=10005, port_max=10009)]
+    supervisor = WorkerSupervisor(_stats_worker, configs)
+    supervisor.start()
+    try:
+        stats = supervisor.get_stats()
+        assert [w['agents'] for w in stats['workers']] == [1, 1]
+        assert [w['connections'] for w in stats['workers']] == [2, 2]
+        assert [(a['agent_id'], a['worker']) for a in stats['agents']] == [
+            ('agent-10000', 0), ('agent-10005', 1)
+        ]
+    finally:
+        supervisor.stop()
+
+
+def test_supervisor_restarts_crashed_worker():
+    """Test that a worker that exits is started again."""
+    supervisor = WorkerSupervisor(_crashing_worker, [SimpleNamespace(port_min=10000, port_max=10009)])
+    supervisor.start()
+    try:
+        deadline = time.monotonic() + 5
+        while time.monotonic() < deadline:
+            supervisor.poll(0.1)
+            if supervisor.get_stats()['workers'][0]['restarts']:
+                break
+        assert supervisor.get_stats()['workers'][0]['restarts'] >= 1
+    finally:
+        supervisor.stop()
+
+
+
+def test_workers_offer_neither_striping_nor_resume():
+    """Test that workers do not offer sessions that SO_REUSEPORT would spread over them."""
+    config = ServerConfig(
+        bind="127.0.0.1",
+        control_port=7000,
+        port_min=10000,
+        port_max=10009,
+        token="testtoken",
+        workers=2,
+        max_stripes=4,
+        resume_grace=30.0
+    )
+    configs = worker_configs(config)
+    assert [(c.port_min, c.port_max) for c in configs] == [(10000, 10004), (10005, 10009)]
+    for worker_config in configs:
+        hello = TunnelServer._server_handshake(worker_config)
+        assert not hello.supports(CAP_STRIPING)
+        assert not hello.supports(CAP_RESUME)
+    assert TunnelServer._server_handshake(config).supports(CAP_STRIPING | CAP_RESUME)
@@ -0,0 +1,176 @@
+"""Tests for write scheduler."""
+
+import asyncio
+import socket
+
+import pytest
+from src.server_app.common.write_scheduler import (
+    WriteScheduler,
+    split_payload,
+    PRIORITY_INTERACTIVE,
+    PRIORITY_BULK
+)
+from src.server_app.common.errors import ConnectionError
+
+
+async def _open_pair():
+    """Open a StreamWriter and the socket on the other end."""
+    local, peer = socket.socketpair()
+    reader, writer = await asyncio.open_connection(sock=local)
+    peer_reader, peer_writer = await asyncio.open_connection(sock=peer)
+    return writer, peer_reader, peer_writer
+
+
+@pytest.mark.asyncio
+async def test_frames_are_coalesced():
+    """Test that frames queued together are written as one batch."""
+    writer, peer_reader, peer_writer = await _open_pair()
+    scheduler = WriteScheduler(writer)
+    scheduler.start()
+    
+    for i in range(10):
+        scheduler.write(bytes([i]) * 10)
+    
+    data = await peer_reader.readexactly(100)
+    assert data == b"".join(bytes([i]) * 10 for i in range(10))
+    
+    stats = scheduler.stats
+    assert stats.frames_written == 10
+    assert stats.batches == 1
+    assert stats.queue_depth == 0
+    
+    await scheduler.close()
+    writer.close()
+    peer_writer.close()
+
+
+@pytest.mark.asyncio
+async def test_flush_bytes_limits_batch_size():
+    """Test that batches are split at the byte threshold."""
+    writer, peer_reader, peer_writer = await _open_pair()
+    scheduler = WriteScheduler(writer, flush_bytes=100)
+    scheduler.start()
+    
+    for _ in range(4):
+        await scheduler.send(b"x" * 50)
+    
+    await peer_reader.readexactly(200)
+    stats = scheduler.stats
+    assert stats.frames_written == 4
+    assert stats.max_batch_bytes <= 100
+    
+    await scheduler.close()
+    writer.close()
+    peer_writer.close()
+
+
+@pytest.mark.asyncio
+async def test_flush_interval_waits_for_more_frames():
+    """Test that a flush deadline gathers frames sent shortly after each other."""
+    writer, peer_reader, peer_writer = await _open_pair()
+    scheduler = WriteScheduler(writer, flush_interval=0.05)
+    scheduler.start()
+    
+    await scheduler.send(b"a")
+    await asyncio.sleep(0.01)
+    await scheduler.send(b"b")
+    
+    assert await peer_reader.readexactly(2) == b"ab"
+    assert scheduler.stats.batches == 1
+    
+    await scheduler.close()
+    writer.close()
+    peer_writer.close()
+
+
+@pytest.mark.asyncio
+async def test_send_after_close_fails():
+    """Test that sending on a closed scheduler raises."""
+    writer, _, peer_writer = await _open_pair()
+    scheduler = WriteScheduler(writer)
+    scheduler.start()
+    await scheduler.close()
+    
+    with pytest.raises(ConnectionError):
+        await scheduler.send(b"late")
+    
+    writer.close()
+    peer_writer.close()
+
+
+@pytest.mark.asyncio
+async def test_streams_are_interleaved():
+    """Test that a stream with a long queue cannot starve another stream."""
+    writer, peer_reader, peer_writer = await _open_pair()
+    scheduler = WriteScheduler(writer, flush_bytes=1, quantum=100)
+    
+    for _ in range(5):
+        scheduler.write(b"a" * 100, stream=1)
+    scheduler.write(b"b" * 10, stream=2)
+    scheduler.start()
+    
+    data = await peer_reader.readexactly(510)
+    # One visit of a normal-priority stream sends two quanta
+    assert data.index(b"b") == 200
+    
+    await scheduler.close()
+    writer.close()
+    peer_writer.close()
+
+
+@pytest.mark.asyncio
+async def test_priority_classes():
+    """Test that an interactive stream gets a larger share than a bulk stream."""
+    writer, peer_reader, peer_writer = await _open_pair()
+    scheduler = WriteScheduler(writer, flush_bytes=1, quantum=100)
+    scheduler.set_priority(1, PRIORITY_BULK)
+    scheduler.set_priority(2, PRIORITY_INTERACTIVE)
+    
+    for _ in range(4):
+        scheduler.write(b"a" * 100, stream=1)
+    for _ in range(3):
+        scheduler.write(b"b" * 100, stream=2)
+    scheduler.start()
+    
+    data = await peer_reader.readexactly(700)
+    assert data == b"a" * 100 + b"b" * 300 + b"a" * 300
+    
+    classes = scheduler.stats.as_dict()['classes']
+    assert classes['bulk']['frames'] == 4
+    assert classes['interactive']['frames'] == 3
+    assert classes['interactive']['max_delay_ms'] >= 0
+    
+    await scheduler.close()
+    writer.close()
+    peer_writer.close()
+
+
+@pytest.mark.asyncio
+async def test_control_lane():
+    """Test that control frames skip queued DATA, except that of their own stream."""
+    writer, peer_reader, peer_writer = await _open_pair()
+    scheduler = WriteScheduler(writer, flush_bytes=1)
+    
+    for _ in range(3):
+        scheduler.write(b"a" * 100, stream=1)
+    scheduler.write(b"o", stream=2, control=True)
+    scheduler.write(b"c", stream=1, control=True)
+    scheduler.start()
+    
+    data = await peer_reader.readexactly(302)
+    assert data == b"o" + b"a" * 300 + b"c"
+    assert scheduler.stats.classes['control'].frames == 1
+    
+    await scheduler.close()
+    writer.close()
+    peer_writer.close()
+
+
+def test_split_payload():
+    """Test that payloads are split into bounded zero-copy chunks."""
+    data = bytes(range(250))
+    chunks = split_payload(data, 100)
+    assert [len(chunk) for chunk in chunks] == [100, 100, 50]
+    assert b"".join(chunks) == data
+    assert split_payload(data, 250) == [data]
+